@@ -0,0 +1,65 @@
+"""
+Benchmark del reporte de consumo de timbres.
+
+Compara la respuesta original (una consulta por certificado que regresa los
+documentos completos de facturasemitidas, con XML, QR y sellos) contra la
+agregación por certificado y día. Reporta latencia y tamaño de la respuesta.
+"""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from comun import conecta_db, mide, imprime_resultado
+from dbaccess.db_timbres import consulta_facturas_emitidas_by_certificado, resumen_consumo_por_certificado
+
+NO_CERTIFICADOS = 5
+FACTURAS_POR_CERTIFICADO = 2000
+DESDE, HASTA = "2024-01-01", "2024-01-31"
+# Tamaños aproximados de un CFDI real
+CFDI = "<cfdi:Comprobante " + "x" * 6000 + "/>"
+QR_CODE = "iVBORw0KGgo" + "A" * 4000
+SELLO = "S" * 344
+
+
+def prepara_datos(db):
+    db.facturasemitidas.delete_many({"idCertificado": {"$regex": "^bench_cert_"}})
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for c in range(NO_CERTIFICADOS):
+        db.facturasemitidas.insert_many([{
+            "idCertificado": f"bench_cert_{c}",
+            "uuid": f"bench-{c}-{i}",
+            "ticket": f"T{c}{i}",
+            "sucursal": "BENCH",
+            "fechaTimbrado": inicio + timedelta(minutes=random.randint(0, 30 * 24 * 60)),
+            "estatus": "Cancelada" if i % 50 == 0 else "Vigente",
+            "cfdi": CFDI, "qrCode": QR_CODE, "selloCFDI": SELLO, "selloSAT": SELLO,
+            "cadenaOriginalSAT": SELLO, "noCertificadoCFDI": "30001000000400002345", "noCertificadoSAT": "30001000000400002495",
+        } for i in range(FACTURAS_POR_CERTIFICADO)])
+    db.facturasemitidas.create_index([("idCertificado", 1), ("fechaTimbrado", 1)])
+
+
+def respuesta_original(db, ids):
+    certificados = [{"_id": i} for i in ids]
+    for cert in certificados:
+        cert["facturas_emitidas"] = consulta_facturas_emitidas_by_certificado(cert["_id"], DESDE, HASTA, db.facturasemitidas)
+    return json.dumps(certificados, default=str)
+
+
+def respuesta_agregada(db, ids):
+    resumen = resumen_consumo_por_certificado(ids, DESDE, HASTA, db.facturasemitidas)
+    return json.dumps([{"_id": i, "consumo": resumen[i]} for i in ids], default=str)
+
+
+def main():
+    client, db = conecta_db()
+    prepara_datos(db)
+    ids = [f"bench_cert_{c}" for c in range(NO_CERTIFICADOS)]
+    print(f"Dataset: {NO_CERTIFICADOS} certificados x {FACTURAS_POR_CERTIFICADO} facturas")
+    imprime_resultado("documentos completos", mide(lambda: respuesta_original(db, ids), repeticiones=5))
+    imprime_resultado("agregación por día", mide(lambda: respuesta_agregada(db, ids)))
+    print(f"Tamaño respuesta original: {len(respuesta_original(db, ids)) / 1024 / 1024:10.2f} MB")
+    print(f"Tamaño respuesta agregada: {len(respuesta_agregada(db, ids)) / 1024:10.2f} KB")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark del extractor de la Constancia de Situación Fiscal (sin PDF ni PyMuPDF).
+
+Genera un corpus de textos sintéticos con el mismo orden de líneas que produce
+`page.get_text("text")` sobre una constancia real (personas físicas y morales, varias
+actividades, regímenes y obligaciones) y compara la extracción anterior (varias
+pasadas sobre las líneas e impresión de cada línea) contra `ExtractorCSF`.
+
+    python benchmarks/bench_csf_parser.py
+"""
+import contextlib
+import io
+import random
+import re
+from comun import mide, imprime_resultado
+from pdf_regimen_parser_pymupdf import RegimenFiscalPyMuPDFParser, es_persona_fisica
+
+DOCUMENTOS = 200
+REGIMENES = [
+    "Régimen de Sueldos y Salarios e Ingresos Asimilados a Salarios",
+    "Régimen de las Personas Físicas con Actividades Empresariales y Profesionales",
+    "Régimen Simplificado de Confianza",
+    "Régimen de Arrendamiento",
+    "General de Ley Personas Morales",
+]
+
+
+def texto_csf(n: int, persona_fisica: bool, paginas: int) -> str:
+    lineas = ["CONSTANCIA DE SITUACIÓN FISCAL", "CÉDULA DE IDENTIFICACIÓN FISCAL",
+              "Lugar y Fecha de Emisión", "CIUDAD DE MÉXICO , A 01 DE ENERO DE 2025",
+              "Datos de Identificación del Contribuyente:", "RFC:"]
+    if persona_fisica:
+        lineas += [f"PEFA{n % 100:02d}0101AB{n % 10}", "CURP:", f"PEFA{n % 100:02d}0101HDFRRN0{n % 10}",
+                   "Nombre (s):", f"NOMBRE{n}", "Primer Apellido:", "PEREZ", "Segundo Apellido:", "FLORES"]
+    else:
+        lineas += [f"EMP{n % 100:02d}0101AB{n % 10}", "Denominación/Razón Social:",
+                   f"EMPRESA SINTETICA {n}", "Régimen Capital:", "SOCIEDAD ANONIMA DE CAPITAL VARIABLE"]
+    lineas += ["Fecha inicio de operaciones:", "01 DE ENERO DE 2010", "Estatus en el padrón:", "ACTIVO",
+               "Datos del domicilio registrado", f"Código Postal:{(n * 37) % 100000:05d}",
+               "Tipo de Vialidad: CALLE", "Nombre de Vialidad: REFORMA", "Número Exterior: 100",
+               "Actividades Económicas:", "Orden", "Actividad Económica", "Porcentaje", "Fecha Inicio", "Fecha Fin"]
+    for orden in range(1, 4):
+        lineas += [str(orden), f"Actividad económica {orden}", "100", "01/01/2010"]
+    lineas += ["Regímenes:", "Régimen", "Fecha Inicio", "Fecha Fin"]
+    for regimen in random.sample(REGIMENES, 1 + n % 3):
+        lineas += [regimen, "01/01/2010"]
+    lineas += ["Obligaciones:", "Descripción de la Obligación", "Descripción Vencimiento", "Fecha Inicio", "Fecha Fin"]
+    for pagina in range(paginas):
+        for obligacion in range(25):
+            lineas += [f"Declaración de proveedores de IVA {pagina}-{obligacion}",
+                       "A más tardar el último día del mes inmediato posterior", "01/01/2010"]
+        lineas += [f"Página [{pagina + 1}] de [{paginas}]", "Cadena Original Sello: ||2025/01/01|XXXX||"]
+    return "\n".join(lineas)
+
+
+def corpus() -> list:
+    random.seed(42)
+    return [texto_csf(n, persona_fisica=n % 2 == 0, paginas=1 + n % 4) for n in range(DOCUMENTOS)]
+
+
+def _linea_siguiente(lines, etiqueta):
+    encontrada = False
+    for line in lines:
+        if encontrada:
+            return line.strip()
+        if line.startswith(etiqueta):
+            encontrada = True
+    return None
+
+
+def _regimenes(lines):
+    fetch, regimen, fecha_fin, regimenes, count = False, False, False, [], 2
+    for line in lines:
+        print(line)
+        if line == "Obligaciones:":
+            return regimenes
+        if fetch and count % 2 == 0:
+            regimenes.append(line.strip())
+        if fetch:
+            count += 1
+        regimen = regimen or line.startswith("Regímenes:")
+        fecha_fin = fecha_fin or (line.startswith("Fecha Fin") and regimen)
+        fetch = regimen and fecha_fin
+    return None
+
+
+def extraccion_anterior(text: str) -> dict:
+    """Misma secuencia que `_extract_all_from_text` antes del extractor de una pasada"""
+    print(text)
+    lines = [l.strip() for l in re.sub(r"[\t\u00A0]+", " ", text).splitlines() if l.strip()]
+    rfc = (_linea_siguiente(lines, "RFC:") or "").upper()
+    if es_persona_fisica(rfc):
+        razon_social = " ".join(_linea_siguiente(lines, e) or ""
+                                for e in ("Nombre (s):", "Primer Apellido:", "Segundo Apellido:"))
+    else:
+        razon_social = _linea_siguiente(lines, "Denominación/Razón Social:") or ""
+    cp = ""
+    for line in lines:
+        m = re.search(r"C[oó]digo\s*Postal[:\-\s]+(\d{4,5})", line, re.IGNORECASE)
+        if m:
+            cp = m.group(1)
+            break
+    return {"razonSocial": razon_social, "Rfc": rfc, "codigoPostal": cp, "regimenFiscal": _regimenes(lines)}
+
+
+def main():
+    textos = corpus()
+    parser = RegimenFiscalPyMuPDFParser()
+    with contextlib.redirect_stdout(io.StringIO()) as salida:
+        anteriores = [extraccion_anterior(t) for t in textos]
+    bytes_log = len(salida.getvalue().encode())
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados = {
+            "varias pasadas + print por línea": mide(lambda: [extraccion_anterior(t) for t in textos], repeticiones=10),
+        }
+    resultados["una pasada (ExtractorCSF)"] = mide(
+        lambda: [parser._extract_all_from_text(t) for t in textos], repeticiones=10)
+    diferentes = sum(a != parser._extract_all_from_text(t) for a, t in zip(anteriores, textos))
+    print(f"{DOCUMENTOS} constancias sintéticas, {sum(map(len, textos)) // 1024} KiB de texto")
+    for nombre, stats in resultados.items():
+        imprime_resultado(nombre, stats)
+    print(f"Log del flujo anterior por corpus: {bytes_log // 1024} KiB; resultados distintos: {diferentes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark de la lectura de PDFs de constancias (requiere PyMuPDF).
+
+Genera constancias sintéticas de varias páginas con el texto de `bench_csf_parser`
+(la tabla de obligaciones ocupa las páginas finales) y compara:
+
+    todas las páginas     el flujo anterior: texto de todas las páginas unido y luego el parser
+    perezoso              páginas de una en una hasta tener todos los campos
+    perezoso solo texto   lo mismo con FLAGS_SOLO_TEXTO
+
+Cada modo corre en su propio proceso para medir el pico de RSS sin que lo contamine otro.
+
+    python benchmarks/bench_csf_pdf.py
+"""
+import json
+import random
+import resource
+import subprocess
+import sys
+from comun import mide, imprime_resultado
+from bench_csf_parser import texto_csf
+import fitz
+from pdf_regimen_parser_pymupdf import RegimenFiscalPyMuPDFParser
+
+LINEAS_POR_PAGINA = 60
+PAGINAS_OBLIGACIONES = [1, 4, 10]
+MODOS = ["todas las páginas", "perezoso", "perezoso solo texto"]
+
+
+def genera_pdf(paginas_obligaciones: int) -> bytes:
+    # Misma constancia en cada proceso
+    random.seed(paginas_obligaciones)
+    lineas = texto_csf(7, persona_fisica=True, paginas=paginas_obligaciones).splitlines()
+    doc = fitz.open()
+    for desde in range(0, len(lineas), LINEAS_POR_PAGINA):
+        page = doc.new_page()
+        for n, linea in enumerate(lineas[desde:desde + LINEAS_POR_PAGINA]):
+            page.insert_text((40, 40 + n * 12.5), linea, fontsize=9)
+    pdf = doc.tobytes()
+    doc.close()
+    return pdf
+
+
+def todas_las_paginas(pdf: bytes) -> dict:
+    """Flujo anterior: decodifica todas las páginas antes de empezar a buscar"""
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        text = "\n".join(page.get_text("text") for page in doc)
+    return RegimenFiscalPyMuPDFParser()._extract_all_from_text(text)
+
+
+def extractor(modo: str):
+    if modo == "todas las páginas":
+        return todas_las_paginas
+    return RegimenFiscalPyMuPDFParser(solo_texto=modo == "perezoso solo texto").extract_from_bytes
+
+
+def corre_modo(modo: str, paginas_obligaciones: int) -> None:
+    """Proceso hijo: mide un modo e imprime sus estadísticas en JSON"""
+    pdf = genera_pdf(paginas_obligaciones)
+    funcion = extractor(modo)
+    rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stats = mide(lambda: funcion(pdf), repeticiones=30)
+    stats["rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_inicial
+    stats["resultado"] = funcion(pdf)
+    print(json.dumps(stats))
+
+
+def main():
+    for paginas_obligaciones in PAGINAS_OBLIGACIONES:
+        with fitz.open(stream=genera_pdf(paginas_obligaciones), filetype="pdf") as doc:
+            print(f"Constancia de {doc.page_count} páginas")
+        resultados = []
+        for modo in MODOS:
+            salida = subprocess.run([sys.executable, __file__, modo, str(paginas_obligaciones)],
+                                    capture_output=True, text=True, check=True).stdout
+            stats = json.loads(salida.splitlines()[-1])
+            imprime_resultado(modo, stats)
+            print(f"{'':<40} pico de RSS +{stats['rss_kib']} KiB")
+            resultados.append(stats.pop("resultado"))
+        print(f"{'':<40} mismos campos en los tres modos: {all(r == resultados[0] for r in resultados)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        corre_modo(sys.argv[1], int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,79 @@
+"""
+Benchmark del listado de certificados con sucursales.
+
+Compara el patrón N+1 original (una consulta por sucursal) contra la consulta
+batched con $in y contra el pipeline de agregación con $lookup, usando un
+dataset sintético de 100 certificados y 5,000 sucursales.
+"""
+from bson.objectid import ObjectId
+from comun import conecta_db, mide, imprime_resultado
+from dbaccess.db_certificado import (
+    list_certificates,
+    list_certificates_with_sucursales,
+    get_sucursales_by_ids,
+)
+from dbaccess.db_sucursal import get_sucursal_by_id
+
+USUARIO = "bench_certificados@example.com"
+NO_CERTIFICADOS = 100
+NO_SUCURSALES = 5000
+
+
+def prepara_datos(db):
+    db.certificates.delete_many({"usuario": USUARIO})
+    db.sucursales.delete_many({"codigo_sucursal": {"$regex": "^BENCH_"}})
+    por_certificado = NO_SUCURSALES // NO_CERTIFICADOS
+    for i in range(NO_CERTIFICADOS):
+        cert_id = ObjectId()
+        sucursales = [{
+            "_id": ObjectId(),
+            "id_certificado": str(cert_id),
+            "codigo_sucursal": f"BENCH_{i}_{j}",
+            "serie": "BEN",
+            "direccion": "Calle Benchmark 123",
+            "codigo_postal": "01000",
+            "responsable": "Bench",
+            "telefono": "5500000000",
+            "regimen_fiscal": "601",
+        } for j in range(por_certificado)]
+        db.sucursales.insert_many(sucursales)
+        db.certificates.insert_one({
+            "_id": cert_id,
+            "nombre": f"Certificado {i}",
+            "rfc": "BENC000101AAA",
+            "no_certificado": f"3000100000040000{i:04d}",
+            "usuario": USUARIO,
+            "sucursales": [{"_id": str(s["_id"]), "codigo_sucursal": s["codigo_sucursal"]} for s in sucursales],
+        })
+
+
+def listado_n_mas_uno(db):
+    certificados = list_certificates(USUARIO, db.certificates)
+    for cert in certificados:
+        cert["sucursales"] = [get_sucursal_by_id(s["_id"], db.sucursales) for s in cert["sucursales"]]
+    return certificados
+
+
+def listado_batched(db):
+    certificados = list_certificates(USUARIO, db.certificates)
+    ids = [s["_id"] for cert in certificados for s in cert["sucursales"]]
+    por_id = {str(s["_id"]): s for s in get_sucursales_by_ids(ids, db.sucursales)}
+    for cert in certificados:
+        cert["sucursales"] = [por_id[s["_id"]] for s in cert["sucursales"] if s["_id"] in por_id]
+    return certificados
+
+
+def main():
+    client, db = conecta_db()
+    prepara_datos(db)
+    print(f"Dataset: {NO_CERTIFICADOS} certificados / {NO_SUCURSALES} sucursales")
+    imprime_resultado("N+1 (get_sucursal_by_id)", mide(lambda: listado_n_mas_uno(db), repeticiones=3, calentamiento=1))
+    imprime_resultado("batched ($in)", mide(lambda: listado_batched(db)))
+    imprime_resultado("agregación ($lookup)", mide(lambda: list_certificates_with_sucursales(USUARIO, db.certificates)))
+    imprime_resultado("agregación ($lookup) limit=10", mide(
+        lambda: list_certificates_with_sucursales(USUARIO, db.certificates, limit=10)))
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
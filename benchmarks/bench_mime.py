@@ -0,0 +1,93 @@
+"""
+Benchmark del armado del correo de la factura con adjuntos grandes (PDF de 1, 5 y 10 MB).
+
+El PDF llega ya en base64 (es el `pdf_cfdi_b64` de la respuesta) y el mensaje se "envía"
+a un socket nulo. Compara CPU (time.process_time) y pico de memoria (tracemalloc) de:
+
+    email.mime   b64decode + encode_base64 + as_string + lo que hace smtplib.sendmail
+                 con un str (_fix_eols, encode('ascii'), escape de puntos)
+    MensajeMIME  reutiliza el base64 y escribe el mensaje por bloques
+
+    python benchmarks/bench_mime.py
+"""
+import base64
+import os
+import smtplib
+import time
+import tracemalloc
+import comun  # noqa: F401  (agrega invoice_cdk/lambdas al sys.path)
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from mensaje_mime import MensajeMIME, Adjunto
+
+TAMANOS_MB = [1, 5, 10]
+REPETICIONES = 5
+XML = ("<cfdi:Comprobante>" + "x" * 20000 + "</cfdi:Comprobante>").encode()
+
+
+class SocketNulo:
+    def __init__(self):
+        self.bytes = 0
+
+    def send(self, datos) -> None:
+        self.bytes += len(datos)
+
+
+def email_mime(pdf_b64: str, socket: SocketNulo) -> None:
+    msg = MIMEMultipart('related')
+    msg['Subject'] = "Factura del ticket 1"
+    msg.attach(MIMEText("Se adjunto factura en PDF y XML", 'plain'))
+    for nombre, tipo, contenido in (("f.pdf", "pdf", base64.b64decode(pdf_b64)), ("f.xml", "xml", XML)):
+        parte = MIMEBase('application', tipo)
+        parte.set_payload(contenido)
+        encoders.encode_base64(parte)
+        parte.add_header('Content-Disposition', f'attachment; filename="{nombre}"')
+        msg.attach(parte)
+    # smtplib.sendmail(str) -> data()
+    datos = smtplib._quote_periods(smtplib._fix_eols(msg.as_string()).encode('ascii'))
+    socket.send(datos)
+
+
+def mensaje_mime(pdf_b64: str, socket: SocketNulo) -> None:
+    msg = MensajeMIME('related')
+    msg['Subject'] = "Factura del ticket 1"
+    msg.texto = "Se adjunto factura en PDF y XML"
+    msg.adjunta(Adjunto("f.pdf", "application/pdf", base64=pdf_b64))
+    msg.adjunta(Adjunto("f.xml", "application/xml", contenido=XML))
+    for fragmento in msg.fragmentos():
+        socket.send(fragmento)
+
+
+def cpu_ms(funcion, pdf_b64: str) -> float:
+    funcion(pdf_b64, SocketNulo())
+    inicio = time.process_time()
+    for _ in range(REPETICIONES):
+        funcion(pdf_b64, SocketNulo())
+    return (time.process_time() - inicio) * 1000 / REPETICIONES
+
+
+def pico_mb(funcion, pdf_b64: str) -> float:
+    tracemalloc.start()
+    funcion(pdf_b64, SocketNulo())
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / (1024 * 1024)
+
+
+def main():
+    for tamano in TAMANOS_MB:
+        pdf_b64 = base64.b64encode(os.urandom(tamano * 1024 * 1024)).decode()
+        print(f"PDF de {tamano} MB")
+        tamanos = set()
+        for nombre, funcion in (("email.mime", email_mime), ("MensajeMIME", mensaje_mime)):
+            socket = SocketNulo()
+            funcion(pdf_b64, socket)
+            tamanos.add(socket.bytes // 1024)
+            print(f"{nombre:<40} CPU {cpu_ms(funcion, pdf_b64):8.1f} ms   pico de memoria {pico_mb(funcion, pdf_b64):6.1f} MB")
+        print(f"{'':<40} mismo tamaño en DATA: {len(tamanos) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark de memoria al leer cargas multipart (constancias y CSD) de 5 y 10 MB.
+
+Arma el evento de API Gateway (cuerpo en base64) y compara el pico de memoria de
+Python (tracemalloc) y la latencia de:
+
+    anterior   base64.b64decode + requests_toolbelt MultipartDecoder + part.content
+    multipart  cuerpo_bytes + partes (vistas sobre un solo buffer)
+
+    pip install -r requirements-dev.txt   (requests_toolbelt, ya no está en la capa)
+    python benchmarks/bench_multipart.py
+"""
+import base64
+import hashlib
+import os
+import tracemalloc
+from comun import mide, imprime_resultado
+from requests_toolbelt.multipart import decoder
+from multipart import cuerpo_bytes, partes, partes_por_nombre
+
+BOUNDARY = "----BenchBoundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+TAMANOS_MB = [5, 10]
+
+
+def evento(tamano_mb: int) -> dict:
+    archivo = os.urandom(tamano_mb * 1024 * 1024)
+    body = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"csf\"; filename=\"csf.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode() + archivo + \
+        f"\r\n--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"usuario\"\r\n\r\nbench\r\n--{BOUNDARY}--\r\n".encode()
+    return {"body": base64.b64encode(body).decode(), "isBase64Encoded": True,
+            "headers": {"Content-Type": CONTENT_TYPE}}
+
+
+def anterior(event) -> str:
+    body = base64.b64decode(event["body"])
+    for part in decoder.MultipartDecoder(body, CONTENT_TYPE).parts:
+        if 'name="csf"' in part.headers[b"Content-Disposition"].decode():
+            # Lo que sigue (hash, PyMuPDF) recibe part.content
+            return hashlib.sha256(part.content).hexdigest()
+
+
+def nuevo(event) -> str:
+    campos = partes_por_nombre(partes(cuerpo_bytes(event), CONTENT_TYPE))
+    return hashlib.sha256(campos["csf"].contenido).hexdigest()
+
+
+def pico_mb(funcion, event) -> float:
+    tracemalloc.start()
+    funcion(event)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / (1024 * 1024)
+
+
+def main():
+    for tamano in TAMANOS_MB:
+        event = evento(tamano)
+        print(f"Archivo de {tamano} MB (cuerpo base64 de {len(event['body']) / (1024 * 1024):.1f} MB)")
+        assert anterior(event) == nuevo(event)
+        for nombre, funcion in (("anterior", anterior), ("multipart", nuevo)):
+            imprime_resultado(nombre, mide(lambda: funcion(event), repeticiones=10))
+            print(f"{'':<40} pico de memoria {pico_mb(funcion, event):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
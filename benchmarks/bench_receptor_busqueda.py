@@ -0,0 +1,88 @@
+"""
+Benchmark de la búsqueda de receptores por prefijo de RFC y de nombre.
+
+Carga 1M de receptores sintéticos (con los campos normalizados que calcula
+`db_receptor` al guardar), crea los índices de `dbaccess.indices` y mide
+`busca_receptores` con prefijos de 1 a 6 caracteres, primera página y
+siguiente página. Objetivo: p99 < 20 ms.
+"""
+import random
+from comun import conecta_db, mide, imprime_resultado
+from dbaccess.indices import ensure_indexes
+import dbaccess.db_receptor as db_receptor
+
+NO_RECEPTORES = 1_000_000
+LOTE = 10_000
+CONSULTAS = 500
+OBJETIVO_P99_MS = 20
+NOMBRES = ["JOSÉ", "MARÍA", "JUAN", "ÁNGEL", "NOÉ", "LUCÍA", "PEÑA", "MUÑOZ", "ZOÉ", "RAÚL", "SOFÍA", "IÑAKI"]
+APELLIDOS = ["GARCÍA", "LÓPEZ", "HERNÁNDEZ", "MARTÍNEZ", "GONZÁLEZ", "PÉREZ", "SÁNCHEZ", "RAMÍREZ", "NÚÑEZ", "ÁLVAREZ"]
+LETRAS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def receptor_sintetico(n: int, rnd: random.Random) -> dict:
+    rfc = "".join(rnd.choice(LETRAS) for _ in range(4)) + f"{rnd.randrange(1_000_000):06d}" + f"{n % 1000:03d}"
+    receptor = {
+        "Rfc": rfc,
+        "Nombre": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+        "DomicilioFiscalReceptor": "01000",
+        "email": f"r{n}@example.com",
+        "RegimenFiscalReceptor": "605",
+        "UsoCFDI": "G03",
+        "bench": True,
+    }
+    receptor.update(db_receptor.campos_busqueda(receptor))
+    return receptor
+
+
+def prepara_datos(db):
+    if db.receptors.count_documents({"bench": True}) >= NO_RECEPTORES:
+        return
+    db.receptors.delete_many({"bench": True})
+    rnd = random.Random(38)
+    for desde in range(0, NO_RECEPTORES, LOTE):
+        db.receptors.insert_many([receptor_sintetico(n, rnd) for n in range(desde, desde + LOTE)], ordered=False)
+
+
+def prefijos(db, campo: str) -> list:
+    """Prefijos de 1 a 6 caracteres tomados de receptores reales del dataset"""
+    original = db_receptor.CAMPOS_BUSQUEDA[campo][0]
+    muestra = [r[original] for r in db.receptors.aggregate([{"$sample": {"size": CONSULTAS}}])]
+    return [texto[:random.randint(1, 6)] for texto in muestra]
+
+
+def mide_consultas(nombre: str, consultas: list) -> dict:
+    """Cada consulta es una repetición, para que el p99 sea por consulta y no por lote"""
+    pendientes = iter(consultas * 2)
+    stats = mide(lambda: next(pendientes)(), repeticiones=len(consultas), calentamiento=min(20, len(consultas)))
+    imprime_resultado(nombre, stats)
+    return stats
+
+
+def main():
+    client, db = conecta_db()
+    prepara_datos(db)
+    print(f"Índices: {ensure_indexes(db)}")
+    print(f"Dataset: {NO_RECEPTORES} receptores, {CONSULTAS} consultas por escenario")
+
+    resultados = {}
+    for campo in db_receptor.CAMPOS_BUSQUEDA:
+        textos = prefijos(db, campo)
+        resultados[f"{campo} primera página"] = mide_consultas(
+            f"busca por {campo} (primera página)",
+            [lambda t=t: db_receptor.busca_receptores(t, db.receptors, campo=campo) for t in textos])
+
+        cursores = [db_receptor.busca_receptores(t, db.receptors, campo=campo) for t in textos]
+        siguientes = [(t, siguiente) for t, (_, siguiente) in zip(textos, cursores) if siguiente]
+        resultados[f"{campo} siguiente página"] = mide_consultas(
+            f"busca por {campo} (siguiente página)",
+            [lambda t=t, s=s: db_receptor.busca_receptores(t, db.receptors, campo=campo, after=s)
+             for t, s in siguientes])
+
+    lentos = [nombre for nombre, stats in resultados.items() if stats["p99"] >= OBJETIVO_P99_MS]
+    print(f"Objetivo p99 < {OBJETIVO_P99_MS} ms: {'OK' if not lentos else 'NO se cumple en ' + ', '.join(lentos)}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark de la consulta de receptores por RFC.
+
+Simula el formulario de factura: muchas consultas repetidas sobre un conjunto
+pequeño de RFC "calientes". Compara find_one directo contra
+`obtiene_receptor_by_rfc` con el caché LRU por contenedor, con y sin índice en Rfc.
+"""
+import random
+from comun import conecta_db, mide, imprime_resultado
+import dbaccess.db_receptor as db_receptor
+
+NO_RECEPTORES = 100_000
+RFCS_CALIENTES = 200
+CONSULTAS = 1000
+
+
+def prepara_datos(db):
+    if db.receptors.count_documents({"Rfc": {"$regex": "^BEN"}}) >= NO_RECEPTORES:
+        return
+    db.receptors.delete_many({"Rfc": {"$regex": "^BEN"}})
+    for desde in range(0, NO_RECEPTORES, 10_000):
+        db.receptors.insert_many([{
+            "Rfc": f"BEN{n:07d}AB1",
+            "Nombre": f"RECEPTOR {n}",
+            "DomicilioFiscalReceptor": "01000",
+            "email": f"r{n}@example.com",
+            "RegimenFiscalReceptor": "601",
+            "UsoCFDI": "G03",
+        } for n in range(desde, desde + 10_000)])
+
+
+def consultas():
+    calientes = [f"BEN{n:07d}AB1" for n in random.sample(range(NO_RECEPTORES), RFCS_CALIENTES)]
+    return [random.choice(calientes) for _ in range(CONSULTAS)]
+
+
+def main():
+    client, db = conecta_db()
+    prepara_datos(db)
+    rfcs = consultas()
+    print(f"Dataset: {NO_RECEPTORES} receptores, {CONSULTAS} consultas sobre {RFCS_CALIENTES} RFC")
+
+    if "Rfc" in db.receptors.index_information():
+        db.receptors.drop_index("Rfc")
+    imprime_resultado("find_one sin índice", mide(lambda: [db.receptors.find_one({"Rfc": r}) for r in rfcs[:50]], repeticiones=3))
+    db.receptors.create_index("Rfc", name="Rfc")
+    imprime_resultado("find_one con índice", mide(lambda: [db.receptors.find_one({"Rfc": r}) for r in rfcs], repeticiones=5))
+
+    def con_cache():
+        db_receptor.invalida_cache()
+        return [db_receptor.obtiene_receptor_by_rfc(r, db.receptors) for r in rfcs]
+    imprime_resultado("caché LRU + índice", mide(con_cache, repeticiones=5))
+    print("(sin índice se miden solo 50 consultas por repetición)")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del resumen de bitácora.
+
+Genera una bitácora sintética de un millón de registros repartidos en 90 días y
+compara exportar los registros del rango (lo que hace soporte hoy) contra la
+agregación de `resumen_bitacora`. Reporta latencia y tamaño de la respuesta.
+
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_resumen_bitacora.py [--registros N]
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from comun import conecta_db, mide, imprime_resultado
+from dbaccess.db_bitacora import resumen_bitacora
+from dbaccess.indices import ensure_indexes, INDICES
+
+LOTE = 10000
+DIAS = 90
+RFCS = [f"BEN{n:06d}AB{n % 10}" for n in range(200)]
+SUCURSALES = [f"SUC{n:03d}" for n in range(300)]
+ERRORES = [
+    "Nombre:CLIENTE {n} CP:{cp} Reg Fis:Régimen Uso CFDI:G03 CFDI40147 - El RFC del receptor no existe",
+    "Nombre:CLIENTE {n} CP:{cp} Reg Fis:Régimen Uso CFDI:S01 CFDI40145 - El código postal no coincide",
+    "ya existe una solicitud de timbrado para el ticket",
+    "Error: No se encontró folio para la sucursal {n}",
+]
+TRACEBACK = "Traceback (most recent call last):\n" + "  File \"handler.py\", line 1\n" * 20
+
+
+def prepara_datos(db, registros):
+    if db.bitacora.estimated_document_count() >= registros:
+        return
+    db.bitacora.drop()
+    ensure_indexes(db, {"bitacora": INDICES["bitacora"]})
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for desde in range(0, registros, LOTE):
+        lote = []
+        for n in range(desde, min(desde + LOTE, registros)):
+            error = random.random() < 0.2
+            lote.append({
+                "ticket": f"T{n}",
+                "rfc": "XAXX010101000",
+                "rfcEmisor": random.choice(RFCS),
+                "sucursal": random.choice(SUCURSALES),
+                "email": "cliente@example.com",
+                "mensaje": random.choice(ERRORES).format(n=n, cp=random.randint(10000, 99999)) if error
+                else f"Factura generada exitosamente Serie:A folio:{n}",
+                "status": "error" if error else "exito",
+                "traceback": TRACEBACK if error else "",
+                "timestamp": inicio + timedelta(seconds=random.randint(0, DIAS * 24 * 3600)),
+            })
+        db.bitacora.insert_many(lote, ordered=False)
+
+
+def exporta_rango(db, fecha_inicio, fecha_fin):
+    from dbaccess.db_bitacora import filtro_bitacora
+    return json.dumps(list(db.bitacora.find(filtro_bitacora(fecha_inicio, fecha_fin), {"traceback": 0})), default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registros", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    client, db = conecta_db()
+    prepara_datos(db, args.registros)
+    print(f"Dataset: {db.bitacora.estimated_document_count()} registros en {DIAS} días")
+    for etiqueta, fin, intervalo in (("7 días", "2024-01-07", "hora"), ("90 días", "2024-03-31", "dia")):
+        desde, hasta = "2024-01-01T00:00:00", f"{fin}T23:59:59"
+        imprime_resultado(f"resumen {etiqueta} por {intervalo}",
+                          mide(lambda: resumen_bitacora(desde, hasta, db.bitacora, intervalo=intervalo), repeticiones=5))
+        print(f"  Tamaño resumen: {len(json.dumps(resumen_bitacora(desde, hasta, db.bitacora, intervalo=intervalo))) / 1024:10.2f} KB")
+    desde, hasta = "2024-01-01T00:00:00", "2024-01-07T23:59:59"
+    imprime_resultado("exportación 7 días", mide(lambda: exporta_rango(db, desde, hasta), repeticiones=3, calentamiento=1))
+    print(f"  Tamaño exportación: {len(exporta_rango(db, desde, hasta)) / 1024 / 1024:10.2f} MB")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark de envío de correos contra el SMTP local de `smtp_sink` (no manda correos reales).
+
+Compara mensajes por segundo de:
+
+    conexión por correo    el flujo anterior: conecta, login, sendmail y quit por factura
+    transporte persistente TransporteSMTP + EmailSender.send_batch sobre una sola sesión
+
+con y sin latencia simulada por respuesta. El sink no hace STARTTLS, así que el ahorro
+real con SES es mayor: cada conexión nueva además paga el handshake TLS.
+
+    python benchmarks/bench_smtp.py
+"""
+import base64
+import os
+import smtplib
+import time
+import comun  # noqa: F401  (agrega invoice_cdk/lambdas al sys.path)
+import email_sender
+from email_sender import EmailSender, TransporteSMTP
+from smtp_sink import SMTPSink
+
+MENSAJES = 50
+LATENCIAS_MS = [0, 2, 10]
+PDF_B64 = base64.b64encode(os.urandom(60 * 1024)).decode()
+XML = "<cfdi:Comprobante>" + "x" * 8000 + "</cfdi:Comprobante>"
+
+email_sender.FROM = "facturas@example.com"
+email_sender.REPLY_TO = "contacto@example.com"
+email_sender.SMTP_BCC = None
+
+
+def facturas(n: int) -> list:
+    return [{
+        "recipient_email": f"cliente{i}@example.com", "pdf_base64": PDF_B64, "cfdi_xml": XML,
+        "pdf_filename": f"{i}.pdf", "xml_filename": f"{i}.xml",
+        "subject": f"Factura del ticket {i}", "body_text": "Se adjunto factura en PDF y XML",
+    } for i in range(n)]
+
+
+def conexion_por_correo(puerto: int, lote: list) -> None:
+    """Flujo anterior: una conexión autenticada por factura"""
+    sender = EmailSender(TransporteSMTP("127.0.0.1", puerto))
+    for factura in lote:
+        msg, destinatarios = sender._build_message(**factura)
+        server = smtplib.SMTP("127.0.0.1", puerto, timeout=30)
+        server.login("usuario", "password")
+        server.sendmail(email_sender.FROM, destinatarios, msg.as_bytes())
+        server.quit()
+
+
+def transporte_persistente(puerto: int, lote: list) -> None:
+    transporte = TransporteSMTP("127.0.0.1", puerto, "usuario", "password", use_tls=False, por_segundo=0)
+    assert all(EmailSender(transporte).send_batch(lote))
+    transporte.cierra()
+
+
+def main():
+    lote = facturas(MENSAJES)
+    for latencia in LATENCIAS_MS:
+        sink = SMTPSink(latencia_ms=latencia).inicia()
+        print(f"{MENSAJES} correos, latencia simulada {latencia} ms por respuesta")
+        for nombre, funcion in (("conexión por correo", conexion_por_correo),
+                                ("transporte persistente", transporte_persistente)):
+            recibidos = sink.mensajes
+            inicio = time.perf_counter()
+            funcion(sink.puerto, lote)
+            segundos = time.perf_counter() - inicio
+            assert sink.mensajes - recibidos == MENSAJES
+            print(f"{nombre:<40} {MENSAJES / segundos:8.1f} mensajes/s  ({segundos * 1000:8.1f} ms)")
+        sink.shutdown()
+        sink.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark del contexto de un ticket (GET /tapetes/{ticket}).
+
+Levanta un servidor HTTP local que hace de Tapetes (/token y /tickets con latencia
+simulada) y compara el flujo anterior del handler (token nuevo en cada ticket,
+llamadas secuenciales, un find_one por partida) contra `resuelve_contexto`
+en frío (sin cachés) y en caliente (token, sucursal y certificado en caché).
+
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_tapetes_contexto.py
+"""
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from bson import ObjectId
+from comun import conecta_db, mide, imprime_resultado
+import dbaccess.db_sucursal as db_sucursal
+import tapetes_contexto
+
+LATENCIA_TOKEN_MS = float(os.getenv("BENCH_LATENCIA_TOKEN_MS", "80"))
+LATENCIA_TICKET_MS = float(os.getenv("BENCH_LATENCIA_TICKET_MS", "60"))
+PARTIDAS = 25
+CODIGO_SUCURSAL = "BENCH-TAPETES"
+CLAVES = [f"B{n:02d}" for n in range(PARTIDAS)]
+
+
+class TapetesLocal(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("token"):
+            time.sleep(LATENCIA_TOKEN_MS / 1000)
+            cuerpo = {"access_token": "bench", "expires_in": 3600}
+        else:
+            time.sleep(LATENCIA_TICKET_MS / 1000)
+            cuerpo = {"sucursal": CODIGO_SUCURSAL, "total": 100.0,
+                      "detalle": [{"claveunidad": clave, "cantidad": 1} for clave in CLAVES]}
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+
+def inicia_tapetes_local() -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), TapetesLocal)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def prepara_datos(db):
+    db.sucursales.delete_many({"codigo_sucursal": CODIGO_SUCURSAL})
+    db.certificates.delete_many({"nombre": "BENCH TAPETES"})
+    db.medidas.delete_many({"clave": {"$in": CLAVES}})
+    cert_id = db.certificates.insert_one({"nombre": "BENCH TAPETES", "rfc": "EKU9003173C9", "usuario": "bench"}).inserted_id
+    db.sucursales.insert_one({"codigo_sucursal": CODIGO_SUCURSAL, "id_certificado": str(cert_id), "serie": "B"})
+    db.medidas.insert_many([{"clave": clave, "descripcion": f"Unidad {clave}"} for clave in CLAVES])
+    db.sucursales.create_index("codigo_sucursal")
+    db.medidas.create_index("clave")
+
+
+def flujo_anterior(url: str, db, ticket: str):
+    """Misma secuencia que el handler antes del resolver"""
+    token = requests.post(f"{url}token", data={"username": "u", "password": "p"}).json()["access_token"]
+    venta = requests.post(f"{url}tickets", headers={"Authorization": f"Bearer {token}"},
+                          data=json.dumps({"ticket": ticket})).json()
+    sucursal = db.sucursales.find_one({"codigo_sucursal": venta["sucursal"]})
+    for item in venta["detalle"]:
+        item["unidad"] = db.medidas.find_one({"clave": item["claveunidad"]}).get("descripcion")
+    return db.certificates.find_one({"_id": ObjectId(sucursal["id_certificado"])})
+
+
+def main():
+    client, db = conecta_db()
+    prepara_datos(db)
+    servidor = inicia_tapetes_local()
+    url = f"http://127.0.0.1:{servidor.server_port}/"
+    tapetes_contexto.TAPETES_API_URL = url
+    print(f"Tapetes local en {url} (token {LATENCIA_TOKEN_MS} ms, ticket {LATENCIA_TICKET_MS} ms), {PARTIDAS} partidas")
+
+    def en_frio():
+        tapetes_contexto.invalida_token()
+        db_sucursal.invalida_cache()
+        return tapetes_contexto.resuelve_contexto("T1", db.sucursales, db.medidas)
+
+    # resuelve_contexto escribe la venta y los tiempos en el log de cada invocación
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados = {
+            "flujo anterior": mide(lambda: flujo_anterior(url, db, "T1"), repeticiones=20),
+            "resolver en frío": mide(en_frio, repeticiones=20),
+            "resolver en caliente": mide(
+                lambda: tapetes_contexto.resuelve_contexto("T1", db.sucursales, db.medidas), repeticiones=50),
+        }
+        _, tiempos = tapetes_contexto.resuelve_contexto("T1", db.sucursales, db.medidas)
+    for nombre, stats in resultados.items():
+        imprime_resultado(nombre, stats)
+    print(f"Etapas (caliente): {tiempos}")
+    servidor.shutdown()
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
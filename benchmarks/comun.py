@@ -0,0 +1,49 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los benchmarks corren contra un mongod local (no contra Atlas) y usan su propia
+base de datos para no tocar datos reales:
+
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_<nombre>.py
+"""
+import os
+import sys
+import time
+import statistics
+from pathlib import Path
+
+# Mismo sys.path que usan las lambdas (y conftest.py) para resolver dbaccess/models
+LAMBDAS_PATH = Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"
+if str(LAMBDAS_PATH) not in sys.path:
+    sys.path.insert(0, str(LAMBDAS_PATH))
+
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "invoice_bench")
+
+
+def conecta_db(nombre_db: str = BENCH_DB_NAME):
+    """Regresa (client, db) para la base de datos de benchmarks."""
+    from pymongo import MongoClient
+    client = MongoClient(MONGODB_URI)
+    return client, client[nombre_db]
+
+
+def mide(funcion, repeticiones: int = 20, calentamiento: int = 2) -> dict:
+    """Ejecuta `funcion` varias veces y regresa estadísticas de latencia en milisegundos."""
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "p50": statistics.median(tiempos),
+        "p99": tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))],
+        "max": tiempos[-1],
+    }
+
+
+def imprime_resultado(nombre: str, stats: dict) -> None:
+    print(f"{nombre:<40} p50={stats['p50']:8.2f} ms  p99={stats['p99']:8.2f} ms  max={stats['max']:8.2f} ms")
@@ -0,0 +1,88 @@
+"""
+Servidor SMTP local que acepta y descarta todo (un sustituto de aiosmtpd solo con la
+biblioteca estándar). Sirve para medir el cliente sin mandar correos reales:
+
+    python benchmarks/smtp_sink.py --puerto 1025 --latencia-ms 20
+
+Anuncia AUTH PLAIN y acepta cualquier credencial; no implementa STARTTLS, así
+que el cliente debe usar use_tls=False. `latencia_ms` se espera antes de cada respuesta
+para simular la distancia al servidor real (SES está a varios ms de la lambda).
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Sesion(socketserver.StreamRequestHandler):
+
+    def responde(self, linea: str) -> None:
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+        self.wfile.write(linea.encode() + b"\r\n")
+
+    def handle(self):
+        self.responde("220 sink ESMTP")
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.strip().split(b" ", 1)[0].upper()
+            if comando == b"EHLO":
+                # Una sola escritura: en varias, Nagle y el ACK diferido agregan ~40 ms
+                self.responde("250-sink\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+            elif comando == b"HELO":
+                self.responde("250 sink")
+            elif comando == b"AUTH":
+                if len(linea.split()) == 2:
+                    # Sin respuesta inicial: el cliente manda las credenciales en otra línea
+                    self.responde("334 ")
+                    self.rfile.readline()
+                self.responde("235 autenticado")
+            elif comando == b"DATA":
+                self.responde("354 fin con <CRLF>.<CRLF>")
+                tamano = 0
+                for linea_datos in self.rfile:
+                    if linea_datos == b".\r\n":
+                        break
+                    tamano += len(linea_datos)
+                with self.server.lock:
+                    self.server.mensajes += 1
+                    self.server.bytes += tamano
+                self.responde("250 aceptado")
+            elif comando == b"QUIT":
+                self.responde("221 adios")
+                return
+            else:
+                # MAIL, RCPT, NOOP, RSET
+                self.responde("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, latencia_ms: float = 0):
+        super().__init__((host, puerto), _Sesion)
+        self.latencia = latencia_ms / 1000
+        self.lock = threading.Lock()
+        self.mensajes = 0
+        self.bytes = 0
+
+    @property
+    def puerto(self) -> int:
+        return self.server_address[1]
+
+    def inicia(self) -> "SMTPSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--puerto", type=int, default=1025)
+    parser.add_argument("--latencia-ms", type=float, default=0)
+    args = parser.parse_args()
+    sink = SMTPSink(puerto=args.puerto, latencia_ms=args.latencia_ms)
+    print(f"SMTP sink en 127.0.0.1:{sink.puerto}")
+    sink.serve_forever()
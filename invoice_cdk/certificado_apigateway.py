@@ -1,5 +1,7 @@
 from aws_cdk import (
     Duration,
+    Stack,
+    custom_resources as cr,
     aws_lambda as _lambda,
     aws_apigateway as apigw,
     aws_cognito as cognito,
@@ -11,6 +13,69 @@ import os
 
 load_dotenv()  # Cargar variables de entorno desde el archivo .env
 APPLICATION_JSON = "application/json"
+# Caché de API Gateway para los GET que no dependen del usuario (datosfactura, environment).
+# Apagado por default porque el cache cluster tiene costo por hora.
+API_CACHE_ENABLED = os.getenv("API_CACHE_ENABLED", "false").lower() == "true"
+API_CACHE_TTL_SECONDS = int(os.getenv("API_CACHE_TTL_SECONDS", "3600"))
+# La respuesta lleva Access-Control-Allow-Origin según el origin, así que forma parte de la llave
+ORIGIN_HEADER = "method.request.header.origin"
+
+def cache_deploy_options(*method_paths):
+    """StageOptions con caché solo en los métodos indicados ("/recurso/GET"), o None si está apagado"""
+    if not API_CACHE_ENABLED:
+        return None
+    return apigw.StageOptions(
+        cache_cluster_enabled=True,
+        cache_cluster_size="0.5",
+        method_options={
+            path: apigw.MethodDeploymentOptions(
+                caching_enabled=True,
+                cache_ttl=Duration.seconds(API_CACHE_TTL_SECONDS)
+            ) for path in method_paths
+        }
+    )
+
+def cache_control_sin_403(scope: Construct, id: str, api: apigw.RestApi, *method_paths):
+    """
+    Al recargar, el navegador manda `Cache-Control: max-age=0`; sin permiso para invalidar
+    el caché API Gateway responde 403 (FAIL_WITH_403). Con SUCCEED_WITHOUT_RESPONSE_HEADER
+    se ignora el header y se responde del caché. MethodDeploymentOptions (y el MethodSetting
+    de CloudFormation) no exponen unauthorizedCacheControlHeaderStrategy, así que se aplica
+    con UpdateStage en cada despliegue de la API.
+    """
+    if not API_CACHE_ENABLED:
+        return None
+    stage = api.deployment_stage
+    operaciones = []
+    for path in method_paths:
+        recurso, metodo = path.rsplit("/", 1)
+        operaciones.append({
+            "op": "replace",
+            "path": f"/{recurso.replace('/', '~1')}/{metodo}/caching/unauthorizedCacheControlHeaderStrategy",
+            "value": "SUCCEED_WITHOUT_RESPONSE_HEADER"
+        })
+    stack = Stack.of(scope)
+    llamada = cr.AwsSdkCall(
+        service="APIGateway",
+        action="updateStage",
+        parameters={"restApiId": api.rest_api_id, "stageName": stage.stage_name, "patchOperations": operaciones},
+        # Un despliegue nuevo reescribe los method settings del stage; se vuelve a aplicar
+        physical_resource_id=cr.PhysicalResourceId.of(api.latest_deployment.deployment_id)
+    )
+    recurso_cr = cr.AwsCustomResource(
+        scope, id,
+        on_create=llamada,
+        on_update=llamada,
+        policy=cr.AwsCustomResourcePolicy.from_statements([
+            iam.PolicyStatement(
+                actions=["apigateway:PATCH"],
+                resources=[f"arn:aws:apigateway:{stack.region}::/restapis/{api.rest_api_id}/stages/{stage.stage_name}"]
+            )
+        ])
+    )
+    recurso_cr.node.add_dependency(stage)
+    return recurso_cr
+
 class CertificateApiGateway(Construct):
     def __init__(self, scope: Construct, id: str,  alias: dict, user_pool: cognito.UserPool):
         super().__init__(scope, id)
@@ -25,8 +90,12 @@ class CertificateApiGateway(Construct):
         self.alias_maneja_certificado = alias.get("maneja_certificado_alias")
         self.alias_timbres_consumo = alias.get("timbres_consumo_alias")
         self.alias_parsea_pdf_regimen = alias.get("parsea_pdf_regimen_alias")
+        self.alias_parsea_pdf_regimen_lote = alias.get("parsea_pdf_regimen_lote_alias")
         self.alias_environment_handler = alias.get("environment_handler_alias")
         self.alias_bitacora = alias.get("bitacora_alias")
+        self.alias_resumen_bitacora = alias.get("resumen_bitacora_alias")
+        self.alias_reenvia_facturas = alias.get("reenvia_facturas_alias")
+        self.alias_descarga_factura = alias.get("descarga_factura_alias")
 
         server = os.getenv("CORS_OPTION")
         print("CORS OPTION:", server)
@@ -45,8 +114,14 @@ class CertificateApiGateway(Construct):
             binary_media_types=[
                 "application/x-x509-ca-cert",
                 "application/x-iwork-keynote-sffkey",
-                "multipart/form-data"
+                "multipart/form-data",
+                # Lotes de constancias (POST /parsea-pdf/lote)
+                "application/zip",
+                "application/x-zip-compressed",
+                # Descarga del PDF de la factura (GET /facturas/{uuid})
+                "application/pdf"
             ],
+            deploy_options=cache_deploy_options("/environment/GET"),
         )
 
         datos_factura_apigw=apigw.RestApi(
@@ -59,9 +134,13 @@ class CertificateApiGateway(Construct):
                 "allow_methods": ['OPTIONS','GET','POST','PUT','DELETE'],
                 "allow_headers": ["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "X-Amz-Security-Token"],
                 "allow_credentials": True
-            }
+            },
+            deploy_options=cache_deploy_options("/datosfactura/GET"),
         )
 
+        cache_control_sin_403(self, "InvoiceAPICacheControl", api, "/environment/GET")
+        cache_control_sin_403(self, "DatosFacturaAPICacheControl", datos_factura_apigw, "/datosfactura/GET")
+
         # Create authorizer (preferir custom authorizer si está disponible)
         
         authorizer = apigw.CognitoUserPoolsAuthorizer(
@@ -97,6 +176,9 @@ class CertificateApiGateway(Construct):
         # Receptor resource
         receptor_resource = api.root.add_resource("receptor")
         receptor_id_resource = receptor_resource.add_resource("{id_receptor}")
+        receptor_importar_resource = receptor_resource.add_resource("importar")
+        receptor_exportar_resource = receptor_resource.add_resource("exportar")
+        receptor_buscar_resource = receptor_resource.add_resource("buscar")
 
         #Maneja Certificado resource
         maneja_certificado_resource = api.root.add_resource("maneja-certificado")
@@ -108,12 +190,21 @@ class CertificateApiGateway(Construct):
 
         # Parsea PDF Regimen resource
         parsea_pdf_regimen_resource = api.root.add_resource("parsea-pdf")
+        parsea_pdf_regimen_lote_resource = parsea_pdf_regimen_resource.add_resource("lote")
 
         # Environment resource
         environment_resource = api.root.add_resource("environment")
 
         # Bitacora resource
         bitacora_resource = api.root.add_resource("bitacora")
+        bitacora_resumen_resource = bitacora_resource.add_resource("resumen")
+
+        # Facturas resource
+        facturas_resource = api.root.add_resource("facturas")
+        facturas_reenvio_resource = facturas_resource.add_resource("reenvio")
+        facturas_reenvio_usuario_resource = facturas_reenvio_resource.add_resource("{usuario}")
+        facturas_uuid_resource = facturas_resource.add_resource("{uuid}")
+        facturas_ticket_resource = facturas_resource.add_resource("ticket").add_resource("{ticket}")
 
         # Integrations
         certificate_integration = apigw.LambdaIntegration(
@@ -128,7 +219,8 @@ class CertificateApiGateway(Construct):
 
         datos_factura_integration = apigw.LambdaIntegration(
             self.alias_datos_factura,
-            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'},
+            cache_key_parameters=[ORIGIN_HEADER]
         )
 
         tapetes_integration = apigw.LambdaIntegration(
@@ -166,14 +258,32 @@ class CertificateApiGateway(Construct):
             request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
         )
 
+        parsea_pdf_regimen_lote_integration = apigw.LambdaIntegration(
+            self.alias_parsea_pdf_regimen_lote,
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+        )
+
         environment_integration = apigw.LambdaIntegration(
             self.alias_environment_handler,
-            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'},
+            cache_key_parameters=[ORIGIN_HEADER]
         )
         bitacora_integration = apigw.LambdaIntegration(
             self.alias_bitacora,
             request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
         )
+        resumen_bitacora_integration = apigw.LambdaIntegration(
+            self.alias_resumen_bitacora,
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+        )
+        reenvia_facturas_integration = apigw.LambdaIntegration(
+            self.alias_reenvia_facturas,
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+        )
+        descarga_factura_integration = apigw.LambdaIntegration(
+            self.alias_descarga_factura,
+            request_templates={APPLICATION_JSON: '{ "statusCode": "200" }'}
+        )
 
         # Certificate methods (CON CUSTOM AUTHORIZER)
         certificates_resource.add_method("POST", certificate_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
@@ -184,12 +294,13 @@ class CertificateApiGateway(Construct):
 
         # Sucursal methods (CON CUSTOM AUTHORIZER)
         sucursales_resource.add_method("POST", sucursal_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        sucursales_resource.add_method("GET", sucursal_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
         sucursal_id_resource.add_method("GET", sucursal_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
         sucursal_id_resource.add_method("PUT", sucursal_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
         sucursal_id_resource.add_method("DELETE", sucursal_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
 
         # Datos Factura methods, no lleva authorizer
-        datos_factura.add_method("GET", datos_factura_integration)
+        datos_factura.add_method("GET", datos_factura_integration, request_parameters={ORIGIN_HEADER: False})
 
         #Datos Tapetes methods, obtiene el ticket de venta, no lleva authorizer
         tapetes_id_resource.add_method("GET", tapetes_integration)
@@ -207,6 +318,9 @@ class CertificateApiGateway(Construct):
         receptor_resource.add_method("POST", receptor_integration)
         receptor_id_resource.add_method("GET", receptor_integration)
         receptor_id_resource.add_method("PUT", receptor_integration)
+        receptor_importar_resource.add_method("POST", receptor_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        receptor_exportar_resource.add_method("GET", receptor_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        receptor_buscar_resource.add_method("GET", receptor_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
 
         # Maneja Certificado methods
         maneja_certificado_resource.add_method("POST", maneja_certificado_integration,authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
@@ -219,9 +333,18 @@ class CertificateApiGateway(Construct):
 
         # Parsea PDF Regimen methods
         parsea_pdf_regimen_resource.add_method("POST", parsea_pdf_regimen_integration)
+        parsea_pdf_regimen_lote_resource.add_method("POST", parsea_pdf_regimen_lote_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
 
         # Environment methods
-        environment_resource.add_method("GET", environment_integration)
+        environment_resource.add_method("GET", environment_integration, request_parameters={ORIGIN_HEADER: False})
 
         # Bitacora methods
-        bitacora_resource.add_method("GET", bitacora_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
\ No newline at end of file
+        bitacora_resource.add_method("GET", bitacora_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        bitacora_resumen_resource.add_method("GET", resumen_bitacora_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+
+        # Facturas methods
+        facturas_reenvio_usuario_resource.add_method("POST", reenvia_facturas_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
+        # Sin authorizer, como /factura: el cliente descarga su factura con el UUID.
+        # Los tickets son fáciles de adivinar, así que por ticket solo el dueño del certificado
+        facturas_uuid_resource.add_method("GET", descarga_factura_integration)
+        facturas_ticket_resource.add_method("GET", descarga_factura_integration, authorizer=authorizer, authorization_type=apigw.AuthorizationType.COGNITO)
\ No newline at end of file
@@ -34,8 +34,12 @@ class InvoiceCdkStack(Stack):
             "maneja_certificado_alias": self.lambda_functions.maneja_certificado_alias,
             "timbres_consumo_alias": self.lambda_functions.timbres_consumo_alias,
             "parsea_pdf_regimen_alias": self.lambda_functions.parsea_pdf_regimen_alias,
+            "parsea_pdf_regimen_lote_alias": self.lambda_functions.parsea_pdf_regimen_lote_alias,
             "environment_handler_alias": self.lambda_functions.environment_handler_alias,
-            "bitacora_alias": self.lambda_functions.bitacora_alias
+            "bitacora_alias": self.lambda_functions.bitacora_alias,
+            "resumen_bitacora_alias": self.lambda_functions.resumen_bitacora_alias,
+            "reenvia_facturas_alias": self.lambda_functions.reenvia_facturas_alias,
+            "descarga_factura_alias": self.lambda_functions.descarga_factura_alias
         }
         # Create API Gateway for the certificate lambda
         CertificateApiGateway(self, "CertificateApiGateway", alias, self.cognito_invoice.user_pool_cognito)
@@ -1,4 +1,4 @@
-from aws_cdk import Duration, aws_lambda as lambda_, RemovalPolicy
+from aws_cdk import Duration, Stack, aws_lambda as lambda_, aws_iam as iam, RemovalPolicy
 from constructs import Construct
 from dotenv import dotenv_values
 
@@ -16,8 +16,12 @@ class LambdaFunctions(Construct):
     maneja_certificado_lambda: lambda_.Function
     timbres_consumo_lambda: lambda_.Function
     parsea_pdf_regimen_lambda: lambda_.Function
+    parsea_pdf_regimen_lote_lambda: lambda_.Function
     environment_handler_lambda: lambda_.Function
     bitacora_lambda: lambda_.Function
+    resumen_bitacora_lambda: lambda_.Function
+    reenvia_facturas_lambda: lambda_.Function
+    descarga_factura_lambda: lambda_.Function
 
     pymongo_layer: lambda_.LayerVersion
     
@@ -93,9 +97,13 @@ class LambdaFunctions(Construct):
         self.create_receptor_lambda(env, pymongo_layer)
         self.create_maneja_certificado_lambda(env_cert, pymongo_layer)
         self.create_timbres_consumo_lambda(env, pymongo_layer)
-        self.create_parsea_pdf_regimen_lambda(env_cors,pymongo_layer)
+        self.create_parsea_pdf_regimen_lambda(env, pymongo_layer)
+        self.create_parsea_pdf_regimen_lote_lambda(env, pymongo_layer)
         self.create_environment_handler_lambda(env_cors,pymongo_layer)
         self.create_bitacora_lambda(env, pymongo_layer)
+        self.create_resumen_bitacora_lambda(env, pymongo_layer)
+        self.create_reenvia_facturas_lambda(env_fact, pymongo_layer)
+        self.create_descarga_factura_lambda(env, pymongo_layer)
 
     def create_post_confirmation_lambda(self, env: dict,):
         self.post_confirmation_lambda = lambda_.Function(
@@ -319,6 +327,30 @@ class LambdaFunctions(Construct):
             version=self.parsea_pdf_regimen_lambda.current_version
         )
 
+    def create_parsea_pdf_regimen_lote_lambda(self, env: dict, pymongo_layer: lambda_.LayerVersion):
+        # Mismo handler que /parsea-pdf; el lote va aparte para no darle su memoria a cada PDF suelto
+        self.parsea_pdf_regimen_lote_lambda = lambda_.Function(
+            self, "ParseaPDFRegimenLoteLambda",
+            function_name="parsea-pdf-regimen-lote-lambda-invoice",
+            description="Lambda function to parse a batch of PDFs and extract regimen fiscal",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="parse_regimen_handler.handler",
+            code=lambda_.Code.from_asset(INVOICE_LAMBDAS_PATH),
+            layers=[pymongo_layer],
+            environment=env,
+            timeout=Duration.seconds(30),
+            # 3008 MB: ~2 vCPU para los procesos trabajadores y el lote completo en memoria
+            memory_size=3008,
+            current_version_options=lambda_.VersionOptions(
+                removal_policy=RemovalPolicy.RETAIN
+            )
+        )
+        self.parsea_pdf_regimen_lote_alias = lambda_.Alias(
+            self, "ParseaPDFRegimenLoteLambdaAlias",
+            alias_name="Prod",
+            version=self.parsea_pdf_regimen_lote_lambda.current_version
+        )
+
     def create_environment_handler_lambda(self, env: dict, pymongo_layer: lambda_.LayerVersion):
         self.environment_handler_lambda = lambda_.Function(
             self, "EnvironmentHandlerLambda",
@@ -359,4 +391,84 @@ class LambdaFunctions(Construct):
             self, "BitacoraLambdaAlias",
             alias_name="Prod",
             version=self.bitacora_lambda.current_version
-        )
\ No newline at end of file
+        )
+
+    def create_resumen_bitacora_lambda(self, env: dict, pymongo_layer: lambda_.LayerVersion):
+        self.resumen_bitacora_lambda = lambda_.Function(
+            self, "ResumenBitacoraLambda",
+            function_name="resumen-bitacora-lambda-invoice",
+            description="Lambda function to aggregate bitacora statistics",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="resumen_bitacora_handler.handler",
+            code=lambda_.Code.from_asset(INVOICE_LAMBDAS_PATH),
+            layers=[pymongo_layer],
+            environment=env,
+            timeout=Duration.seconds(35),
+            current_version_options=lambda_.VersionOptions(
+                removal_policy=RemovalPolicy.RETAIN
+            )
+        )
+        self.resumen_bitacora_alias = lambda_.Alias(
+            self, "ResumenBitacoraLambdaAlias",
+            alias_name="Prod",
+            version=self.resumen_bitacora_lambda.current_version
+        )
+
+    def create_reenvia_facturas_lambda(self, env: dict, pymongo_layer: lambda_.LayerVersion):
+        function_name = "reenvia-facturas-lambda-invoice"
+        self.reenvia_facturas_lambda = lambda_.Function(
+            self, "ReenviaFacturasLambda",
+            function_name=function_name,
+            description="Lambda function to re-send invoices by receptor, sucursal and date range",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="reenvia_facturas_handler.handler",
+            code=lambda_.Code.from_asset(INVOICE_LAMBDAS_PATH),
+            layers=[pymongo_layer],
+            environment=env,
+            # La invocación asíncrona genera los PDFs y envía los correos
+            timeout=Duration.minutes(15),
+            memory_size=2048,
+            retry_attempts=0,
+            current_version_options=lambda_.VersionOptions(
+                removal_policy=RemovalPolicy.RETAIN
+            )
+        )
+        # Se invoca a sí misma (por nombre para no crear una dependencia circular con su rol)
+        stack = Stack.of(self)
+        self.reenvia_facturas_lambda.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["lambda:InvokeFunction"],
+                resources=[f"arn:aws:lambda:{stack.region}:{stack.account}:function:{function_name}*"]
+            )
+        )
+        self.reenvia_facturas_alias = lambda_.Alias(
+            self, "ReenviaFacturasLambdaAlias",
+            alias_name="Prod",
+            version=self.reenvia_facturas_lambda.current_version,
+            # La autoinvocación lleva el calificador :Prod; retry_attempts de la función solo
+            # aplica a $LATEST. Un reintento (timeout, memoria) repetiría los correos ya enviados
+            retry_attempts=0
+        )
+
+    def create_descarga_factura_lambda(self, env: dict, pymongo_layer: lambda_.LayerVersion):
+        self.descarga_factura_lambda = lambda_.Function(
+            self, "DescargaFacturaLambda",
+            function_name="descarga-factura-lambda-invoice",
+            description="Lambda function to download invoice PDF and XML",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="descarga_factura_handler.handler",
+            code=lambda_.Code.from_asset(INVOICE_LAMBDAS_PATH),
+            layers=[pymongo_layer],
+            environment=env,
+            timeout=Duration.seconds(35),
+            # El primer render del PDF (fpdf) es CPU; más memoria da más CPU
+            memory_size=512,
+            current_version_options=lambda_.VersionOptions(
+                removal_policy=RemovalPolicy.RETAIN
+            )
+        )
+        self.descarga_factura_alias = lambda_.Alias(
+            self, "DescargaFacturaLambdaAlias",
+            alias_name="Prod",
+            version=self.descarga_factura_lambda.current_version
+        )
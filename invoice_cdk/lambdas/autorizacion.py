@@ -0,0 +1,20 @@
+"""
+Identidad del usuario que hace la petición, según el authorizer de Cognito de API Gateway.
+
+Los recursos de un usuario (certificados, sucursales, facturas) se guardan con su correo
+en `usuario`; el correo es el alias de inicio de sesión del user pool, así que sale del
+claim `email` del token y no de la URL ni del body.
+"""
+
+
+def usuario_autenticado(event) -> str:
+    """Correo (en minúsculas) del token de Cognito, o None si la ruta no tiene authorizer"""
+    claims = ((event.get("requestContext") or {}).get("authorizer") or {}).get("claims") or {}
+    email = claims.get("email")
+    return email.strip().lower() if email else None
+
+
+def es_el_usuario(event, usuario: str) -> bool:
+    """True si `usuario` (de la URL o del query string) es quien hizo la petición"""
+    autenticado = usuario_autenticado(event)
+    return bool(autenticado and usuario and usuario.strip().lower() == autenticado)
@@ -0,0 +1,101 @@
+import os
+import threading
+import traceback
+from datetime import datetime, timezone
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+# "0" = sin acuse, "1" = acuse del primario, "majority" = acuse de la mayoría
+BITACORA_WRITE_CONCERN = os.getenv("BITACORA_WRITE_CONCERN", "1")
+BITACORA_SPILL_FILE = os.getenv("BITACORA_SPILL_FILE", "/tmp/bitacora_spill.ndjson")
+DUPLICATE_KEY = 11000
+
+
+def _write_concern(valor: str) -> WriteConcern:
+    return WriteConcern(w=int(valor) if valor.isdigit() else valor)
+
+
+class BitacoraWriter:
+    """
+    Acumula los eventos de bitácora de una invocación y los guarda con un solo
+    insert_many. Si Mongo no responde, los eventos se escriben en un archivo
+    NDJSON en /tmp y se reintentan en el siguiente flush del mismo contenedor.
+
+    Uso:
+        bitacora = BitacoraWriter(bitacora_collection)
+        bitacora.registra({"ticket": ..., "mensaje": ..., "status": "exito"})
+        bitacora.flush_en_segundo_plano()   # opcional, mientras se arma la respuesta
+        bitacora.flush()                    # siempre antes de regresar del handler
+    """
+
+    def __init__(self, bitacora_collection, write_concern: str = None, spill_file: str = None):
+        self.collection = bitacora_collection.with_options(
+            write_concern=_write_concern(write_concern or BITACORA_WRITE_CONCERN))
+        self.spill_file = spill_file or BITACORA_SPILL_FILE
+        self._eventos = []
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def registra(self, evento: dict) -> None:
+        """Agrega un evento al buffer; el timestamp es el momento del registro, no del flush"""
+        evento = {"timestamp": datetime.now(timezone.utc), **evento}
+        with self._lock:
+            self._eventos.append(evento)
+
+    def flush_en_segundo_plano(self) -> None:
+        """Inicia el flush en un hilo; `flush()` espera a que termine"""
+        self._espera()
+        self._hilo = threading.Thread(target=self._escribe, daemon=True)
+        self._hilo.start()
+
+    def flush(self) -> None:
+        """Guarda los eventos pendientes. Lambda congela los hilos al regresar, así que debe llamarse al final"""
+        self._espera()
+        self._escribe()
+
+    def _espera(self) -> None:
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def _escribe(self) -> None:
+        with self._lock:
+            eventos, self._eventos = self._eventos, []
+        eventos = self._lee_spill() + eventos
+        if not eventos:
+            return
+        try:
+            self.collection.insert_many(eventos, ordered=False)
+        except BulkWriteError as e:
+            # Los duplicados son eventos del spill que sí se guardaron en un intento anterior
+            fallidos = [eventos[error["index"]] for error in e.details.get("writeErrors", [])
+                        if error.get("code") != DUPLICATE_KEY]
+            if fallidos:
+                print(f"Error al guardar bitácora: {str(e)}")
+                self._escribe_spill(fallidos)
+        except PyMongoError as e:
+            print(f"Error al guardar bitácora, se escribe en {self.spill_file}: {str(e)}")
+            self._escribe_spill(eventos)
+
+    def _lee_spill(self) -> list:
+        if not os.path.exists(self.spill_file):
+            return []
+        try:
+            with open(self.spill_file) as f:
+                eventos = [json_util.loads(linea) for linea in f if linea.strip()]
+            os.remove(self.spill_file)
+            return eventos
+        except Exception:
+            traceback.print_exc()
+            return []
+
+    def _escribe_spill(self, eventos: list) -> None:
+        try:
+            with open(self.spill_file, "a") as f:
+                for evento in eventos:
+                    f.write(json_util.dumps(evento) + "\n")
+        except Exception:
+            # Último recurso: que el evento quede al menos en CloudWatch
+            print(f"Eventos de bitácora perdidos: {json_util.dumps(eventos)}")
+            traceback.print_exc()
@@ -5,16 +5,16 @@ from constantes import Constants
 from receptor_handler import valida_cors
 from pymongo import MongoClient
 from bson import json_util
+from bson.errors import InvalidId
 from http import HTTPStatus
 from dbaccess.db_certificado import (
     Certificado,
     update_certificate,
-    list_certificates,
-    delete_certificate,
-    get_certificate_by_id,
+    list_certificates_with_sucursales,
     add_certificate
 )
-from dbaccess.db_sucursal import(get_sucursal_by_id, delete_sucursal)
+from dbaccess.db_cascada import elimina_certificado_cascada
+from dbaccess.paginacion import obten_limite, siguiente_cursor
 
 #Esta clase maneja los certificados a nivel de base de datos
 client = MongoClient(os.getenv("MONGODB_URI"))
@@ -65,32 +65,44 @@ def handler(event, context):
         elif http_method == Constants.GET:
             print("GET method called with path parameters:", path_parameters)
             usuario = path_parameters.get("id")
-            certificates = list_certificates(usuario,certificates_collection)
+            query_params = event.get("queryStringParameters") or {}
+            # Si se pide `limit` se regresa una página con el cursor de la siguiente
+            limit = obten_limite(query_params.get("limit")) if query_params.get("limit") else None
+            try:
+                certificates = list_certificates_with_sucursales(
+                    usuario, certificates_collection, limit=limit, after=query_params.get("after"))
+            except InvalidId:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.BODY: json.dumps({"error": "Cursor inválido"}),
+                    Constants.HEADERS_KEY: headers
+                }
             for cert in certificates:
                 cert["_id"] = str(cert["_id"])
                 cert["desde"] = str(cert["desde"])  # Convert ObjectId to string
                 cert["hasta"] = str(cert["hasta"])  # Convert ObjectId to string
-                sucursales = []
-                for sucursal_id in cert.get("sucursales", []):
-                    sucursal = get_sucursal_by_id(sucursal_id["_id"], sucursal_collection)
-                    if sucursal:
-                        sucursal["_id"] = str(sucursal["_id"])
-                        sucursales.append(sucursal)
-                cert["sucursales"] = sucursales
+                for sucursal in cert["sucursales"]:
+                    sucursal["_id"] = str(sucursal["_id"])
+            if limit:
+                respuesta = {"data": certificates, "next": siguiente_cursor(certificates, limit)}
+            else:
+                respuesta = certificates
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
-                Constants.BODY: json_util.dumps(certificates),
+                Constants.BODY: json_util.dumps(respuesta),
                 Constants.HEADERS_KEY: headers
             }
 
         elif http_method == Constants.DELETE:
             cert_id = path_parameters["id"]
-            certificate = get_certificate_by_id(cert_id, certificates_collection)
-            sucursales = certificate["sucursales"] 
-            for sucursal in sucursales:
-                delete_sucursal(sucursal["_id"], sucursal_collection)
-                folio_collection.delete_one({"sucursal": sucursal["codigo_sucursal"]})
-            delete_certificate(cert_id, certificates_collection)
+            certificate = elimina_certificado_cascada(
+                cert_id, client, certificates_collection, sucursal_collection, folio_collection)
+            if not certificate:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+                    Constants.BODY: json.dumps({"message": "Certificate not found"}),
+                    Constants.HEADERS_KEY: headers
+                }
             
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
@@ -3,10 +3,11 @@ import json
 import traceback
 from http import HTTPStatus
 from utils import valida_cors
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 from pymongo import MongoClient
 from constantes import Constants
 from dbaccess.db_bitacora import buscar_bitacora_por_fechas
+from dbaccess.paginacion import obten_limite
 
 # Configuración de MongoDB
 client = MongoClient(os.getenv("MONGODB_URI"))
@@ -20,7 +21,9 @@ def handler(event, context):
     """
     Handler para consultar la bitácora de actividades.
     
-    GET /consulta-bitacora?fechaInicio=YYYY-MM-DDTHH:MM:SS&fechaFin=YYYY-MM-DDTHH:MM:SS
+    GET /consulta-bitacora?fechaInicio=YYYY-MM-DD&fechaFin=YYYY-MM-DD[&limit=N&after=<cursor>&traceback=true]
+
+    Regresa {"data": [...], "next": cursor}; `next` es null en la última página.
     """
     print(event)
     try:
@@ -67,8 +70,21 @@ def handler(event, context):
                 }
             
             # Buscar registros en la bitácora
-            registros, total_registros = buscar_bitacora_por_fechas(fecha_inicio, fecha_fin, bitacora_collection)
-            if total_registros == 0:
+            after = query_params.get("after")
+            try:
+                registros, siguiente = buscar_bitacora_por_fechas(
+                    fecha_inicio, fecha_fin, bitacora_collection,
+                    limit=obten_limite(query_params.get("limit")),
+                    after=after,
+                    incluye_traceback=query_params.get("traceback", "").lower() == "true"
+                )
+            except ValueError as e:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.HEADERS_KEY: headers,
+                    Constants.BODY: json.dumps({"message": str(e)})
+                }
+            if not registros and not after:
                 return {
                     Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
                     Constants.HEADERS_KEY: headers,
@@ -81,7 +97,7 @@ def handler(event, context):
                 Constants.HEADERS_KEY: headers,
                 Constants.BODY: json.dumps({
                     "data": registros,
-                    "total": total_registros,
+                    "next": siguiente,
                 })
             }
         
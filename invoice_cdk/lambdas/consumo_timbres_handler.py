@@ -1,18 +1,47 @@
 import os
 import json
+from datetime import datetime
 from constantes import Constants
 from utils import valida_cors
 from pymongo import MongoClient
-from dbaccess.db_timbres import (consulta_facturas_emitidas_by_certificado)
+from dbaccess.db_timbres import (
+    consulta_facturas_emitidas_detalle,
+    resumen_consumo_por_certificado,
+    FORMATOS_PERIODO
+)
+from dbaccess.db_usage_counters import resumen_consumo_desde_contadores, contadores_reconstruidos
 from dbaccess.db_certificado import (list_certificates)
+from dbaccess.paginacion import obten_limite, siguiente_cursor
 
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client[os.getenv("DB_NAME")]
 certificates_collection = db["certificates"]
 facturas_emitidas_collection = db["facturasemitidas"]
+usage_counters_collection = db["usage_counters"]
+usage_counter_events_collection = db["usage_counter_events"]
 
 headers = Constants.HEADERS.copy()
 
+# Una vez reconstruidos, los contadores ya no dejan de estarlo
+_contadores_listos = False
+
+
+def _usa_contadores() -> bool:
+    """Los contadores solo se leen después de scripts/reconstruye_contadores.py sobre todo el histórico"""
+    global _contadores_listos
+    if not _contadores_listos:
+        _contadores_listos = contadores_reconstruidos(usage_counter_events_collection)
+    return _contadores_listos
+
+
+def _fecha_valida(valor) -> bool:
+    try:
+        datetime.strptime(valor or "", "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
 def lambda_handler(event, context):
     print(event)
     try:
@@ -23,13 +52,48 @@ def lambda_handler(event, context):
         if http_method == Constants.GET:
             usuario = path_parameters.get("usuario")
             if usuario:
-                desde = event['queryStringParameters'].get('desde')
-                hasta = event['queryStringParameters'].get('hasta')
+                query_params = event.get('queryStringParameters') or {}
+                desde = query_params.get('desde')
+                hasta = query_params.get('hasta')
+                if not (_fecha_valida(desde) and _fecha_valida(hasta)) or desde > hasta:
+                    return {
+                        Constants.STATUS_CODE: 400,
+                        Constants.BODY: json.dumps({'error': "desde y hasta son requeridos (YYYY-MM-DD) y desde no puede ser posterior a hasta"}),
+                        Constants.HEADERS_KEY: headers
+                    }
                 lista_certificados = list_certificates(usuario, certificates_collection)
+                ids_certificado = [str(cert['_id']) for cert in lista_certificados]
+                if query_params.get('detalle') == 'true':
+                    # Modo detalle: facturas paginadas y proyectadas, solo de los certificados del usuario
+                    id_certificado = query_params.get('idCertificado')
+                    if id_certificado:
+                        ids_certificado = [id_certificado] if id_certificado in ids_certificado else []
+                    limit = obten_limite(query_params.get('limit'))
+                    facturas = consulta_facturas_emitidas_detalle(
+                        ids_certificado, desde, hasta, facturas_emitidas_collection, limit, query_params.get('after'))
+                    return {
+                        Constants.STATUS_CODE: 200,
+                        Constants.BODY: json.dumps({"data": facturas, "next": siguiente_cursor(facturas, limit)}, default=str),
+                        Constants.HEADERS_KEY: headers
+                    }
+                agrupacion = query_params.get('agrupacion', 'dia')
+                if agrupacion not in FORMATOS_PERIODO:
+                    return {
+                        Constants.STATUS_CODE: 400,
+                        Constants.BODY: json.dumps({'error': f"agrupacion debe ser una de: {', '.join(FORMATOS_PERIODO)}"}),
+                        Constants.HEADERS_KEY: headers
+                    }
+                if not ids_certificado:
+                    resumen = {}
+                elif _usa_contadores():
+                    resumen = resumen_consumo_desde_contadores(
+                        ids_certificado, desde, hasta, usage_counters_collection, agrupacion)
+                else:
+                    # Sin reconstrucción los contadores no tienen el histórico anterior al despliegue
+                    resumen = resumen_consumo_por_certificado(
+                        ids_certificado, desde, hasta, facturas_emitidas_collection, agrupacion)
                 for cert in lista_certificados:
-                    facturas_emitidas = consulta_facturas_emitidas_by_certificado(
-                        str(cert['_id']), desde, hasta, facturas_emitidas_collection)
-                    cert['facturas_emitidas'] = facturas_emitidas
+                    cert['consumo'] = resumen[str(cert['_id'])]
                 
                 return {
                     Constants.STATUS_CODE: 200,
@@ -42,4 +106,4 @@ def lambda_handler(event, context):
             Constants.STATUS_CODE: 500,
             Constants.BODY: json.dumps({'error': str(e)}),
             Constants.HEADERS_KEY: headers
-        }
\ No newline at end of file
+        }
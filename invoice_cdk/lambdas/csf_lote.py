@@ -0,0 +1,168 @@
+"""
+Procesa un lote de constancias (CSF) en paralelo: un ZIP o un multipart con varios PDFs.
+
+    archivos -> huellas -> caché (un $in) ─┬ en caché: resultado inmediato
+                                           └ resto: procesos trabajadores -> guarda en caché
+        -> (opcional) upsert de receptores en un solo bulk_write
+
+Los trabajadores son procesos de `paralelo` (fork, sin /dev/shm). Un PDF que
+falla (imagen, dañado, o un trabajador que muere) se reporta como error de ese archivo
+sin detener el lote.
+"""
+import hashlib
+import io
+import os
+import zipfile
+from typing import Iterable, Iterator
+from dbaccess.db_csf import obtiene_csfs, guarda_csfs
+from dbaccess.db_receptor import normaliza_texto, actualiza_receptores_csf
+from paralelo import en_paralelo
+
+TRABAJADORES = int(os.getenv("CSF_LOTE_TRABAJADORES", "0")) or os.cpu_count() or 1
+# Con menos PDFs por trabajador el fork cuesta más de lo que ahorra
+PDFS_POR_TRABAJADOR_MIN = 4
+# El lote se responde dentro de los 29 s de API Gateway: ~0.5 s por PDF sin caché en
+# los 2 vCPU de la lambda del lote deja margen para 50
+MAX_ARCHIVOS = int(os.getenv("CSF_LOTE_MAX_ARCHIVOS", "50"))
+# Suma del tamaño descomprimido de los PDFs del ZIP (protege contra ZIP bombs); todo
+# el lote está en memoria junto con el cuerpo de la petición
+MAX_BYTES_LOTE = int(os.getenv("CSF_LOTE_MAX_BYTES", str(25 * 1024 * 1024)))
+MENSAJE_TRABAJADOR = "El proceso que leía el PDF terminó inesperadamente"
+MENSAJE_SIN_DATOS = "No se pudieron extraer datos del PDF, revisa que el formato sea correcto. Es posible que el PDF sea una imagen"
+# Prefijos con los que la constancia nombra los regímenes y que el catálogo del SAT no lleva
+_PREFIJOS_REGIMEN = ("REGIMEN DE LAS ", "REGIMEN DE LOS ", "REGIMEN DE ", "REGIMEN ")
+
+
+class LoteInvalido(Exception):
+    """El lote no se puede procesar; el mensaje es para el usuario"""
+
+
+def archivos_de_zip(contenido: bytes) -> list:
+    """[(nombre, bytes)] de los PDFs del ZIP, en el orden en que vienen"""
+    try:
+        zip_file = zipfile.ZipFile(io.BytesIO(contenido))
+    except zipfile.BadZipFile:
+        raise LoteInvalido("El archivo no es un ZIP válido")
+    entradas = [info for info in zip_file.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                and not os.path.basename(info.filename).startswith(".") and "__MACOSX/" not in info.filename]
+    valida_tamano(len(entradas), sum(info.file_size for info in entradas))
+    return [(info.filename, zip_file.read(info)) for info in entradas]
+
+
+def valida_tamano(archivos: int, total_bytes: int) -> None:
+    if not archivos:
+        raise LoteInvalido("El lote no contiene PDFs")
+    if archivos > MAX_ARCHIVOS:
+        raise LoteInvalido(f"El lote tiene {archivos} PDFs; el máximo es {MAX_ARCHIVOS}")
+    if total_bytes > MAX_BYTES_LOTE:
+        raise LoteInvalido(f"Los PDFs del lote suman {total_bytes} bytes; el máximo es {MAX_BYTES_LOTE}")
+
+
+def procesa_pdf(pdf: bytes) -> dict:
+    """Extrae un PDF; regresa {"csf": ...} o {"error": ...}, nunca lanza"""
+    try:
+        from pdf_regimen_parser_pymupdf import RegimenFiscalPyMuPDFParser
+        datos_csf = RegimenFiscalPyMuPDFParser().extract_from_bytes(pdf)
+    except Exception as e:
+        return {"error": f"No se pudo leer el PDF: {str(e)}"}
+    if not datos_csf["razonSocial"] and not datos_csf["Rfc"]:
+        return {"error": MENSAJE_SIN_DATOS}
+    return {"csf": datos_csf}
+
+
+def procesa_en_paralelo(pdfs: list, trabajadores: int = TRABAJADORES) -> Iterator[tuple]:
+    """
+    Reparte [(índice, bytes)] entre hasta `trabajadores` procesos y regresa
+    (índice, resultado) conforme terminan. Si no alcanzan dos trabajadores con
+    PDFS_POR_TRABAJADOR_MIN PDFs cada uno, se procesan en este mismo proceso.
+    """
+    return en_paralelo(procesa_pdf, pdfs, trabajadores, error={"error": MENSAJE_TRABAJADOR},
+                       minimo_por_trabajador=PDFS_POR_TRABAJADOR_MIN)
+
+
+def claves_regimen(catalogo: dict) -> dict:
+    """Descripción normalizada -> clave, a partir de {clave: descripción} del catálogo"""
+    return {_normaliza_regimen(descripcion): clave for clave, descripcion in catalogo.items() if descripcion}
+
+
+def _normaliza_regimen(descripcion: str) -> str:
+    normalizado = normaliza_texto(descripcion)
+    for prefijo in _PREFIJOS_REGIMEN:
+        if normalizado.startswith(prefijo):
+            return normalizado[len(prefijo):]
+    return normalizado
+
+
+def receptor_de_csf(datos_csf: dict, regimenes: dict) -> dict:
+    """Campos del receptor que da la constancia; el régimen solo si es uno y está en el catálogo"""
+    receptor = {
+        "Rfc": datos_csf["Rfc"],
+        "Nombre": datos_csf["razonSocial"].strip(),
+        "DomicilioFiscalReceptor": datos_csf["codigoPostal"],
+    }
+    regimenes_csf = datos_csf.get("regimenFiscal") or []
+    if len(regimenes_csf) == 1:
+        clave = regimenes.get(_normaliza_regimen(regimenes_csf[0]))
+        if clave:
+            receptor["RegimenFiscalReceptor"] = clave
+    return {campo: valor for campo, valor in receptor.items() if valor}
+
+
+def procesa_lote(archivos: Iterable[tuple], csf_cache_collection, receptor_collection=None,
+                 regimenes: dict = None, trabajadores: int = TRABAJADORES) -> Iterator[dict]:
+    """
+    Args:
+        archivos: [(nombre, bytes)]
+        receptor_collection: si se indica, los receptores se guardan al final del lote
+        regimenes: resultado de `claves_regimen` para resolver la clave del régimen
+
+    Yields:
+        {"archivo", "huella", "csf" | "error", "cache"} por archivo en el orden en que
+        terminan, y al final {"resumen": {...}}
+    """
+    archivos = list(archivos)
+    huellas = [hashlib.sha256(pdf).hexdigest() for _, pdf in archivos]
+    try:
+        en_cache = obtiene_csfs(set(huellas), csf_cache_collection)
+    except Exception as e:
+        print(f"No se pudo leer el caché de CSF: {str(e)}")
+        en_cache = {}
+    resumen = {"archivos": len(archivos), "correctos": 0, "errores": 0, "en_cache": 0}
+    extraidos = {}
+    pendientes = []
+    for indice, (_, pdf) in enumerate(archivos):
+        if huellas[indice] in en_cache:
+            resultado = {"csf": en_cache[huellas[indice]], "cache": True}
+            resumen["en_cache"] += 1
+            yield _linea(archivos, huellas, indice, resultado, resumen, extraidos)
+        else:
+            pendientes.append((indice, pdf))
+
+    nuevos = {}
+    for indice, resultado in procesa_en_paralelo(pendientes, trabajadores):
+        if "csf" in resultado:
+            nuevos[huellas[indice]] = resultado["csf"]
+        yield _linea(archivos, huellas, indice, {**resultado, "cache": False}, resumen, extraidos)
+    try:
+        guarda_csfs(nuevos, csf_cache_collection)
+    except Exception as e:
+        print(f"No se pudo guardar el lote de CSF en caché: {str(e)}")
+
+    if receptor_collection is not None:
+        receptores = {}
+        for datos_csf in extraidos.values():
+            receptor = receptor_de_csf(datos_csf, regimenes or {})
+            if receptor.get("Rfc"):
+                receptores[receptor["Rfc"]] = receptor
+        resumen["receptores"] = actualiza_receptores_csf(list(receptores.values()), receptor_collection)
+    yield {"resumen": resumen}
+
+
+def _linea(archivos, huellas, indice, resultado, resumen, extraidos) -> dict:
+    if "csf" in resultado:
+        resumen["correctos"] += 1
+        extraidos[indice] = resultado["csf"]
+    else:
+        resumen["errores"] += 1
+    return {"archivo": archivos[indice][0], "huella": huellas[indice], **resultado}
@@ -1,6 +1,8 @@
 from http import HTTPStatus
 from constantes import Constants
-from receptor_handler import valida_cors
+from utils import valida_cors
+from http_cache import calcula_etag, etag_coincide
+from dbaccess.catalogos import snapshot_vigente
 from pymongo import MongoClient
 import json
 import os
@@ -16,31 +18,52 @@ usocfdi_collection = db["usocfdis"]
 regimen_fiscal_collection = db["regimenfiscal"]
 forma_pago_collection = db["formapago"]
 
+# Los catálogos del SAT casi no cambian; el navegador revalida con If-None-Match
+CACHE_CONTROL = os.getenv("CATALOGOS_CACHE_CONTROL", "public, max-age=86400")
+
 headers = Constants.HEADERS.copy()
 
+def datos_factura_desde_mongo():
+    """Cuerpo de /datosfactura leído de Mongo, cuando no hay snapshot vigente"""
+    uso_cfdi = get_uso_cfdi(usocfdi_collection)
+    for uso in uso_cfdi:
+        uso["_id"] = str(uso["_id"])  # Convert ObjectId to string
+    regimen_fiscal = get_regimen_fiscal(regimen_fiscal_collection)
+    for regimen in regimen_fiscal:
+        regimen["_id"] = str(regimen["_id"])  # Convert ObjectId to string
+    forma_pago = get_forma_pago(forma_pago_collection)
+    for forma in forma_pago:
+        forma["_id"] = str(forma["_id"])  # Convert ObjectId to string
+    return json.dumps({
+        "uso_cfdi": uso_cfdi,
+        "regimen_fiscal": regimen_fiscal,
+        "forma_pago": forma_pago
+    })
+
 def handler(event, context):
     origin = event.get("headers", {}).get("origin")
     headers["Access-Control-Allow-Origin"] = valida_cors(origin)
     try:
         http_method = event["httpMethod"]
         if http_method == Constants.GET:
-            uso_cfdi = get_uso_cfdi(usocfdi_collection)
-            for uso in uso_cfdi:
-                uso["_id"] = str(uso["_id"])  # Convert ObjectId to string
-            regimen_fiscal = get_regimen_fiscal(regimen_fiscal_collection)
-            for regimen in regimen_fiscal:
-                regimen["_id"] = str(regimen["_id"])  # Convert ObjectId to string
-            forma_pago = get_forma_pago(forma_pago_collection)
-            for forma in forma_pago:
-                forma["_id"] = str(forma["_id"])  # Convert ObjectId to string
+            snapshot = snapshot_vigente(db)
+            if snapshot:
+                # Cuerpo pre-serializado en build; no hay consulta ni json.dumps
+                body, etag = snapshot["datos_factura"], snapshot["etag"]
+            else:
+                body = datos_factura_desde_mongo()
+                etag = calcula_etag(body)
+            cache_headers = {**headers, "ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Origin"}
+            if etag_coincide(event, etag):
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.NOT_MODIFIED,
+                    Constants.HEADERS_KEY: cache_headers,
+                    Constants.BODY: ""
+                }
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
-                Constants.HEADERS_KEY: headers,
-                Constants.BODY: json.dumps({
-                    "uso_cfdi": uso_cfdi,
-                    "regimen_fiscal": regimen_fiscal,
-                    "forma_pago": forma_pago
-                })
+                Constants.HEADERS_KEY: cache_headers,
+                Constants.BODY: body
             }
     except Exception as e:
         print(f"Error: {str(e)}")
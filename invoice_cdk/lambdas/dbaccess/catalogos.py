@@ -0,0 +1,111 @@
+"""
+Snapshot de los catálogos del SAT empacado junto con las lambdas.
+
+`scripts/exporta_catalogos.py` genera en build dos archivos en `catalogos/`:
+
+    datos_factura.json  cuerpo exacto de GET /datosfactura (uso_cfdi, regimen_fiscal, forma_pago)
+    indice.json         {"version", "etag", "generado", "indices": {catálogo: {clave: descripcion}}}
+
+Si el snapshot no existe, o si su versión no coincide con la publicada en la
+colección `catalogos_version` (corrección en caliente de un catálogo en Mongo),
+las funciones de `db_datos_factura` y `datos_factura_handler` leen de Mongo.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from http_cache import calcula_etag
+
+SNAPSHOT_DIR = Path(os.getenv("CATALOGOS_SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "catalogos"))
+ARCHIVO_DATOS_FACTURA = "datos_factura.json"
+ARCHIVO_INDICE = "indice.json"
+# Cada cuánto se vuelve a leer la versión publicada en Mongo, por contenedor
+VERIFICACION_TTL_SEGUNDOS = int(os.getenv("CATALOGOS_VERIFICACION_TTL", "300"))
+VERSION_ID = "catalogos"
+
+# Llave del cuerpo de /datosfactura -> colección
+CATALOGOS_DATOS_FACTURA = {"uso_cfdi": "usocfdis", "regimen_fiscal": "regimenfiscal", "forma_pago": "formapago"}
+# Colección -> campo por el que la buscan get_regimen_fiscal_by_clave / get_descripcion_by_clave
+CATALOGOS_INDEXADOS = {"regimenfiscal": "regimenfiscal", "medidas": "clave"}
+COLECCIONES = sorted(set(CATALOGOS_DATOS_FACTURA.values()) | set(CATALOGOS_INDEXADOS))
+
+_snapshot = None
+_version_publicada = {"version": None, "expira": 0.0}
+
+
+def lee_catalogos(db) -> dict:
+    """Documentos de cada colección de catálogo, ordenados por _id y con _id como string"""
+    catalogos = {}
+    for coleccion in COLECCIONES:
+        documentos = list(db[coleccion].find().sort("_id", 1))
+        for documento in documentos:
+            documento["_id"] = str(documento["_id"])
+        catalogos[coleccion] = documentos
+    return catalogos
+
+
+def calcula_version(catalogos: dict) -> str:
+    """Hash del contenido de los catálogos; cambia con cualquier alta, baja o edición"""
+    canonico = json.dumps(catalogos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonico.encode()).hexdigest()[:16]
+
+
+def construye_snapshot(catalogos: dict) -> tuple:
+    """Regresa (cuerpo de /datosfactura en bytes, índice) a partir de `lee_catalogos`"""
+    cuerpo = json.dumps({llave: catalogos[coleccion] for llave, coleccion in CATALOGOS_DATOS_FACTURA.items()})
+    indices = {
+        coleccion: {str(doc[campo]): doc.get("descripcion") for doc in catalogos[coleccion] if campo in doc}
+        for coleccion, campo in CATALOGOS_INDEXADOS.items()
+    }
+    indice = {
+        "version": calcula_version(catalogos),
+        "etag": calcula_etag(cuerpo),
+        "indices": indices
+    }
+    return cuerpo.encode(), indice
+
+
+def carga_snapshot():
+    """Snapshot empacado en la lambda, leído una sola vez por contenedor; None si no existe"""
+    global _snapshot
+    if _snapshot is None:
+        try:
+            with open(SNAPSHOT_DIR / ARCHIVO_INDICE) as f:
+                indice = json.load(f)
+            with open(SNAPSHOT_DIR / ARCHIVO_DATOS_FACTURA, "rb") as f:
+                # El proxy de API Gateway espera str; se decodifica una vez y se sirve tal cual
+                indice["datos_factura"] = f.read().decode()
+            _snapshot = indice
+        except FileNotFoundError:
+            _snapshot = False
+    return _snapshot or None
+
+
+def version_publicada(db):
+    """Versión publicada en `catalogos_version`, con caché por contenedor"""
+    ahora = time.monotonic()
+    if ahora >= _version_publicada["expira"]:
+        documento = db["catalogos_version"].find_one({"_id": VERSION_ID}, {"version": 1})
+        _version_publicada["version"] = documento.get("version") if documento else None
+        _version_publicada["expira"] = ahora + VERIFICACION_TTL_SEGUNDOS
+    return _version_publicada["version"]
+
+
+def snapshot_vigente(db):
+    """
+    Snapshot si existe y no está desactualizado. Sin versión publicada en Mongo se
+    confía en el snapshot; con una versión distinta se regresa None para leer de Mongo.
+    """
+    snapshot = carga_snapshot()
+    if not snapshot:
+        return None
+    try:
+        publicada = version_publicada(db)
+    except Exception as e:
+        print(f"No se pudo verificar la versión de catálogos, se usa el snapshot: {str(e)}")
+        return snapshot
+    if publicada and publicada != snapshot["version"]:
+        print(f"Snapshot de catálogos desactualizado ({snapshot['version']} != {publicada}), se lee de Mongo")
+        return None
+    return snapshot
@@ -1,50 +1,229 @@
-from datetime import datetime
-from typing import List, Dict, Any
+import re
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
 from pymongo.collection import Collection
 
-def buscar_bitacora_por_fechas(fecha_inicio: str, fecha_fin: str, bitacora_collection: Collection) -> List[Dict[str, Any]]:
+# Hora del centro de México (sin horario de verano desde 2022). Los parámetros de
+# consulta y los timestamps que se regresan al cliente se expresan en esta zona.
+ZONA_HORARIA = timezone(timedelta(hours=-6))
+BITACORA_SORT = [("timestamp", -1), ("_id", -1)]
+TAMANO_LOTE = 1000
+
+# Resumen de la bitácora
+FORMATOS_INTERVALO = {"hora": "%Y-%m-%dT%H:00", "dia": "%Y-%m-%d", "mes": "%Y-%m"}
+TOP_DEFAULT = 10
+TOP_MAXIMO = 50
+MAX_INTERVALOS = 744  # un mes por hora
+# Mensajes distintos que se traen del servidor antes de normalizarlos en Python
+MAX_GRUPOS_MENSAJE = 500
+LARGO_MENSAJE = 120
+_PATRONES_MENSAJE = [
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "<uuid>"),
+    (re.compile(r"\b[A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3}\b"), "<rfc>"),
+    (re.compile(r"\d+"), "#"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def _a_utc(fecha) -> datetime:
+    """Convierte una fecha ISO (o datetime) sin zona, interpretada en ZONA_HORARIA, a UTC"""
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha.replace('Z', '+00:00'))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=ZONA_HORARIA)
+    return fecha.astimezone(timezone.utc)
+
+
+def codifica_cursor(registro: Dict[str, Any]) -> str:
+    """Cursor `<milisegundos>_<_id>` del último registro de una página"""
+    timestamp = registro["timestamp"]
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return f"{int(timestamp.timestamp() * 1000)}_{registro['_id']}"
+
+
+def decodifica_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverso de `codifica_cursor`; lanza ValueError si el cursor no es válido"""
+    try:
+        milisegundos, registro_id = cursor.split("_", 1)
+        timestamp = datetime.fromtimestamp(int(milisegundos) / 1000, tz=timezone.utc)
+        return timestamp, ObjectId(registro_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def filtro_bitacora(fecha_inicio, fecha_fin, after: Optional[str] = None) -> Dict[str, Any]:
+    """Filtro por rango de fechas que continúa después del cursor `after` en orden BITACORA_SORT"""
+    filtro = {"timestamp": {"$gte": _a_utc(fecha_inicio), "$lte": _a_utc(fecha_fin)}}
+    if after:
+        timestamp, registro_id = decodifica_cursor(after)
+        filtro = {"$and": [filtro, {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": registro_id}}
+        ]}]}
+    return filtro
+
+
+def buscar_bitacora_por_fechas(fecha_inicio: str, fecha_fin: str, bitacora_collection: Collection,
+                               limit: int, after: Optional[str] = None,
+                               incluye_traceback: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Busca registros en la bitácora dentro del rango de fechas especificado.
-    
+    Busca una página de registros de la bitácora dentro del rango de fechas especificado.
+
     Args:
-        fecha_inicio: Fecha de inicio en formato ISO (YYYY-MM-DDTHH:MM:SS)
-        fecha_fin: Fecha de fin en formato ISO (YYYY-MM-DDTHH:MM:SS)
+        fecha_inicio: Fecha de inicio en formato ISO (YYYY-MM-DDTHH:MM:SS), hora del centro de México
+        fecha_fin: Fecha de fin en formato ISO (YYYY-MM-DDTHH:MM:SS), hora del centro de México
         bitacora_collection: Colección de MongoDB para bitácora
-    
+        limit: Número máximo de registros de la página
+        after: Cursor regresado por la página anterior
+        incluye_traceback: Si es False se omite el campo `traceback`
+
     Returns:
-        Lista de registros de bitácora que caen dentro del rango de fechas
+        Tupla (registros de la página, cursor de la siguiente página o None)
     """
-    try:
-        # Convertir strings a objetos datetime si es necesario
-        if isinstance(fecha_inicio, str):
-            fecha_inicio_dt = datetime.fromisoformat(fecha_inicio.replace('Z', '+00:00'))
-        else:
-            fecha_inicio_dt = fecha_inicio
-            
-        if isinstance(fecha_fin, str):
-            fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-        else:
-            fecha_fin_dt = fecha_fin
-        
-        # Crear el filtro de búsqueda
-        filtro = {
-            "timestamp": {
-                "$gte": fecha_inicio_dt.isoformat(),
-                "$lte": fecha_fin_dt.isoformat()
-            }
-        }
-        
-        # Ejecutar la búsqueda y ordenar por timestamp descendente
-        registros = list(bitacora_collection.find(filtro).sort("timestamp", -1))
-        #obten los registros
-        no_registros = len(registros)
-        # Convertir ObjectId a string para serialización JSON
-        for registro in registros:
-            if '_id' in registro:
-                registro['_id'] = str(registro['_id'])
-        #regresa los registros y el numero de registros
-        return registros, no_registros
-        
-    except Exception as e:
-        print(f"Error al buscar en bitácora: {str(e)}")
-        return [], 0
+    projection = None if incluye_traceback else {"traceback": 0}
+    cursor = bitacora_collection.find(filtro_bitacora(fecha_inicio, fecha_fin, after), projection)
+    registros = list(cursor.sort(BITACORA_SORT).limit(limit))
+    siguiente = codifica_cursor(registros[-1]) if len(registros) == limit else None
+    # Serialización JSON: _id como string y timestamp en hora local
+    for registro in registros:
+        registro['_id'] = str(registro['_id'])
+        timestamp = registro['timestamp']
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        registro['timestamp'] = timestamp.astimezone(ZONA_HORARIA).isoformat()
+    return registros, siguiente
+
+
+def timestamp_legado_a_utc(timestamp: str) -> datetime:
+    """
+    Los registros anteriores guardaban la hora local (UTC-6) como string ISO,
+    etiquetada como +00:00; se reinterpreta en ZONA_HORARIA y se pasa a UTC.
+    """
+    return datetime.fromisoformat(timestamp).replace(tzinfo=ZONA_HORARIA).astimezone(timezone.utc)
+
+
+def migra_timestamps(bitacora_collection: Collection, tamano_lote: int = TAMANO_LOTE) -> int:
+    """
+    Convierte a fecha BSON los `timestamp` guardados como string, por lotes y sin
+    cargar la colección en memoria. Se puede interrumpir y volver a ejecutar.
+
+    Returns:
+        Número de registros convertidos
+    """
+    cursor = bitacora_collection.find({"timestamp": {"$type": "string"}}, {"timestamp": 1}).batch_size(tamano_lote)
+    convertidos = 0
+    operaciones = []
+    for registro in cursor:
+        operaciones.append(UpdateOne(
+            {"_id": registro["_id"], "timestamp": registro["timestamp"]},
+            {"$set": {"timestamp": timestamp_legado_a_utc(registro["timestamp"])}}
+        ))
+        if len(operaciones) >= tamano_lote:
+            convertidos += bitacora_collection.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+    if operaciones:
+        convertidos += bitacora_collection.bulk_write(operaciones, ordered=False).modified_count
+    return convertidos
+
+
+def normaliza_mensaje(mensaje: str) -> str:
+    """Quita del mensaje de error los datos que cambian entre registros (uuid, RFC, números)"""
+    for patron, reemplazo in _PATRONES_MENSAJE:
+        mensaje = patron.sub(reemplazo, mensaje)
+    return mensaje.strip()
+
+
+def _conteo_por(campo: str, top: int) -> list:
+    return [
+        {"$group": {
+            "_id": campo,
+            "total": {"$sum": 1},
+            "errores": {"$sum": {"$cond": [{"$eq": ["$status", "error"]}, 1, 0]}}
+        }},
+        {"$sort": {"total": -1, "_id": 1}},
+        # Uno de más para saber si el top dejó grupos fuera
+        {"$limit": top + 1}
+    ]
+
+
+def pipeline_resumen_bitacora(fecha_inicio, fecha_fin, top: int = TOP_DEFAULT, intervalo: str = "dia",
+                              filtros: Optional[Dict[str, Any]] = None) -> list:
+    """
+    Pipeline con un solo recorrido del rango de fechas (índice timestamp_id_desc) que
+    cuenta por status, rfcEmisor, sucursal, intervalo de tiempo y mensaje de error.
+    """
+    match = {**filtro_bitacora(fecha_inicio, fecha_fin), **(filtros or {})}
+    # Los errores de SW llegan como "Nombre:... Uso CFDI:G03 <mensaje>"; solo interesa el mensaje
+    mensaje = {"$let": {
+        "vars": {"sw": {"$regexFind": {"input": "$mensaje", "regex": "^Nombre:.* Uso CFDI:\\S* (.*)$"}}},
+        "in": {"$substrCP": [
+            {"$cond": [{"$eq": ["$$sw", None]}, "$mensaje", {"$arrayElemAt": ["$$sw.captures", 0]}]},
+            0, LARGO_MENSAJE
+        ]}
+    }}
+    return [
+        {"$match": match},
+        {"$project": {"status": 1, "rfcEmisor": 1, "sucursal": 1, "mensaje": 1, "timestamp": 1}},
+        {"$facet": {
+            "total": [{"$count": "total"}],
+            "por_status": _conteo_por("$status", top),
+            "por_rfc_emisor": _conteo_por("$rfcEmisor", top),
+            "por_sucursal": _conteo_por("$sucursal", top),
+            "por_intervalo": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": FORMATOS_INTERVALO[intervalo], "date": "$timestamp",
+                                              "timezone": "-06:00"}},
+                    "total": {"$sum": 1},
+                    "errores": {"$sum": {"$cond": [{"$eq": ["$status", "error"]}, 1, 0]}}
+                }},
+                {"$sort": {"_id": 1}},
+                {"$limit": MAX_INTERVALOS + 1}
+            ],
+            "por_mensaje": [
+                {"$match": {"status": "error", "mensaje": {"$type": "string"}}},
+                {"$group": {"_id": mensaje, "total": {"$sum": 1}}},
+                {"$sort": {"total": -1}},
+                {"$limit": MAX_GRUPOS_MENSAJE}
+            ]
+        }}
+    ]
+
+
+def resumen_bitacora(fecha_inicio, fecha_fin, bitacora_collection: Collection, top: int = TOP_DEFAULT,
+                     intervalo: str = "dia", filtros: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Resume la bitácora del rango de fechas sin regresar los registros.
+
+    Returns:
+        {"total", "por_status", "por_rfc_emisor", "por_sucursal", "por_intervalo", "por_mensaje", "truncado"}; cada
+        grupo es {"valor", "total", "errores"} (por_mensaje solo {"valor", "total"})
+    """
+    resultado = next(bitacora_collection.aggregate(
+        pipeline_resumen_bitacora(fecha_inicio, fecha_fin, top, intervalo, filtros), allowDiskUse=True))
+    mensajes = {}
+    for grupo in resultado["por_mensaje"]:
+        clave = normaliza_mensaje(grupo["_id"] or "")
+        mensajes[clave] = mensajes.get(clave, 0) + grupo["total"]
+    intervalos = resultado["por_intervalo"]
+
+    def grupos(lista):
+        return [{"valor": g["_id"], "total": g["total"], "errores": g["errores"]} for g in lista]
+
+    conteos = [resultado[faceta] for faceta in ("por_status", "por_rfc_emisor", "por_sucursal")]
+    truncado = (any(len(conteo) > top for conteo in conteos)
+                or len(intervalos) > MAX_INTERVALOS
+                or len(mensajes) > top
+                or len(resultado["por_mensaje"]) == MAX_GRUPOS_MENSAJE)
+    return {
+        "total": resultado["total"][0]["total"] if resultado["total"] else 0,
+        "por_status": grupos(resultado["por_status"][:top]),
+        "por_rfc_emisor": grupos(resultado["por_rfc_emisor"][:top]),
+        "por_sucursal": grupos(resultado["por_sucursal"][:top]),
+        "por_intervalo": grupos(intervalos[:MAX_INTERVALOS]),
+        "por_mensaje": [{"valor": valor, "total": total}
+                        for valor, total in sorted(mensajes.items(), key=lambda m: (-m[1], m[0]))[:top]],
+        "truncado": truncado
+    }
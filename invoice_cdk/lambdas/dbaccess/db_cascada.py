@@ -0,0 +1,69 @@
+"""
+Borrado en cascada de certificados y sucursales.
+
+Cada operación corre dentro de una transacción multi-documento y usa borrados
+masivos ($in / $pull), de modo que el número de round trips no depende del
+número de sucursales y no quedan sucursales ni folios huérfanos si algo falla.
+Las transacciones requieren un replica set (Atlas lo es).
+"""
+from bson.objectid import ObjectId
+
+
+def _object_ids(ids) -> list:
+    return [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+
+
+def elimina_certificado_cascada(cert_id: str, client, certificates_collection, sucursal_collection, folio_collection):
+    """
+    Elimina el certificado, todas sus sucursales y sus folios en una transacción.
+
+    Returns:
+        El documento del certificado eliminado, o None si no existía
+    """
+    def _elimina(session):
+        certificado = certificates_collection.find_one({"_id": ObjectId(cert_id)}, session=session)
+        if not certificado:
+            return None
+        sucursales = certificado.get("sucursales", [])
+        # Se incluyen también las sucursales que apuntan al certificado pero ya no están embebidas
+        filtro_sucursales = {"$or": [
+            {"_id": {"$in": _object_ids(s.get("_id") for s in sucursales)}},
+            {"id_certificado": cert_id}
+        ]}
+        codigos = set(sucursal_collection.distinct("codigo_sucursal", filtro_sucursales, session=session))
+        codigos.update(s["codigo_sucursal"] for s in sucursales if s.get("codigo_sucursal"))
+        if codigos:
+            folio_collection.delete_many({"sucursal": {"$in": list(codigos)}}, session=session)
+        sucursal_collection.delete_many(filtro_sucursales, session=session)
+        certificates_collection.delete_one({"_id": certificado["_id"]}, session=session)
+        return certificado
+
+    with client.start_session() as session:
+        return session.with_transaction(_elimina)
+
+
+def elimina_sucursal_cascada(sucursal_id: str, client, sucursal_collection, certificates_collection, folio_collection):
+    """
+    Elimina la sucursal, la quita del arreglo `sucursales` de su certificado con $pull
+    y borra su folio, todo en una transacción.
+
+    Returns:
+        El documento de la sucursal eliminada, o None si no existía
+    """
+    def _elimina(session):
+        sucursal = sucursal_collection.find_one_and_delete({"_id": ObjectId(sucursal_id)}, session=session)
+        if not sucursal:
+            return None
+        id_certificado = sucursal.get("id_certificado")
+        if id_certificado and ObjectId.is_valid(id_certificado):
+            # La referencia embebida puede estar guardada como string o como ObjectId
+            certificates_collection.update_one(
+                {"_id": ObjectId(id_certificado)},
+                {"$pull": {"sucursales": {"_id": {"$in": [sucursal_id, ObjectId(sucursal_id)]}}}},
+                session=session
+            )
+        folio_collection.delete_many({"sucursal": sucursal["codigo_sucursal"]}, session=session)
+        return sucursal
+
+    with client.start_session() as session:
+        return session.with_transaction(_elimina)
@@ -23,6 +23,62 @@ def update_certificate(cert_id: str, updated_data: dict, certificates_collection
 def list_certificates(usuario: str, certificates_collection):
     return list(certificates_collection.find({"usuario": usuario}))
 
+# Campos que la UI necesita para el listado de certificados y sus sucursales
+CERTIFICADO_PROJECTION = {
+    "nombre": 1, "rfc": 1, "no_certificado": 1, "desde": 1, "hasta": 1, "usuario": 1
+}
+SUCURSAL_PROJECTION = {
+    "id_certificado": 1, "codigo_sucursal": 1, "serie": 1, "direccion": 1,
+    "codigo_postal": 1, "responsable": 1, "telefono": 1, "regimen_fiscal": 1
+}
+
+def get_sucursales_by_ids(sucursal_ids: list, sucursal_collection, projection: dict = None) -> list:
+    """Obtiene en una sola consulta todas las sucursales cuyos ids vienen en la lista"""
+    ids = [ObjectId(sucursal_id) for sucursal_id in sucursal_ids if ObjectId.is_valid(sucursal_id)]
+    if not ids:
+        return []
+    return list(sucursal_collection.find({"_id": {"$in": ids}}, projection or SUCURSAL_PROJECTION))
+
+def pipeline_certificates_with_sucursales(usuario: str, limit: int = None, after: str = None) -> list:
+    """
+    Arma el pipeline que lista los certificados del usuario y resuelve sus sucursales
+    con un $lookup, en lugar de consultar cada sucursal por separado.
+    """
+    match = {"usuario": usuario}
+    if after:
+        match["_id"] = {"$gt": ObjectId(after)}
+    pipeline = [{"$match": match}, {"$sort": {"_id": 1}}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.extend([
+        {"$project": {
+            **CERTIFICADO_PROJECTION,
+            # Las referencias embebidas guardan el _id de la sucursal como string
+            "sucursal_ids": {"$map": {
+                "input": {"$ifNull": ["$sucursales", []]},
+                "as": "s",
+                "in": {"$convert": {"input": "$$s._id", "to": "objectId", "onError": None, "onNull": None}}
+            }}
+        }},
+        {"$lookup": {
+            "from": "sucursales",
+            "localField": "sucursal_ids",
+            "foreignField": "_id",
+            "pipeline": [{"$project": SUCURSAL_PROJECTION}],
+            "as": "sucursales"
+        }}
+    ])
+    return pipeline
+
+def list_certificates_with_sucursales(usuario: str, certificates_collection, limit: int = None, after: str = None) -> list:
+    """Lista los certificados del usuario con sus sucursales en un solo round trip"""
+    certificates = list(certificates_collection.aggregate(pipeline_certificates_with_sucursales(usuario, limit, after)))
+    for cert in certificates:
+        # $lookup no respeta el orden del arreglo original; se reordena como estaba guardado
+        orden = {sucursal_id: i for i, sucursal_id in enumerate(cert.pop("sucursal_ids", []))}
+        cert["sucursales"].sort(key=lambda sucursal: orden.get(sucursal["_id"], len(orden)))
+    return certificates
+
 def get_certificate_by_id(cert_id: str, certificates_collection):
     return serialize_certificate(certificates_collection.find_one({"_id": ObjectId(cert_id)}))
 
@@ -0,0 +1,64 @@
+"""
+Caché de constancias (CSF) ya procesadas, por huella SHA-256 del PDF.
+
+Los usuarios suben el mismo PDF varias veces (otra sesión, otra caja, el mismo
+cliente); con la misma huella `parse_regimen_handler` regresa el `csf` guardado sin
+cargar PyMuPDF. Cada documento de `csf_cache`:
+
+    {"_id": sha256 del PDF, "csf": datos extraídos, "creado": fecha, "expira": fecha}
+
+El índice TTL sobre `expira` borra los vencidos; la lectura también filtra por `expira`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from pymongo import ReplaceOne
+
+CACHE_TTL_SEGUNDOS = int(os.getenv("CSF_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Contadores por contenedor para la tasa de aciertos que se reporta en cada consulta
+estadisticas = {"consultas": 0, "aciertos": 0}
+
+
+def obtiene_csf(huella: str, csf_cache_collection):
+    """`csf` guardado para la huella, o None"""
+    documento = csf_cache_collection.find_one(
+        {"_id": huella, "expira": {"$gt": datetime.now(timezone.utc)}}, {"csf": 1})
+    return documento["csf"] if documento else None
+
+
+def guarda_csf(huella: str, csf: dict, csf_cache_collection) -> None:
+    ahora = datetime.now(timezone.utc)
+    csf_cache_collection.replace_one(
+        {"_id": huella},
+        {"csf": csf, "creado": ahora, "expira": ahora + timedelta(seconds=CACHE_TTL_SEGUNDOS)},
+        upsert=True
+    )
+
+
+def obtiene_csfs(huellas: list, csf_cache_collection) -> dict:
+    """huella -> `csf` de las que están en caché, en una sola consulta"""
+    documentos = csf_cache_collection.find(
+        {"_id": {"$in": list(huellas)}, "expira": {"$gt": datetime.now(timezone.utc)}}, {"csf": 1})
+    return {documento["_id"]: documento["csf"] for documento in documentos}
+
+
+def guarda_csfs(csfs: dict, csf_cache_collection) -> None:
+    """Guarda varias constancias (huella -> `csf`) en un solo bulk_write"""
+    if not csfs:
+        return
+    ahora = datetime.now(timezone.utc)
+    expira = ahora + timedelta(seconds=CACHE_TTL_SEGUNDOS)
+    csf_cache_collection.bulk_write([
+        ReplaceOne({"_id": huella}, {"csf": csf, "creado": ahora, "expira": expira}, upsert=True)
+        for huella, csf in csfs.items()
+    ], ordered=False)
+
+
+def registra_consulta(aciertos: int, consultas: int = 1) -> dict:
+    """
+    Actualiza los contadores del contenedor y regresa una copia con la tasa de aciertos.
+    Un PDF suelto es registra_consulta(True | False); un lote, (en caché, número de PDFs).
+    """
+    estadisticas["consultas"] += consultas
+    estadisticas["aciertos"] += int(aciertos)
+    return {**estadisticas, "tasa_aciertos": round(estadisticas["aciertos"] / estadisticas["consultas"], 4)}
@@ -1,3 +1,4 @@
+from dbaccess.catalogos import snapshot_vigente
 
 def get_uso_cfdi(usocfdi_collection):
     return list(usocfdi_collection.find())
@@ -5,12 +6,39 @@ def get_uso_cfdi(usocfdi_collection):
 def get_regimen_fiscal(regimen_fiscal_collection):
     return list(regimen_fiscal_collection.find())
 
+def _descripcion_snapshot(catalogo, clave, collection):
+    """Descripción desde el índice del snapshot; None si no hay snapshot vigente o no trae la clave"""
+    snapshot = snapshot_vigente(collection.database)
+    if snapshot:
+        return snapshot["indices"].get(catalogo, {}).get(str(clave))
+    return None
+
 def get_regimen_fiscal_by_clave(regimenfiscal, regimen_fiscal_collection):
+    descripcion = _descripcion_snapshot("regimenfiscal", regimenfiscal, regimen_fiscal_collection)
+    if descripcion is not None:
+        return descripcion
     return regimen_fiscal_collection.find_one({"regimenfiscal": regimenfiscal}).get("descripcion")
 
 def get_forma_pago(forma_pago_collection):
     return list(forma_pago_collection.find())
 
 def get_descripcion_by_clave(clave, medidas_collection):
+    descripcion = _descripcion_snapshot("medidas", clave, medidas_collection)
+    if descripcion is not None:
+        return descripcion
     return medidas_collection.find_one({"clave": clave}).get("descripcion")
 
+def get_descripciones_by_claves(claves, medidas_collection) -> dict:
+    """
+    {clave: descripcion} de todas las claves de unidad de un ticket: las que trae el
+    snapshot no van a Mongo y el resto se resuelve con una sola consulta $in.
+    """
+    claves = set(claves)
+    snapshot = snapshot_vigente(medidas_collection.database)
+    indice = snapshot["indices"].get("medidas", {}) if snapshot else {}
+    descripciones = {clave: indice[str(clave)] for clave in claves if str(clave) in indice}
+    faltantes = [clave for clave in claves if clave not in descripciones]
+    if faltantes:
+        for medida in medidas_collection.find({"clave": {"$in": faltantes}}, {"clave": 1, "descripcion": 1}):
+            descripciones[medida["clave"]] = medida.get("descripcion")
+    return descripciones
@@ -1,13 +1,89 @@
+import xml.etree.ElementTree as ET
+from pymongo import ReturnDocument, UpdateOne
 from models.factura_emitida import FacturaEmitida
+from dbaccess.db_timbres import _rango_fechas
+
+NS_CFDI = {"cfdi": "http://www.sat.gob.mx/cfd/4"}
 
 def guarda_factura_emitida(factura_emitida: FacturaEmitida, facturas_emitidas_collection):
     facturas_emitidas_collection.insert_one(factura_emitida.dict())
 
-def get_factura_by_uuid(uuid: str, facturas_emitidas_collection):
-    return facturas_emitidas_collection.find_one({"uuid": uuid})
+def get_factura_by_uuid(uuid: str, facturas_emitidas_collection, projection: dict = None):
+    return facturas_emitidas_collection.find_one({"uuid": uuid}, projection)
+
+def get_factura_by_ticket(ticket: str, facturas_emitidas_collection, projection: dict = None):
+    return facturas_emitidas_collection.find_one({"ticket": ticket}, projection)
 
-def get_factura_by_ticket(ticket: str, facturas_emitidas_collection):
-    return facturas_emitidas_collection.find_one({"ticket": ticket})
+def get_factura_vigente_by_ticket(ticket: str, facturas_emitidas_collection, projection: dict = None):
+    """La factura no cancelada del ticket (la más reciente si se canceló y se volvió a timbrar)"""
+    return facturas_emitidas_collection.find_one(
+        {"ticket": ticket, "estatus": {"$ne": "Cancelada"}}, projection, sort=[("fechaTimbrado", -1)])
 
 def cancela_factura_status(uuid: str,  facturas_emitidas_collection):
-    facturas_emitidas_collection.update_one({"uuid": uuid}, {"$set": {"estatus": "Cancelada"}})
\ No newline at end of file
+    return facturas_emitidas_collection.find_one_and_update(
+        {"uuid": uuid}, {"$set": {"estatus": "Cancelada"}},
+        projection={"uuid": 1, "idCertificado": 1, "sucursal": 1, "fechaTimbrado": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+# Campos para volver a generar el PDF (descarga y reenvío); se excluyen sellos y certificados
+FACTURA_PDF_PROJECTION = {
+    "uuid": 1, "ticket": 1, "sucursal": 1, "fechaTimbrado": 1, "cfdi": 1, "qrCode": 1,
+    "cadenaOriginalSAT": 1, "rfcReceptor": 1, "email": 1, "fechaVenta": 1, "direccion": 1, "empresa": 1
+}
+
+def filtro_reenvio(ids_certificado: list, desde: str, hasta: str, rfc: str = None, sucursal: str = None) -> dict:
+    """
+    Facturas vigentes de los certificados del usuario en el rango; usa el índice
+    rfcReceptor_sucursal_fechaTimbrado o sucursal_fechaTimbrado según los filtros.
+    """
+    desde_dt, hasta_dt = _rango_fechas(desde, hasta)
+    filtro = {}
+    if rfc:
+        filtro["rfcReceptor"] = rfc.strip().upper()
+    if sucursal:
+        filtro["sucursal"] = sucursal
+    filtro["fechaTimbrado"] = {"$gte": desde_dt, "$lte": hasta_dt}
+    filtro["idCertificado"] = {"$in": ids_certificado}
+    filtro["estatus"] = {"$ne": "Cancelada"}
+    return filtro
+
+def cuenta_facturas_reenvio(filtro: dict, facturas_emitidas_collection, maximo: int) -> int:
+    """Cuenta hasta maximo + 1 para saber si el rango rebasa el límite sin contar todo"""
+    return facturas_emitidas_collection.count_documents(filtro, limit=maximo + 1)
+
+def consulta_facturas_reenvio(filtro: dict, facturas_emitidas_collection, maximo: int) -> list:
+    cursor = facturas_emitidas_collection.find(filtro, FACTURA_PDF_PROJECTION).sort("fechaTimbrado", 1).limit(maximo)
+    return list(cursor)
+
+def rfc_receptor_de_cfdi(cfdi: str):
+    """Rfc del nodo cfdi:Receptor del XML timbrado"""
+    try:
+        receptor = ET.fromstring(cfdi).find("cfdi:Receptor", NS_CFDI)
+    except ET.ParseError:
+        return None
+    return receptor.attrib.get("Rfc") if receptor is not None else None
+
+def migra_rfc_receptor(facturas_emitidas_collection, tamano_lote: int = 500) -> int:
+    """
+    Guarda `rfcReceptor` (leído del XML) en las facturas timbradas antes de que se
+    guardara, por lotes. Se puede volver a ejecutar.
+
+    Returns:
+        Número de facturas actualizadas
+    """
+    cursor = facturas_emitidas_collection.find(
+        {"rfcReceptor": None}, {"cfdi": 1}).batch_size(tamano_lote)
+    actualizadas = 0
+    operaciones = []
+    for factura in cursor:
+        rfc = rfc_receptor_de_cfdi(factura.get("cfdi") or "")
+        if not rfc:
+            continue
+        operaciones.append(UpdateOne({"_id": factura["_id"], "rfcReceptor": None}, {"$set": {"rfcReceptor": rfc}}))
+        if len(operaciones) >= tamano_lote:
+            actualizadas += facturas_emitidas_collection.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+    if operaciones:
+        actualizadas += facturas_emitidas_collection.bulk_write(operaciones, ordered=False).modified_count
+    return actualizadas
@@ -0,0 +1,43 @@
+"""
+Caché de los PDFs de facturas ya generados, por UUID.
+
+Generar el PDF (regímenes, dirección, fpdf) cuesta cientos de milisegundos; el XML
+timbrado no cambia, así que el primer render se guarda y las siguientes descargas
+son una sola lectura. La descarga por ticket primero resuelve el UUID de la factura
+vigente en `facturasemitidas`. Cada documento de `factura_pdf_cache`:
+
+    {"_id": uuid, "pdf": bytes, "etag": ETag del PDF, "creado": fecha, "expira": fecha}
+
+El índice TTL sobre `expira` borra los vencidos; la lectura también filtra por `expira`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from bson import Binary
+
+CACHE_TTL_SEGUNDOS = int(os.getenv("FACTURA_PDF_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+def obtiene_pdf(uuid: str, factura_pdf_cache_collection, incluye_pdf: bool = True):
+    """
+    {"_id": uuid, "etag": ..., "pdf": bytes} guardado para el UUID, o None.
+    Con `incluye_pdf=False` solo regresa el ETag (para responder 304 sin leer el PDF).
+    """
+    projection = {"etag": 1, "pdf": 1} if incluye_pdf else {"etag": 1}
+    return factura_pdf_cache_collection.find_one(
+        {"_id": uuid, "expira": {"$gt": datetime.now(timezone.utc)}}, projection)
+
+
+def obtiene_pdfs(uuids: list, factura_pdf_cache_collection) -> dict:
+    """uuid -> PDF de los que están en caché, en una sola consulta"""
+    documentos = factura_pdf_cache_collection.find(
+        {"_id": {"$in": list(uuids)}, "expira": {"$gt": datetime.now(timezone.utc)}}, {"pdf": 1})
+    return {documento["_id"]: bytes(documento["pdf"]) for documento in documentos}
+
+
+def guarda_pdf(uuid: str, pdf: bytes, etag: str, factura_pdf_cache_collection) -> None:
+    ahora = datetime.now(timezone.utc)
+    factura_pdf_cache_collection.replace_one(
+        {"_id": uuid},
+        {"pdf": Binary(pdf), "etag": etag, "creado": ahora, "expira": ahora + timedelta(seconds=CACHE_TTL_SEGUNDOS)},
+        upsert=True
+    )
@@ -1,13 +1,352 @@
+import base64
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Iterator
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from models.receptor import Receptor
 
+# Caché LRU por contenedor de receptores por RFC. El formulario de factura consulta el
+# mismo RFC varias veces seguidas; el TTL acota lo que puede tardar en verse un cambio
+# hecho desde otro contenedor.
+CACHE_TTL_SEGUNDOS = float(os.getenv("RECEPTOR_CACHE_TTL", "60"))
+CACHE_MAXIMO = int(os.getenv("RECEPTOR_CACHE_MAX", "512"))
+_cache = OrderedDict()
+
+# Importación / exportación masiva
+TAMANO_LOTE = 1000
+MAX_ERRORES_REPORTADOS = 1000
+
+# Búsqueda por prefijo: campo de la consulta -> (campo original, campo normalizado indexado)
+CAMPOS_BUSQUEDA = {"rfc": ("Rfc", "rfcNormalizado"), "nombre": ("Nombre", "nombreNormalizado")}
+BUSQUEDA_LIMITE_DEFAULT = 10
+
+
+def _cache_obtiene(rfc: str):
+    entrada = _cache.get(rfc)
+    if entrada is None:
+        return None
+    expira, receptor = entrada
+    if time.monotonic() >= expira:
+        del _cache[rfc]
+        return None
+    _cache.move_to_end(rfc)
+    return dict(receptor)
+
+
+def _cache_guarda(rfc: str, receptor: dict) -> None:
+    _cache[rfc] = (time.monotonic() + CACHE_TTL_SEGUNDOS, dict(receptor))
+    _cache.move_to_end(rfc)
+    while len(_cache) > CACHE_MAXIMO:
+        _cache.popitem(last=False)
+
+
+def invalida_cache(*rfcs: str) -> None:
+    """Saca los RFC indicados del caché, o lo vacía si no se indica ninguno"""
+    if not rfcs:
+        _cache.clear()
+    for rfc in rfcs:
+        _cache.pop(rfc, None)
+
+
+def normaliza_texto(texto: str) -> str:
+    """Mayúsculas, sin acentos (Ñ -> N) y con espacios colapsados; se aplica igual al guardar y al buscar"""
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return " ".join(sin_acentos.upper().split())
+
+
+def normaliza_rfc(rfc):
+    """RFC como se guarda y se indexa en Rfc_unique: sin espacios alrededor y en mayúsculas"""
+    return rfc.strip().upper() if isinstance(rfc, str) else rfc
+
+
+def campos_busqueda(datos: dict) -> dict:
+    """Campos normalizados de búsqueda para los campos de `datos` que los tienen"""
+    return {
+        normalizado: normaliza_texto(datos[original])
+        for original, normalizado in CAMPOS_BUSQUEDA.values()
+        if isinstance(datos.get(original), str)
+    }
+
+
+def _upsert(rfc: str, datos: dict, receptor_collection, upsert: bool):
+    # El índice único Rfc_unique evita que dos upserts simultáneos del mismo RFC inserten
+    # dos receptores; Mongo reintenta solo el que choca con la llave duplicada
+    # Todas las escrituras usan la misma llave que la importación, o un RFC en minúsculas
+    # no encontraría al receptor importado y crearía otro
+    rfc = normaliza_rfc(rfc)
+    datos = {campo: valor for campo, valor in datos.items() if campo != "_id"}
+    if "Rfc" in datos:
+        datos["Rfc"] = normaliza_rfc(datos["Rfc"])
+    datos.update(campos_busqueda(datos))
+    receptor = receptor_collection.find_one_and_update(
+        {"Rfc": rfc},
+        {"$set": datos},
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER
+    )
+    invalida_cache(rfc, datos.get("Rfc", rfc))
+    if receptor:
+        _cache_guarda(receptor["Rfc"], receptor)
+    return receptor
+
+
 def guarda_receptor(receptor: Receptor, receptor_collection):
-    return receptor_collection.insert_one(receptor.dict()).inserted_id
+    """Crea o actualiza el receptor por RFC (un solo viaje) y regresa su _id"""
+    return _upsert(receptor.Rfc, receptor.dict(), receptor_collection, upsert=True)["_id"]
 
 
 def obtiene_receptor_by_rfc(rfc: str, receptor_collection) -> Receptor:
-    return receptor_collection.find_one({"Rfc": rfc})
+    rfc = normaliza_rfc(rfc)
+    receptor = _cache_obtiene(rfc)
+    if receptor is not None:
+        return receptor
+    receptor = receptor_collection.find_one({"Rfc": rfc})
+    if receptor:
+        _cache_guarda(rfc, receptor)
+    return receptor
+
 
 def update_receptor(id_receptor: str, receptor_data: dict, receptor_collection):
-    """Update receptor by id_receptor (which is the RFC)"""
-    return receptor_collection.update_one({"_id": id_receptor}, {"$set": receptor_data})
+    """Update receptor by id_receptor (which is the RFC); returns the updated document or None"""
+    return _upsert(id_receptor, receptor_data, receptor_collection, upsert=False)
+
+
+def _errores_validacion(error: ValidationError) -> list:
+    return [f"{'.'.join(str(c) for c in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+
+def _escribe_lote(lote: dict, receptor_collection, resultado: dict) -> None:
+    """lote: Rfc -> (número de fila, receptor validado)"""
+    filas = list(lote.values())
+    operaciones = []
+    for rfc, (_, receptor) in lote.items():
+        datos = receptor.dict()
+        datos.update(campos_busqueda(datos))
+        operaciones.append(UpdateOne({"Rfc": rfc}, {"$set": datos}, upsert=True))
+    try:
+        escritura = receptor_collection.bulk_write(operaciones, ordered=False)
+        detalles = escritura.bulk_api_result
+    except BulkWriteError as e:
+        detalles = e.details
+        for error in detalles.get("writeErrors", []):
+            fila, receptor = filas[error["index"]]
+            _agrega_error(resultado, fila, receptor.Rfc, [error.get("errmsg", "Error de escritura")])
+    resultado["insertados"] += detalles.get("nUpserted", 0)
+    resultado["actualizados"] += detalles.get("nModified", 0)
+    # nModified omite los que coincidieron pero ya tenían esos valores
+    resultado["sinCambios"] += detalles.get("nMatched", 0) - detalles.get("nModified", 0)
+
+
+def _agrega_error(resultado: dict, fila: int, rfc, errores: list) -> None:
+    resultado["total_errores"] += 1
+    if len(resultado["errores"]) < MAX_ERRORES_REPORTADOS:
+        resultado["errores"].append({"fila": fila, "Rfc": rfc, "errores": errores})
+
+
+def importa_receptores(filas: Iterable[dict], receptor_collection, tamano_lote: int = TAMANO_LOTE) -> dict:
+    """
+    Valida cada fila con el modelo Receptor y la guarda con upserts por RFC, en lotes
+    de `tamano_lote` con bulk_write(ordered=False). Una fila inválida no detiene la carga.
+    Si un RFC se repite dentro del mismo lote se conserva la última fila y la anterior
+    cuenta en `duplicados`. procesadas = insertados + actualizados + sinCambios +
+    duplicados + total_errores.
+
+    Returns:
+        {"procesadas", "insertados", "actualizados", "sinCambios", "duplicados", "total_errores",
+         "errores": [{"fila", "Rfc", "errores"}]}
+    """
+    resultado = {"procesadas": 0, "insertados": 0, "actualizados": 0, "sinCambios": 0, "duplicados": 0,
+                 "total_errores": 0, "errores": []}
+    lote = {}
+    for numero, fila in enumerate(filas, start=1):
+        resultado["procesadas"] += 1
+        if isinstance(fila, Exception):
+            _agrega_error(resultado, numero, None, [str(fila)])
+            continue
+        datos = {campo: valor.strip() if isinstance(valor, str) else valor for campo, valor in fila.items() if campo}
+        if "Rfc" in datos:
+            datos["Rfc"] = normaliza_rfc(datos["Rfc"])
+        try:
+            receptor = Receptor(**datos)
+        except ValidationError as e:
+            _agrega_error(resultado, numero, datos.get("Rfc"), _errores_validacion(e))
+            continue
+        if lote.pop(receptor.Rfc, None) is not None:
+            resultado["duplicados"] += 1
+        lote[receptor.Rfc] = (numero, receptor)
+        if len(lote) >= tamano_lote:
+            _escribe_lote(lote, receptor_collection, resultado)
+            lote = {}
+    if lote:
+        _escribe_lote(lote, receptor_collection, resultado)
+    invalida_cache()
+    return resultado
+
+
+def actualiza_receptores_csf(receptores: list, receptor_collection) -> dict:
+    """
+    Upsert por RFC de los datos que trae una constancia (Rfc, Nombre, domicilio y, si se
+    pudo resolver, régimen), en un solo bulk_write. Los campos que la constancia no trae
+    (email, UsoCFDI) se conservan en los receptores existentes.
+
+    Returns:
+        {"insertados", "actualizados"}
+    """
+    if not receptores:
+        return {"insertados": 0, "actualizados": 0}
+    operaciones = []
+    receptores = [{**datos, "Rfc": normaliza_rfc(datos["Rfc"])} for datos in receptores]
+    for datos in receptores:
+        datos = {**datos, **campos_busqueda(datos)}
+        operaciones.append(UpdateOne({"Rfc": datos["Rfc"]}, {"$set": datos}, upsert=True))
+    resultado = receptor_collection.bulk_write(operaciones, ordered=False)
+    invalida_cache(*(datos["Rfc"] for datos in receptores))
+    return {"insertados": resultado.upserted_count, "actualizados": resultado.modified_count}
+
+
+def exporta_receptores(receptor_collection, after: str = None, limite: int = None,
+                       tamano_lote: int = TAMANO_LOTE) -> Iterator[dict]:
+    """
+    Recorre los receptores en orden de _id con un cursor (sin cargar la colección en
+    memoria), a partir del cursor `after`. Con `limite` regresa solo esa página.
+    """
+    filtro = {"_id": {"$gt": ObjectId(after)}} if after else {}
+    cursor = receptor_collection.find(filtro).sort("_id", 1).batch_size(tamano_lote)
+    if limite:
+        cursor = cursor.limit(limite)
+    for receptor in cursor:
+        receptor["_id"] = str(receptor["_id"])
+        yield receptor
+
+
+def campo_busqueda(texto: str) -> str:
+    """Campo por el que se busca si no se indica: un texto sin espacios y con dígitos es un RFC"""
+    normalizado = normaliza_texto(texto)
+    return "rfc" if " " not in normalizado and any(c.isdigit() for c in normalizado) else "nombre"
+
+
+def codifica_cursor_busqueda(valor: str, receptor_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([valor, str(receptor_id)]).encode()).decode()
+
+
+def decodifica_cursor_busqueda(cursor: str) -> tuple:
+    """Inverso de `codifica_cursor_busqueda`; lanza ValueError si el cursor no es válido"""
+    try:
+        valor, receptor_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return valor, ObjectId(receptor_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def filtro_busqueda(texto: str, campo: str, after: str = None) -> dict:
+    """Regex anclado sobre el campo normalizado que continúa después del cursor `after`"""
+    if campo not in CAMPOS_BUSQUEDA:
+        raise ValueError(f"campo debe ser uno de: {', '.join(CAMPOS_BUSQUEDA)}")
+    prefijo = normaliza_texto(texto)
+    if not prefijo:
+        raise ValueError("El texto de búsqueda está vacío")
+    normalizado = CAMPOS_BUSQUEDA[campo][1]
+    filtro = {normalizado: {"$regex": f"^{re.escape(prefijo)}"}}
+    if after:
+        valor, receptor_id = decodifica_cursor_busqueda(after)
+        filtro = {"$and": [filtro, {"$or": [
+            {normalizado: {"$gt": valor}},
+            {normalizado: valor, "_id": {"$gt": receptor_id}}
+        ]}]}
+    return filtro
+
+
+def orden_busqueda(campo: str) -> list:
+    return [(CAMPOS_BUSQUEDA[campo][1], 1), ("_id", 1)]
+
+
+def busca_receptores(texto: str, receptor_collection, campo: str = None,
+                     limite: int = BUSQUEDA_LIMITE_DEFAULT, after: str = None) -> tuple:
+    """
+    Busca receptores cuyo RFC o nombre normalizado empieza con `texto`. El regex anclado
+    usa el índice {campo normalizado, _id}, que también da el orden para el cursor.
+
+    Args:
+        campo: "rfc" o "nombre"; si es None se elige con `campo_busqueda`
+
+    Returns:
+        Tupla (receptores de la página, cursor de la siguiente página o None)
+    """
+    campo = campo or campo_busqueda(texto)
+    filtro = filtro_busqueda(texto, campo, after)
+    normalizado = CAMPOS_BUSQUEDA[campo][1]
+    # El campo buscado se conserva para el cursor y se quita antes de regresar
+    proyeccion = {otro: 0 for _, otro in CAMPOS_BUSQUEDA.values() if otro != normalizado}
+    receptores = list(receptor_collection.find(filtro, proyeccion).sort(orden_busqueda(campo)).limit(limite))
+    siguiente = None
+    if len(receptores) == limite:
+        siguiente = codifica_cursor_busqueda(receptores[-1][normalizado], receptores[-1]["_id"])
+    for receptor in receptores:
+        receptor.pop(normalizado, None)
+        receptor["_id"] = str(receptor["_id"])
+    return receptores, siguiente
+
+
+def migra_campos_busqueda(receptor_collection, tamano_lote: int = TAMANO_LOTE) -> int:
+    """
+    Calcula los campos normalizados de los receptores guardados antes de la búsqueda por
+    prefijo, por lotes y sin cargar la colección en memoria. Se puede volver a ejecutar.
+
+    Returns:
+        Número de receptores actualizados
+    """
+    cursor = receptor_collection.find(
+        {"rfcNormalizado": {"$exists": False}}, {"Rfc": 1, "Nombre": 1}).batch_size(tamano_lote)
+    actualizados = 0
+    operaciones = []
+    for receptor in cursor:
+        campos = campos_busqueda(receptor)
+        if not campos:
+            continue
+        operaciones.append(UpdateOne(
+            {"_id": receptor["_id"], "rfcNormalizado": {"$exists": False}},
+            {"$set": campos}
+        ))
+        if len(operaciones) >= tamano_lote:
+            actualizados += receptor_collection.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+    if operaciones:
+        actualizados += receptor_collection.bulk_write(operaciones, ordered=False).modified_count
+    return actualizados
+
+
+def deduplica_receptores(receptor_collection) -> int:
+    """
+    Deja un solo receptor por Rfc para poder crear el índice único: conserva el más
+    reciente (mayor _id) y le completa los campos vacíos con los de los anteriores. Se
+    puede volver a ejecutar.
 
+    Returns:
+        Número de receptores eliminados
+    """
+    duplicados = receptor_collection.aggregate([
+        {"$match": {"Rfc": {"$type": "string"}}},
+        {"$group": {"_id": "$Rfc", "ids": {"$push": "$_id"}, "total": {"$sum": 1}}},
+        {"$match": {"total": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    eliminados = 0
+    for grupo in duplicados:
+        conservado, *anteriores = receptor_collection.find({"_id": {"$in": grupo["ids"]}}).sort("_id", -1)
+        faltantes = {}
+        for anterior in anteriores:
+            for campo, valor in anterior.items():
+                if conservado.get(campo) in (None, "") and campo not in faltantes and valor not in (None, ""):
+                    faltantes[campo] = valor
+        operaciones = [DeleteOne({"_id": anterior["_id"]}) for anterior in anteriores]
+        if faltantes:
+            operaciones.insert(0, UpdateOne({"_id": conservado["_id"]}, {"$set": faltantes}))
+        eliminados += receptor_collection.bulk_write(operaciones).deleted_count
+    invalida_cache()
+    return eliminados
@@ -1,19 +1,128 @@
+import os
+import time
+from collections import OrderedDict
 from bson.objectid import ObjectId
 from models.sucursal import Sucursal
+from dbaccess.db_certificado import SUCURSAL_PROJECTION, serialize_certificate
+
+# Caché por contenedor de get_sucursal_by_codigo (tapetes_handler la consulta en cada
+# ticket). Los códigos que no existen también se guardan, con un TTL más corto, para
+# que un código mal capturado no llegue a Mongo en cada intento. La invalidación solo
+# alcanza al contenedor que hace la escritura; en los demás el TTL acota el retraso.
+CACHE_TTL_SEGUNDOS = float(os.getenv("SUCURSAL_CACHE_TTL", "300"))
+CACHE_NEGATIVO_TTL_SEGUNDOS = float(os.getenv("SUCURSAL_CACHE_NEGATIVO_TTL", "30"))
+CACHE_MAXIMO = int(os.getenv("SUCURSAL_CACHE_MAX", "1024"))
+_cache = OrderedDict()
+# Misma política para get_sucursal_con_certificado (sucursal y certificado del ticket)
+_cache_con_certificado = OrderedDict()
+
+LISTADO_SORT = [("_id", 1)]
+
+
+def invalida_cache(*codigos: str) -> None:
+    """Saca los códigos indicados del caché, o lo vacía si no se indica ninguno"""
+    for cache in (_cache, _cache_con_certificado):
+        if not codigos:
+            cache.clear()
+        for codigo in codigos:
+            cache.pop(codigo, None)
+
+
+def _cache_obtiene(cache: OrderedDict, codigo: str):
+    """(True, valor) si el código está vigente en el caché, (False, None) si no"""
+    entrada = cache.get(codigo)
+    if entrada is None or time.monotonic() >= entrada[0]:
+        return False, None
+    cache.move_to_end(codigo)
+    return True, entrada[1]
+
+
+def _cache_guarda(cache: OrderedDict, codigo: str, valor, encontrado: bool) -> None:
+    ttl = CACHE_TTL_SEGUNDOS if encontrado else CACHE_NEGATIVO_TTL_SEGUNDOS
+    cache[codigo] = (time.monotonic() + ttl, valor)
+    cache.move_to_end(codigo)
+    while len(cache) > CACHE_MAXIMO:
+        cache.popitem(last=False)
+
 
 def get_sucursal_by_id(sucursal_id: str, sucursal_collection):
     return sucursal_collection.find_one({"_id": ObjectId(sucursal_id)})
 
 def get_sucursal_by_codigo(codigo_sucursal: str, sucursal_collection):
-    return sucursal_collection.find_one({"codigo_sucursal": codigo_sucursal})
+    vigente, sucursal = _cache_obtiene(_cache, codigo_sucursal)
+    if not vigente:
+        sucursal = sucursal_collection.find_one({"codigo_sucursal": codigo_sucursal})
+        _cache_guarda(_cache, codigo_sucursal, sucursal, sucursal is not None)
+    return dict(sucursal) if sucursal else None
+
+def pipeline_sucursal_con_certificado(codigo_sucursal: str) -> list:
+    """Sucursal por código (índice codigo_sucursal) con su certificado resuelto por _id"""
+    return [
+        {"$match": {"codigo_sucursal": codigo_sucursal}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "certificates",
+            # id_certificado se guarda como string; uno inválido deja el certificado vacío
+            "let": {"id_certificado": {"$convert": {
+                "input": "$id_certificado", "to": "objectId", "onError": None, "onNull": None}}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$id_certificado"]}}},
+                {"$limit": 1}
+            ],
+            "as": "certificado"
+        }}
+    ]
+
+def get_sucursal_con_certificado(codigo_sucursal: str, sucursal_collection) -> tuple:
+    """
+    Sucursal y certificado del ticket en un solo viaje a Mongo, con el mismo caché que
+    get_sucursal_by_codigo.
+
+    Returns:
+        (sucursal o None, certificado serializado o None)
+    """
+    vigente, resultado = _cache_obtiene(_cache_con_certificado, codigo_sucursal)
+    if not vigente:
+        sucursal = next(sucursal_collection.aggregate(pipeline_sucursal_con_certificado(codigo_sucursal)), None)
+        certificado = None
+        if sucursal:
+            certificados = sucursal.pop("certificado")
+            certificado = serialize_certificate(certificados[0]) if certificados else None
+        resultado = (sucursal, certificado)
+        _cache_guarda(_cache_con_certificado, codigo_sucursal, resultado, sucursal is not None)
+    sucursal, certificado = resultado
+    return (dict(sucursal) if sucursal else None, dict(certificado) if certificado else None)
+
+def ids_certificados_de_usuario(usuario: str, certificates_collection) -> list:
+    """Ids (string, como se guardan en sucursales.id_certificado) de los certificados del usuario"""
+    return [str(cert["_id"]) for cert in certificates_collection.find({"usuario": usuario}, {"_id": 1})]
+
+def lista_sucursales(id_certificados: list, sucursal_collection, limit: int,
+                     after: str = None, projection: dict = None) -> list:
+    """
+    Una página de las sucursales de los certificados indicados, en orden de _id
+    (índice id_certificado_id) y solo con los campos de `projection`.
+    """
+    filtro = {"id_certificado": {"$in": list(id_certificados)}}
+    if after:
+        filtro["_id"] = {"$gt": ObjectId(after)}
+    cursor = sucursal_collection.find(filtro, projection or SUCURSAL_PROJECTION)
+    return list(cursor.sort(LISTADO_SORT).limit(limit))
 
 def add_sucursal(sucursal: Sucursal, sucursal_collection):
-    return sucursal_collection.insert_one(sucursal.dict()).inserted_id
+    sucursal_id = sucursal_collection.insert_one(sucursal.dict()).inserted_id
+    invalida_cache(sucursal.codigo_sucursal)
+    return sucursal_id
 
 def update_sucursal(sucursal_id: str, updated_data: dict, sucursal_collection):
-    return sucursal_collection.update_one(
+    resultado = sucursal_collection.update_one(
         {"_id": ObjectId(sucursal_id)}, {"$set": updated_data}
     )
+    # El código anterior no se conoce sin otra lectura; las actualizaciones son raras
+    invalida_cache()
+    return resultado
 
 def delete_sucursal(sucursal_id: str, sucursal_collection):
-    return sucursal_collection.delete_one({"_id": ObjectId(sucursal_id)})
\ No newline at end of file
+    resultado = sucursal_collection.delete_one({"_id": ObjectId(sucursal_id)})
+    invalida_cache()
+    return resultado
@@ -0,0 +1,82 @@
+"""
+Snapshot de la venta de Tapetes por ticket.
+
+`tapetes_handler` guarda la respuesta de /tickets y, mientras no expire, la vuelve a
+servir sin llamar a Tapetes (reintentos, recargas de la página, edición del receptor).
+`genera_factura_handler` compara el total del timbrado contra el del snapshot sin
+otro viaje al punto de venta.
+
+Cada documento de `ticket_snapshots`:
+
+    {"_id": ticket normalizado, "venta": respuesta de Tapetes, "totales": {...},
+     "creado": fecha, "expira": fecha}
+
+El índice TTL sobre `expira` (expireAfterSeconds=0) borra los vencidos; como el
+monitor TTL corre cada minuto, la lectura también filtra por `expira`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+SNAPSHOT_TTL_SEGUNDOS = int(os.getenv("TICKET_SNAPSHOT_TTL", "1800"))
+# Diferencia máxima aceptada entre el total del timbrado y el del ticket (redondeos)
+TOLERANCIA_TOTAL = 0.01
+
+
+def normaliza_ticket(ticket: str) -> str:
+    """Misma llave que ticket_timbrado: sin guiones ni espacios"""
+    return ticket.replace("-", "").strip()
+
+
+def _importe(valor):
+    try:
+        return round(float(valor), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def totales_venta(venta: dict) -> dict:
+    """Totales del encabezado del ticket; Tapetes manda el impuesto como `impuesto` o `impuestos`"""
+    encabezado = venta.get("ticket") or {}
+    return {
+        "subtotal": _importe(encabezado.get("subtotal")),
+        "impuesto": _importe(encabezado.get("impuesto", encabezado.get("impuestos"))),
+        "total": _importe(encabezado.get("total")),
+    }
+
+
+def guarda_snapshot(ticket: str, venta: dict, ticket_snapshot_collection) -> None:
+    ahora = datetime.now(timezone.utc)
+    ticket_snapshot_collection.replace_one(
+        {"_id": normaliza_ticket(ticket)},
+        {
+            "venta": venta,
+            "sucursal": venta.get("sucursal"),
+            "totales": totales_venta(venta),
+            "creado": ahora,
+            "expira": ahora + timedelta(seconds=SNAPSHOT_TTL_SEGUNDOS),
+        },
+        upsert=True
+    )
+
+
+def obtiene_snapshot(ticket: str, ticket_snapshot_collection, projection: dict = None):
+    """Snapshot vigente del ticket, o None"""
+    return ticket_snapshot_collection.find_one(
+        {"_id": normaliza_ticket(ticket), "expira": {"$gt": datetime.now(timezone.utc)}}, projection)
+
+
+def verifica_totales(ticket: str, timbrado: dict, ticket_snapshot_collection):
+    """
+    Compara el Total del timbrado contra el total del ticket en el snapshot.
+
+    Returns:
+        (True | False | None, mensaje); None si no hay snapshot vigente con total
+    """
+    snapshot = obtiene_snapshot(ticket, ticket_snapshot_collection, {"totales": 1})
+    total_ticket = (snapshot or {}).get("totales", {}).get("total")
+    if total_ticket is None:
+        return None, "Sin snapshot vigente del ticket"
+    total_timbrado = _importe(timbrado.get("Total"))
+    if total_timbrado is None or round(abs(total_timbrado - total_ticket), 2) > TOLERANCIA_TOTAL:
+        return False, f"El total del timbrado ({timbrado.get('Total')}) no coincide con el del ticket ({total_ticket})"
+    return True, "Total verificado contra el ticket"
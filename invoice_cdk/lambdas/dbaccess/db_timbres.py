@@ -1,11 +1,75 @@
 from datetime import datetime, timezone
+from bson.objectid import ObjectId
 
-def consulta_facturas_emitidas_by_certificado(id_certificado, desde: str, hasta: str, facturas_emitidas_collection=None):
+# Campos del modo detalle; se excluyen cfdi, qrCode, sellos y cadena original
+FACTURA_DETALLE_PROJECTION = {
+    "uuid": 1, "ticket": 1, "sucursal": 1, "idCertificado": 1,
+    "fechaTimbrado": 1, "estatus": 1, "noCertificadoCFDI": 1
+}
+FORMATOS_PERIODO = {"dia": "%Y-%m-%d", "mes": "%Y-%m"}
+
+def _rango_fechas(desde: str, hasta: str):
     desde_dt = datetime.strptime(desde + 'T00:00:00', "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
     hasta_dt = datetime.strptime(hasta + 'T23:59:59', "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return desde_dt, hasta_dt
+
+def consulta_facturas_emitidas_by_certificado(id_certificado, desde: str, hasta: str, facturas_emitidas_collection=None):
+    desde_dt, hasta_dt = _rango_fechas(desde, hasta)
     facturas_emitidas = facturas_emitidas_collection.find({
         "idCertificado": id_certificado,
         "fechaTimbrado": {"$gte": desde_dt, "$lte": hasta_dt}
     })
     return list(facturas_emitidas)
 
+def pipeline_resumen_consumo(ids_certificado: list, desde: str, hasta: str, agrupacion: str = "dia") -> list:
+    """Pipeline que cuenta los timbres por certificado y por día o mes, sin traer los documentos"""
+    desde_dt, hasta_dt = _rango_fechas(desde, hasta)
+    return [
+        {"$match": {
+            "idCertificado": {"$in": ids_certificado},
+            "fechaTimbrado": {"$gte": desde_dt, "$lte": hasta_dt}
+        }},
+        {"$group": {
+            "_id": {
+                "idCertificado": "$idCertificado",
+                "periodo": {"$dateToString": {"format": FORMATOS_PERIODO[agrupacion], "date": "$fechaTimbrado"}}
+            },
+            "timbres": {"$sum": 1},
+            "cancelados": {"$sum": {"$cond": [{"$eq": ["$estatus", "Cancelada"]}, 1, 0]}}
+        }},
+        {"$sort": {"_id.idCertificado": 1, "_id.periodo": 1}}
+    ]
+
+def resumen_consumo_por_certificado(ids_certificado: list, desde: str, hasta: str,
+                                    facturas_emitidas_collection, agrupacion: str = "dia") -> dict:
+    """
+    Resume el consumo de timbres de varios certificados en una sola agregación.
+
+    Returns:
+        Diccionario idCertificado -> {"total", "cancelados", "periodos": [{"periodo", "timbres", "cancelados"}]}
+    """
+    resumen = {id_certificado: {"total": 0, "cancelados": 0, "periodos": []} for id_certificado in ids_certificado}
+    grupos = facturas_emitidas_collection.aggregate(pipeline_resumen_consumo(ids_certificado, desde, hasta, agrupacion))
+    for grupo in grupos:
+        consumo = resumen[grupo["_id"]["idCertificado"]]
+        consumo["total"] += grupo["timbres"]
+        consumo["cancelados"] += grupo["cancelados"]
+        consumo["periodos"].append({
+            "periodo": grupo["_id"]["periodo"],
+            "timbres": grupo["timbres"],
+            "cancelados": grupo["cancelados"]
+        })
+    return resumen
+
+def consulta_facturas_emitidas_detalle(ids_certificado: list, desde: str, hasta: str, facturas_emitidas_collection,
+                                       limit: int, after: str = None) -> list:
+    """Página de facturas emitidas con solo los campos de FACTURA_DETALLE_PROJECTION"""
+    desde_dt, hasta_dt = _rango_fechas(desde, hasta)
+    filtro = {
+        "idCertificado": {"$in": ids_certificado},
+        "fechaTimbrado": {"$gte": desde_dt, "$lte": hasta_dt}
+    }
+    if after:
+        filtro["_id"] = {"$gt": ObjectId(after)}
+    cursor = facturas_emitidas_collection.find(filtro, FACTURA_DETALLE_PROJECTION).sort("_id", 1).limit(limit)
+    return list(cursor)
@@ -0,0 +1,160 @@
+"""
+Contadores pre-agregados de consumo de timbres.
+
+Cada documento de `usage_counters` acumula los timbres y cancelaciones de un
+certificado y una sucursal en un día, de modo que los reportes por rango de
+fechas suman unos cuantos documentos en lugar de recorrer `facturasemitidas`.
+
+La idempotencia por UUID se logra con un marcador en `usage_counter_events`
+(`_id` = "<uuid>:<evento>"): si el marcador ya existe, el evento ya se contó y
+no se vuelve a incrementar. Si el proceso muere entre el marcador y el $inc,
+`reconstruye_contadores` recalcula los valores desde el histórico.
+
+Los contadores solo cubren el histórico completo después de una reconstrucción
+sin filtro, que deja el marcador MARCADOR_RECONSTRUCCION; mientras no exista, los
+reportes deben seguir agregando `facturasemitidas`.
+"""
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+EVENTO_TIMBRE = "timbre"
+EVENTO_CANCELACION = "cancelacion"
+CAMPO_POR_EVENTO = {EVENTO_TIMBRE: "timbres", EVENTO_CANCELACION: "cancelados"}
+TAMANO_LOTE = 1000
+# Prefijo de "YYYY-MM-DD" que identifica el periodo de cada agrupación
+LARGO_PERIODO = {"dia": 10, "mes": 7}
+# _id en usage_counter_events; no choca con los "<uuid>:<evento>"
+MARCADOR_RECONSTRUCCION = "reconstruccion-completa"
+
+
+def _dia(fecha) -> str:
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha.replace('Z', '+00:00'))
+    return fecha.strftime("%Y-%m-%d")
+
+
+def _llave(factura: dict) -> dict:
+    return {
+        "idCertificado": factura["idCertificado"],
+        "sucursal": factura.get("sucursal"),
+        "dia": _dia(factura["fechaTimbrado"])
+    }
+
+
+def _registra_evento(factura: dict, evento: str, counters_collection, events_collection) -> bool:
+    try:
+        events_collection.insert_one({"_id": f"{factura['uuid']}:{evento}"})
+    except DuplicateKeyError:
+        return False
+    counters_collection.update_one(_llave(factura), {"$inc": {CAMPO_POR_EVENTO[evento]: 1}}, upsert=True)
+    return True
+
+
+def registra_timbre(factura: dict, counters_collection, events_collection) -> bool:
+    """Suma un timbre al contador del día; regresa False si el UUID ya estaba contado"""
+    return _registra_evento(factura, EVENTO_TIMBRE, counters_collection, events_collection)
+
+
+def registra_cancelacion(factura: dict, counters_collection, events_collection) -> bool:
+    """
+    Suma una cancelación al contador del día en que se timbró la factura, igual que
+    el resumen calculado sobre `facturasemitidas`; regresa False si ya estaba contada.
+    """
+    return _registra_evento(factura, EVENTO_CANCELACION, counters_collection, events_collection)
+
+
+def contadores_reconstruidos(events_collection) -> bool:
+    """True si una reconstrucción completa ya cargó el histórico en los contadores"""
+    return events_collection.find_one({"_id": MARCADOR_RECONSTRUCCION}, {"_id": 1}) is not None
+
+
+def resumen_consumo_desde_contadores(ids_certificado: list, desde: str, hasta: str,
+                                     counters_collection, agrupacion: str = "dia") -> dict:
+    """
+    Mismo resultado que `resumen_consumo_por_certificado`, sumando los contadores diarios.
+
+    Returns:
+        Diccionario idCertificado -> {"total", "cancelados", "periodos": [{"periodo", "timbres", "cancelados"}]}
+    """
+    largo_periodo = LARGO_PERIODO[agrupacion]
+    periodos = {id_certificado: {} for id_certificado in ids_certificado}
+    contadores = counters_collection.find(
+        {"idCertificado": {"$in": ids_certificado}, "dia": {"$gte": desde, "$lte": hasta}},
+        {"_id": 0, "idCertificado": 1, "dia": 1, "timbres": 1, "cancelados": 1}
+    )
+    for contador in contadores:
+        periodo = periodos[contador["idCertificado"]].setdefault(
+            contador["dia"][:largo_periodo], {"periodo": contador["dia"][:largo_periodo], "timbres": 0, "cancelados": 0})
+        periodo["timbres"] += contador.get("timbres", 0)
+        periodo["cancelados"] += contador.get("cancelados", 0)
+    resumen = {}
+    for id_certificado, por_periodo in periodos.items():
+        lista = [por_periodo[p] for p in sorted(por_periodo)]
+        resumen[id_certificado] = {
+            "total": sum(p["timbres"] for p in lista),
+            "cancelados": sum(p["cancelados"] for p in lista),
+            "periodos": lista
+        }
+    return resumen
+
+
+def _inserta_marcadores(marcadores: list, events_collection) -> None:
+    if not marcadores:
+        return
+    try:
+        events_collection.insert_many([{"_id": m} for m in marcadores], ordered=False)
+    except BulkWriteError:
+        # Los marcadores que ya existían se ignoran
+        pass
+
+
+def reconstruye_contadores(facturas_emitidas_collection, counters_collection, events_collection,
+                           filtro: dict = None) -> int:
+    """
+    Recalcula los contadores a partir del histórico de `facturasemitidas`.
+
+    Recorre las facturas con un cursor (sin materializarlas), acumula en memoria
+    un total por certificado/sucursal/día y al final reemplaza los valores con $set.
+    Conviene correrlo con poco tráfico: los timbres que lleguen mientras corre
+    pueden quedar fuera del valor final. Sin `filtro` (histórico completo) deja
+    MARCADOR_RECONSTRUCCION para que los reportes empiecen a leer los contadores.
+
+    Returns:
+        Número de facturas procesadas
+    """
+    totales = {}
+    marcadores = []
+    procesadas = 0
+    cursor = facturas_emitidas_collection.find(
+        filtro or {},
+        {"_id": 0, "uuid": 1, "idCertificado": 1, "sucursal": 1, "fechaTimbrado": 1, "estatus": 1},
+        batch_size=TAMANO_LOTE
+    )
+    for factura in cursor:
+        llave = _llave(factura)
+        total = totales.setdefault(tuple(llave.values()), {**llave, "timbres": 0, "cancelados": 0})
+        total["timbres"] += 1
+        marcadores.append(f"{factura['uuid']}:{EVENTO_TIMBRE}")
+        if factura.get("estatus") == "Cancelada":
+            total["cancelados"] += 1
+            marcadores.append(f"{factura['uuid']}:{EVENTO_CANCELACION}")
+        procesadas += 1
+        if len(marcadores) >= TAMANO_LOTE:
+            _inserta_marcadores(marcadores, events_collection)
+            marcadores = []
+    _inserta_marcadores(marcadores, events_collection)
+
+    operaciones = [
+        UpdateOne(
+            {"idCertificado": t["idCertificado"], "sucursal": t["sucursal"], "dia": t["dia"]},
+            {"$set": {"timbres": t["timbres"], "cancelados": t["cancelados"]}},
+            upsert=True
+        ) for t in totales.values()
+    ]
+    for i in range(0, len(operaciones), TAMANO_LOTE):
+        counters_collection.bulk_write(operaciones[i:i + TAMANO_LOTE], ordered=False)
+    if not filtro:
+        events_collection.replace_one({"_id": MARCADOR_RECONSTRUCCION},
+                                      {"fecha": datetime.now(timezone.utc), "facturas": procesadas}, upsert=True)
+    return procesadas
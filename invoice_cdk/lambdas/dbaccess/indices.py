@@ -0,0 +1,143 @@
+"""
+Registro declarativo de los índices de cada colección que usan las lambdas.
+
+Cada entrada documenta la consulta que la respalda. `ensure_indexes` es
+idempotente: solo crea los índices cuya especificación de llaves no existe
+todavía, sin importar con qué nombre se hayan creado a mano. Un índice con las
+mismas llaves pero otras opciones (unique, TTL) y los índices de OBSOLETOS se
+reportan; con `corrige=True` se reconstruyen o se eliminan.
+"""
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+INDICES = {
+    # list_certificates / list_certificates_with_sucursales: filtro por usuario, orden por _id
+    "certificates": [
+        IndexModel([("usuario", ASCENDING), ("_id", ASCENDING)], name="usuario_id"),
+    ],
+    "sucursales": [
+        # get_sucursal_by_codigo (tapetes_handler en cada ticket)
+        IndexModel([("codigo_sucursal", ASCENDING)], name="codigo_sucursal"),
+        # elimina_certificado_cascada (prefijo) y lista_sucursales: por certificado, orden por _id
+        IndexModel([("id_certificado", ASCENDING), ("_id", ASCENDING)], name="id_certificado_id"),
+    ],
+    # folio_handler y genera_factura_handler: find_one / find_one_and_update por sucursal
+    "folios": [
+        IndexModel([("sucursal", ASCENDING)], name="sucursal"),
+    ],
+    # obtiene_receptor_by_rfc; único porque las escrituras son upserts por Rfc
+    # (antes de reconstruirlo: scripts/deduplica_receptores.py)
+    "receptors": [
+        IndexModel([("Rfc", ASCENDING)], name="Rfc_unique", unique=True),
+        # Búsqueda por prefijo (regex anclado) con orden y cursor por _id
+        IndexModel([("rfcNormalizado", ASCENDING), ("_id", ASCENDING)], name="rfcNormalizado_id"),
+        IndexModel([("nombreNormalizado", ASCENDING), ("_id", ASCENDING)], name="nombreNormalizado_id"),
+    ],
+    "facturasemitidas": [
+        IndexModel([("ticket", ASCENDING)], name="ticket"),
+        IndexModel([("uuid", ASCENDING)], name="uuid"),
+        # consumo de timbres por certificado y rango de fechas
+        IndexModel([("idCertificado", ASCENDING), ("fechaTimbrado", ASCENDING)], name="idCertificado_fechaTimbrado"),
+        # reenvío de facturas (filtro_reenvio): por receptor y opcionalmente sucursal, o solo por sucursal
+        IndexModel([("rfcReceptor", ASCENDING), ("sucursal", ASCENDING), ("fechaTimbrado", ASCENDING)],
+                   name="rfcReceptor_sucursal_fechaTimbrado"),
+        IndexModel([("sucursal", ASCENDING), ("fechaTimbrado", ASCENDING)], name="sucursal_fechaTimbrado"),
+    ],
+    # buscar_bitacora_por_fechas: rango y páginas por (timestamp, _id) descendente
+    "bitacora": [
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id_desc"),
+    ],
+    # genera_factura_handler depende de la llave duplicada para no timbrar dos veces
+    "ticket_timbrado": [
+        IndexModel([("ticket", ASCENDING)], name="ticket_unique", unique=True),
+    ],
+    # db_tickets: lectura por _id; el TTL borra los snapshots al llegar a `expira`
+    "ticket_snapshots": [
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+    ],
+    # db_csf: lectura por _id (huella del PDF); el TTL borra las constancias al llegar a `expira`
+    "csf_cache": [
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+    ],
+    # db_factura_pdf: lectura por _id (UUID); el TTL borra los PDFs al llegar a `expira`
+    "factura_pdf_cache": [
+        IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0),
+    ],
+    "serie_folio": [
+        IndexModel([("folioTimbrado", ASCENDING)], name="folioTimbrado_unique", unique=True),
+    ],
+    # get_regimen_fiscal_by_clave
+    "regimenfiscal": [
+        IndexModel([("regimenfiscal", ASCENDING)], name="regimenfiscal"),
+    ],
+    # get_descripcion_by_clave
+    "medidas": [
+        IndexModel([("clave", ASCENDING)], name="clave"),
+    ],
+    # registra_timbre / resumen_consumo_desde_contadores
+    "usage_counters": [
+        IndexModel([("idCertificado", ASCENDING), ("dia", ASCENDING), ("sucursal", ASCENDING)],
+                   name="idCertificado_dia_sucursal", unique=True),
+    ],
+}
+
+
+# Llaves de índices desplegados que otro del registro reemplazó; se quitan porque cada índice
+# cuesta en cada escritura. Solo índices que existieron en producción: --corrige los elimina
+OBSOLETOS = {}
+
+# Opciones que cambian el comportamiento del índice y no se pueden modificar sin recrearlo
+OPCIONES = ("unique", "expireAfterSeconds", "sparse", "partialFilterExpression")
+
+
+def _llaves(index_model: IndexModel) -> list:
+    return list(index_model.document["key"].items())
+
+
+def _opciones(documento: dict) -> dict:
+    """Opciones de OPCIONES presentes en el documento (index_information omite unique=False)"""
+    return {opcion: documento[opcion] for opcion in OPCIONES if documento.get(opcion) not in (None, False)}
+
+
+def ensure_indexes(db, indices: dict = None, obsoletos: dict = None, corrige: bool = False) -> dict:
+    """
+    Crea los índices del registro que no existan en la base de datos y revisa los que sí.
+
+    Args:
+        db: Base de datos
+        indices: Registro colección -> [IndexModel] (INDICES por omisión)
+        obsoletos: Colección -> [llaves] de índices reemplazados (OBSOLETOS por omisión)
+        corrige: Si es True elimina los obsoletos y reconstruye los que difieren en opciones;
+            si es False solo los reporta
+
+    Returns:
+        Diccionario colección -> {"creados": [...], "diferentes": [...], "obsoletos": [...]},
+        con nombres de índices y solo las colecciones donde hubo algo
+    """
+    indices = INDICES if indices is None else indices
+    obsoletos = OBSOLETOS if obsoletos is None else obsoletos
+    resultado = {}
+    for nombre_coleccion in list(indices) + [c for c in obsoletos if c not in indices]:
+        coleccion = db[nombre_coleccion]
+        existentes = coleccion.index_information()
+        por_llaves = {tuple(info["key"]): nombre for nombre, info in existentes.items()}
+        faltantes, diferentes = [], []
+        for modelo in indices.get(nombre_coleccion, []):
+            nombre = por_llaves.get(tuple(_llaves(modelo)))
+            if nombre is None:
+                faltantes.append(modelo)
+            elif _opciones(existentes[nombre]) != _opciones(modelo.document):
+                diferentes.append((nombre, modelo))
+        reemplazados = [por_llaves[tuple(llaves)] for llaves in obsoletos.get(nombre_coleccion, [])
+                        if tuple(llaves) in por_llaves]
+        if corrige:
+            for nombre in reemplazados + [nombre for nombre, _ in diferentes]:
+                coleccion.drop_index(nombre)
+            faltantes += [modelo for _, modelo in diferentes]
+        reporte = {
+            "creados": coleccion.create_indexes(faltantes) if faltantes else [],
+            "diferentes": [nombre for nombre, _ in diferentes],
+            "obsoletos": reemplazados,
+        }
+        if any(reporte.values()):
+            resultado[nombre_coleccion] = reporte
+    return resultado
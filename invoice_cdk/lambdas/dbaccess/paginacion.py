@@ -0,0 +1,20 @@
+"""Utilidades compartidas para listados paginados por cursor (keyset)."""
+
+LIMITE_DEFAULT = 50
+LIMITE_MAXIMO = 500
+
+
+def obten_limite(valor, default: int = LIMITE_DEFAULT, maximo: int = LIMITE_MAXIMO) -> int:
+    """Convierte el parámetro `limit` del query string a un entero acotado a [1, maximo]."""
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limite, maximo))
+
+
+def siguiente_cursor(registros: list, limite: int, campo: str = "_id"):
+    """Regresa el cursor de la siguiente página, o None si ya no hay más registros."""
+    if not registros or len(registros) < limite:
+        return None
+    return str(registros[-1][campo])
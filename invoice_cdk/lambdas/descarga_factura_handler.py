@@ -0,0 +1,157 @@
+import os
+import json
+import base64
+import traceback
+from http import HTTPStatus
+from utils import valida_cors
+from pymongo import MongoClient
+from constantes import Constants
+from http_cache import calcula_etag, etag_coincide, if_none_match
+from autorizacion import usuario_autenticado
+from factura_pdf import completa_datos_pdf, renderiza
+from dbaccess.db_factura import get_factura_by_uuid, get_factura_vigente_by_ticket, FACTURA_PDF_PROJECTION
+from dbaccess.db_factura_pdf import obtiene_pdf, guarda_pdf
+from dbaccess.db_sucursal import ids_certificados_de_usuario
+
+# Configuración de MongoDB
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client[os.getenv("DB_NAME")]
+facturas_emitidas_collection = db["facturasemitidas"]
+regimen_fiscal_collection = db["regimenfiscal"]
+sucursal_collection = db["sucursales"]
+certificates_collection = db["certificates"]
+factura_pdf_cache_collection = db["factura_pdf_cache"]
+
+# El XML timbrado no cambia; el PDF lleva datos del receptor, así que solo el navegador lo guarda
+CACHE_CONTROL = os.getenv("FACTURA_CACHE_CONTROL", "private, max-age=86400")
+FORMATOS = {"pdf": "application/pdf", "xml": "application/xml; charset=utf-8"}
+XML_PROJECTION = {"uuid": 1, "cfdi": 1}
+
+# Headers de respuesta
+headers = Constants.HEADERS.copy()
+
+
+def handler(event, context):
+    """
+    Descarga del PDF o del XML de una factura emitida.
+
+    GET /facturas/{uuid}?formato=pdf|xml            (sin authorizer: el cliente tiene el UUID)
+    GET /facturas/ticket/{ticket}?formato=pdf|xml   (Cognito: solo facturas de sus certificados)
+
+    Por ticket se resuelve primero el UUID de la factura vigente (no cancelada). El PDF
+    se regresa binario (isBase64Encoded); API Gateway lo entrega como bytes si el
+    cliente manda `Accept: application/pdf`. El primer PDF de cada UUID se genera y se
+    guarda en `factura_pdf_cache`; los siguientes son una lectura. Con If-None-Match
+    igual al ETag se responde 304 sin leer el PDF.
+    """
+    print(event)
+    try:
+        http_method = event["httpMethod"]
+        origin = event.get("headers", {}).get("origin")
+        headers["Access-Control-Allow-Origin"] = valida_cors(origin)
+        if http_method != Constants.GET:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.METHOD_NOT_ALLOWED,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": "Método no permitido"})
+            }
+        path_parameters = event.get("pathParameters") or {}
+        uuid, ticket = path_parameters.get("uuid"), path_parameters.get("ticket")
+        formato = (event.get("queryStringParameters") or {}).get("formato", "pdf")
+        if formato not in FORMATOS:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": f"formato debe ser uno de: {', '.join(FORMATOS)}"})
+            }
+        if ticket:
+            uuid = uuid_por_ticket(event, ticket)
+            if not uuid:
+                return no_encontrada()
+        if formato == "xml":
+            return descarga_xml(event, uuid)
+        return descarga_pdf(event, uuid)
+    except Exception as e:
+        traceback.print_exc()
+        return {
+            Constants.STATUS_CODE: HTTPStatus.INTERNAL_SERVER_ERROR,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"message": f"Error: {str(e)}"})
+        }
+
+
+def uuid_por_ticket(event, ticket: str):
+    """UUID de la factura vigente del ticket si es de un certificado del usuario autenticado"""
+    factura = get_factura_vigente_by_ticket(ticket, facturas_emitidas_collection, {"uuid": 1, "idCertificado": 1})
+    usuario = usuario_autenticado(event)
+    if not factura or not usuario:
+        return None
+    if factura["idCertificado"] not in ids_certificados_de_usuario(usuario, certificates_collection):
+        return None
+    return factura["uuid"]
+
+
+def no_encontrada() -> dict:
+    return {
+        Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+        Constants.HEADERS_KEY: headers,
+        Constants.BODY: json.dumps({"message": "Factura no encontrada"})
+    }
+
+
+def respuesta_archivo(event, contenido, etag: str, nombre: str, formato: str) -> dict:
+    """200 con el archivo (binario si es PDF), o 304 si el cliente ya tiene esa versión"""
+    archivo_headers = {**headers, "ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Origin"}
+    if etag_coincide(event, etag):
+        return {
+            Constants.STATUS_CODE: HTTPStatus.NOT_MODIFIED,
+            Constants.HEADERS_KEY: archivo_headers,
+            Constants.BODY: ""
+        }
+    archivo_headers["Content-Type"] = FORMATOS[formato]
+    archivo_headers["Content-Disposition"] = f'attachment; filename="{nombre}.{formato}"'
+    if formato == "pdf":
+        return {
+            Constants.STATUS_CODE: HTTPStatus.OK,
+            Constants.HEADERS_KEY: archivo_headers,
+            Constants.BODY: base64.b64encode(contenido).decode("ascii"),
+            "isBase64Encoded": True
+        }
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.HEADERS_KEY: archivo_headers,
+        Constants.BODY: contenido
+    }
+
+
+def descarga_xml(event, uuid: str) -> dict:
+    factura = get_factura_by_uuid(uuid, facturas_emitidas_collection, XML_PROJECTION)
+    if not factura:
+        return no_encontrada()
+    return respuesta_archivo(event, factura["cfdi"], calcula_etag(factura["cfdi"]), factura["uuid"], "xml")
+
+
+def descarga_pdf(event, uuid: str) -> dict:
+    # Con If-None-Match basta el ETag guardado; el PDF solo se lee si hay que mandarlo
+    condicional = bool(if_none_match(event))
+    guardado = obtiene_pdf(uuid, factura_pdf_cache_collection, incluye_pdf=not condicional)
+    if guardado and "pdf" not in guardado and not etag_coincide(event, guardado["etag"]):
+        # El cliente tiene otra versión: ahora sí se lee el PDF
+        guardado = obtiene_pdf(uuid, factura_pdf_cache_collection)
+    if guardado:
+        return respuesta_archivo(event, guardado.get("pdf"), guardado["etag"], uuid, "pdf")
+
+    factura = get_factura_by_uuid(uuid, facturas_emitidas_collection, FACTURA_PDF_PROJECTION)
+    if not factura:
+        return no_encontrada()
+    completa_datos_pdf([factura], regimen_fiscal_collection, sucursal_collection)
+    resultado = renderiza(factura)
+    if "error" in resultado:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.INTERNAL_SERVER_ERROR,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"message": resultado["error"]})
+        }
+    etag = calcula_etag(resultado["pdf"])
+    guarda_pdf(uuid, resultado["pdf"], etag, factura_pdf_cache_collection)
+    return respuesta_archivo(event, resultado["pdf"], etag, uuid, "pdf")
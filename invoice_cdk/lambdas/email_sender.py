@@ -1,41 +1,234 @@
 from email.utils import formataddr, make_msgid
 import os
 import smtplib
-import base64
+import threading
+import time
 import traceback
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
+from mensaje_mime import MensajeMIME, Adjunto
 
 
 SMTP_HOST=os.getenv('SMTP_HOST')
 SMTP_PORT=os.getenv('SMTP_PORT')
 SMTP_USER=os.getenv('SMTP_USER')
 SMTP_PASSWORD=os.getenv('SMTP_PASSWORD')
-FROM=os.getenv('SMTP_FROM') 
+FROM=os.getenv('SMTP_FROM')
 SMTP_BCC=os.getenv('SMTP_BCC')
 REPLY_TO=os.getenv('SMTP_REPLY_TO')
+# 1 vuelca toda la conversación SMTP (incluido el AUTH) a los logs; solo para depurar
+SMTP_DEBUG=int(os.getenv('SMTP_DEBUG', '0'))
+SMTP_TIMEOUT=float(os.getenv('SMTP_TIMEOUT', '30'))
+# Si la conexión lleva más de estos segundos sin usarse se verifica con NOOP antes de enviar
+SMTP_VERIFICA_SEGUNDOS=float(os.getenv('SMTP_VERIFICA_SEGUNDOS', '10'))
+SMTP_BYTES_POR_ESCRITURA=64 * 1024
+# Límite de envío de la cuenta de SES (14/s por omisión en producción); 0 = sin límite
+SMTP_MENSAJES_POR_SEGUNDO=float(os.getenv('SMTP_MENSAJES_POR_SEGUNDO', '14'))
+
+
+class EnvioSinConfirmar(smtplib.SMTPException):
+    """Se perdió la conexión después del punto final: no se sabe si el servidor aceptó el mensaje"""
+
+
+class TransporteSMTP:
+    """
+    Conexión SMTP autenticada que se reutiliza entre envíos (y entre invocaciones del
+    contenedor). STARTTLS y AUTH se pagan una vez por conexión:
+
+        envía -> ¿conexión abierta? ─ no ─> conecta + STARTTLS + login
+                      │ sí, inactiva más de SMTP_VERIFICA_SEGUNDOS -> NOOP (si falla, reconecta)
+                      └> MAIL/RCPT/DATA; si el servidor ya había cerrado, reconecta y reintenta una vez
+
+    Una respuesta de error completa del servidor (SMTPResponseException, destinatarios
+    rechazados) deja la conexión lista para el siguiente mensaje; cualquier otra falla
+    (timeout, socket cerrado) la descarta. Después de escribir el punto final no se
+    reintenta: el servidor pudo haber aceptado el mensaje y se enviaría dos veces.
+
+    Los envíos se espacian para no pasar de `por_segundo` mensajes por segundo.
+    """
+
+    def __init__(self, host=None, port=None, usuario=None, password=None, use_tls: bool = True,
+                 timeout: float = SMTP_TIMEOUT, debug: int = SMTP_DEBUG,
+                 por_segundo: float = SMTP_MENSAJES_POR_SEGUNDO):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.usuario = usuario if usuario is not None else SMTP_USER
+        self.password = password if password is not None else SMTP_PASSWORD
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.debug = debug
+        self.por_segundo = por_segundo
+        self.conexiones = 0
+        self._siguiente_envio = 0.0
+        self._server = None
+        self._ultimo_uso = 0.0
+        self._lock = threading.Lock()
+
+    def _conecta(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.set_debuglevel(self.debug)
+            if self.use_tls:
+                server.starttls()
+            if self.usuario:
+                server.login(self.usuario, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.conexiones += 1
+        return server
+
+    def _descarta(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.close()
+            finally:
+                self._server = None
+
+    def _esta_viva(self) -> bool:
+        if time.monotonic() - self._ultimo_uso < SMTP_VERIFICA_SEGUNDOS:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _conexion(self):
+        if self._server is None or not self._esta_viva():
+            self._descarta()
+            self._server = self._conecta()
+        return self._server
+
+    def _espera_turno(self) -> None:
+        if self.por_segundo <= 0:
+            return
+        espera = self._siguiente_envio - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self._siguiente_envio = time.monotonic() + 1 / self.por_segundo
+
+    @staticmethod
+    def _fragmentos(mensaje):
+        """Bloques de DATA con CRLF y el escape de puntos, como los arma sendmail"""
+        if hasattr(mensaje, "fragmentos"):
+            return mensaje.fragmentos()
+        if isinstance(mensaje, str):
+            mensaje = smtplib._fix_eols(mensaje).encode("ascii")
+        datos = smtplib._quote_periods(mensaje)
+        return [datos if datos.endswith(b"\r\n") else datos + b"\r\n"]
+
+    @staticmethod
+    def _envia_en_flujo(server, remitente: str, destinatarios: list, mensaje) -> dict:
+        """
+        sendmail en pasos: los bloques de un MensajeMIME se escriben al socket conforme se
+        generan en lugar de armar el mensaje completo, y una falla después del punto final
+        se distingue (EnvioSinConfirmar) para no reintentarla.
+        """
+        server.ehlo_or_helo_if_needed()
+        codigo, respuesta = server.mail(remitente)
+        if codigo != 250:
+            server._rset()
+            raise smtplib.SMTPSenderRefused(codigo, respuesta, remitente)
+        rechazados = {}
+        for destinatario in destinatarios:
+            codigo, respuesta = server.rcpt(destinatario)
+            if codigo not in (250, 251):
+                rechazados[destinatario] = (codigo, respuesta)
+        if len(rechazados) == len(destinatarios):
+            server._rset()
+            raise smtplib.SMTPRecipientsRefused(rechazados)
+        server.putcmd("data")
+        codigo, respuesta = server.getreply()
+        if codigo != 354:
+            server._rset()
+            raise smtplib.SMTPDataError(codigo, respuesta)
+        # Los fragmentos chicos (headers) se juntan: varias escrituras chicas seguidas
+        # esperan el ACK diferido del servidor (Nagle) y cuestan ~40 ms cada una
+        buffer = bytearray()
+        for fragmento in TransporteSMTP._fragmentos(mensaje):
+            buffer += fragmento
+            if len(buffer) >= SMTP_BYTES_POR_ESCRITURA:
+                server.send(buffer)
+                buffer = bytearray()
+        buffer += b".\r\n"
+        try:
+            server.send(buffer)
+            codigo, respuesta = server.getreply()
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            raise EnvioSinConfirmar(f"Sin respuesta al final del mensaje: {e}") from e
+        if codigo != 250:
+            raise smtplib.SMTPDataError(codigo, respuesta)
+        return rechazados
+
+    def envia(self, remitente: str, destinatarios: list, mensaje) -> dict:
+        """
+        Envía un mensaje ya armado (str, bytes o un MensajeMIME, que se escribe en flujo);
+        regresa los destinatarios rechazados como sendmail.
+        Los errores del mensaje (destinatario rechazado, etc.) se propagan sin reintentar;
+        solo se reintenta, una vez, si el servidor cerró la conexión antes del punto final.
+        """
+        with self._lock:
+            self._espera_turno()
+            for intento in range(2):
+                server = self._conexion()
+                try:
+                    rechazados = self._envia_en_flujo(server, remitente, destinatarios, mensaje)
+                    self._ultimo_uso = time.monotonic()
+                    return rechazados
+                except EnvioSinConfirmar:
+                    self._descarta()
+                    raise
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._descarta()
+                    if intento:
+                        raise
+                except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                    # 421: el servidor va a cerrar; el siguiente envío abre otra conexión
+                    if getattr(e, "smtp_code", None) == 421:
+                        self._descarta()
+                    else:
+                        self._ultimo_uso = time.monotonic()
+                    raise
+                except BaseException:
+                    # Timeout o error a medio comando: no se sabe en qué estado quedó la sesión
+                    self._descarta()
+                    raise
+
+    def cierra(self) -> None:
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                finally:
+                    self._descarta()
+
+
+# Una conexión por contenedor: las invocaciones siguientes la reutilizan mientras siga viva
+_transporte = None
+_transporte_lock = threading.Lock()
+
+
+def transporte() -> TransporteSMTP:
+    global _transporte
+    with _transporte_lock:
+        if _transporte is None:
+            _transporte = TransporteSMTP()
+        return _transporte
+
 
 class EmailSender:
-    def __init__(self):
-        self.smtp_host = SMTP_HOST
-        self.smtp_port = SMTP_PORT
-        self.smtp_user = SMTP_USER
-        self.smtp_pass = SMTP_PASSWORD
-        self.use_tls = True
+    def __init__(self, transporte_smtp: TransporteSMTP = None):
+        self.transporte = transporte_smtp or transporte()
 
-    def send_invoice(self, recipient_email: str, pdf_base64: str, cfdi_xml: str,
-                     pdf_filename: str, xml_filename: str,
-                     subject: str, body_text: str) -> bool:
-        # Construir mensaje MIME (igual que antes)
-        msg = MIMEMultipart('related')
+    def build_email(self, recipient_email: str, subject: str, body_text: str, adjuntos: list):
+        """Correo con los headers de siempre y los `Adjunto`s indicados; regresa (mensaje, destinatarios)"""
+        msg = MensajeMIME('related')
 
         msg['From'] = formataddr((FROM, REPLY_TO))
         msg['To'] = ', '.join([recipient_email])
         msg['Reply-To'] = REPLY_TO
         msg['Subject'] = subject
-        msg.attach(MIMEText(body_text, 'plain'))
+        msg.texto = body_text
         # Headers anti-spam críticos
         msg['Message-ID'] = make_msgid(domain="farzin.com.mx")
         msg['X-Mailer'] = 'Facturacion Farzin v1.0'
@@ -49,37 +242,65 @@ class EmailSender:
         msg['Organization'] = 'Facturacion Farzin'
         msg['X-Auto-Response-Suppress'] = 'OOF'  # Evita respuestas automáticas
         TO=[recipient_email]
-        BCC=[SMTP_BCC]
+        BCC=[SMTP_BCC] if SMTP_BCC else []
+        for adjunto in adjuntos:
+            msg.adjunta(adjunto)
+        return msg, TO + BCC
 
-        if pdf_base64:
-            pdf_bytes = base64.b64decode(pdf_base64)
-            part_pdf = MIMEBase('application', 'pdf')
-            part_pdf.set_payload(pdf_bytes)
-            encoders.encode_base64(part_pdf)
-            part_pdf.add_header('Content-Disposition', f'attachment; filename="{pdf_filename}"')
-            msg.attach(part_pdf)
+    def _build_message(self, recipient_email: str, pdf_base64: str, cfdi_xml: str,
+                       pdf_filename: str, xml_filename: str,
+                       subject: str, body_text: str, pdf_bytes: bytes = None):
+        """
+        Arma el correo de la factura. El PDF puede venir ya en base64 (`pdf_base64`, se
+        reutiliza sin decodificarlo) o como bytes (`pdf_bytes`); el mensaje no se genera
+        hasta que el transporte lo escribe.
+        """
+        adjuntos = []
+        if pdf_bytes is not None:
+            adjuntos.append(Adjunto(pdf_filename, 'application/pdf', contenido=pdf_bytes))
+        elif pdf_base64:
+            adjuntos.append(Adjunto(pdf_filename, 'application/pdf', base64=pdf_base64))
 
         if cfdi_xml:
             xml_bytes = cfdi_xml.encode('utf-8') if isinstance(cfdi_xml, str) else cfdi_xml
-            part_xml = MIMEBase('application', 'xml')
-            part_xml.set_payload(xml_bytes)
-            encoders.encode_base64(part_xml)
-            part_xml.add_header('Content-Disposition', f'attachment; filename="{xml_filename}"')
-            msg.attach(part_xml)
+            adjuntos.append(Adjunto(xml_filename, 'application/xml', contenido=xml_bytes))
+        return self.build_email(recipient_email, subject, body_text, adjuntos)
 
-        try:
-            # Usar SMTP (SES SMTP endpoint) con las credenciales SMTP_USER / SMTP_PASSWORD
-            server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
-            server.set_debuglevel(1)  # para depuración
-            if self.use_tls:
-                server.starttls()
-            server.login(self.smtp_user, self.smtp_pass)
-            server.sendmail(FROM, TO + BCC, msg.as_string())
-            server.quit()
-            print("Email sent via SES")
-            return True
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            traceback.print_exc()
-            return False
-   
\ No newline at end of file
+    def send_invoice(self, recipient_email: str, pdf_base64: str, cfdi_xml: str,
+                     pdf_filename: str, xml_filename: str,
+                     subject: str, body_text: str, pdf_bytes: bytes = None) -> bool:
+        return self.send_batch([{
+            "recipient_email": recipient_email, "pdf_base64": pdf_base64, "cfdi_xml": cfdi_xml,
+            "pdf_filename": pdf_filename, "xml_filename": xml_filename,
+            "subject": subject, "body_text": body_text, "pdf_bytes": pdf_bytes,
+        }])[0]
+
+    def send_batch(self, invoices: list) -> list:
+        """
+        Envía varios correos de factura por la misma sesión SMTP.
+
+        Args:
+            invoices: lista de dicts con los argumentos de `send_invoice`
+
+        Returns:
+            un bool por correo, en el mismo orden; un correo que falla no detiene el lote
+        """
+        return self._send_all(invoices, self._build_message)
+
+    def send_emails(self, emails: list) -> list:
+        """Como `send_batch`, con dicts de argumentos de `build_email` (adjuntos libres)"""
+        return self._send_all(emails, self.build_email)
+
+    def _send_all(self, correos: list, construye) -> list:
+        resultados = []
+        for correo in correos:
+            try:
+                msg, destinatarios = construye(**correo)
+                self.transporte.envia(FROM, destinatarios, msg)
+                resultados.append(True)
+            except Exception as e:
+                print(f"Error sending email to {correo.get('recipient_email')}: {str(e)}")
+                traceback.print_exc()
+                resultados.append(False)
+        print(f"Emails sent via SES: {sum(resultados)}/{len(resultados)}")
+        return resultados
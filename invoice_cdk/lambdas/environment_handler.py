@@ -2,8 +2,13 @@ import json
 import os
 from constantes import Constants
 from utils import valida_cors
+from http_cache import calcula_etag, etag_coincide
 
 ENV = os.environ.get("ENV")
+CACHE_CONTROL = os.getenv("ENVIRONMENT_CACHE_CONTROL", "public, max-age=86400")
+# El cuerpo solo cambia con un despliegue, así que se calcula una vez por contenedor
+BODY = json.dumps({"environment": ENV})
+ETAG = calcula_etag(BODY)
 headers = Constants.HEADERS.copy()
 
 def handler(event, context):
@@ -11,10 +16,17 @@ def handler(event, context):
     origin = event.get("headers", {}).get("origin")
     headers["Access-Control-Allow-Origin"] = valida_cors(origin)
     if http_method == "GET":
+        cache_headers = {**headers, "ETag": ETAG, "Cache-Control": CACHE_CONTROL, "Vary": "Origin"}
+        if etag_coincide(event, ETAG):
+            return {
+                Constants.STATUS_CODE: 304,
+                Constants.BODY: "",
+                Constants.HEADERS_KEY: cache_headers
+            }
         return {
             Constants.STATUS_CODE: 200,
-            Constants.BODY: json.dumps({"environment": ENV}),
-            Constants.HEADERS_KEY: headers
+            Constants.BODY: BODY,
+            Constants.HEADERS_KEY: cache_headers
         }
     else:
         return {
@@ -0,0 +1,67 @@
+"""
+Vuelve a generar el PDF de una factura guardada en `facturasemitidas`, sin volver a
+Tapetes ni al PAC: el XML timbrado, el QR y la cadena original ya están guardados.
+
+    facturas -> claves de régimen del XML -> descripciones (una vez por clave)
+             -> datos_pdf(factura) -> CFDIPDF_FPDF_Generator
+
+`fechaVenta`, `direccion` y `empresa` se guardan desde que existe el reenvío; para
+facturas anteriores la dirección sale de la sucursal y la fecha de venta queda vacía.
+"""
+import xml.etree.ElementTree as ET
+from dbaccess.db_datos_factura import get_regimen_fiscal_by_clave
+from dbaccess.db_sucursal import get_sucursal_by_codigo
+
+NS_CFDI = {"cfdi": "http://www.sat.gob.mx/cfd/4"}
+
+
+def claves_regimen(cfdi: str) -> tuple:
+    """(RegimenFiscal del emisor, RegimenFiscalReceptor del receptor) del XML timbrado"""
+    comprobante = ET.fromstring(cfdi)
+    emisor = comprobante.find("cfdi:Emisor", NS_CFDI)
+    receptor = comprobante.find("cfdi:Receptor", NS_CFDI)
+    return (emisor.attrib.get("RegimenFiscal") if emisor is not None else None,
+            receptor.attrib.get("RegimenFiscalReceptor") if receptor is not None else None)
+
+
+def completa_datos_pdf(facturas: list, regimen_fiscal_collection, sucursal_collection) -> None:
+    """
+    Agrega a cada factura lo que el generador necesita y no está en el XML: la
+    descripción de los regímenes (`regimenEmisor`, `regimenReceptor`) y la dirección de
+    la sucursal si no se guardó. Cada clave y cada sucursal se consultan una sola vez.
+    """
+    descripciones = {}
+    direcciones = {}
+    for factura in facturas:
+        try:
+            claves = claves_regimen(factura["cfdi"])
+        except ET.ParseError:
+            claves = (None, None)
+        for campo, clave in zip(("regimenEmisor", "regimenReceptor"), claves):
+            if clave and clave not in descripciones:
+                descripciones[clave] = get_regimen_fiscal_by_clave(clave, regimen_fiscal_collection) or ""
+            factura[campo] = descripciones.get(clave, "")
+        if not factura.get("direccion"):
+            sucursal = factura.get("sucursal")
+            if sucursal not in direcciones:
+                datos_sucursal = get_sucursal_by_codigo(sucursal, sucursal_collection) if sucursal else None
+                direcciones[sucursal] = (datos_sucursal or {}).get("direccion") or ""
+            factura["direccion"] = direcciones[sucursal]
+
+
+def genera_pdf(factura: dict) -> bytes:
+    """PDF de una factura ya completada con `completa_datos_pdf`"""
+    from cfdi_pdf_fpdf_generator import CFDIPDF_FPDF_Generator
+    return CFDIPDF_FPDF_Generator(
+        factura["cfdi"], factura["qrCode"], factura["cadenaOriginalSAT"], factura.get("ticket") or "",
+        factura.get("fechaVenta") or "", factura.get("direccion") or "", factura.get("empresa") or "",
+        factura.get("regimenEmisor") or "", factura.get("regimenReceptor") or ""
+    ).generate_pdf()
+
+
+def renderiza(factura: dict) -> dict:
+    """genera_pdf para `paralelo.en_paralelo`: regresa {"pdf": bytes} o {"error": ...}, nunca lanza"""
+    try:
+        return {"pdf": genera_pdf(factura)}
+    except Exception as e:
+        return {"error": f"No se pudo generar el PDF: {str(e)}"}
@@ -9,10 +9,13 @@ from cfdi_pdf_fpdf_generator import CFDIPDF_FPDF_Generator
 from constantes import Constants
 from pymongo import MongoClient
 from dbaccess.db_datos_factura import (get_regimen_fiscal_by_clave)
-from dbaccess.db_factura import (guarda_factura_emitida, get_factura_by_ticket)
+from dbaccess.db_factura import (guarda_factura_emitida, get_factura_by_ticket, cancela_factura_status)
+from dbaccess.db_usage_counters import (registra_timbre, registra_cancelacion)
+from dbaccess.db_tickets import verifica_totales
 from models.factura_emitida import FacturaEmitida
 from email_sender import EmailSender
-from datetime import datetime, timezone, timedelta
+from bitacora_writer import BitacoraWriter
+from datetime import datetime, timezone
 
 SW_USER_NAME = os.getenv("SW_USER_NAME")
 SW_USER_PASSWORD = os.getenv("SW_USER_PASSWORD")
@@ -32,6 +35,9 @@ folio_collection = db["folios"]
 ticket_timbrado_collection = db["ticket_timbrado"]
 serie_folio_collection = db["serie_folio"]
 bitacora_collection = db["bitacora"]
+usage_counters_collection = db["usage_counters"]
+usage_counter_events_collection = db["usage_counter_events"]
+ticket_snapshot_collection = db["ticket_snapshots"]
 
 APPLICATION_JSON = "application/json"
 headersEndpoint = {
@@ -44,6 +50,14 @@ headers = {
 
 
 def handler(event, context):
+    bitacora = BitacoraWriter(bitacora_collection)
+    try:
+        return procesa_solicitud(event, bitacora)
+    finally:
+        bitacora.flush()
+
+
+def procesa_solicitud(event, bitacora: BitacoraWriter):
     try:
         http_method = event["httpMethod"]
         body = json.loads(event.get("body"))
@@ -58,11 +72,20 @@ def handler(event, context):
         #buscar el ID del usuario que viene en el CSD, para despues asignarlo en la bitacora
         if http_method == Constants.POST:
             #Estos son los pasos para generar la factura
+            #Antes de apartar el ticket, verificar el total contra el snapshot que sirvió tapetes_handler (sin volver a Tapetes)
+            totales_ok, mensaje_totales = verifica_totales(ticket, timbrado, ticket_snapshot_collection)
+            if totales_ok is False:
+                bitacora.registra({"ticket": ticket, "sucursal": sucursal, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": mensaje_totales, "status": "error", "traceback": ''})
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.HEADERS_KEY: headers,
+                    Constants.BODY: json.dumps({"message": mensaje_totales})
+                }
             #0 revisar si ya existe la factura para el ticket
             try:
                 ticket_timbrado_collection.insert_one({"ticket": ticket.replace("-", ""), "fechaTimbrado": datetime.now(timezone.utc).isoformat()})
             except Exception as e:
-                bitacora_collection.insert_one({"ticket": ticket, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "ya existe una solicitud de timbrado para el ticket", "status": "error", "traceback": traceback.format_exc(), "timestamp": (datetime.now(timezone.utc)- timedelta(hours=6)).isoformat()})
+                bitacora.registra({"ticket": ticket, "sucursal": sucursal, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "ya existe una solicitud de timbrado para el ticket", "status": "error", "traceback": traceback.format_exc()})
                 return {
                     "statusCode": 500,
                     "headers": headers,
@@ -108,7 +131,7 @@ def handler(event, context):
                 serie_folio_collection.delete_one({"folioTimbrado": timbrado['Serie'] + str(folio['noFolio'])})
                 folio_collection.find_one_and_update({"sucursal": sucursal}, {"$inc": {"noFolio": -1}}, return_document=False)
                 ticket_timbrado_collection.delete_one({"ticket": ticket.replace("-", "")})
-                bitacora_collection.insert_one({"ticket": ticket, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "Nombre:" + timbrado['Receptor']['Nombre'] + " CP:" + timbrado['Receptor']['DomicilioFiscalReceptor'] + " Reg Fis:"+regimen_fiscal_receptor + " Uso CFDI:" +timbrado['Receptor']['UsoCFDI'] + " " + factura_generada.get("message"),"status": "error", "traceback": '', "timestamp": (datetime.now(timezone.utc)- timedelta(hours=6)).isoformat()})
+                bitacora.registra({"ticket": ticket, "sucursal": sucursal, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "Nombre:" + timbrado['Receptor']['Nombre'] + " CP:" + timbrado['Receptor']['DomicilioFiscalReceptor'] + " Reg Fis:"+regimen_fiscal_receptor + " Uso CFDI:" +timbrado['Receptor']['UsoCFDI'] + " " + factura_generada.get("message"),"status": "error", "traceback": ''})
                 return {
                     Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
                     Constants.HEADERS_KEY: headers,
@@ -164,7 +187,16 @@ def handler(event, context):
             factura_generada["data"]["idCertificado"]=id_certificado
             factura_generada["data"]["ticket"]=ticket
             factura_generada["data"]["estatus"]="Vigente"
-            guarda_factura_emitida(FacturaEmitida(**factura_generada["data"]), facturas_emitidas_collection)
+            # Datos para buscar y reenviar la factura; no van en la respuesta
+            factura_emitida = FacturaEmitida(**factura_generada["data"], rfcReceptor=timbrado['Receptor']['Rfc'],
+                                             email=email_receptor, fechaVenta=fecha_venta,
+                                             direccion=direccion, empresa=empresa)
+            guarda_factura_emitida(factura_emitida, facturas_emitidas_collection)
+            try:
+                registra_timbre(factura_emitida.dict(), usage_counters_collection, usage_counter_events_collection)
+            except Exception as e:
+                # La factura ya quedó timbrada; los contadores se pueden reconstruir después
+                print(f"Error al actualizar contadores de uso: {str(e)}")
             
             #7 Generar PDF de la factura
             cfdi = factura_generada["data"]["cfdi"]
@@ -187,7 +219,8 @@ def handler(event, context):
                 )
                 print(f"Email sent: {result}")
             #9. Retornar la factura generada a la página
-            bitacora_collection.insert_one({"ticket": ticket, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "Factura generada exitosamente" + " Serie:"+ timbrado['Serie']+ " folio:" + str(timbrado['Folio']),"status": "exito", "traceback": '', "timestamp": (datetime.now(timezone.utc)- timedelta(hours=6)).isoformat()})
+            bitacora.registra({"ticket": ticket, "sucursal": sucursal, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'], "email": email_receptor, "mensaje": "Factura generada exitosamente" + " Serie:"+ timbrado['Serie']+ " folio:" + str(timbrado['Folio']),"status": "exito", "traceback": ''})
+            bitacora.flush_en_segundo_plano()
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
                 Constants.HEADERS_KEY: headers,
@@ -212,6 +245,13 @@ def handler(event, context):
                 headers={"Authorization": f"Bearer {sw_token.get('data').get('token')}"},  # Fixed token extraction
             ).json()
             print(f"Respuesta cancelacion: {respuesta}")
+            if respuesta.get("status") == "success":
+                try:
+                    factura_cancelada = cancela_factura_status(uuid, facturas_emitidas_collection)
+                    if factura_cancelada:
+                        registra_cancelacion(factura_cancelada, usage_counters_collection, usage_counter_events_collection)
+                except Exception as e:
+                    print(f"Error al registrar la cancelación: {str(e)}")
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
                 Constants.HEADERS_KEY: headers,
@@ -220,7 +260,7 @@ def handler(event, context):
     except Exception as e:
         print(f"Error: {str(e)}")
         traceback.print_exc()
-        bitacora_collection.insert_one({"ticket": ticket, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'],  "email": email_receptor, "mensaje": f"Error: {str(e)}","status": "error", "traceback": traceback.format_exc(), "timestamp": (datetime.now(timezone.utc)- timedelta(hours=6)).isoformat()})
+        bitacora.registra({"ticket": ticket, "sucursal": sucursal, "rfc": timbrado['Receptor']['Rfc'], "rfcEmisor": timbrado['Emisor']['Rfc'],  "email": email_receptor, "mensaje": f"Error: {str(e)}","status": "error", "traceback": traceback.format_exc()})
         return {
             Constants.STATUS_CODE: HTTPStatus.INTERNAL_SERVER_ERROR,
             Constants.HEADERS_KEY: headers,
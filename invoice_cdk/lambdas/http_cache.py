@@ -0,0 +1,24 @@
+"""Utilidades para respuestas cacheables (ETag / If-None-Match)."""
+import hashlib
+
+
+def calcula_etag(cuerpo) -> str:
+    """ETag fuerte a partir del cuerpo de la respuesta (str o bytes)"""
+    if isinstance(cuerpo, str):
+        cuerpo = cuerpo.encode()
+    return '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def if_none_match(event):
+    """Header If-None-Match de la petición, o None (API Gateway no normaliza mayúsculas)"""
+    request_headers = event.get("headers") or {}
+    return next((v for k, v in request_headers.items() if k.lower() == "if-none-match"), None)
+
+
+def etag_coincide(event, etag: str) -> bool:
+    """True si el If-None-Match de la petición incluye `etag`"""
+    valor = if_none_match(event)
+    if not valor:
+        return False
+    etiquetas = [t.strip().removeprefix("W/") for t in valor.split(",")]
+    return "*" in etiquetas or etag in etiquetas
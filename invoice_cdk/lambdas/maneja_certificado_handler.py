@@ -9,17 +9,16 @@ from bson import json_util
 from constantes import Constants
 from utils import valida_cors
 from models.certificate import Certificado, CertificadoUpdate
-from requests_toolbelt.multipart import decoder
+from multipart import cuerpo_bytes, partes, partes_por_nombre, CargaInvalida, CargaDemasiadoGrande
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from pymongo import MongoClient
 from dbaccess.db_certificado import (
     Certificado,
     update_certificate,
-    delete_certificate,
     get_certificate_by_id
 )
-from dbaccess.db_sucursal import(delete_sucursal)
+from dbaccess.db_cascada import elimina_certificado_cascada
 #Esta clase maneja los certificados a nivel del PAC SW Sapien
 client = MongoClient(os.getenv("MONGODB_URI"))
 db = client[os.getenv("DB_NAME")]  
@@ -32,6 +31,20 @@ SW_URL = os.getenv("SW_URL")
 
 headers = Constants.HEADERS.copy()
 
+
+def _campos_multipart(event) -> dict:
+    """name -> Parte del formulario (.key, .cer, ctrsn, ...); los archivos son vistas sobre un solo buffer"""
+    content_type = event["headers"].get("Content-Type") or event["headers"].get("content-type")
+    return partes_por_nombre(partes(cuerpo_bytes(event, codificacion="utf-8"), content_type))
+
+
+def _archivo(campos: dict, nombre: str):
+    return campos[nombre].contenido if nombre in campos else None
+
+
+def _texto(campos: dict, nombre: str):
+    return campos[nombre].texto if nombre in campos else None
+
 def handler(event, context):
     event_method = event["httpMethod"]
     path_parameters = event.get("pathParameters")
@@ -40,12 +53,14 @@ def handler(event, context):
     try:
         if event_method == Constants.DELETE:
             cert_id = path_parameters["id"]
-            certificate = get_certificate_by_id(cert_id, certificates_collection)
-            sucursales = certificate["sucursales"] 
-            for sucursal in sucursales:
-                delete_sucursal(sucursal["_id"], sucursal_collection)
-                folio_collection.delete_one({"sucursal": sucursal["codigo_sucursal"]})
-            delete_certificate(cert_id, certificates_collection)
+            certificate = elimina_certificado_cascada(
+                cert_id, client, certificates_collection, sucursal_collection, folio_collection)
+            if not certificate:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+                    Constants.BODY: json.dumps({"message": "Certificado no encontrado"}),
+                    Constants.HEADERS_KEY: headers
+                }
             sw_token = requests.post(
                     f"{SW_URL}/v2/security/authenticate",
                     headers={"Content-Type": Constants.APPLICATION_JSON},
@@ -66,27 +81,11 @@ def handler(event, context):
                 Constants.HEADERS_KEY: headers
             }
         elif event_method == Constants.POST:
-            if event.get("isBase64Encoded"):
-                body = base64.b64decode(event["body"])
-            else:
-                body = event["body"].encode() 
-            
-            content_type = event["headers"].get("Content-Type") or event["headers"].get("content-type")
-            multipart_data = decoder.MultipartDecoder(body, content_type)
-            key_bytes = None
-            cer_bytes = None
-            ctrsn = None
-            usuario = None
-            for part in multipart_data.parts:
-                content_disposition = part.headers[b"Content-Disposition"].decode()
-                if 'name="key"' in content_disposition:
-                    key_bytes = part.content
-                elif 'name="cer"' in content_disposition:
-                    cer_bytes = part.content
-                elif 'name="ctrsn"' in content_disposition:
-                    ctrsn = part.text
-                elif 'name="usuario"' in content_disposition:
-                    usuario = part.text
+            campos = _campos_multipart(event)
+            key_bytes = _archivo(campos, "key")
+            cer_bytes = _archivo(campos, "cer")
+            ctrsn = _texto(campos, "ctrsn")
+            usuario = _texto(campos, "usuario")
 
             if not key_bytes or not cer_bytes or not ctrsn:
                 return {
@@ -95,7 +94,8 @@ def handler(event, context):
                     Constants.HEADERS_KEY: headers
                 }
             print("Cargando certificado...")
-            cert = x509.load_der_x509_certificate(cer_bytes, default_backend())
+            # cryptography solo acepta bytes; el .cer es pequeño
+            cert = x509.load_der_x509_certificate(bytes(cer_bytes), default_backend())
             serial_number = cert.serial_number
             serial_bytes = serial_number.to_bytes((serial_number.bit_length() + 7) // 8, byteorder='big')
             # Decodifica los bytes a string (ISO-8859-1 es común en certificados)
@@ -121,7 +121,6 @@ def handler(event, context):
                 "b64Key": b64_key,
                 "password": ctrsn
             }
-            print("cert_body prepared:", cert_body)
             sw_token = requests.post(
                     f"{SW_URL}/v2/security/authenticate",
                     headers={"Content-Type": Constants.APPLICATION_JSON},
@@ -160,37 +159,18 @@ def handler(event, context):
             }
         elif event_method == Constants.PUT:
             #Lee los archivos multipart
-            if event.get("isBase64Encoded"):
-                body = base64.b64decode(event["body"])
-            else:
-                body = event["body"].encode() 
-            
-            content_type = event["headers"].get("Content-Type") or event["headers"].get("content-type")
-            multipart_data = decoder.MultipartDecoder(body, content_type)
-            key_bytes = None
-            cer_bytes = None
-            ctrsn = None
-            usuario = None
-            id_cert = None
-            for part in multipart_data.parts:
-                content_disposition = part.headers[b"Content-Disposition"].decode()
-                if 'name="key"' in content_disposition:
-                    key_bytes = part.content
-                elif 'name="cer"' in content_disposition:
-                    cer_bytes = part.content
-                elif 'name="ctrsn"' in content_disposition:
-                    ctrsn = part.text
-                elif 'name="usuario"' in content_disposition:
-                    usuario = part.text
-                elif 'name="idCertificado"' in content_disposition:
-                    id_cert = part.text
+            campos = _campos_multipart(event)
+            key_bytes = _archivo(campos, "key")
+            cer_bytes = _archivo(campos, "cer")
+            ctrsn = _texto(campos, "ctrsn")
+            id_cert = _texto(campos, "idCertificado")
             if not key_bytes or not cer_bytes or not ctrsn or not id_cert:
                 return {
                     Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
                     Constants.BODY: json.dumps({"message": "Faltan Parametros obligatorios"}),
                     Constants.HEADERS_KEY: headers
                 }
-            cert_x509 = x509.load_der_x509_certificate(cer_bytes, default_backend())
+            cert_x509 = x509.load_der_x509_certificate(bytes(cer_bytes), default_backend())
             certificado = get_certificate_by_id(id_cert, certificates_collection)
             rfc_inicial = certificado["rfc"]
             #obtiene  RFC del certificado actualizado
@@ -270,6 +250,18 @@ def handler(event, context):
                 Constants.BODY: json.dumps({"message": "Certificado actualizado correctamente"}),
                 Constants.HEADERS_KEY: headers
             }
+    except CargaDemasiadoGrande as e:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            Constants.BODY: json.dumps({"message": str(e)}),
+            Constants.HEADERS_KEY: headers
+        }
+    except CargaInvalida as e:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.BODY: json.dumps({"message": str(e)}),
+            Constants.HEADERS_KEY: headers
+        }
     except Exception as e:
         print(f"Error: {str(e)}")
         traceback.print_exc()
@@ -0,0 +1,148 @@
+"""
+Arma correos MIME por bloques, sin recodificar los adjuntos ni construir el mensaje completo.
+
+Con email.mime el PDF pasaba por base64 tres veces (la lambda lo codifica para la
+respuesta, EmailSender lo decodificaba y encode_base64 lo volvía a codificar) y
+msg.as_string(), _fix_eols, encode y el escape de puntos de smtplib hacían cuatro
+copias del mensaje completo. Aquí:
+
+    Adjunto(base64=...)     reutiliza el texto ya codificado; solo se parte en líneas de 76
+    Adjunto(contenido=...)  codifica los bytes por bloques de ~64 KB
+
+`MensajeMIME.fragmentos()` genera el mensaje (CRLF, listo para DATA) en bloques que
+`TransporteSMTP` escribe directo al socket.
+"""
+import binascii
+import uuid
+from email.header import Header
+from email.utils import encode_rfc2231, formataddr, getaddresses
+
+LINEA_BASE64 = 76
+# 57 bytes crudos = una línea de 76 caracteres en base64
+BYTES_POR_LINEA = LINEA_BASE64 * 3 // 4
+LINEAS_POR_BLOQUE = 1024
+CRLF = b"\r\n"
+HEADERS_DIRECCION = {"from", "to", "cc", "bcc", "reply-to", "sender"}
+
+
+def _valor_header(nombre: str, valor: str) -> str:
+    """
+    Los valores con acentos van como encoded-word (RFC 2047), doblados con CRLF. En los
+    headers de direcciones solo se codifica el nombre; la dirección queda legible.
+    """
+    valor = str(valor)
+    if valor.isascii():
+        return valor
+    if nombre.lower() in HEADERS_DIRECCION:
+        return ", ".join(formataddr(par, "utf-8") for par in getaddresses([valor]))
+    return Header(valor, "utf-8", header_name=nombre).encode(linesep="\r\n")
+
+
+def _parametro_archivo(nombre: str) -> str:
+    if nombre.isascii() and '"' not in nombre:
+        return f'filename="{nombre}"'
+    return f"filename*={encode_rfc2231(nombre, 'utf-8')}"
+
+
+class Adjunto:
+    """
+    Un archivo adjunto. Se indica uno de `contenido` (bytes, bytearray o memoryview) o
+    `base64` (str o bytes ya codificado, como el `pdf_cfdi_b64` de la respuesta; se
+    guarda como str para no copiarlo completo).
+    """
+    __slots__ = ("nombre", "tipo", "contenido", "base64")
+
+    def __init__(self, nombre: str, tipo: str, contenido=None, base64=None):
+        if (contenido is None) == (base64 is None):
+            raise ValueError("Indica contenido o base64, no ambos")
+        if isinstance(base64, (bytes, bytearray)):
+            base64 = base64.decode("ascii")
+        if base64 is not None and ("\n" in base64 or "\r" in base64 or " " in base64):
+            # Base64 con saltos de línea propios: se normaliza una vez
+            base64 = "".join(base64.split())
+        self.nombre = nombre
+        self.tipo = tipo
+        self.contenido = contenido
+        self.base64 = base64
+
+    def headers(self) -> bytes:
+        return (f"Content-Type: {self.tipo}\r\n"
+                f"MIME-Version: 1.0\r\n"
+                f"Content-Transfer-Encoding: base64\r\n"
+                f"Content-Disposition: attachment; {_parametro_archivo(self.nombre)}\r\n\r\n").encode("ascii")
+
+    def bloques_base64(self):
+        if self.base64 is not None:
+            return en_lineas(self.base64)
+        return codifica(self.contenido)
+
+
+def en_lineas(codificado):
+    """
+    Base64 sin saltos (str o bytes) partido en líneas de 76 con CRLF, por bloques; no lo
+    decodifica. Un str se convierte a bytes bloque por bloque, no completo.
+    """
+    paso = LINEA_BASE64 * LINEAS_POR_BLOQUE
+    for inicio in range(0, len(codificado), paso):
+        bloque = codificado[inicio:inicio + paso]
+        if isinstance(bloque, str):
+            bloque = bloque.encode("ascii")
+        yield CRLF.join(bloque[i:i + LINEA_BASE64] for i in range(0, len(bloque), LINEA_BASE64)) + CRLF
+
+
+def codifica(contenido):
+    """Bytes a base64 en líneas de 76 con CRLF; cada bloque se codifica en una sola llamada"""
+    vista = memoryview(contenido).cast("B")
+    paso = BYTES_POR_LINEA * LINEAS_POR_BLOQUE
+    for inicio in range(0, len(vista), paso):
+        yield from en_lineas(binascii.b2a_base64(vista[inicio:inicio + paso], newline=False))
+
+
+class MensajeMIME:
+    """
+    multipart/related con un cuerpo de texto y adjuntos en base64, igual al que armaba
+    email.mime, pero generado por bloques con `fragmentos()`.
+    """
+
+    def __init__(self, tipo: str = "related"):
+        self.tipo = tipo
+        self.headers = []
+        self.texto = ""
+        self.adjuntos = []
+        self.boundary = "===============" + uuid.uuid4().hex + "=="
+
+    def __setitem__(self, nombre: str, valor: str) -> None:
+        self.headers.append((nombre, valor))
+
+    def __getitem__(self, nombre: str):
+        for header, valor in self.headers:
+            if header.lower() == nombre.lower():
+                return valor
+        return None
+
+    def adjunta(self, adjunto: Adjunto) -> None:
+        self.adjuntos.append(adjunto)
+
+    def _parte_texto(self) -> bytes:
+        if self.texto.isascii():
+            lineas = self.texto.replace("\r\n", "\n").split("\n")
+            # Escape de puntos de SMTP (RFC 5321 4.5.2): base64 nunca empieza con "."
+            cuerpo = "\r\n".join("." + linea if linea.startswith(".") else linea for linea in lineas)
+            return ('Content-Type: text/plain; charset="us-ascii"\r\nMIME-Version: 1.0\r\n'
+                    "Content-Transfer-Encoding: 7bit\r\n\r\n" + cuerpo + "\r\n").encode("ascii")
+        return ('Content-Type: text/plain; charset="utf-8"\r\nMIME-Version: 1.0\r\n'
+                "Content-Transfer-Encoding: base64\r\n\r\n").encode("ascii") + b"".join(codifica(self.texto.encode("utf-8")))
+
+    def fragmentos(self):
+        """El mensaje en bloques de bytes con CRLF y con el escape de puntos ya aplicado"""
+        delimitador = f"--{self.boundary}\r\n".encode("ascii")
+        encabezado = [f'Content-Type: multipart/{self.tipo}; boundary="{self.boundary}"', "MIME-Version: 1.0"]
+        encabezado += [f"{nombre}: {_valor_header(nombre, valor)}" for nombre, valor in self.headers if valor is not None]
+        yield ("\r\n".join(encabezado) + "\r\n\r\n").encode("ascii") + delimitador + self._parte_texto()
+        for adjunto in self.adjuntos:
+            yield delimitador + adjunto.headers()
+            yield from adjunto.bloques_base64()
+        yield f"--{self.boundary}--\r\n".encode("ascii")
+
+    def as_bytes(self) -> bytes:
+        return b"".join(self.fragmentos())
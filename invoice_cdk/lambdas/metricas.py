@@ -0,0 +1,35 @@
+"""
+Métricas de CloudWatch en Embedded Metric Format (EMF).
+
+Cada llamada a `emite` escribe una línea JSON en el log de la lambda que CloudWatch
+convierte en métricas, sin llamadas a PutMetricData ni dependencias adicionales.
+"""
+import json
+import os
+import time
+
+NAMESPACE = os.getenv("METRICAS_NAMESPACE", "Facturacion")
+
+
+def emite(metricas: dict, dimensiones: dict = None, unidad: str = "Count", **propiedades) -> None:
+    """
+    Args:
+        metricas: nombre -> valor
+        dimensiones: nombre -> valor de cada dimensión (todas en un solo conjunto)
+        propiedades: campos adicionales de la línea, consultables con Logs Insights
+    """
+    dimensiones = dimensiones or {}
+    linea = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [list(dimensiones)],
+                "Metrics": [{"Name": nombre, "Unit": unidad} for nombre in metricas],
+            }],
+        },
+        **propiedades,
+        **dimensiones,
+        **metricas,
+    }
+    print(json.dumps(linea, default=str))
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 
 class FacturaEmitida(BaseModel):
@@ -14,4 +15,10 @@ class FacturaEmitida(BaseModel):
     sucursal: str
     idCertificado: str
     ticket: str
-    estatus: str
\ No newline at end of file
+    estatus: str
+    # Para buscar y reenviar la factura sin volver a Tapetes (las anteriores no los traen)
+    rfcReceptor: Optional[str] = None
+    email: Optional[str] = None
+    fechaVenta: Optional[str] = None
+    direccion: Optional[str] = None
+    empresa: Optional[str] = None
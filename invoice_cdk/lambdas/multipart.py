@@ -0,0 +1,139 @@
+"""
+Lectura de cargas multipart/form-data con el mínimo de copias.
+
+El cuerpo en base64 se decodifica una sola vez a un buffer y cada parte es un
+`memoryview` sobre ese buffer, así que separar las partes no copia los archivos:
+
+    event["body"] (base64) -> bytes (una copia) -> Parte.contenido (vistas)
+
+PyMuPDF (`fitz.open(stream=...)`), hashlib y base64 aceptan la vista directamente.
+cryptography exige `bytes` en `x509.load_der_x509_certificate`; el .cer pesa un par de
+KB y se copia solo ese.
+"""
+import binascii
+import os
+from email.message import Message
+from email.utils import collapse_rfc2231_value
+
+MAX_BYTES_CARGA = int(os.getenv("MAX_BYTES_CARGA", str(12 * 1024 * 1024)))
+
+
+class CargaInvalida(Exception):
+    """El cuerpo no es un multipart válido o no se puede decodificar"""
+
+
+class CargaDemasiadoGrande(CargaInvalida):
+    """El cuerpo rebasa MAX_BYTES_CARGA"""
+
+
+class Parte:
+    __slots__ = ("headers", "contenido")
+
+    def __init__(self, headers: dict, contenido: memoryview):
+        self.headers = headers
+        self.contenido = contenido
+
+    def _parametro(self, parametro: str):
+        disposicion = self.headers.get("content-disposition")
+        if not disposicion:
+            return None
+        mensaje = Message()
+        mensaje["content-disposition"] = disposicion
+        valor = mensaje.get_param(parametro, header="content-disposition")
+        # filename*=utf-8''... (RFC 2231) llega como tupla
+        return collapse_rfc2231_value(valor) if valor is not None else None
+
+    @property
+    def nombre(self):
+        """Nombre del campo del formulario (name=)"""
+        return self._parametro("name")
+
+    @property
+    def archivo(self):
+        """Nombre del archivo (filename=), o None si la parte no es un archivo"""
+        return self._parametro("filename")
+
+    @property
+    def texto(self) -> str:
+        return str(self.contenido, "utf-8")
+
+
+def valida_tamano(bytes_decodificados: int, maximo: int = MAX_BYTES_CARGA) -> None:
+    if bytes_decodificados > maximo:
+        raise CargaDemasiadoGrande(f"La carga pesa {bytes_decodificados} bytes; el máximo es {maximo}")
+
+
+def cuerpo_bytes(event, maximo: int = MAX_BYTES_CARGA, codificacion: str = "latin1") -> bytes:
+    """
+    Cuerpo del evento de API Gateway como bytes. El tamaño se valida antes de decodificar
+    (con base64 a partir de la longitud del texto), así una carga enorme no llega a copiarse.
+    binascii.a2b_base64 lee el str directamente; base64.b64decode lo copiaría antes a bytes.
+    """
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        valida_tamano(len(body) * 3 // 4, maximo)
+        try:
+            return binascii.a2b_base64(body)
+        except (binascii.Error, ValueError) as e:
+            raise CargaInvalida(f"El cuerpo no es base64 válido: {str(e)}")
+    valida_tamano(len(body), maximo)
+    return body.encode(codificacion) if isinstance(body, str) else body
+
+
+def boundary(content_type: str) -> bytes:
+    mensaje = Message()
+    mensaje["content-type"] = content_type or ""
+    valor = mensaje.get_param("boundary")
+    if mensaje.get_content_type() != "multipart/form-data" or not valor:
+        raise CargaInvalida("Content-Type debe ser multipart/form-data con boundary")
+    return str(valor).encode("latin1")
+
+
+def _headers_parte(bloque: memoryview) -> dict:
+    headers = {}
+    for linea in str(bloque, "utf-8", "replace").split("\r\n"):
+        nombre, separador, valor = linea.partition(":")
+        if separador:
+            headers[nombre.strip().lower()] = valor.strip()
+    return headers
+
+
+def partes(body: bytes, content_type: str) -> list:
+    """
+    Separa un multipart/form-data en `Parte`s cuyo contenido es una vista sobre `body`.
+    Los límites se buscan con bytes.find sobre el buffer original.
+    """
+    delimitador = b"--" + boundary(content_type)
+    vista = memoryview(body)
+    resultado = []
+    posicion = body.find(delimitador)
+    if posicion < 0:
+        raise CargaInvalida("No se encontró el boundary en el cuerpo")
+    posicion += len(delimitador)
+    while not body.startswith(b"--", posicion):
+        inicio_headers = body.find(b"\r\n", posicion)
+        if inicio_headers < 0:
+            raise CargaInvalida("Multipart incompleto")
+        inicio_headers += 2
+        if body.startswith(b"\r\n", inicio_headers):
+            fin_headers, inicio_contenido = inicio_headers, inicio_headers + 2
+        else:
+            fin_headers = body.find(b"\r\n\r\n", inicio_headers)
+            if fin_headers < 0:
+                raise CargaInvalida("Multipart incompleto")
+            inicio_contenido = fin_headers + 4
+        fin_contenido = body.find(b"\r\n" + delimitador, inicio_contenido)
+        if fin_contenido < 0:
+            raise CargaInvalida("Multipart sin cierre")
+        resultado.append(Parte(_headers_parte(vista[inicio_headers:fin_headers]),
+                               vista[inicio_contenido:fin_contenido]))
+        posicion = fin_contenido + 2 + len(delimitador)
+    return resultado
+
+
+def partes_por_nombre(partes_multipart: list) -> dict:
+    """name -> Parte; si un campo se repite se conserva el primero"""
+    por_nombre = {}
+    for parte in partes_multipart:
+        por_nombre.setdefault(parte.nombre, parte)
+    return por_nombre
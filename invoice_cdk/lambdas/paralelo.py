@@ -0,0 +1,66 @@
+"""
+Reparte trabajo de CPU (leer constancias, generar PDFs) entre procesos trabajadores.
+
+Lambda no tiene /dev/shm, así que multiprocessing.Pool y ProcessPoolExecutor no
+funcionan (necesitan semáforos); cada trabajador es un Process con su propio Pipe. Con
+fork los datos de entrada se heredan sin serializarlos y solo regresan los resultados.
+"""
+import multiprocessing
+import os
+from multiprocessing.connection import wait
+from typing import Callable, Iterator
+
+TRABAJADORES = os.cpu_count() or 1
+# Con menos elementos por trabajador el fork cuesta más de lo que ahorra
+ELEMENTOS_POR_TRABAJADOR_MIN = 4
+
+
+def _trabajador(conexion, funcion: Callable, pendientes: list) -> None:
+    """Proceso hijo: aplica `funcion` a sus elementos y manda (índice, resultado) de cada uno"""
+    for indice, elemento in pendientes:
+        conexion.send((indice, funcion(elemento)))
+    conexion.close()
+
+
+def en_paralelo(funcion: Callable, pendientes: list, trabajadores: int = TRABAJADORES,
+                error: dict = None, minimo_por_trabajador: int = ELEMENTOS_POR_TRABAJADOR_MIN) -> Iterator[tuple]:
+    """
+    Aplica `funcion` a [(índice, elemento)] en hasta `trabajadores` procesos y regresa
+    (índice, resultado) conforme terminan. `funcion` no debe lanzar excepciones. Si un
+    trabajador muere, sus elementos pendientes regresan con `error` como resultado.
+    Si no alcanzan dos trabajadores con `minimo_por_trabajador` elementos cada uno, se
+    procesan en este mismo proceso.
+    """
+    trabajadores = min(trabajadores, len(pendientes) // minimo_por_trabajador)
+    if trabajadores <= 1:
+        for indice, elemento in pendientes:
+            yield indice, funcion(elemento)
+        return
+    contexto = multiprocessing.get_context("fork")
+    pendientes_por_conexion = {}
+    procesos = []
+    for n in range(trabajadores):
+        asignados = pendientes[n::trabajadores]
+        lectura, escritura = contexto.Pipe(duplex=False)
+        proceso = contexto.Process(target=_trabajador, args=(escritura, funcion, asignados), daemon=True)
+        proceso.start()
+        escritura.close()
+        procesos.append(proceso)
+        pendientes_por_conexion[lectura] = {indice for indice, _ in asignados}
+    try:
+        while pendientes_por_conexion:
+            for conexion in wait(list(pendientes_por_conexion)):
+                try:
+                    indice, resultado = conexion.recv()
+                    pendientes_por_conexion[conexion].discard(indice)
+                    yield indice, resultado
+                except EOFError:
+                    # El trabajador terminó (o murió) sin mandar todos sus resultados
+                    for indice in sorted(pendientes_por_conexion.pop(conexion)):
+                        yield indice, error
+                    conexion.close()
+    finally:
+        for proceso in procesos:
+            proceso.join(timeout=1)
+            if proceso.is_alive():
+                proceso.kill()
@@ -1,31 +1,107 @@
 import os
 import json
 import base64
+import hashlib
 import traceback
 from http import HTTPStatus
 from constantes import Constants
+from pymongo import MongoClient
 from utils import valida_cors
-#from requests_toolbelt.multipart import decoder
-from pdf_regimen_parser_pymupdf import RegimenFiscalPyMuPDFParser
+from dbaccess.db_csf import obtiene_csf, guarda_csf, registra_consulta
+from dbaccess.catalogos import snapshot_vigente
+from csf_lote import procesa_lote, archivos_de_zip, valida_tamano, claves_regimen, LoteInvalido
+from metricas import emite
+from multipart import cuerpo_bytes, partes, partes_por_nombre, valida_tamano as valida_tamano_carga, \
+    CargaInvalida, CargaDemasiadoGrande
+# pdf_regimen_parser_pymupdf (y PyMuPDF) se importa solo cuando el PDF no está en caché
 
 
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client[os.getenv("DB_NAME")]
+csf_cache_collection = db["csf_cache"]
+receptor_collection = db["receptors"]
+
 headers = Constants.HEADERS.copy()
 
+RECURSO_LOTE = "/parsea-pdf/lote"
+NDJSON = "application/x-ndjson"
 
-def handler(event, context):
-    print("Event:", event)
-    origin = event.get('headers', {}).get('origin')
-    headers["Access-Control-Allow-Origin"] = valida_cors(origin)
+
+def _emite_metricas_cache(aciertos: int, consultas: int, **propiedades) -> None:
+    estadisticas = registra_consulta(aciertos, consultas)
+    # Tasa de aciertos = SUM(CsfCacheHit) / SUM(CsfCacheLookup)
+    emite({"CsfCacheHit": int(aciertos), "CsfCacheLookup": consultas}, {"Servicio": "parse_regimen"},
+          **propiedades, **estadisticas)
+
+
+def _busca_en_cache(huella: str):
+    """`csf` en caché o None; un error de Mongo no impide procesar el PDF"""
+    try:
+        datos_csf = obtiene_csf(huella, csf_cache_collection)
+    except Exception as e:
+        print(f"No se pudo leer el caché de CSF: {str(e)}")
+        datos_csf = None
+    _emite_metricas_cache(datos_csf is not None, 1, huella=huella[:12])
+    return datos_csf
+
+
+def _guarda_en_cache(huella: str, datos_csf: dict) -> None:
+    try:
+        guarda_csf(huella, datos_csf, csf_cache_collection)
+    except Exception as e:
+        print(f"No se pudo guardar el CSF en caché: {str(e)}")
+
+
+def _catalogo_regimenes() -> dict:
+    """{clave: descripción} del catálogo de regímenes, del snapshot empacado o de Mongo"""
+    snapshot = snapshot_vigente(db)
+    if snapshot:
+        return snapshot["indices"]["regimenfiscal"]
+    return {doc["regimenfiscal"]: doc.get("descripcion")
+            for doc in db["regimenfiscal"].find({}, {"regimenfiscal": 1, "descripcion": 1})}
+
+
+def lote(event, content_type: str, body_bytes: bytes):
+    """
+    POST /parsea-pdf/lote con un ZIP de PDFs o un multipart con un PDF por parte.
+    Responde NDJSON: una línea por archivo y una última con el resumen. Con
+    ?guarda_receptores=true guarda los receptores extraídos.
+    """
+    query_params = event.get("queryStringParameters") or {}
+    guarda_receptores = (query_params.get("guarda_receptores") or "").lower() in ("1", "true")
     try:
-        # lazy import to surface import errors immediately
-        from requests_toolbelt.multipart import decoder
-    except Exception:
-        print("Error importing requests_toolbelt:", traceback.format_exc())
+        if 'multipart/form-data' in content_type:
+            archivos = [(parte.archivo or f"archivo{n}.pdf", parte.contenido)
+                        for n, parte in enumerate(partes(body_bytes, content_type), 1) if parte.contenido]
+            valida_tamano(len(archivos), sum(len(pdf) for _, pdf in archivos))
+        else:
+            archivos = archivos_de_zip(body_bytes)
+    except LoteInvalido as e:
         return {
-            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
-            "headers": headers,
-            "body": json.dumps({"message": "Import error: requests_toolbelt not available. Revisar layer."})
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.BODY: json.dumps({"error": str(e)}),
+            Constants.HEADERS_KEY: headers
         }
+    lineas = list(procesa_lote(
+        archivos, csf_cache_collection,
+        receptor_collection=receptor_collection if guarda_receptores else None,
+        regimenes=claves_regimen(_catalogo_regimenes()) if guarda_receptores else None
+    ))
+    resumen = lineas[-1]["resumen"]
+    print(json.dumps({"csf_lote": resumen}))
+    _emite_metricas_cache(resumen["en_cache"], resumen["archivos"])
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.BODY: "".join(json.dumps(linea) + "\n" for linea in lineas),
+        Constants.HEADERS_KEY: {**headers, "Content-Type": NDJSON}
+    }
+
+
+def handler(event, context):
+    # Sin el cuerpo: un lote de PDFs en base64 llenaría el log
+    print("Event:", {llave: valor for llave, valor in event.items() if llave != "body"})
+    origin = event.get('headers', {}).get('origin')
+    headers["Access-Control-Allow-Origin"] = valida_cors(origin)
     try:
         http_method = event.get('httpMethod')
         if http_method != Constants.POST:
@@ -37,14 +113,10 @@ def handler(event, context):
 
         content_type = event.get('headers', {}).get('Content-Type') or event.get('headers', {}).get('content-type', '')
         body = event.get('body', '')
-        is_b64 = event.get('isBase64Encoded', False)
 
-        # Normalize to bytes
-        if is_b64 and body:
-            body_bytes = base64.b64decode(body)
-        else:
+        try:
             # If it's raw JSON containing base64
-            if 'application/json' in content_type and body:
+            if 'application/json' in content_type and body and not event.get('isBase64Encoded'):
                 data = json.loads(body)
                 pdf_b64 = data.get('pdf_base64') or data.get('pdfB64')
                 if not pdf_b64:
@@ -53,46 +125,62 @@ def handler(event, context):
                         Constants.BODY: json.dumps({"error": "Missing pdf_base64 in JSON body"}),
                         Constants.HEADERS_KEY: headers
                     }
+                valida_tamano_carga(len(pdf_b64) * 3 // 4)
                 body_bytes = base64.b64decode(pdf_b64)
             else:
-                # Treat body as binary string; encode using latin1 to preserve bytes
-                body_bytes = body.encode('latin1') if isinstance(body, str) else body
+                # base64 de API Gateway o texto latin1 que conserva los bytes
+                body_bytes = cuerpo_bytes(event)
 
-        # Extract PDF bytes from multipart if needed
-        pdf_bytes = None
-        if 'multipart/form-data' in content_type:
-            multipart_data = decoder.MultipartDecoder(body_bytes, content_type)
-            for part in multipart_data.parts:
-                cd = part.headers.get(b'Content-Disposition', b'').decode()
-                # look for common field names or filename
-                if 'name="csf"' in cd:
-                    pdf_bytes = part.content
-                    break
-            if pdf_bytes is None:
-                # fallback: take first part
-                if multipart_data.parts:
-                    pdf_bytes = multipart_data.parts[0].content
-        elif 'application/pdf' in content_type or content_type == '':
-            pdf_bytes = body_bytes
-        else:
-            # fallback: assume body_bytes is the pdf
-            pdf_bytes = body_bytes
+            if event.get("resource") == RECURSO_LOTE:
+                return lote(event, content_type, body_bytes)
 
-        if not pdf_bytes:
+            # Extract PDF bytes from multipart if needed; el PDF es una vista sobre body_bytes
+            pdf_bytes = None
+            if 'multipart/form-data' in content_type:
+                partes_pdf = partes(body_bytes, content_type)
+                # campo "csf" o, si no viene, la primera parte
+                parte = partes_por_nombre(partes_pdf).get("csf") or (partes_pdf[0] if partes_pdf else None)
+                pdf_bytes = parte.contenido if parte else None
+            elif 'application/pdf' in content_type or content_type == '':
+                pdf_bytes = body_bytes
+            else:
+                # fallback: assume body_bytes is the pdf
+                pdf_bytes = body_bytes
+        except CargaDemasiadoGrande as e:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                Constants.BODY: json.dumps({"error": str(e)}),
+                Constants.HEADERS_KEY: headers
+            }
+        except CargaInvalida as e:
             return {
                 Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
-                Constants.BODY: json.dumps({"error": "PDF not found in request"}),
+                Constants.BODY: json.dumps({"error": str(e)}),
                 Constants.HEADERS_KEY: headers
             }
 
-        parser = RegimenFiscalPyMuPDFParser()
-        datos_csf = parser.extract_from_bytes(pdf_bytes)
-        if not datos_csf["razonSocial"] and not datos_csf["Rfc"]:
+        if not pdf_bytes:
             return {
-                Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
-                Constants.BODY: json.dumps({"error": "No se pudieron extraer datos del PDF, revisa que el formato sea correcto. Es posible que el PDF sea una imagen"}),
+                Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                Constants.BODY: json.dumps({"error": "PDF not found in request"}),
                 Constants.HEADERS_KEY: headers
             }
+        # Huella del PDF (no del cuerpo completo): la misma constancia subida por otro medio coincide
+        huella = hashlib.sha256(pdf_bytes).hexdigest()
+
+        datos_csf = _busca_en_cache(huella)
+        if datos_csf is None:
+            from pdf_regimen_parser_pymupdf import RegimenFiscalPyMuPDFParser
+            parser = RegimenFiscalPyMuPDFParser()
+            datos_csf = parser.extract_from_bytes(pdf_bytes)
+            print(f"CSF: {parser.paginas_leidas} de {parser.paginas_totales} páginas leídas")
+            if not datos_csf["razonSocial"] and not datos_csf["Rfc"]:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+                    Constants.BODY: json.dumps({"error": "No se pudieron extraer datos del PDF, revisa que el formato sea correcto. Es posible que el PDF sea una imagen"}),
+                    Constants.HEADERS_KEY: headers
+                }
+            _guarda_en_cache(huella, datos_csf)
         return {
             Constants.STATUS_CODE: HTTPStatus.OK,
             Constants.BODY: json.dumps({"csf": datos_csf}),
@@ -1,12 +1,123 @@
 import re
 import io
-from typing import List, Dict, Any, Union
+from typing import Dict, Any, Iterable, Iterator
 
 try:
     import fitz  # PyMuPDF
 except Exception as e:
     fitz = None  # el error se reportará al usar la clase
 
+# Modo solo texto de get_text: sin conservar ligaduras ni espacios originales (el extractor
+# los normaliza) y solo lo que cae dentro de la página
+FLAGS_SOLO_TEXTO = fitz.TEXT_MEDIABOX_CLIP if fitz is not None else 0
+
+# Patrones precompilados del extractor; cada línea se revisa una sola vez
+_ESPACIOS = re.compile(r"[\t\u00A0]+")
+_CODIGO_POSTAL = re.compile(r"C[oó]digo\s*Postal[:\-\s]+(\d{4,5})", re.IGNORECASE)
+_RFC_PERSONA_FISICA = re.compile(r"^[A-ZÑ&]{4}\d{6}[A-Z0-9]{3}$", re.IGNORECASE)
+# Etiqueta -> campo; el valor es la línea que sigue a la primera aparición de la etiqueta
+ETIQUETAS = (
+    ("RFC:", "Rfc"),
+    ("Nombre (s):", "nombre"),
+    ("Primer Apellido:", "primerApellido"),
+    ("Segundo Apellido:", "segundoApellido"),
+    ("Denominación/Razón Social:", "razonSocial"),
+)
+CAMPOS_PERSONA_FISICA = ("nombre", "primerApellido", "segundoApellido")
+# El acento puede venir precompuesto o como carácter combinante según el PDF
+INICIO_REGIMENES = ("Regímenes:", "Regi\u0301menes:")
+ENCABEZADO_FECHA_FIN = "Fecha Fin"
+FIN_REGIMENES = "Obligaciones:"
+
+
+def es_persona_fisica(rfc: str) -> bool:
+    """RFC de 13 caracteres con formato de Persona Física"""
+    if not rfc or len(rfc) < 12:
+        return False
+    return bool(_RFC_PERSONA_FISICA.match(rfc))
+
+
+class ExtractorCSF:
+    """Máquina de estados que extrae los campos de la constancia en una sola pasada.
+
+    Se alimenta línea por línea (`alimenta`) hasta que `completo` es True y `resultado`
+    arma el diccionario. Los
+    regímenes son la tabla entre "Regímenes:" y "Obligaciones:": después del encabezado
+    "Fecha Fin" las filas alternan nombre del régimen y fecha de inicio.
+    """
+
+    # Estados de la tabla de regímenes
+    ANTES, ENCABEZADO, FILAS, TERMINADO = range(4)
+
+    def __init__(self):
+        self.valores = {}
+        self.codigo_postal = None
+        self.regimenes = []
+        self.estado_regimenes = self.ANTES
+        self._etiquetas = list(ETIQUETAS)
+        self._pendiente = None
+        self._toma_fila = True
+
+    def alimenta(self, line: str) -> None:
+        if "\t" in line or "\u00A0" in line:
+            line = _ESPACIOS.sub(" ", line)
+        line = line.strip()
+        if not line:
+            return
+        if self._pendiente is not None:
+            self.valores[self._pendiente] = line
+            self._pendiente = None
+        for etiqueta in self._etiquetas:
+            if line.startswith(etiqueta[0]):
+                self._pendiente = etiqueta[1]
+                self._etiquetas.remove(etiqueta)
+                break
+        if self.codigo_postal is None:
+            m = _CODIGO_POSTAL.search(line)
+            if m:
+                self.codigo_postal = m.group(1)
+        self._alimenta_regimenes(line)
+
+    @property
+    def completo(self) -> bool:
+        """True cuando ya no hay nada que extraer: el resto del texto no cambia el resultado"""
+        if self.estado_regimenes != self.TERMINADO or self.codigo_postal is None or self._pendiente:
+            return False
+        rfc = self.valores.get("Rfc")
+        if rfc is None:
+            return False
+        campos = CAMPOS_PERSONA_FISICA if es_persona_fisica(rfc.upper()) else ("razonSocial",)
+        return all(campo in self.valores for campo in campos)
+
+    def _alimenta_regimenes(self, line: str) -> None:
+        if self.estado_regimenes == self.TERMINADO:
+            return
+        if line == FIN_REGIMENES:
+            self.estado_regimenes = self.TERMINADO
+        elif self.estado_regimenes == self.FILAS:
+            if self._toma_fila:
+                self.regimenes.append(line)
+            self._toma_fila = not self._toma_fila
+        elif self.estado_regimenes == self.ANTES:
+            if line.startswith(INICIO_REGIMENES):
+                self.estado_regimenes = self.ENCABEZADO
+        elif line.startswith(ENCABEZADO_FECHA_FIN):
+            self.estado_regimenes = self.FILAS
+
+    def resultado(self) -> Dict[str, Any]:
+        rfc = self.valores.get("Rfc", "").upper()
+        if es_persona_fisica(rfc):
+            razon_social = " ".join(self.valores.get(campo, "") for campo in CAMPOS_PERSONA_FISICA)
+        else:
+            razon_social = self.valores.get("razonSocial", "")
+        return {
+            "razonSocial": razon_social,
+            "Rfc": rfc,
+            "codigoPostal": self.codigo_postal or "",
+            # Sin "Obligaciones:" la tabla no se cerró y, como antes, no se reportan regímenes
+            "regimenFiscal": self.regimenes if self.estado_regimenes == self.TERMINADO else None
+        }
+
 
 class RegimenFiscalPyMuPDFParser:
     """Parser que extrae datos importantes desde una Constancia de Situación Fiscal usando PyMuPDF.
@@ -15,6 +126,10 @@ class RegimenFiscalPyMuPDFParser:
       - extract_from_file(path) -> dict
       - extract_from_bytes(pdf_bytes) -> dict
 
+    Las páginas se leen de una en una y la lectura se detiene en cuanto el extractor
+    tiene todos los campos (normalmente al llegar a "Obligaciones:"); `paginas_leidas`
+    y `paginas_totales` quedan en la instancia.
+
     Devuelve diccionario con claves:
       nombre, primerApellido, segundoApellido, razonSocial, Rfc, codigoPostal, regimenFiscal
     """
@@ -24,115 +139,49 @@ class RegimenFiscalPyMuPDFParser:
         re.compile(r"R[EÉ]GIMEN(?:ES)?[:\-\s]+(.+)", re.IGNORECASE),
     ]
 
-    def __init__(self):
-        if fitz is None:
-            # Deferir la excepción hasta que realmente se intente usar el parser
-            pass
+    def __init__(self, solo_texto: bool = True):
+        # solo_texto: extrae sin el trabajo de layout que el parser no usa (ver FLAGS_SOLO_TEXTO)
+        self.solo_texto = solo_texto
+        self.paginas_leidas = 0
+        self.paginas_totales = 0
 
-    def _extract_text_from_path(self, path: str) -> str:
-        if fitz is None:
-            raise RuntimeError("PyMuPDF (fitz) no está disponible. Instala PyMuPDF.")
-        txt = []
-        #print(f"Extrayendo texto del PDF en: {path}")
-        with fitz.open(path) as doc:
-            #print(f"Abriendo PDF: {path}")
-            #print(f"Cantidad de páginas: {doc.page_count}")
-            for page in doc:
-                #print(f"texto {page.get_text("words")}")
-                # "text" mode devuelve texto con saltos de línea razonables
-                txt.append(page.get_text("text"))
-        return "\n".join(txt)
-
-    def _extract_text_from_bytes(self, pdf_bytes: bytes) -> str:
+    def _abre(self, **kwargs):
         if fitz is None:
             raise RuntimeError("PyMuPDF (fitz) no está disponible. Instala PyMuPDF.")
-        txt = []
-        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-            for page in doc:
-                txt.append(page.get_text("text"))
-        return "\n".join(txt)
- 
-    def _search_regimenes_in_lines(self, lines) -> Union[List[str], None]:
-        is_able_to_fetch = False
-        is_regimen = False
-        is_fecha_fin = False
-        regimenes = []
-        count = 2
-        for line in lines:
-            print(f"{line}")
-            if line == 'Obligaciones:':
-                return regimenes
-            if is_able_to_fetch and count % 2 == 0:
-                print(f"Count: {count}")
-                regimenes.append(line.strip())
-            if is_able_to_fetch:
-                count += 1
-            if line.startswith("Regímenes:") or line.startswith("Regímenes:"):
-                is_regimen = True
-            if (line.startswith("Fecha Fin") or line.startswith("Fecha Fin")) and is_regimen:
-                is_fecha_fin = True
-            if is_regimen and is_fecha_fin:
-                is_able_to_fetch = True
-            
-
-    def _search_line_patterns(self, lines: List[str], patterns: List[str]) -> Union[str, None]:
-        for line in lines:
-            for pat in patterns:
-                m = pat.search(line)
-                if m:
-                    val = m.group(1).strip()
-                    return re.sub(r"[\s:\-]+$", "", val)
-        return None
-    
-    def _search_line_by_name(self, lines: List[str], patterns: str) -> Union[str, None]:
-        m = False
+        return fitz.open(**kwargs)
+
+    def _lineas_de_documento(self, doc) -> Iterator[str]:
+        """Líneas de cada página; una página solo se carga y decodifica si se piden más líneas"""
+        self.paginas_totales = doc.page_count
+        for page in doc:
+            self.paginas_leidas += 1
+            if self.solo_texto:
+                text = page.get_text("text", flags=FLAGS_SOLO_TEXTO)
+            else:
+                text = page.get_text("text")
+            yield from text.splitlines()
+
+    def _extract_from_lines(self, lines: Iterable[str]) -> Dict[str, Any]:
+        extractor = ExtractorCSF()
         for line in lines:
-            if m:
-                return line.strip()
-            if line==patterns or line.startswith(patterns):
-                m = True        
-        return None
+            extractor.alimenta(line)
+            if extractor.completo:
+                break
+        return extractor.resultado()
 
     def _extract_all_from_text(self, text: str) -> Dict[str, Any]:
-        print(text)
-        normalized = re.sub(r"[\t\u00A0]+", " ", text)
-        lines = [l.strip() for l in normalized.splitlines() if l.strip()]
-        # Corregir patrones para que el primer grupo capture el valor real (nombre completo)
-        cp_patterns = [re.compile(r"C[oó]digo\s+Postal[:\-\s]+(\d{4,5})", re.IGNORECASE),
-                       re.compile(r"C[oó]digoPostal[:\-\s]+(\d{4,5})", re.IGNORECASE)]
-        rfc = (self._search_line_by_name(lines, 'RFC:') or "").upper()
-        nombre = ""
-        primer_apellido = ""
-        segundo_apellido = ""
-        razon_social = ""
-        if self.es_persona_fisica(rfc):
-            nombre = self._search_line_by_name(lines, 'Nombre (s):') or ""
-            primer_apellido = self._search_line_by_name(lines, 'Primer Apellido:') or ""
-            segundo_apellido = self._search_line_by_name(lines, 'Segundo Apellido:') or ""
-            razon_social = nombre + " " + primer_apellido + " " + segundo_apellido
-        else:
-            razon_social = self._search_line_by_name(lines, 'Denominación/Razón Social:') or ""
-        cp = self._search_line_patterns(lines, cp_patterns) or ""
-        regimenes = self._search_regimenes_in_lines(lines)
-        return {
-            "razonSocial": razon_social,
-            "Rfc": rfc,
-            "codigoPostal": cp,
-            "regimenFiscal": regimenes
-        }
+        return self._extract_from_lines(text.splitlines())
 
     def extract_from_file(self, path: str) -> Dict[str, Any]:
         """Extrae datos desde un archivo PDF en disco."""
-        text = self._extract_text_from_path(path)
-        return self._extract_all_from_text(text)
+        with self._abre(filename=path) as doc:
+            return self._extract_from_lines(self._lineas_de_documento(doc))
 
     def extract_from_bytes(self, pdf_bytes: bytes) -> Dict[str, Any]:
         """Extrae datos desde bytes PDF."""
-        text = self._extract_text_from_bytes(pdf_bytes)
-        return self._extract_all_from_text(text)
+        with self._abre(stream=pdf_bytes, filetype="pdf") as doc:
+            return self._extract_from_lines(self._lineas_de_documento(doc))
 
     def es_persona_fisica(self, rfc: str) -> bool:
         """Determina si el RFC corresponde a una Persona Física por formato RFC."""
-        if not rfc or len(rfc) < 12:
-            return False
-        return bool(re.match(r"^[A-ZÑ&]{4}\d{6}[A-Z0-9]{3}$", rfc, re.IGNORECASE))
+        return es_persona_fisica(rfc)
@@ -1,10 +1,18 @@
+import base64
+import csv
+import io
 import json
 import os
+from bson.errors import InvalidId
 from dbaccess.db_receptor import (
     guarda_receptor, 
     obtiene_receptor_by_rfc,
-    update_receptor
+    update_receptor,
+    importa_receptores,
+    exporta_receptores,
+    busca_receptores
     )
+from dbaccess.paginacion import obten_limite, siguiente_cursor
 from models.receptor import Receptor
 from pymongo import MongoClient
 from bson import json_util
@@ -18,13 +26,127 @@ receptor_collection = db["receptors"]
 
 headers = Constants.HEADERS.copy()
 
+RECURSO_IMPORTAR = "/receptor/importar"
+RECURSO_EXPORTAR = "/receptor/exportar"
+RECURSO_BUSCAR = "/receptor/buscar"
+BUSQUEDA_LIMITE_DEFAULT = 10
+BUSQUEDA_LIMITE_MAXIMO = 50
+EXPORTA_LIMITE_DEFAULT = 1000
+EXPORTA_LIMITE_MAXIMO = 5000
+NDJSON = "application/x-ndjson"
+
+
+def _content_type(event) -> str:
+    for nombre, valor in (event.get("headers") or {}).items():
+        if nombre.lower() == "content-type":
+            return (valor or "").split(";")[0].strip().lower()
+    return ""
+
+
+def _texto_body(event) -> str:
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8-sig")
+    return body.lstrip("\ufeff")
+
+
+def _filas_csv(texto: str):
+    return csv.DictReader(io.StringIO(texto, newline=""))
+
+
+def _filas_ndjson(texto: str):
+    """Una fila por línea; las líneas que no son JSON se reportan como error de la fila"""
+    for linea in io.StringIO(texto):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+            yield fila if isinstance(fila, dict) else ValueError("La fila no es un objeto JSON")
+        except ValueError as e:
+            yield ValueError(f"JSON inválido: {str(e)}")
+
+
+def importa(event):
+    """POST /receptor/importar con cuerpo text/csv (con encabezados) o NDJSON (?formato=csv|ndjson)"""
+    query_params = event.get("queryStringParameters") or {}
+    formato = query_params.get("formato") or ("csv" if _content_type(event) == "text/csv" else "ndjson")
+    if formato not in ("csv", "ndjson"):
+        return {
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"error": "formato debe ser csv o ndjson"})
+        }
+    texto = _texto_body(event)
+    filas = _filas_csv(texto) if formato == "csv" else _filas_ndjson(texto)
+    resultado = importa_receptores(filas, receptor_collection)
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.HEADERS_KEY: headers,
+        Constants.BODY: json.dumps(resultado)
+    }
+
+
+def exporta(event):
+    """GET /receptor/exportar?limit=N&after=<cursor>: una página en NDJSON, siguiente cursor en X-Next-Cursor"""
+    query_params = event.get("queryStringParameters") or {}
+    limite = obten_limite(query_params.get("limit"), EXPORTA_LIMITE_DEFAULT, EXPORTA_LIMITE_MAXIMO)
+    try:
+        receptores = list(exporta_receptores(receptor_collection, after=query_params.get("after"), limite=limite))
+    except InvalidId:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"error": "Cursor inválido"})
+        }
+    respuesta_headers = {**headers, "Content-Type": NDJSON, "Access-Control-Expose-Headers": "X-Next-Cursor"}
+    siguiente = siguiente_cursor(receptores, limite)
+    if siguiente:
+        respuesta_headers["X-Next-Cursor"] = siguiente
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.HEADERS_KEY: respuesta_headers,
+        Constants.BODY: "".join(json_util.dumps(receptor) + "\n" for receptor in receptores)
+    }
+
+
+def busca(event):
+    """GET /receptor/buscar?q=<prefijo de RFC o nombre>[&campo=rfc|nombre&limit=N&after=<cursor>]"""
+    query_params = event.get("queryStringParameters") or {}
+    try:
+        receptores, siguiente = busca_receptores(
+            query_params.get("q") or "",
+            receptor_collection,
+            campo=query_params.get("campo"),
+            limite=obten_limite(query_params.get("limit"), BUSQUEDA_LIMITE_DEFAULT, BUSQUEDA_LIMITE_MAXIMO),
+            after=query_params.get("after")
+        )
+    except ValueError as e:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"error": str(e)})
+        }
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.HEADERS_KEY: headers,
+        Constants.BODY: json_util.dumps({"data": receptores, "next": siguiente})
+    }
+
+
 def handler(event, context):
     http_method = event["httpMethod"]
     path_parameters = event.get("pathParameters")
     body = event.get("body")
     origin = event.get("headers", {}).get("origin")
     headers["Access-Control-Allow-Origin"] = valida_cors(origin)
-    if http_method == Constants.POST:
+    resource = event.get("resource")
+    if http_method == Constants.POST and resource == RECURSO_IMPORTAR:
+        return importa(event)
+    elif http_method == Constants.GET and resource == RECURSO_EXPORTAR:
+        return exporta(event)
+    elif http_method == Constants.GET and resource == RECURSO_BUSCAR:
+        return busca(event)
+    elif http_method == Constants.POST:
         # Create a new receptor
         receptor = Receptor(**json.loads(body))
         receptor_id = guarda_receptor(receptor, receptor_collection)
@@ -54,13 +176,11 @@ def handler(event, context):
         # Update a receptor by ID
         receptor_id = path_parameters.get("id_receptor")
         receptor_data = json.loads(body)
-        update_result = update_receptor(receptor_id, receptor_data, receptor_collection)
+        # find_one_and_update regresa el documento ya actualizado, sin volver a leerlo
+        updated_receptor = update_receptor(receptor_id, receptor_data, receptor_collection)
         
-        if update_result.matched_count > 0:
-            # Get the updated receptor to return it
-            updated_receptor = obtiene_receptor_by_rfc(receptor_id, receptor_collection)
-            if updated_receptor:
-                updated_receptor["_id"] = str(updated_receptor["_id"])
+        if updated_receptor:
+            updated_receptor["_id"] = str(updated_receptor["_id"])
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
                 Constants.HEADERS_KEY: headers,
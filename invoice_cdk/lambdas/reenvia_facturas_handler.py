@@ -0,0 +1,162 @@
+import os
+import json
+import traceback
+from uuid import uuid4
+from http import HTTPStatus
+from utils import valida_cors
+from pymongo import MongoClient
+from constantes import Constants
+from bitacora_writer import BitacoraWriter
+from autorizacion import usuario_autenticado, es_el_usuario
+from email_sender import EmailSender
+from factura_pdf import completa_datos_pdf
+from reenvio_facturas import SolicitudInvalida, valida_solicitud, ejecuta_reenvio, MAX_FACTURAS
+from dbaccess.db_sucursal import ids_certificados_de_usuario
+from dbaccess.db_factura import filtro_reenvio, cuenta_facturas_reenvio, consulta_facturas_reenvio
+from dbaccess.db_factura_pdf import obtiene_pdfs
+
+# Configuración de MongoDB
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client[os.getenv("DB_NAME")]
+facturas_emitidas_collection = db["facturasemitidas"]
+certificates_collection = db["certificates"]
+regimen_fiscal_collection = db["regimenfiscal"]
+sucursal_collection = db["sucursales"]
+bitacora_collection = db["bitacora"]
+factura_pdf_cache_collection = db["factura_pdf_cache"]
+
+# Headers de respuesta
+headers = Constants.HEADERS.copy()
+
+_cliente_lambda = None
+
+
+def _lambda_client():
+    """Cliente de Lambda para la invocación asíncrona; boto3 viene en el runtime de Lambda"""
+    global _cliente_lambda
+    if _cliente_lambda is None:
+        import boto3
+        _cliente_lambda = boto3.client("lambda")
+    return _cliente_lambda
+
+
+def handler(event, context):
+    """
+    Reenvío masivo de facturas por receptor y/o sucursal en un rango de fechas.
+
+    POST /facturas/reenvio/{usuario}
+        {"desde": "YYYY-MM-DD", "hasta": "YYYY-MM-DD", "rfc": ..., "sucursal": ...,
+         "email": ..., "formato": "adjuntos" | "zip"}
+
+    Valida y cuenta las facturas, responde 202 con el `idReenvio` y se vuelve a invocar
+    de forma asíncrona ({"reenvio": solicitud}) para generar y enviar los correos sin el
+    límite de 29 s de API Gateway. El avance queda en la bitácora.
+    """
+    if "reenvio" in event:
+        return procesa_reenvio(event["reenvio"])
+    print(event)
+    try:
+        http_method = event["httpMethod"]
+        origin = event.get("headers", {}).get("origin")
+        headers["Access-Control-Allow-Origin"] = valida_cors(origin)
+        if http_method != Constants.POST:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.METHOD_NOT_ALLOWED,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": "Método no permitido"})
+            }
+        usuario = (event.get("pathParameters") or {}).get("usuario")
+        if not es_el_usuario(event, usuario):
+            return {
+                Constants.STATUS_CODE: HTTPStatus.FORBIDDEN,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": "Solo puedes reenviar las facturas de tus certificados"})
+            }
+        try:
+            solicitud = valida_solicitud(json.loads(event.get("body") or "{}"))
+        except (SolicitudInvalida, ValueError) as e:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": str(e)})
+            }
+        solicitud["solicitante"] = usuario_autenticado(event)
+        solicitud["idsCertificado"] = ids_certificados_de_usuario(usuario, certificates_collection)
+        filtro = filtro_reenvio(solicitud["idsCertificado"], solicitud["desde"], solicitud["hasta"],
+                                solicitud["rfc"], solicitud["sucursal"])
+        total = cuenta_facturas_reenvio(filtro, facturas_emitidas_collection, MAX_FACTURAS)
+        if total == 0:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({"message": "No hay facturas para reenviar con esos filtros"})
+            }
+        if total > MAX_FACTURAS:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({
+                    "message": f"El reenvío está limitado a {MAX_FACTURAS} facturas; reduce el rango de fechas"
+                })
+            }
+        solicitud["idReenvio"] = uuid4().hex
+        _lambda_client().invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=json.dumps({"reenvio": solicitud}).encode("utf-8")
+        )
+        bitacora = BitacoraWriter(bitacora_collection)
+        bitacora.registra({"idReenvio": solicitud["idReenvio"], "rfc": solicitud["rfc"],
+                           "sucursal": solicitud["sucursal"], "email": solicitud["email"],
+                           "solicitante": solicitud["solicitante"],
+                           "mensaje": f"Reenvío solicitado por {solicitud['solicitante']}: {total} facturas del "
+                                      f"{solicitud['desde']} al {solicitud['hasta']}"
+                                      + (f" a {solicitud['email']} en lugar del correo de cada factura"
+                                         if solicitud["email"] else ""),
+                           "status": "exito", "traceback": ""})
+        bitacora.flush()
+        return {
+            Constants.STATUS_CODE: HTTPStatus.ACCEPTED,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"idReenvio": solicitud["idReenvio"], "facturas": total})
+        }
+    except Exception as e:
+        traceback.print_exc()
+        return {
+            Constants.STATUS_CODE: HTTPStatus.INTERNAL_SERVER_ERROR,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({"message": f"Error: {str(e)}"})
+        }
+
+
+def procesa_reenvio(solicitud: dict) -> dict:
+    """Invocación asíncrona: consulta, genera los PDFs y envía; el resultado queda en la bitácora"""
+    bitacora = BitacoraWriter(bitacora_collection)
+    try:
+        filtro = filtro_reenvio(solicitud["idsCertificado"], solicitud["desde"], solicitud["hasta"],
+                                solicitud.get("rfc"), solicitud.get("sucursal"))
+        facturas = consulta_facturas_reenvio(filtro, facturas_emitidas_collection, MAX_FACTURAS)
+        # Los PDFs ya descargados no se vuelven a generar
+        en_cache = obtiene_pdfs([factura["uuid"] for factura in facturas], factura_pdf_cache_collection)
+        for factura in facturas:
+            if factura["uuid"] in en_cache:
+                factura["pdf"] = en_cache[factura["uuid"]]
+        completa_datos_pdf([factura for factura in facturas if "pdf" not in factura],
+                           regimen_fiscal_collection, sucursal_collection)
+        resumen = ejecuta_reenvio(solicitud, facturas, EmailSender(), bitacora)
+        bitacora.registra({"idReenvio": solicitud["idReenvio"], "rfc": solicitud.get("rfc"),
+                           "sucursal": solicitud.get("sucursal"), "solicitante": solicitud.get("solicitante"),
+                           "mensaje": f"Reenvío terminado: {resumen['facturasEnviadas']} de {resumen['facturas']} "
+                                      f"facturas enviadas en {resumen['correosEnviados']} correos",
+                           "status": "exito" if resumen["facturasEnviadas"] == resumen["facturas"] else "error",
+                           "traceback": ""})
+        return resumen
+    except Exception as e:
+        bitacora.registra({"idReenvio": solicitud.get("idReenvio"), "rfc": solicitud.get("rfc"),
+                           "sucursal": solicitud.get("sucursal"), "solicitante": solicitud.get("solicitante"),
+                           "mensaje": f"Reenvío: Error: {str(e)}",
+                           "status": "error", "traceback": traceback.format_exc()})
+        # Sin relanzar: Lambda reintentaría la invocación asíncrona y repetiría los correos ya enviados
+        return {"error": str(e)}
+    finally:
+        bitacora.flush()
@@ -0,0 +1,191 @@
+"""
+Reenvío masivo de facturas: las de un receptor y/o sucursal en un rango de fechas.
+
+    solicitud -> facturas (índice rfcReceptor/sucursal + fechaTimbrado)
+        -> PDFs de la caché (`db_factura_pdf`) o generados en procesos trabajadores (`paralelo`)
+        -> agrupa por destinatario -> correos de hasta MAX_BYTES_CORREO (PDF+XML o un ZIP)
+        -> una sesión SMTP con límite de envío (TransporteSMTP) -> bitácora por destinatario
+
+Cada destinatario recibe sus facturas en uno o varios correos; el avance y el resultado
+quedan en la bitácora con el `idReenvio` de la solicitud.
+"""
+import io
+import os
+import zipfile
+from datetime import datetime
+from paralelo import en_paralelo
+from factura_pdf import renderiza
+from mensaje_mime import Adjunto
+
+MAX_FACTURAS = int(os.getenv("REENVIO_MAX_FACTURAS", "500"))
+# Suma de los archivos de un correo antes de codificar; en base64 crece 4/3 y SES acepta 10 MB
+MAX_BYTES_CORREO = int(os.getenv("REENVIO_MAX_BYTES_CORREO", str(7 * 1024 * 1024)))
+TRABAJADORES = int(os.getenv("REENVIO_TRABAJADORES", "0")) or os.cpu_count() or 1
+FORMATOS = ("adjuntos", "zip")
+MENSAJE_TRABAJADOR = "El proceso que generaba el PDF terminó inesperadamente"
+
+
+class SolicitudInvalida(Exception):
+    """La solicitud de reenvío no es válida; el mensaje es para el usuario"""
+
+
+def _fecha(valor, campo: str) -> str:
+    try:
+        datetime.strptime(valor or "", "%Y-%m-%d")
+    except ValueError:
+        raise SolicitudInvalida(f"{campo} debe tener el formato YYYY-MM-DD")
+    return valor
+
+
+def valida_solicitud(body: dict) -> dict:
+    """{desde, hasta, rfc, sucursal, email, formato} normalizados"""
+    solicitud = {
+        "desde": _fecha(body.get("desde"), "desde"),
+        "hasta": _fecha(body.get("hasta"), "hasta"),
+        "rfc": (body.get("rfc") or "").strip().upper() or None,
+        "sucursal": (body.get("sucursal") or "").strip() or None,
+        "email": (body.get("email") or "").strip() or None,
+        "formato": body.get("formato") or "adjuntos",
+    }
+    if solicitud["desde"] > solicitud["hasta"]:
+        raise SolicitudInvalida("desde no puede ser posterior a hasta")
+    if not solicitud["rfc"] and not solicitud["sucursal"]:
+        raise SolicitudInvalida("Indica el rfc del receptor, la sucursal o ambos")
+    if solicitud["email"] and "@" not in solicitud["email"]:
+        raise SolicitudInvalida("email no es un correo válido")
+    # Redirigir el correo solo para las facturas de un receptor, no de toda una sucursal
+    if solicitud["email"] and not solicitud["rfc"]:
+        raise SolicitudInvalida("email solo se puede indicar junto con el rfc del receptor")
+    if solicitud["formato"] not in FORMATOS:
+        raise SolicitudInvalida(f"formato debe ser uno de: {', '.join(FORMATOS)}")
+    return solicitud
+
+
+def agrupa_por_destinatario(facturas: list, email: str = None) -> tuple:
+    """
+    ({correo: [factura]}, [facturas sin correo]). `email` reemplaza el correo guardado en
+    cada factura; las direcciones se comparan sin distinguir mayúsculas.
+    """
+    grupos = {}
+    sin_correo = []
+    for factura in facturas:
+        destinatario = (email or factura.get("email") or "").strip()
+        if "@" not in destinatario:
+            sin_correo.append(factura)
+            continue
+        grupos.setdefault(destinatario.lower(), []).append(factura)
+    return grupos, sin_correo
+
+
+def archivos_de_factura(factura: dict) -> list:
+    nombre = factura["uuid"]
+    return [(f"{nombre}.pdf", factura["pdf"]), (f"{nombre}.xml", factura["cfdi"].encode("utf-8"))]
+
+
+def parte_por_tamano(grupos_archivos: list, maximo: int = MAX_BYTES_CORREO) -> list:
+    """
+    Reparte [[archivos de una factura]] en correos de hasta `maximo` bytes sin separar
+    el PDF del XML de una misma factura. Una factura más grande que `maximo` va sola.
+    """
+    correos = []
+    actual, tamano = [], 0
+    for archivos in grupos_archivos:
+        tamano_factura = sum(len(contenido) for _, contenido in archivos)
+        if actual and tamano + tamano_factura > maximo:
+            correos.append(actual)
+            actual, tamano = [], 0
+        actual.extend(archivos)
+        tamano += tamano_factura
+    if actual:
+        correos.append(actual)
+    return correos
+
+
+def zip_de(archivos: list) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for nombre, contenido in archivos:
+            zip_file.writestr(nombre, contenido)
+    return buffer.getvalue()
+
+
+def correos_de_destinatario(destinatario: str, archivos_por_factura: list, formato: str, asunto: str) -> list:
+    """Argumentos de `EmailSender.build_email` para los correos de un destinatario"""
+    partes = parte_por_tamano(archivos_por_factura)
+    correos = []
+    for numero, archivos in enumerate(partes, start=1):
+        sufijo = f" ({numero} de {len(partes)})" if len(partes) > 1 else ""
+        facturas = len(archivos) // 2
+        if formato == "zip":
+            nombre_zip = f"facturas{numero if len(partes) > 1 else ''}.zip"
+            adjuntos = [Adjunto(nombre_zip, "application/zip", contenido=zip_de(archivos))]
+        else:
+            adjuntos = [Adjunto(nombre, "application/pdf" if nombre.endswith(".pdf") else "application/xml",
+                                contenido=contenido)
+                        for nombre, contenido in archivos]
+        correos.append({
+            "recipient_email": destinatario,
+            "subject": asunto + sufijo,
+            "body_text": f"Se adjuntan {facturas} facturas en PDF y XML.\nAgradecemos su preferencia",
+            "adjuntos": adjuntos,
+        })
+    return correos
+
+
+def genera_pdfs(pendientes: list, trabajadores: int = TRABAJADORES) -> dict:
+    """[(índice, factura)] -> {índice: {"pdf": bytes} | {"error": ...}} generados en paralelo"""
+    return dict(en_paralelo(renderiza, pendientes, trabajadores, error={"error": MENSAJE_TRABAJADOR}))
+
+
+def ejecuta_reenvio(solicitud: dict, facturas: list, sender, bitacora, trabajadores: int = TRABAJADORES) -> dict:
+    """
+    Genera los PDFs que no traiga ya cada factura (`pdf`, p. ej. de la caché), agrupa
+    por destinatario y envía. Registra en `bitacora` cada
+    factura cuyo PDF falla, cada destinatario (con el avance) y las facturas sin correo.
+
+    Returns:
+        resumen del reenvío
+    """
+    base = {"idReenvio": solicitud["idReenvio"], "rfc": solicitud.get("rfc"),
+            "sucursal": solicitud.get("sucursal"), "solicitante": solicitud.get("solicitante"), "traceback": ""}
+    resumen = {"facturas": len(facturas), "pdfsConError": 0, "destinatarios": 0, "sinCorreo": 0,
+               "facturasEnviadas": 0, "correosEnviados": 0, "correosConError": 0}
+    resultados = {indice: {"pdf": factura["pdf"]} for indice, factura in enumerate(facturas) if factura.get("pdf")}
+    resultados.update(genera_pdfs(
+        [(indice, factura) for indice, factura in enumerate(facturas) if indice not in resultados], trabajadores))
+    con_pdf = []
+    for indice, resultado in sorted(resultados.items()):
+        factura = facturas[indice]
+        if "pdf" in resultado:
+            factura["pdf"] = resultado["pdf"]
+            con_pdf.append(factura)
+        else:
+            resumen["pdfsConError"] += 1
+            bitacora.registra({**base, "ticket": factura.get("ticket"), "sucursal": factura.get("sucursal"),
+                               "mensaje": f"Reenvío: {resultado['error']} (UUID {factura['uuid']})",
+                               "status": "error"})
+
+    grupos, sin_correo = agrupa_por_destinatario(con_pdf, solicitud.get("email"))
+    resumen["destinatarios"] = len(grupos)
+    resumen["sinCorreo"] = len(sin_correo)
+    if sin_correo:
+        tickets = ", ".join(factura.get("ticket") or factura["uuid"] for factura in sin_correo)
+        bitacora.registra({**base, "mensaje": f"Reenvío: {len(sin_correo)} facturas sin correo del receptor: {tickets}",
+                           "status": "error"})
+
+    asunto = f"Facturas del {solicitud['desde']} al {solicitud['hasta']}"
+    for numero, (destinatario, facturas_destinatario) in enumerate(grupos.items(), start=1):
+        archivos = [archivos_de_factura(factura) for factura in facturas_destinatario]
+        correos = correos_de_destinatario(destinatario, archivos, solicitud["formato"], asunto)
+        enviados = sender.send_emails(correos)
+        resumen["correosEnviados"] += sum(enviados)
+        resumen["correosConError"] += len(enviados) - sum(enviados)
+        if all(enviados):
+            resumen["facturasEnviadas"] += len(facturas_destinatario)
+        bitacora.registra({**base, "email": destinatario,
+                           "mensaje": f"Reenvío {numero}/{len(grupos)}: {len(facturas_destinatario)} facturas en "
+                                      f"{len(correos)} correos, {sum(enviados)} enviados",
+                           "status": "exito" if all(enviados) else "error"})
+        # El avance queda visible en la bitácora mientras sigue el envío
+        bitacora.flush_en_segundo_plano()
+    return resumen
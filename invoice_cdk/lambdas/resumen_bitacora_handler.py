@@ -0,0 +1,97 @@
+import os
+import json
+import traceback
+from http import HTTPStatus
+from utils import valida_cors
+from datetime import datetime
+from pymongo import MongoClient
+from constantes import Constants
+from dbaccess.db_bitacora import resumen_bitacora, FORMATOS_INTERVALO, TOP_DEFAULT, TOP_MAXIMO
+from dbaccess.paginacion import obten_limite
+
+# Configuración de MongoDB
+client = MongoClient(os.getenv("MONGODB_URI"))
+db = client[os.getenv("DB_NAME")]
+bitacora_collection = db["bitacora"]
+
+# Filtros opcionales del query string -> campo en bitácora
+FILTROS = {"status": "status", "rfcEmisor": "rfcEmisor", "sucursal": "sucursal"}
+
+# Headers de respuesta
+headers = Constants.HEADERS.copy()
+
+def handler(event, context):
+    """
+    Handler con el resumen de la bitácora calculado en el servidor.
+
+    GET /bitacora/resumen?fechaInicio=YYYY-MM-DD&fechaFin=YYYY-MM-DD
+        [&intervalo=hora|dia|mes&top=N&status=...&rfcEmisor=...&sucursal=...]
+    """
+    print(event)
+    try:
+        http_method = event["httpMethod"]
+        origin = event.get("headers", {}).get("origin")
+        headers["Access-Control-Allow-Origin"] = valida_cors(origin)
+        if http_method == Constants.GET:
+            query_params = event.get("queryStringParameters") or {}
+            if not query_params.get("fechaInicio") or not query_params.get("fechaFin"):
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.HEADERS_KEY: headers,
+                    Constants.BODY: json.dumps({
+                        "message": "Faltan parámetros requeridos: fechaInicio y fechaFin"
+                    })
+                }
+            fecha_inicio = query_params["fechaInicio"] + "T00:00:00"
+            fecha_fin = query_params["fechaFin"] + "T23:59:59"
+            intervalo = query_params.get("intervalo", "dia")
+            try:
+                datetime.fromisoformat(fecha_inicio)
+                datetime.fromisoformat(fecha_fin)
+            except ValueError:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.HEADERS_KEY: headers,
+                    Constants.BODY: json.dumps({
+                        "message": "Formato de fecha inválido. Use formato: YYYY-MM-DD"
+                    })
+                }
+            if intervalo not in FORMATOS_INTERVALO:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+                    Constants.HEADERS_KEY: headers,
+                    Constants.BODY: json.dumps({
+                        "message": f"intervalo debe ser uno de: {', '.join(FORMATOS_INTERVALO)}"
+                    })
+                }
+            filtros = {campo: query_params[param] for param, campo in FILTROS.items() if query_params.get(param)}
+            resumen = resumen_bitacora(
+                fecha_inicio, fecha_fin, bitacora_collection,
+                top=obten_limite(query_params.get("top"), TOP_DEFAULT, TOP_MAXIMO),
+                intervalo=intervalo,
+                filtros=filtros
+            )
+            return {
+                Constants.STATUS_CODE: HTTPStatus.OK,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps(resumen)
+            }
+        else:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.METHOD_NOT_ALLOWED,
+                Constants.HEADERS_KEY: headers,
+                Constants.BODY: json.dumps({
+                    "message": f"Método {http_method} no permitido"
+                })
+            }
+
+    except Exception as e:
+        print(f"Error en resumen de bitácora: {str(e)}")
+        traceback.print_exc()
+        return {
+            Constants.STATUS_CODE: HTTPStatus.INTERNAL_SERVER_ERROR,
+            Constants.HEADERS_KEY: headers,
+            Constants.BODY: json.dumps({
+                "message": f"Error interno del servidor: {str(e)}"
+            })
+        }
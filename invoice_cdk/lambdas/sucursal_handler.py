@@ -7,12 +7,17 @@ from http import HTTPStatus
 from dbaccess.db_sucursal import (
     add_sucursal,
     update_sucursal,
-    delete_sucursal,
     get_sucursal_by_codigo,
-    get_sucursal_by_id
+    get_sucursal_by_id,
+    ids_certificados_de_usuario,
+    lista_sucursales,
+    invalida_cache
 )
-from dbaccess.db_certificado import (update_certificate, get_certificate_by_id)
+from dbaccess.db_cascada import elimina_sucursal_cascada
+from dbaccess.paginacion import obten_limite, siguiente_cursor
+from bson.errors import InvalidId
 from models.sucursal import Sucursal
+from autorizacion import usuario_autenticado, es_el_usuario
 headers = Constants.HEADERS.copy()
 
 client = MongoClient(os.getenv("MONGODB_URI"))
@@ -21,6 +26,61 @@ sucursal_collection = db["sucursales"]
 certificado_collection = db["certificates"]
 folio_collection = db["folios"]
 
+# Campos que se pueden pedir con ?campos=a,b en el listado
+CAMPOS_LISTADO = (
+    "id_certificado", "codigo_sucursal", "serie", "direccion",
+    "codigo_postal", "responsable", "telefono", "regimen_fiscal"
+)
+
+
+def lista(event):
+    """
+    GET /sucursales[?id_certificado=<id>&limit=N&after=<cursor>&campos=a,b]
+    Sucursales de los certificados del usuario del token de Cognito (o solo de uno de
+    ellos con id_certificado). Regresa {"data": [...], "next": cursor}
+    """
+    query_params = event.get("queryStringParameters") or {}
+    # ?usuario= se acepta solo si es el mismo del token
+    usuario = query_params.get("usuario") or usuario_autenticado(event)
+    if not es_el_usuario(event, usuario):
+        return {
+            Constants.STATUS_CODE: HTTPStatus.FORBIDDEN,
+            Constants.BODY: json.dumps({"error": "Solo puedes listar las sucursales de tus certificados"}),
+            Constants.HEADERS_KEY: headers
+        }
+    id_certificados = ids_certificados_de_usuario(usuario, certificado_collection)
+    if query_params.get("id_certificado"):
+        if query_params["id_certificado"] not in id_certificados:
+            return {
+                Constants.STATUS_CODE: HTTPStatus.FORBIDDEN,
+                Constants.BODY: json.dumps({"error": "Solo puedes listar las sucursales de tus certificados"}),
+                Constants.HEADERS_KEY: headers
+            }
+        id_certificados = [query_params["id_certificado"]]
+    projection = None
+    if query_params.get("campos"):
+        campos = [c.strip() for c in query_params["campos"].split(",") if c.strip() in CAMPOS_LISTADO]
+        projection = {campo: 1 for campo in campos} or None
+    limit = obten_limite(query_params.get("limit"))
+    try:
+        sucursales = lista_sucursales(
+            id_certificados, sucursal_collection, limit, after=query_params.get("after"), projection=projection)
+    except InvalidId:
+        return {
+            Constants.STATUS_CODE: HTTPStatus.BAD_REQUEST,
+            Constants.BODY: json.dumps({"error": "Cursor inválido"}),
+            Constants.HEADERS_KEY: headers
+        }
+    siguiente = siguiente_cursor(sucursales, limit)
+    for suc in sucursales:
+        suc["_id"] = str(suc["_id"])
+    return {
+        Constants.STATUS_CODE: HTTPStatus.OK,
+        Constants.BODY: json.dumps({"data": sucursales, "next": siguiente}),
+        Constants.HEADERS_KEY: headers
+    }
+
+
 def handler(event, context):
     http_method = event["httpMethod"]
     path_parameters = event.get("pathParameters")
@@ -57,14 +117,7 @@ def handler(event, context):
                         Constants.HEADERS_KEY: headers
                     }
             else:
-                sucursales = list(sucursal_collection.find())
-                for suc in sucursales:
-                    suc["_id"] = str(suc["_id"])
-                return {
-                    Constants.STATUS_CODE: HTTPStatus.OK,
-                    Constants.BODY: json.dumps(sucursales),
-                    Constants.HEADERS_KEY: headers
-                }
+                return lista(event)
 
         elif http_method == Constants.PUT:
             sucursal_id = path_parameters["id"]
@@ -82,23 +135,15 @@ def handler(event, context):
 
         elif http_method == Constants.DELETE:
             sucursal_id = path_parameters["id"]
-            sucursal = get_sucursal_by_id(sucursal_id, sucursal_collection)
-            certificado = sucursal["id_certificado"]
-            certificado_found = get_certificate_by_id(certificado, certificado_collection)
-            if certificado_found:
-                #print(f"Deleting certificate with ID: {certificado_found}")
-                sucursales = certificado_found.get("sucursales", [])
-                new_sucursales = []
-                for sucursal_loop in sucursales:
-                    if sucursal_loop["_id"] != sucursal_id:
-                        new_sucursales.append(sucursal_loop)
-                certificado_found["sucursales"] = new_sucursales
-                # Remove _id before updating to avoid "immutable field" error
-                cert_id = certificado_found.pop("_id")
-                update_certificate(cert_id, certificado_found, certificado_collection)
-
-            folio_collection.delete_one({"sucursal": sucursal["codigo_sucursal"]})
-            delete_sucursal(sucursal_id, sucursal_collection)
+            sucursal = elimina_sucursal_cascada(
+                sucursal_id, client, sucursal_collection, certificado_collection, folio_collection)
+            invalida_cache()
+            if not sucursal:
+                return {
+                    Constants.STATUS_CODE: HTTPStatus.NOT_FOUND,
+                    Constants.BODY: json.dumps({"error": "Sucursal not found"}),
+                    Constants.HEADERS_KEY: headers
+                }
             return {
                 Constants.STATUS_CODE: HTTPStatus.OK,
                 Constants.BODY: json.dumps({"message": "Sucursal deleted"}),
@@ -0,0 +1,167 @@
+"""
+Resuelve en un solo paso el contexto de un ticket de Tapetes: la venta, la sucursal,
+su certificado y la descripción de cada clave de unidad.
+
+    snapshot del ticket ─ o ─ token (caché) -> ticket -> guarda snapshot
+        -> ┬ sucursal + certificado (una agregación, con caché)
+           └ claves de unidad (snapshot de catálogos o un $in)
+
+Mientras el snapshot del ticket (`db_tickets`) esté vigente no se llama a Tapetes.
+Las consultas a Mongo posteriores no dependen entre sí y corren en paralelo. Cada
+etapa registra su duración en milisegundos en `tiempos`.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from constantes import Constants
+from dbaccess.db_sucursal import get_sucursal_con_certificado
+from dbaccess.db_datos_factura import get_descripciones_by_claves
+from dbaccess.db_tickets import obtiene_snapshot, guarda_snapshot
+
+TAPETES_API_URL = os.getenv("TAPETES_API_URL")
+TAPETES_USER_NAME = os.getenv("TAPETES_USER_NAME")
+TAPETES_PASSWORD = os.getenv("TAPETES_PASSWORD")
+# Vigencia del token cuando Tapetes no manda `expires_in`, y margen para renovarlo antes
+TOKEN_TTL_SEGUNDOS = int(os.getenv("TAPETES_TOKEN_TTL", "1800"))
+TOKEN_MARGEN_SEGUNDOS = 60
+TIMEOUT_SEGUNDOS = float(os.getenv("TAPETES_TIMEOUT", "10"))
+MENSAJE_SUCURSAL = "Sucursal no encontrada, consúltalo con el Administrador"
+MENSAJE_CERTIFICADO = "Certificado no encontrado, consúltalo con el Administrador"
+
+# La sesión reutiliza la conexión TLS con Tapetes entre invocaciones del contenedor
+_sesion = requests.Session()
+_token = {"valor": None, "expira": 0.0}
+_token_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=3)
+
+
+class ContextoNoEncontrado(Exception):
+    """El ticket, la sucursal o el certificado no existen; el mensaje es para el usuario"""
+
+
+class _Cronometro:
+    def __init__(self):
+        self.tiempos = {}
+
+    def mide(self, etapa: str, funcion, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        finally:
+            self.tiempos[etapa] = round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def obten_token(renueva: bool = False) -> str:
+    """Token de Tapetes con caché por contenedor; `renueva` fuerza pedir uno nuevo"""
+    with _token_lock:
+        if renueva or not _token["valor"] or time.monotonic() >= _token["expira"]:
+            respuesta = _sesion.post(
+                f"{TAPETES_API_URL}token",
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                data={"username": TAPETES_USER_NAME, "password": TAPETES_PASSWORD},
+                timeout=TIMEOUT_SEGUNDOS
+            )
+            datos = respuesta.json()
+            vigencia = int(datos.get("expires_in") or TOKEN_TTL_SEGUNDOS)
+            _token["valor"] = datos.get("access_token")
+            _token["expira"] = time.monotonic() + max(vigencia - TOKEN_MARGEN_SEGUNDOS, 0)
+        return _token["valor"]
+
+
+def invalida_token() -> None:
+    with _token_lock:
+        _token["valor"] = None
+        _token["expira"] = 0.0
+
+
+def consulta_ticket(ticket: str, token: str):
+    """POST /tickets; si el token ya no es válido (401) lo renueva y reintenta una vez"""
+    for intento in range(2):
+        respuesta = _sesion.post(
+            f"{TAPETES_API_URL}tickets",
+            headers={"Accept": Constants.APPLICATION_JSON, "Content-Type": Constants.APPLICATION_JSON,
+                     "Authorization": f"Bearer {token}"},
+            data=json.dumps({"ticket": ticket}),
+            timeout=TIMEOUT_SEGUNDOS
+        )
+        if respuesta.status_code != 401 or intento:
+            return respuesta.json()
+        token = obten_token(renueva=True)
+
+
+def _guarda_snapshot(ticket: str, venta: dict, ticket_snapshot_collection) -> None:
+    try:
+        guarda_snapshot(ticket, venta, ticket_snapshot_collection)
+    except Exception as e:
+        # Sin snapshot solo se pierde el atajo del siguiente intento
+        print(f"No se pudo guardar el snapshot del ticket {ticket}: {str(e)}")
+
+
+def _venta_de_snapshot(ticket: str, ticket_snapshot_collection):
+    try:
+        snapshot = obtiene_snapshot(ticket, ticket_snapshot_collection, {"venta": 1})
+        return snapshot["venta"] if snapshot else None
+    except Exception as e:
+        print(f"No se pudo leer el snapshot del ticket {ticket}: {str(e)}")
+        return None
+
+
+def resuelve_contexto(ticket: str, sucursal_collection, medidas_collection, ticket_snapshot_collection=None) -> tuple:
+    """
+    Returns:
+        ({"venta", "certificado", "sucursal"}, tiempos por etapa en ms)
+
+    Raises:
+        ContextoNoEncontrado: si Tapetes no conoce el ticket o no existen la sucursal o su certificado
+    """
+    cronometro = _Cronometro()
+    inicio = time.perf_counter()
+    try:
+        venta, guardado = None, None
+        if ticket_snapshot_collection is not None:
+            venta = cronometro.mide("snapshot", _venta_de_snapshot, ticket, ticket_snapshot_collection)
+        if venta is None:
+            token = cronometro.mide("token", obten_token)
+            venta = cronometro.mide("ticket", consulta_ticket, ticket, token)
+            if 'detail' in venta:
+                raise ContextoNoEncontrado(venta["detail"])
+            if ticket_snapshot_collection is not None:
+                # Copia: la venta se enriquece con la unidad mientras se guarda
+                guardado = _executor.submit(_guarda_snapshot, ticket, copy.deepcopy(venta), ticket_snapshot_collection)
+
+        if not venta.get("sucursal"):
+            raise ContextoNoEncontrado(MENSAJE_SUCURSAL)
+
+        detalle = venta.get("detalle") or []
+        sucursal_certificado = _executor.submit(
+            cronometro.mide, "sucursal_certificado",
+            get_sucursal_con_certificado, venta.get("sucursal"), sucursal_collection)
+        unidades = _executor.submit(
+            cronometro.mide, "unidades",
+            get_descripciones_by_claves, [item.get("claveunidad") for item in detalle], medidas_collection)
+        sucursal, certificado = sucursal_certificado.result()
+        descripciones = unidades.result()
+        if guardado is not None:
+            # Lambda congela los hilos al regresar; el snapshot debe quedar escrito antes
+            guardado.result()
+
+        if not sucursal:
+            raise ContextoNoEncontrado(MENSAJE_SUCURSAL)
+        if not certificado:
+            raise ContextoNoEncontrado(MENSAJE_CERTIFICADO)
+        for item in detalle:
+            item['unidad'] = descripciones.get(item.get("claveunidad"))
+        sucursal["_id"] = str(sucursal["_id"])
+        return {"venta": venta, "certificado": certificado, "sucursal": sucursal}, cronometro.tiempos
+    finally:
+        cronometro.tiempos["total"] = round((time.perf_counter() - inicio) * 1000, 2)
+        print(json.dumps({"ticket": ticket, "tapetes_tiempos_ms": cronometro.tiempos}))
+
+
+def server_timing(tiempos: dict) -> str:
+    """Header Server-Timing con la duración de cada etapa"""
+    return ", ".join(f"{etapa};dur={duracion}" for etapa, duracion in tiempos.items())
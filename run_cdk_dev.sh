@@ -26,8 +26,23 @@ if [ $# -eq 0 ]; then
 else
     echo "copying env file"
     cp .env_dev .env
+    # Solo deploy exporta el snapshot; synth/diff no tocan la base de datos
+    snapshot_exportado=0
+    if [ "$1" = "deploy" ]; then
+        echo "📦 Exportando catálogos del SAT al paquete de las lambdas"
+        if python scripts/exporta_catalogos.py --env-file .env; then
+            snapshot_exportado=1
+        else
+            echo "⚠️  No se generó el snapshot; las lambdas leerán los catálogos de Mongo"
+        fi
+    fi
     echo "🚀 Ejecutando: cdk $@"
     echo "----------------------------------------"
     cdk "$@" --profile pagos
+    resultado_cdk=$?
+    # La versión se publica solo cuando las lambdas con ese snapshot ya están desplegadas
+    if [ $resultado_cdk -eq 0 ] && [ $snapshot_exportado -eq 1 ]; then
+        python scripts/exporta_catalogos.py --env-file .env --publica-snapshot || echo "⚠️  No se publicó la versión de los catálogos"
+    fi
     echo "Termino de ejecutar cdk DEV $@"
 fi
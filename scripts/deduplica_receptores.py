@@ -0,0 +1,35 @@
+"""
+Deja un solo receptor por RFC (el más reciente, completado con los campos de los
+anteriores) y reconstruye el índice `Rfc` como único. Se puede volver a ejecutar.
+
+    MONGODB_URI=... DB_NAME=... python scripts/deduplica_receptores.py
+    MONGODB_URI=... DB_NAME=... python scripts/deduplica_receptores.py --sin-indice
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.db_receptor import deduplica_receptores
+from dbaccess.indices import INDICES, ensure_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sin-indice", action="store_true", help="Solo elimina duplicados, sin tocar el índice")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    db = client[os.environ["DB_NAME"]]
+    print(f"Receptores duplicados eliminados: {deduplica_receptores(db['receptors'])}")
+    if not args.sin_indice:
+        resultado = ensure_indexes(db, {"receptors": INDICES["receptors"]}, obsoletos={}, corrige=True)
+        print(f"Índices de receptors: {resultado.get('receptors', 'sin cambios')}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
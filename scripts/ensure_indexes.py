@@ -0,0 +1,46 @@
+"""
+Crea los índices declarados en `dbaccess.indices.INDICES` que falten. Es seguro
+ejecutarlo en cada despliegue: los índices existentes no se tocan.
+
+Reporta los índices con las mismas llaves pero otras opciones (unique, TTL) y los
+reemplazados (`OBSOLETOS`); --corrige los reconstruye o elimina. Un índice unique
+no se puede reconstruir si la colección tiene duplicados.
+
+    MONGODB_URI=... DB_NAME=... python scripts/ensure_indexes.py
+    MONGODB_URI=... DB_NAME=... python scripts/ensure_indexes.py --corrige
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.indices import ensure_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corrige", action="store_true",
+                        help="Reconstruye los índices con otras opciones y elimina los obsoletos")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    resultado = ensure_indexes(client[os.environ["DB_NAME"]], corrige=args.corrige)
+    for coleccion, reporte in resultado.items():
+        if reporte["creados"]:
+            print(f"{coleccion}: creados {', '.join(reporte['creados'])}")
+        if reporte["diferentes"]:
+            accion = "reconstruidos" if args.corrige else "con otras opciones (usa --corrige)"
+            print(f"{coleccion}: {accion} {', '.join(reporte['diferentes'])}")
+        if reporte["obsoletos"]:
+            accion = "eliminados" if args.corrige else "obsoletos (usa --corrige)"
+            print(f"{coleccion}: {accion} {', '.join(reporte['obsoletos'])}")
+    if not resultado:
+        print("Todos los índices ya existen")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
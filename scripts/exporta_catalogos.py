@@ -0,0 +1,102 @@
+"""
+Exporta los catálogos del SAT (usocfdis, regimenfiscal, formapago, medidas) a
+invoice_cdk/lambdas/catalogos/ para empacarlos con las lambdas.
+
+    MONGODB_URI=... DB_NAME=... python scripts/exporta_catalogos.py
+    python scripts/exporta_catalogos.py --env-file .env        # mismas variables que el CDK
+    python scripts/exporta_catalogos.py --verifica             # exit 1 si el snapshot está desactualizado
+    python scripts/exporta_catalogos.py --publica-snapshot     # después de un `cdk deploy` exitoso
+    python scripts/exporta_catalogos.py --publica-version      # tras corregir un catálogo en Mongo
+
+Exportar no escribe en Mongo. --publica-snapshot guarda en `catalogos_version` la versión
+del snapshot ya desplegado; --publica-version guarda la del contenido actual de Mongo, y
+las lambdas con un snapshot distinto leen de Mongo hasta el siguiente despliegue.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.catalogos import (
+    SNAPSHOT_DIR, ARCHIVO_DATOS_FACTURA, ARCHIVO_INDICE, VERSION_ID,
+    lee_catalogos, construye_snapshot, calcula_version
+)
+
+
+def conexion(env_file):
+    if not env_file:
+        return os.environ["MONGODB_URI"], os.environ["DB_NAME"]
+    from dotenv import dotenv_values
+    env = dotenv_values(env_file)
+    uri = f"mongodb+srv://{env.get('MONGO_USER')}:{env.get('MONGO_PW')}@{env.get('MONGO_HOST')}/{env.get('MONGO_DB')}"
+    return uri, env.get("MONGO_DB")
+
+
+def publica_version(db, version):
+    db["catalogos_version"].update_one(
+        {"_id": VERSION_ID},
+        {"$set": {"version": version, "publicado": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+def version_de_snapshot(destino: Path) -> str:
+    try:
+        with open(destino / ARCHIVO_INDICE) as f:
+            return json.load(f)["version"]
+    except FileNotFoundError:
+        sys.exit(f"No existe snapshot en {destino}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--env-file", help="Archivo .env con MONGO_USER, MONGO_PW, MONGO_HOST y MONGO_DB")
+    parser.add_argument("--destino", default=str(SNAPSHOT_DIR), help="Directorio del snapshot")
+    accion = parser.add_mutually_exclusive_group()
+    accion.add_argument("--verifica", action="store_true", help="Compara el snapshot con Mongo sin escribir")
+    accion.add_argument("--publica-version", action="store_true", help="Publica en Mongo la versión actual")
+    accion.add_argument("--publica-snapshot", action="store_true",
+                        help="Publica en Mongo la versión del snapshot (después del despliegue)")
+    args = parser.parse_args()
+
+    uri, db_name = conexion(args.env_file)
+    client = MongoClient(uri)
+    db = client[db_name]
+    destino = Path(args.destino)
+
+    if args.publica_snapshot:
+        version = version_de_snapshot(destino)
+        publica_version(db, version)
+        print(f"Versión del snapshot publicada: {version}")
+        client.close()
+        return
+
+    catalogos = lee_catalogos(db)
+    if args.verifica:
+        version_snapshot = version_de_snapshot(destino)
+        version_mongo = calcula_version(catalogos)
+        if version_snapshot != version_mongo:
+            sys.exit(f"Snapshot desactualizado: {version_snapshot} (snapshot) != {version_mongo} (Mongo)")
+        print(f"Snapshot vigente: {version_snapshot}")
+    elif args.publica_version:
+        version = calcula_version(catalogos)
+        publica_version(db, version)
+        print(f"Versión publicada: {version}")
+    else:
+        cuerpo, indice = construye_snapshot(catalogos)
+        indice["generado"] = datetime.now(timezone.utc).isoformat()
+        destino.mkdir(parents=True, exist_ok=True)
+        (destino / ARCHIVO_DATOS_FACTURA).write_bytes(cuerpo)
+        (destino / ARCHIVO_INDICE).write_text(json.dumps(indice, ensure_ascii=False))
+        print(f"Snapshot {indice['version']} escrito en {destino} "
+              f"({len(cuerpo) / 1024:.1f} KB, {sum(len(i) for i in indice['indices'].values())} claves)")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Exporta todos los receptores a un archivo NDJSON recorriendo la colección con un
+cursor, sin cargarla en memoria.
+
+    MONGODB_URI=... DB_NAME=... python scripts/exporta_receptores.py --destino receptores.ndjson
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from bson import json_util
+from pymongo import MongoClient
+from dbaccess.db_receptor import exporta_receptores, TAMANO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", default="-", help="Archivo NDJSON de salida ('-' para stdout)")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Documentos por batch del cursor")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    receptors = client[os.environ["DB_NAME"]]["receptors"]
+    salida = sys.stdout if args.destino == "-" else open(args.destino, "w")
+    exportados = 0
+    try:
+        for receptor in exporta_receptores(receptors, tamano_lote=args.lote):
+            salida.write(json_util.dumps(receptor) + "\n")
+            exportados += 1
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+        client.close()
+    print(f"Receptores exportados: {exportados}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
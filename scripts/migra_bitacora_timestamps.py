@@ -0,0 +1,30 @@
+"""
+Convierte a fecha BSON (UTC) los `timestamp` de la bitácora guardados como string
+ISO con la hora del centro de México. Se puede volver a ejecutar sin efectos.
+
+    MONGODB_URI=... DB_NAME=... python scripts/migra_bitacora_timestamps.py
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.db_bitacora import migra_timestamps, TAMANO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Registros por bulk_write")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    convertidos = migra_timestamps(client[os.environ["DB_NAME"]]["bitacora"], args.lote)
+    print(f"Registros convertidos: {convertidos}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Guarda `rfcReceptor` (leído del XML timbrado) en las facturas emitidas antes de que se
+guardara, para que el reenvío por receptor las encuentre con el índice
+rfcReceptor_sucursal_fechaTimbrado. Se puede volver a ejecutar sin efectos.
+
+    MONGODB_URI=... DB_NAME=... python scripts/migra_rfc_receptor.py
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.db_factura import migra_rfc_receptor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=500, help="Facturas por bulk_write")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    actualizadas = migra_rfc_receptor(client[os.environ["DB_NAME"]]["facturasemitidas"], args.lote)
+    print(f"Facturas actualizadas: {actualizadas}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
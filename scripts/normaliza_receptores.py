@@ -0,0 +1,30 @@
+"""
+Calcula `rfcNormalizado` y `nombreNormalizado` de los receptores guardados antes de
+la búsqueda por prefijo. Se puede volver a ejecutar sin efectos.
+
+    MONGODB_URI=... DB_NAME=... python scripts/normaliza_receptores.py
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.db_receptor import migra_campos_busqueda, TAMANO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Receptores por bulk_write")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    actualizados = migra_campos_busqueda(client[os.environ["DB_NAME"]]["receptors"], args.lote)
+    print(f"Receptores actualizados: {actualizados}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
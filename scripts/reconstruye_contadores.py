@@ -0,0 +1,35 @@
+"""
+Reconstruye la colección `usage_counters` a partir del histórico de `facturasemitidas`.
+
+    MONGODB_URI=... DB_NAME=... python scripts/reconstruye_contadores.py [--desde YYYY-MM-DD]
+
+El reporte de consumo sigue agregando `facturasemitidas` hasta que una corrida sin
+--desde termina y deja el marcador de reconstrucción completa.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "invoice_cdk" / "lambdas"))
+
+from pymongo import MongoClient
+from dbaccess.db_usage_counters import reconstruye_contadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--desde", help="Solo reconstruye facturas timbradas a partir de esta fecha (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ["MONGODB_URI"])
+    db = client[os.environ["DB_NAME"]]
+    filtro = {"fechaTimbrado": {"$gte": datetime.strptime(args.desde, "%Y-%m-%d")}} if args.desde else None
+    procesadas = reconstruye_contadores(db["facturasemitidas"], db["usage_counters"], db["usage_counter_events"], filtro)
+    print(f"Facturas procesadas: {procesadas}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
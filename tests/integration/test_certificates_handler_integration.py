@@ -172,6 +172,38 @@ class TestCertificatesHandlerIntegrationGet:
         assert len(body) > 0
         assert len(body[0]["sucursales"]) > 0
         assert body[0]["sucursales"][0]["codigo_sucursal"] == "TEST_SUC001"
+
+    def test_get_certificates_paginated_keeps_sucursal_order_real_db(self, sample_certificate_data,
+                                                                     sample_sucursal_data, test_db):
+        """Test paginated listing resolves sucursales in their stored order"""
+        sucursal_ids = test_db.sucursales.insert_many([
+            {**sample_sucursal_data, "codigo_sucursal": f"TEST_SUC00{i}"} for i in range(3)
+        ]).inserted_ids
+        for _ in range(3):
+            cert_data = sample_certificate_data.copy()
+            cert_data["desde"] = datetime.fromisoformat(cert_data["desde"])
+            cert_data["hasta"] = datetime.fromisoformat(cert_data["hasta"])
+            # Stored order differs from insertion order, references saved as strings
+            cert_data["sucursales"] = [{"_id": str(s)} for s in reversed(sucursal_ids)]
+            test_db.certificates.insert_one(cert_data)
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"id": "test_user_integration@example.com"},
+            "queryStringParameters": {"limit": "2"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        first_page = json.loads(certificates_handler.handler(event, {})["body"])
+        assert len(first_page["data"]) == 2
+        assert first_page["next"] == first_page["data"][-1]["_id"]
+        assert [s["codigo_sucursal"] for s in first_page["data"][0]["sucursales"]] == \
+            ["TEST_SUC002", "TEST_SUC001", "TEST_SUC000"]
+        
+        event["queryStringParameters"] = {"limit": "2", "after": first_page["next"]}
+        second_page = json.loads(certificates_handler.handler(event, {})["body"])
+        assert len(second_page["data"]) == 1
+        assert second_page["next"] is None
     
     def test_get_certificates_empty_result_real_db(self, test_db):
         """Test retrieving certificates when none exist for usuario"""
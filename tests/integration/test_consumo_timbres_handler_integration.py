@@ -29,6 +29,7 @@ from datetime import datetime, timezone
 
 # Import the actual handler (this will now work because env vars are loaded)
 import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+from invoice_cdk.lambdas.dbaccess.db_usage_counters import reconstruye_contadores, registra_timbre
 
 
 @pytest.fixture(scope='module')
@@ -52,17 +53,29 @@ def test_db(mongo_client):
 
 
 @pytest.fixture(autouse=True)
-def setup_teardown(test_db):
+def setup_teardown(test_db, monkeypatch):
     """Setup and cleanup test data before/after each test"""
+    # Las pruebas reconstruyen solo sus certificados (sin marcador): se leen los contadores igual
+    monkeypatch.setattr(consumo_timbres_handler, "_contadores_listos", True)
     # Setup: Clean collections before test
     test_db.certificates.delete_many({"usuario": {"$regex": "^test_consumo_"}})
     test_db.facturasemitidas.delete_many({"idCertificado": {"$regex": "^test_cert_"}})
+    test_db.usage_counters.delete_many({"idCertificado": {"$regex": "^test_cert_"}})
+    test_db.usage_counter_events.delete_many({"_id": {"$regex": "^test-uuid-"}})
     
     yield
     
     # Teardown: Clean after test
     test_db.certificates.delete_many({"usuario": {"$regex": "^test_consumo_"}})
     test_db.facturasemitidas.delete_many({"idCertificado": {"$regex": "^test_cert_"}})
+    test_db.usage_counters.delete_many({"idCertificado": {"$regex": "^test_cert_"}})
+    test_db.usage_counter_events.delete_many({"_id": {"$regex": "^test-uuid-"}})
+
+
+def reconstruye_contadores_test(test_db):
+    """Rebuild the usage counters from the facturas inserted by the test"""
+    reconstruye_contadores(test_db.facturasemitidas, test_db.usage_counters, test_db.usage_counter_events,
+                           {"idCertificado": {"$regex": "^test_cert_"}})
 
 
 @pytest.fixture
@@ -89,7 +102,8 @@ def sample_factura_emitida_data():
         "serie": "A",
         "fechaTimbrado": datetime(2024, 1, 15, 10, 30, 0, tzinfo=timezone.utc),
         "total": 1000.00,
-        "uuid": "12345678-1234-1234-1234-123456789012"
+        "uuid": "test-uuid-0001",
+        "sucursal": "TEST_SUC"
     }
 
 
@@ -104,6 +118,7 @@ class TestConsumoTimbresHandlerIntegrationGet:
         
         # Insert test factura emitida
         test_db.facturasemitidas.insert_one(sample_factura_emitida_data)
+        reconstruye_contadores_test(test_db)
         
         event = {
             "httpMethod": "GET",
@@ -118,9 +133,8 @@ class TestConsumoTimbresHandlerIntegrationGet:
         body = json.loads(response["body"])
         assert isinstance(body, list)
         assert len(body) > 0
-        assert "facturas_emitidas" in body[0]
-        assert len(body[0]["facturas_emitidas"]) > 0
-        assert body[0]["facturas_emitidas"][0]["folio"] == "A001"
+        assert body[0]["consumo"]["total"] == 1
+        assert body[0]["consumo"]["periodos"] == [{"periodo": "2024-01-15", "timbres": 1, "cancelados": 0}]
     
     def test_get_consumo_timbres_no_certificates_real_db(self, test_db):
         """Test retrieving consumo timbres when user has no certificates"""
@@ -156,7 +170,7 @@ class TestConsumoTimbresHandlerIntegrationGet:
         body = json.loads(response["body"])
         assert isinstance(body, list)
         assert len(body) > 0
-        assert body[0]["facturas_emitidas"] == []
+        assert body[0]["consumo"] == {"total": 0, "cancelados": 0, "periodos": []}
     
     def test_get_consumo_timbres_date_range_filtering_real_db(self, sample_certificate_data,
                                                                sample_factura_emitida_data, test_db):
@@ -178,6 +192,7 @@ class TestConsumoTimbresHandlerIntegrationGet:
         factura3["folio"] = "A003"
         
         test_db.facturasemitidas.insert_many([factura1, factura2, factura3])
+        reconstruye_contadores_test(test_db)
         
         # Query only for January
         event = {
@@ -191,8 +206,8 @@ class TestConsumoTimbresHandlerIntegrationGet:
         
         assert response["statusCode"] == 200
         body = json.loads(response["body"])
-        assert len(body[0]["facturas_emitidas"]) == 1
-        assert body[0]["facturas_emitidas"][0]["folio"] == "A001"
+        assert body[0]["consumo"]["total"] == 1
+        assert body[0]["consumo"]["periodos"][0]["periodo"] == "2024-01-15"
     
     def test_get_consumo_timbres_multiple_certificates_real_db(self, sample_certificate_data,
                                                                 sample_factura_emitida_data, test_db):
@@ -217,6 +232,7 @@ class TestConsumoTimbresHandlerIntegrationGet:
         factura2["folio"] = "B001"
         
         test_db.facturasemitidas.insert_many([factura1, factura2])
+        reconstruye_contadores_test(test_db)
         
         event = {
             "httpMethod": "GET",
@@ -230,13 +246,88 @@ class TestConsumoTimbresHandlerIntegrationGet:
         assert response["statusCode"] == 200
         body = json.loads(response["body"])
         assert len(body) == 2
-        # Each certificate should have its facturas
-        folios = []
-        for cert in body:
-            for factura in cert["facturas_emitidas"]:
-                folios.append(factura["folio"])
-        assert "A001" in folios
-        assert "B001" in folios
+        # Each certificate should have its own count
+        consumo = {cert["_id"]: cert["consumo"]["total"] for cert in body}
+        assert consumo == {"test_cert_001": 1, "test_cert_002": 1}
+    
+    def test_get_consumo_timbres_by_month_counts_cancelled_real_db(self, sample_certificate_data,
+                                                                   sample_factura_emitida_data, test_db):
+        """Test monthly grouping and cancelled counts"""
+        test_db.certificates.insert_one(sample_certificate_data)
+        facturas = []
+        for day, estatus in [(2, "Vigente"), (10, "Cancelada"), (20, "Vigente")]:
+            factura = sample_factura_emitida_data.copy()
+            factura["fechaTimbrado"] = datetime(2024, 1, day, 12, 0, 0, tzinfo=timezone.utc)
+            factura["estatus"] = estatus
+            facturas.append(factura)
+        test_db.facturasemitidas.insert_many(facturas)
+        reconstruye_contadores_test(test_db)
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_consumo_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31", "agrupacion": "mes"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = consumo_timbres_handler.lambda_handler(event, {})
+        
+        body = json.loads(response["body"])
+        assert body[0]["consumo"]["periodos"] == [{"periodo": "2024-01", "timbres": 3, "cancelados": 1}]
+    
+    def test_get_consumo_timbres_detalle_real_db(self, sample_certificate_data,
+                                                 sample_factura_emitida_data, test_db):
+        """Test detail mode pages through projected facturas"""
+        test_db.certificates.insert_one(sample_certificate_data)
+        facturas = []
+        for i in range(3):
+            factura = sample_factura_emitida_data.copy()
+            factura["uuid"] = f"test-uuid-detalle-{i}"
+            factura["cfdi"] = "<cfdi:Comprobante/>"
+            factura["qrCode"] = "iVBORw0KGgo="
+            facturas.append(factura)
+        test_db.facturasemitidas.insert_many(facturas)
+        reconstruye_contadores_test(test_db)
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_consumo_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31",
+                                      "detalle": "true", "limit": "2"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        first_page = json.loads(consumo_timbres_handler.lambda_handler(event, {})["body"])
+        assert len(first_page["data"]) == 2
+        assert "cfdi" not in first_page["data"][0]
+        assert "qrCode" not in first_page["data"][0]
+        
+        event["queryStringParameters"]["after"] = first_page["next"]
+        second_page = json.loads(consumo_timbres_handler.lambda_handler(event, {})["body"])
+        assert len(second_page["data"]) == 1
+        assert second_page["next"] is None
+    
+    def test_usage_counters_are_idempotent_per_uuid_real_db(self, sample_certificate_data,
+                                                            sample_factura_emitida_data, test_db):
+        """Test registering the same stamp twice only counts it once"""
+        test_db.certificates.insert_one(sample_certificate_data)
+        
+        assert registra_timbre(sample_factura_emitida_data, test_db.usage_counters,
+                               test_db.usage_counter_events) is True
+        assert registra_timbre(sample_factura_emitida_data, test_db.usage_counters,
+                               test_db.usage_counter_events) is False
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_consumo_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = consumo_timbres_handler.lambda_handler(event, {})
+        
+        body = json.loads(response["body"])
+        assert body[0]["consumo"]["total"] == 1
 
 
 class TestConsumoTimbresHandlerIntegrationCORS:
@@ -0,0 +1,135 @@
+"""
+Integration tests for dbaccess.db_cascada.
+Multi-document transactions require MONGODB_URI to point to a replica set
+(Atlas, or a local mongod started with --replSet).
+IMPORTANT: Environment variables must be loaded BEFORE importing any handlers.
+"""
+import os
+from pathlib import Path
+
+# Load environment variables BEFORE any other imports
+env_file = Path(__file__).parent.parent.parent / '.env_test'
+if env_file.exists():
+    with open(env_file) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                # Only set if not already set (don't override existing env vars)
+                if key not in os.environ:
+                    os.environ[key] = value.strip('"').strip("'")
+else:
+    raise FileNotFoundError(f"Required .env_test file not found at {env_file}")
+
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from invoice_cdk.lambdas.dbaccess.db_cascada import (
+    elimina_certificado_cascada,
+    elimina_sucursal_cascada
+)
+
+
+@pytest.fixture(scope='module')
+def mongo_client():
+    """Create MongoDB client for testing"""
+    mongo_uri = os.environ.get('MONGODB_URI')
+    if not mongo_uri:
+        raise ValueError("MONGODB_URI environment variable is required for integration tests")
+    client = MongoClient(mongo_uri)
+    if not client.admin.command("hello").get("setName"):
+        pytest.skip("Transactions require a replica set")
+    yield client
+    client.close()
+
+
+@pytest.fixture(scope='module')
+def test_db(mongo_client):
+    """Get test database"""
+    db_name = os.environ.get('DB_NAME')
+    if not db_name:
+        raise ValueError("DB_NAME environment variable is required for integration tests")
+    return mongo_client[db_name]
+
+
+@pytest.fixture(autouse=True)
+def setup_teardown(test_db):
+    """Setup and cleanup test data before/after each test"""
+    test_db.certificates.delete_many({"usuario": {"$regex": "^test_cascada_"}})
+    test_db.sucursales.delete_many({"codigo_sucursal": {"$regex": "^TEST_CASCADA_"}})
+    test_db.folios.delete_many({"sucursal": {"$regex": "^TEST_CASCADA_"}})
+    
+    yield
+    
+    test_db.certificates.delete_many({"usuario": {"$regex": "^test_cascada_"}})
+    test_db.sucursales.delete_many({"codigo_sucursal": {"$regex": "^TEST_CASCADA_"}})
+    test_db.folios.delete_many({"sucursal": {"$regex": "^TEST_CASCADA_"}})
+
+
+@pytest.fixture
+def certificado_con_sucursales(test_db):
+    """Certificate with 5 sucursales, one folio per sucursal and one orphan sucursal"""
+    cert_id = ObjectId()
+    codigos = [f"TEST_CASCADA_{i}" for i in range(5)]
+    sucursal_ids = test_db.sucursales.insert_many([
+        {"codigo_sucursal": codigo, "id_certificado": str(cert_id)} for codigo in codigos
+    ]).inserted_ids
+    # Orphan: points to the certificate but is missing from the embedded array
+    test_db.sucursales.insert_one({"codigo_sucursal": "TEST_CASCADA_HUERFANA", "id_certificado": str(cert_id)})
+    test_db.folios.insert_many([{"sucursal": codigo, "noFolio": 1} for codigo in codigos + ["TEST_CASCADA_HUERFANA"]])
+    test_db.certificates.insert_one({
+        "_id": cert_id,
+        "usuario": "test_cascada_user@example.com",
+        "no_certificado": "30001000000400002345",
+        "sucursales": [{"_id": str(s), "codigo_sucursal": c} for s, c in zip(sucursal_ids, codigos)]
+    })
+    return str(cert_id), [str(s) for s in sucursal_ids]
+
+
+class TestEliminaCertificadoCascadaIntegration:
+    """Integration tests for the certificate cascade delete"""
+    
+    def test_deletes_certificate_sucursales_and_folios(self, mongo_client, test_db, certificado_con_sucursales):
+        """No sucursal or folio of the certificate survives, including orphans"""
+        cert_id, _ = certificado_con_sucursales
+        
+        result = elimina_certificado_cascada(cert_id, mongo_client, test_db.certificates,
+                                             test_db.sucursales, test_db.folios)
+        
+        assert result["no_certificado"] == "30001000000400002345"
+        assert test_db.certificates.count_documents({"_id": ObjectId(cert_id)}) == 0
+        assert test_db.sucursales.count_documents({"codigo_sucursal": {"$regex": "^TEST_CASCADA_"}}) == 0
+        assert test_db.folios.count_documents({"sucursal": {"$regex": "^TEST_CASCADA_"}}) == 0
+    
+    def test_rolls_back_when_a_step_fails(self, mongo_client, test_db, certificado_con_sucursales):
+        """A failure after the folios are deleted leaves every document in place"""
+        cert_id, _ = certificado_con_sucursales
+        
+        with patch.object(Collection, "delete_one", side_effect=RuntimeError("falla simulada")):
+            with pytest.raises(RuntimeError):
+                elimina_certificado_cascada(cert_id, mongo_client, test_db.certificates,
+                                            test_db.sucursales, test_db.folios)
+        
+        assert test_db.certificates.count_documents({"_id": ObjectId(cert_id)}) == 1
+        assert test_db.sucursales.count_documents({"codigo_sucursal": {"$regex": "^TEST_CASCADA_"}}) == 6
+        assert test_db.folios.count_documents({"sucursal": {"$regex": "^TEST_CASCADA_"}}) == 6
+
+
+class TestEliminaSucursalCascadaIntegration:
+    """Integration tests for the sucursal cascade delete"""
+    
+    def test_pulls_sucursal_from_certificate(self, mongo_client, test_db, certificado_con_sucursales):
+        """Only the deleted sucursal disappears from the certificate array"""
+        cert_id, sucursal_ids = certificado_con_sucursales
+        
+        result = elimina_sucursal_cascada(sucursal_ids[0], mongo_client, test_db.sucursales,
+                                          test_db.certificates, test_db.folios)
+        
+        assert result["codigo_sucursal"] == "TEST_CASCADA_0"
+        certificado = test_db.certificates.find_one({"_id": ObjectId(cert_id)})
+        assert [s["_id"] for s in certificado["sucursales"]] == sucursal_ids[1:]
+        assert test_db.folios.count_documents({"sucursal": "TEST_CASCADA_0"}) == 0
+        assert test_db.folios.count_documents({"sucursal": "TEST_CASCADA_1"}) == 1
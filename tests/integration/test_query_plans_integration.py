@@ -0,0 +1,298 @@
+"""
+Integration tests for dbaccess.indices.
+Calls the real dbaccess functions against recording collections, runs explain() on
+every query they issue (and on the few written inline in handlers) against a scratch
+database with the registered indexes, and fails if any plan falls back to COLLSCAN.
+IMPORTANT: Environment variables must be loaded BEFORE importing any handlers.
+"""
+import os
+from pathlib import Path
+
+# Load environment variables BEFORE any other imports
+env_file = Path(__file__).parent.parent.parent / '.env_test'
+if env_file.exists():
+    with open(env_file) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                # Only set if not already set (don't override existing env vars)
+                if key not in os.environ:
+                    os.environ[key] = value.strip('"').strip("'")
+else:
+    raise FileNotFoundError(f"Required .env_test file not found at {env_file}")
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+from invoice_cdk.lambdas.dbaccess.indices import INDICES, ensure_indexes
+from invoice_cdk.lambdas.dbaccess import (
+    db_bitacora, db_cascada, db_certificado, db_csf, db_datos_factura, db_factura, db_factura_pdf,
+    db_receptor, db_sucursal, db_tickets, db_timbres, db_usage_counters
+)
+
+CERT_ID = "507f1f77bcf86cd799439011"
+DESDE, HASTA = "2025-01-01", "2025-01-31"
+FACTURA = {"uuid": "uuid", "idCertificado": CERT_ID, "sucursal": "SUC1", "fechaTimbrado": "2025-01-01T10:00:00"}
+
+
+class _Cursor(list):
+    """Cursor vacío que anota el orden que le piden"""
+
+    def __init__(self, consulta):
+        super().__init__()
+        self.consulta = consulta
+
+    def sort(self, llave, direccion=None):
+        self.consulta["orden"] = dict([(llave, direccion)] if isinstance(llave, str) else llave)
+        return self
+
+    def limit(self, _):
+        return self
+
+    def batch_size(self, _):
+        return self
+
+
+class _Grabadora:
+    """
+    Colección falsa que anota cada consulta (operación, filtro, orden o pipeline) que le
+    hace una función de dbaccess y responde vacío, para luego correr explain() de esa
+    misma consulta en la base de prueba.
+    """
+
+    database = None
+
+    def __init__(self, nombre, consultas):
+        self.name = nombre
+        self.consultas = consultas
+
+    def _anota(self, operacion, filtro=None, orden=None, **extra):
+        consulta = {"coleccion": self.name, "operacion": operacion, "filtro": filtro or {},
+                    "orden": dict(orden) if orden else None, **extra}
+        self.consultas.append(consulta)
+        return consulta
+
+    def find(self, filtro=None, *args, **kwargs):
+        return _Cursor(self._anota("find", filtro, kwargs.get("sort")))
+
+    def find_one(self, filtro=None, *args, **kwargs):
+        self._anota("find", filtro, kwargs.get("sort"))
+        return {"_id": ObjectId(CERT_ID)}
+
+    def find_one_and_update(self, filtro, *args, **kwargs):
+        self._anota("find", filtro, kwargs.get("sort"))
+        return {"_id": ObjectId(CERT_ID), "Rfc": filtro.get("Rfc")}
+
+    def count_documents(self, filtro, **kwargs):
+        self._anota("find", filtro)
+        return 0
+
+    def update_one(self, filtro, *args, **kwargs):
+        self._anota("find", filtro)
+
+    def distinct(self, llave, filtro=None, **kwargs):
+        self._anota("distinct", filtro, llave=llave)
+        return []
+
+    def aggregate(self, pipeline, **kwargs):
+        self._anota("aggregate", pipeline=pipeline)
+        return iter([])
+
+    def insert_one(self, *args, **kwargs):
+        pass
+
+    def delete_one(self, *args, **kwargs):
+        pass
+
+    def delete_many(self, *args, **kwargs):
+        pass
+
+
+class _Sesion:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def with_transaction(self, funcion):
+        return funcion(self)
+
+
+class _Cliente:
+    def start_session(self):
+        return _Sesion()
+
+
+class _Grabadoras(dict):
+    """Colecciones falsas por nombre que comparten la lista de consultas"""
+
+    def __init__(self):
+        super().__init__()
+        self.consultas = []
+
+    def __missing__(self, nombre):
+        self[nombre] = _Grabadora(nombre, self.consultas)
+        return self[nombre]
+
+
+# (descripción, llamada a la función real de dbaccess con las colecciones falsas `c`)
+LLAMADAS = [
+    ("db_certificado.list_certificates", lambda c: db_certificado.list_certificates("test@example.com", c["certificates"])),
+    ("db_certificado.get_certificate_by_id", lambda c: db_certificado.get_certificate_by_id(CERT_ID, c["certificates"])),
+    ("db_certificado.get_sucursales_by_ids", lambda c: db_certificado.get_sucursales_by_ids([CERT_ID], c["sucursales"])),
+    ("db_certificado.list_certificates_with_sucursales", lambda c: db_certificado.list_certificates_with_sucursales(
+        "test@example.com", c["certificates"], limit=50, after=CERT_ID)),
+    ("db_cascada.elimina_certificado_cascada", lambda c: db_cascada.elimina_certificado_cascada(
+        CERT_ID, _Cliente(), c["certificates"], c["sucursales"], c["folios"])),
+    ("db_sucursal.get_sucursal_by_codigo", lambda c: db_sucursal.get_sucursal_by_codigo("SUC1", c["sucursales"])),
+    ("db_sucursal.get_sucursal_con_certificado",
+     lambda c: db_sucursal.get_sucursal_con_certificado("SUC1", c["sucursales"])),
+    ("db_sucursal.lista_sucursales", lambda c: db_sucursal.lista_sucursales(
+        [CERT_ID, "otro"], c["sucursales"], limit=50, after=CERT_ID)),
+    ("db_sucursal.ids_certificados_de_usuario",
+     lambda c: db_sucursal.ids_certificados_de_usuario("test@example.com", c["certificates"])),
+    ("db_receptor.obtiene_receptor_by_rfc", lambda c: db_receptor.obtiene_receptor_by_rfc("XAXX010101000", c["receptors"])),
+    ("db_receptor.update_receptor", lambda c: db_receptor.update_receptor(
+        "XAXX010101000", {"Nombre": "PUBLICO"}, c["receptors"])),
+    ("db_receptor.busca_receptores por rfc", lambda c: db_receptor.busca_receptores("xaxx", c["receptors"], "rfc")),
+    ("db_receptor.busca_receptores por nombre siguiente página", lambda c: db_receptor.busca_receptores(
+        "josé", c["receptors"], "nombre", after=db_receptor.codifica_cursor_busqueda("JOSE GARCIA", CERT_ID))),
+    ("db_factura.get_factura_by_uuid", lambda c: db_factura.get_factura_by_uuid("uuid", c["facturasemitidas"])),
+    ("db_factura.get_factura_by_ticket", lambda c: db_factura.get_factura_by_ticket("T1", c["facturasemitidas"])),
+    ("db_factura.get_factura_vigente_by_ticket",
+     lambda c: db_factura.get_factura_vigente_by_ticket("T1", c["facturasemitidas"])),
+    ("db_factura.cancela_factura_status", lambda c: db_factura.cancela_factura_status("uuid", c["facturasemitidas"])),
+    ("db_factura reenvío por receptor", lambda c: db_factura.consulta_facturas_reenvio(
+        db_factura.filtro_reenvio([CERT_ID], DESDE, HASTA, rfc="XAXX010101000"), c["facturasemitidas"], 500)),
+    ("db_factura reenvío por sucursal", lambda c: db_factura.cuenta_facturas_reenvio(
+        db_factura.filtro_reenvio([CERT_ID], DESDE, HASTA, sucursal="SUC1"), c["facturasemitidas"], 500)),
+    ("db_factura_pdf.obtiene_pdf", lambda c: db_factura_pdf.obtiene_pdf("uuid", c["factura_pdf_cache"])),
+    ("db_factura_pdf.obtiene_pdfs", lambda c: db_factura_pdf.obtiene_pdfs(["uuid"], c["factura_pdf_cache"])),
+    ("db_timbres.consulta_facturas_emitidas_by_certificado", lambda c: db_timbres.consulta_facturas_emitidas_by_certificado(
+        CERT_ID, DESDE, HASTA, c["facturasemitidas"])),
+    ("db_timbres.consulta_facturas_emitidas_detalle", lambda c: db_timbres.consulta_facturas_emitidas_detalle(
+        [CERT_ID], DESDE, HASTA, c["facturasemitidas"], limit=50, after=CERT_ID)),
+    ("db_timbres.resumen_consumo_por_certificado", lambda c: db_timbres.resumen_consumo_por_certificado(
+        [CERT_ID], DESDE, HASTA, c["facturasemitidas"], "mes")),
+    ("db_usage_counters.resumen_consumo_desde_contadores", lambda c: db_usage_counters.resumen_consumo_desde_contadores(
+        [CERT_ID], DESDE, HASTA, c["usage_counters"])),
+    ("db_usage_counters.registra_timbre",
+     lambda c: db_usage_counters.registra_timbre(FACTURA, c["usage_counters"], c["usage_events"])),
+    ("db_bitacora.buscar_bitacora_por_fechas", lambda c: db_bitacora.buscar_bitacora_por_fechas(
+        "2025-01-01T00:00:00", "2025-01-31T23:59:59", c["bitacora"], limit=50)),
+    ("db_bitacora.buscar_bitacora_por_fechas siguiente página", lambda c: db_bitacora.buscar_bitacora_por_fechas(
+        "2025-01-01T00:00:00", "2025-01-31T23:59:59", c["bitacora"], limit=50, after=f"1736000000000_{CERT_ID}")),
+    ("db_bitacora.resumen_bitacora", lambda c: db_bitacora.resumen_bitacora(
+        "2025-01-01T00:00:00", "2025-01-31T23:59:59", c["bitacora"], filtros={"status": "error"})),
+    ("db_tickets.obtiene_snapshot", lambda c: db_tickets.obtiene_snapshot("T1", c["ticket_snapshots"])),
+    ("db_csf.obtiene_csfs", lambda c: db_csf.obtiene_csfs(["huella"], c["csf_cache"])),
+    ("db_datos_factura.get_regimen_fiscal_by_clave",
+     lambda c: db_datos_factura.get_regimen_fiscal_by_clave("601", c["regimenfiscal"])),
+    ("db_datos_factura.get_descripcion_by_clave",
+     lambda c: db_datos_factura.get_descripcion_by_clave("H87", c["medidas"])),
+    ("db_datos_factura.get_descripciones_by_claves",
+     lambda c: db_datos_factura.get_descripciones_by_claves(["H87", "KGM"], c["medidas"])),
+]
+
+# Consultas escritas directamente en los handlers (no hay función de dbaccess que llamar)
+CONSULTAS_HANDLERS = [
+    ("folio_handler / genera_factura_handler", {"coleccion": "folios", "operacion": "find",
+                                                "filtro": {"sucursal": "SUC1"}, "orden": None}),
+    ("genera_factura_handler ticket_timbrado", {"coleccion": "ticket_timbrado", "operacion": "find",
+                                                "filtro": {"ticket": "T1"}, "orden": None}),
+    ("genera_factura_handler serie_folio", {"coleccion": "serie_folio", "operacion": "find",
+                                            "filtro": {"folioTimbrado": "A1"}, "orden": None}),
+]
+
+
+@pytest.fixture(scope='module')
+def plans_db():
+    """Scratch database with every registered index and a few documents per collection"""
+    mongo_uri = os.environ.get('MONGODB_URI')
+    db_name = os.environ.get('DB_NAME')
+    if not mongo_uri or not db_name:
+        raise ValueError("MONGODB_URI and DB_NAME environment variables are required for integration tests")
+    client = MongoClient(mongo_uri)
+    db = client[f"{db_name}_query_plans"]
+    client.drop_database(db.name)
+    for nombre, modelos in INDICES.items():
+        # Los campos de los índices únicos llevan valores distintos para poder crearlos
+        unicos = {campo for modelo in modelos if modelo.document.get("unique") for campo in modelo.document["key"]}
+        db[nombre].insert_many([{"relleno": i, **{campo: f"{campo}{i}" for campo in unicos}} for i in range(20)])
+    ensure_indexes(db)
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+def _etapas(plan):
+    """All stage names in an explain plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for valor in plan.values():
+            yield from _etapas(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            yield from _etapas(valor)
+
+
+def _winning_plans(explain):
+    """Query planner output of a find or of the first stage of an aggregation"""
+    if "queryPlanner" in explain:
+        return [explain["queryPlanner"]["winningPlan"]]
+    return [etapa["$cursor"]["queryPlanner"]["winningPlan"]
+            for etapa in explain.get("stages", []) if "$cursor" in etapa]
+
+
+def _consultas_de(llamada, monkeypatch):
+    """Consultas que hace la función real de dbaccess, sin cachés en memoria ni snapshot de catálogos"""
+    monkeypatch.setattr(db_datos_factura, "snapshot_vigente", lambda db: None)
+    db_sucursal.invalida_cache()
+    db_receptor.invalida_cache()
+    colecciones = _Grabadoras()
+    try:
+        llamada(colecciones)
+    except Exception:
+        # Con las respuestas vacías de la colección falsa algunas funciones fallan después de consultar
+        pass
+    return colecciones.consultas
+
+
+def _explain(db, consulta):
+    if consulta["operacion"] == "aggregate":
+        comando = {"aggregate": consulta["coleccion"], "pipeline": consulta["pipeline"], "cursor": {}}
+    elif consulta["operacion"] == "distinct":
+        comando = {"distinct": consulta["coleccion"], "key": consulta["llave"], "query": consulta["filtro"]}
+    else:
+        comando = {"find": consulta["coleccion"], "filter": consulta["filtro"]}
+        if consulta["orden"]:
+            comando["sort"] = consulta["orden"]
+    return db.command("explain", comando, verbosity="queryPlanner")
+
+
+def _sin_collscan(db, descripcion, consulta):
+    etapas = [etapa for plan in _winning_plans(_explain(db, consulta)) for etapa in _etapas(plan)]
+    assert etapas, f"{descripcion}: explain sin plan"
+    assert "COLLSCAN" not in etapas, f"{descripcion} hace COLLSCAN sobre {consulta['coleccion']}"
+
+
+@pytest.mark.parametrize("descripcion,llamada", LLAMADAS, ids=[c[0] for c in LLAMADAS])
+def test_dbaccess_queries_use_index(plans_db, monkeypatch, descripcion, llamada):
+    consultas = _consultas_de(llamada, monkeypatch)
+
+    assert consultas, f"{descripcion} no hizo ninguna consulta"
+    for consulta in consultas:
+        _sin_collscan(plans_db, descripcion, consulta)
+
+
+@pytest.mark.parametrize("descripcion,consulta", CONSULTAS_HANDLERS, ids=[c[0] for c in CONSULTAS_HANDLERS])
+def test_handler_queries_use_index(plans_db, descripcion, consulta):
+    _sin_collscan(plans_db, descripcion, consulta)
+
+
+def test_ensure_indexes_is_idempotent(plans_db):
+    assert ensure_indexes(plans_db) == {}
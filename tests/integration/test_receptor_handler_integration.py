@@ -28,6 +28,7 @@ from pymongo import MongoClient
 
 # Import the actual handler (this will now work because env vars are loaded)
 import invoice_cdk.lambdas.receptor_handler as receptor_handler
+from dbaccess.db_receptor import invalida_cache
 
 
 @pytest.fixture(scope='module')
@@ -56,6 +57,7 @@ def setup_teardown(test_db):
     """Setup and cleanup test data before/after each test"""
     # Setup: Clean collections before test
     test_db.receptors.delete_many({})
+    invalida_cache()
     
     yield
     
@@ -167,6 +169,39 @@ class TestReceptorHandlerIntegrationPut:
         assert receptor["email"] == "juan.updated@example.com"
 
 
+    def test_update_receptor_with_objectid_real_db(self, sample_receptor_data, test_db):
+        """Receptors created through POST have an ObjectId _id; PUT must find them by RFC"""
+        documento = {k: v for k, v in sample_receptor_data.items() if k != "_id"}
+        test_db.receptors.insert_one(documento)
+        
+        event = {
+            "httpMethod": "PUT",
+            "pathParameters": {"id_receptor": "TEST123456ABC"},
+            "body": json.dumps({"email": "nuevo@example.com"}),
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = receptor_handler.handler(event, {})
+        
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"])["receptor"]["email"] == "nuevo@example.com"
+        assert test_db.receptors.find_one({"Rfc": "TEST123456ABC"})["email"] == "nuevo@example.com"
+    
+    def test_post_same_rfc_twice_keeps_one_document_real_db(self, sample_receptor_data, test_db):
+        """POST upserts by RFC instead of inserting duplicates"""
+        documento = {k: v for k, v in sample_receptor_data.items() if k != "_id"}
+        for nombre in ("Primero", "Segundo"):
+            event = {
+                "httpMethod": "POST",
+                "body": json.dumps({**documento, "Nombre": nombre}),
+                "headers": {"origin": "http://localhost:3000"}
+            }
+            assert receptor_handler.handler(event, {})["statusCode"] == HTTPStatus.CREATED
+        
+        assert test_db.receptors.count_documents({"Rfc": "TEST123456ABC"}) == 1
+        assert test_db.receptors.find_one({"Rfc": "TEST123456ABC"})["Nombre"] == "Segundo"
+
+
 class TestReceptorHandlerIntegrationInvalidMethod:
     """Integration tests for invalid methods"""
     
@@ -28,6 +28,7 @@ from pymongo import MongoClient
 
 # Import the actual handler (this will now work because env vars are loaded)
 import invoice_cdk.lambdas.sucursal_handler as sucursal_handler
+from dbaccess.db_sucursal import invalida_cache
 
 
 @pytest.fixture(scope='module')
@@ -58,6 +59,7 @@ def setup_teardown(test_db):
     test_db.sucursales.delete_many({})
     test_db.certificates.delete_many({})  # Changed from 'certificados' to match handler
     test_db.folios.delete_many({})
+    invalida_cache()
     
     yield
     
@@ -140,8 +142,9 @@ class TestSucursalHandlerIntegrationGet:
         body = json.loads(response["body"])
         assert body["codigo_sucursal"] == "378"
     
-    def test_get_all_sucursales_real_db(self, sample_sucursal_data, test_db):
+    def test_get_all_sucursales_real_db(self, sample_sucursal_data, certificado_id, test_db):
         """Test retrieving all sucursales from real database"""
+        test_db.certificates.update_one({"_id": ObjectId(certificado_id)}, {"$set": {"usuario": "test@example.com"}})
         # Insert multiple test records
         test_db.sucursales.insert_many([
             sample_sucursal_data,
@@ -150,14 +153,41 @@ class TestSucursalHandlerIntegrationGet:
         
         event = {
             "httpMethod": "GET",
-            "headers": {"origin": "http://localhost:3000"}
+            "queryStringParameters": {"id_certificado": sample_sucursal_data["id_certificado"], "limit": "1"},
+            "headers": {"origin": "http://localhost:3000"},
+            "requestContext": {"authorizer": {"claims": {"email": "test@example.com"}}}
         }
         
         response = sucursal_handler.handler(event, {})
         
         assert response["statusCode"] == HTTPStatus.OK
         body = json.loads(response["body"])
-        assert len(body) >= 2
+        assert [s["codigo_sucursal"] for s in body["data"]] == ["378"]
+        assert body["next"]
+
+        event["queryStringParameters"]["after"] = body["next"]
+        body = json.loads(sucursal_handler.handler(event, {})["body"])
+        assert [s["codigo_sucursal"] for s in body["data"]] == ["379"]
+
+    def test_list_sucursales_by_usuario_real_db(self, sample_sucursal_data, certificado_id, test_db):
+        """Test listing only returns the sucursales of the user's certificates"""
+        test_db.certificates.update_one({"_id": ObjectId(certificado_id)}, {"$set": {"usuario": "test@example.com"}})
+        test_db.sucursales.insert_many([
+            sample_sucursal_data,
+            {**sample_sucursal_data, "codigo_sucursal": "999", "id_certificado": str(ObjectId())}
+        ])
+
+        event = {
+            "httpMethod": "GET",
+            "queryStringParameters": {"usuario": "test@example.com"},
+            "headers": {"origin": "http://localhost:3000"},
+            "requestContext": {"authorizer": {"claims": {"email": "test@example.com"}}}
+        }
+
+        body = json.loads(sucursal_handler.handler(event, {})["body"])
+
+        assert [s["codigo_sucursal"] for s in body["data"]] == ["378"]
+        assert "folio" not in body["data"][0]
 
 
 class TestSucursalHandlerIntegrationPut:
@@ -0,0 +1,89 @@
+"""
+Unit tests for bitacora_writer.
+These tests use mocks and do not require a database connection.
+"""
+from datetime import datetime
+from unittest.mock import MagicMock
+import pytest
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from invoice_cdk.lambdas.bitacora_writer import BitacoraWriter
+
+
+@pytest.fixture
+def collection():
+    """Bitácora collection; with_options returns the same mock"""
+    collection = MagicMock()
+    collection.with_options.return_value = collection
+    return collection
+
+
+@pytest.fixture
+def spill_file(tmp_path):
+    return str(tmp_path / "bitacora_spill.ndjson")
+
+
+class TestBitacoraWriter:
+    """Unit tests for the buffered bitácora writer"""
+
+    def test_events_are_buffered_and_flushed_in_one_insert_many(self, collection, spill_file):
+        bitacora = BitacoraWriter(collection, spill_file=spill_file)
+        bitacora.registra({"ticket": "T1", "status": "error"})
+        bitacora.registra({"ticket": "T1", "status": "exito"})
+
+        collection.insert_many.assert_not_called()
+        bitacora.flush()
+
+        collection.insert_many.assert_called_once()
+        eventos = collection.insert_many.call_args[0][0]
+        assert [e["status"] for e in eventos] == ["error", "exito"]
+        assert all(isinstance(e["timestamp"], datetime) for e in eventos)
+
+    def test_flush_without_events_does_not_touch_mongo(self, collection, spill_file):
+        BitacoraWriter(collection, spill_file=spill_file).flush()
+
+        collection.insert_many.assert_not_called()
+
+    def test_write_concern_is_configurable(self, collection, spill_file):
+        BitacoraWriter(collection, write_concern="majority", spill_file=spill_file)
+
+        assert collection.with_options.call_args[1]["write_concern"].document == {"w": "majority"}
+
+    def test_background_flush_is_joined_by_flush(self, collection, spill_file):
+        bitacora = BitacoraWriter(collection, spill_file=spill_file)
+        bitacora.registra({"ticket": "T1"})
+
+        bitacora.flush_en_segundo_plano()
+        bitacora.flush()
+
+        collection.insert_many.assert_called_once()
+
+    def test_mongo_unavailable_spills_and_next_flush_replays(self, collection, spill_file):
+        collection.insert_many.side_effect = ServerSelectionTimeoutError("sin conexión")
+        bitacora = BitacoraWriter(collection, spill_file=spill_file)
+        bitacora.registra({"ticket": "T1"})
+        bitacora.flush()
+
+        collection.insert_many.side_effect = None
+        siguiente = BitacoraWriter(collection, spill_file=spill_file)
+        siguiente.registra({"ticket": "T2"})
+        siguiente.flush()
+
+        eventos = collection.insert_many.call_args[0][0]
+        assert [e["ticket"] for e in eventos] == ["T1", "T2"]
+        assert isinstance(eventos[0]["timestamp"], datetime)
+
+    def test_duplicates_from_replayed_spill_are_not_spilled_again(self, collection, spill_file):
+        collection.insert_many.side_effect = BulkWriteError({"writeErrors": [
+            {"index": 0, "code": 11000, "errmsg": "duplicate key"},
+            {"index": 1, "code": 121, "errmsg": "validation"}
+        ]})
+        bitacora = BitacoraWriter(collection, spill_file=spill_file)
+        bitacora.registra({"ticket": "T1"})
+        bitacora.registra({"ticket": "T2"})
+        bitacora.flush()
+
+        with open(spill_file) as f:
+            lineas = f.readlines()
+        assert len(lineas) == 1
+        assert '"T2"' in lineas[0]
@@ -0,0 +1,148 @@
+"""
+Unit tests for dbaccess.catalogos and the snapshot-backed lookups in db_datos_factura.
+These tests use mocks and do not require a database connection.
+"""
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from bson import ObjectId
+
+import invoice_cdk.lambdas.dbaccess.catalogos as catalogos
+from invoice_cdk.lambdas.dbaccess.db_datos_factura import (
+    get_regimen_fiscal_by_clave, get_descripcion_by_clave, get_descripciones_by_claves
+)
+
+
+@pytest.fixture
+def catalogos_mongo():
+    """Documents as returned by lee_catalogos"""
+    return {
+        "usocfdis": [{"_id": "1", "clave": "G03", "descripcion": "Gastos en general"}],
+        "regimenfiscal": [{"_id": "2", "regimenfiscal": "601", "descripcion": "General de Ley Personas Morales"}],
+        "formapago": [{"_id": "3", "clave": "01", "descripcion": "Efectivo"}],
+        "medidas": [{"_id": "4", "clave": "H87", "descripcion": "Pieza"}],
+    }
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch, catalogos_mongo):
+    """Snapshot written to a temp dir, with the per-container caches reset"""
+    cuerpo, indice = catalogos.construye_snapshot(catalogos_mongo)
+    (tmp_path / catalogos.ARCHIVO_DATOS_FACTURA).write_bytes(cuerpo)
+    (tmp_path / catalogos.ARCHIVO_INDICE).write_text(json.dumps(indice))
+    monkeypatch.setattr(catalogos, "SNAPSHOT_DIR", tmp_path)
+    monkeypatch.setattr(catalogos, "_snapshot", None)
+    monkeypatch.setattr(catalogos, "_version_publicada", {"version": None, "expira": 0.0})
+    return tmp_path
+
+
+def _db_con_version(version):
+    db = MagicMock()
+    db.__getitem__.return_value.find_one.return_value = {"version": version} if version else None
+    return db
+
+
+class TestSnapshot:
+    """Unit tests for building and loading the catalog snapshot"""
+
+    def test_body_is_datos_factura_response_and_index_has_lookups(self, catalogos_mongo):
+        cuerpo, indice = catalogos.construye_snapshot(catalogos_mongo)
+
+        assert json.loads(cuerpo) == {
+            "uso_cfdi": catalogos_mongo["usocfdis"],
+            "regimen_fiscal": catalogos_mongo["regimenfiscal"],
+            "forma_pago": catalogos_mongo["formapago"],
+        }
+        assert indice["indices"] == {
+            "regimenfiscal": {"601": "General de Ley Personas Morales"},
+            "medidas": {"H87": "Pieza"},
+        }
+        assert indice["version"] == catalogos.calcula_version(catalogos_mongo)
+
+    def test_version_changes_with_content(self, catalogos_mongo):
+        antes = catalogos.calcula_version(catalogos_mongo)
+        catalogos_mongo["medidas"][0]["descripcion"] = "Pieza corregida"
+
+        assert catalogos.calcula_version(catalogos_mongo) != antes
+
+    def test_missing_snapshot_returns_none(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(catalogos, "SNAPSHOT_DIR", tmp_path)
+        monkeypatch.setattr(catalogos, "_snapshot", None)
+
+        assert catalogos.snapshot_vigente(_db_con_version(None)) is None
+
+    def test_snapshot_used_when_no_version_published(self, snapshot_dir):
+        snapshot = catalogos.snapshot_vigente(_db_con_version(None))
+
+        assert json.loads(snapshot["datos_factura"])["uso_cfdi"][0]["clave"] == "G03"
+
+    def test_stale_snapshot_falls_back_to_mongo(self, snapshot_dir):
+        assert catalogos.snapshot_vigente(_db_con_version("otra-version")) is None
+
+    def test_published_version_is_cached_per_container(self, snapshot_dir, catalogos_mongo):
+        db = _db_con_version(catalogos.calcula_version(catalogos_mongo))
+
+        assert catalogos.snapshot_vigente(db) is not None
+        assert catalogos.snapshot_vigente(db) is not None
+        assert db.__getitem__.return_value.find_one.call_count == 1
+
+    def test_lee_catalogos_converts_ids(self):
+        db = MagicMock()
+        oid = ObjectId()
+        db.__getitem__.return_value.find.return_value.sort.return_value = [{"_id": oid, "clave": "X"}]
+
+        leidos = catalogos.lee_catalogos(db)
+
+        assert set(leidos) == {"usocfdis", "regimenfiscal", "formapago", "medidas"}
+        assert leidos["medidas"] == [{"_id": str(oid), "clave": "X"}]
+
+
+class TestLookups:
+    """Unit tests for get_regimen_fiscal_by_clave / get_descripcion_by_clave"""
+
+    @patch('invoice_cdk.lambdas.dbaccess.db_datos_factura.snapshot_vigente')
+    def test_lookup_uses_snapshot_index(self, mock_snapshot):
+        mock_snapshot.return_value = {"indices": {"regimenfiscal": {"601": "Personas Morales"}, "medidas": {"H87": "Pieza"}}}
+        collection = MagicMock()
+
+        assert get_regimen_fiscal_by_clave("601", collection) == "Personas Morales"
+        assert get_descripcion_by_clave("H87", collection) == "Pieza"
+        collection.find_one.assert_not_called()
+
+    @patch('invoice_cdk.lambdas.dbaccess.db_datos_factura.snapshot_vigente')
+    def test_key_missing_from_snapshot_reads_mongo(self, mock_snapshot):
+        mock_snapshot.return_value = {"indices": {"regimenfiscal": {}, "medidas": {}}}
+        collection = MagicMock()
+        collection.find_one.return_value = {"descripcion": "Nueva clave"}
+
+        assert get_descripcion_by_clave("XYZ", collection) == "Nueva clave"
+        collection.find_one.assert_called_once_with({"clave": "XYZ"})
+
+    @patch('invoice_cdk.lambdas.dbaccess.db_datos_factura.snapshot_vigente')
+    def test_without_snapshot_reads_mongo(self, mock_snapshot):
+        mock_snapshot.return_value = None
+        collection = MagicMock()
+        collection.find_one.return_value = {"descripcion": "General de Ley"}
+
+        assert get_regimen_fiscal_by_clave("601", collection) == "General de Ley"
+
+    @patch('invoice_cdk.lambdas.dbaccess.db_datos_factura.snapshot_vigente')
+    def test_batch_lookup_reads_only_missing_keys_with_one_query(self, mock_snapshot):
+        mock_snapshot.return_value = {"indices": {"medidas": {"H87": "Pieza"}}}
+        collection = MagicMock()
+        collection.find.return_value = [{"clave": "KGM", "descripcion": "Kilogramo"}]
+
+        descripciones = get_descripciones_by_claves(["H87", "KGM", "H87", "NOEXISTE"], collection)
+
+        assert descripciones == {"H87": "Pieza", "KGM": "Kilogramo"}
+        filtro, proyeccion = collection.find.call_args.args
+        assert sorted(filtro["clave"]["$in"]) == ["KGM", "NOEXISTE"]
+        assert proyeccion == {"clave": 1, "descripcion": 1}
+
+    @patch('invoice_cdk.lambdas.dbaccess.db_datos_factura.snapshot_vigente')
+    def test_batch_lookup_fully_served_by_snapshot(self, mock_snapshot):
+        mock_snapshot.return_value = {"indices": {"medidas": {"H87": "Pieza"}}}
+        collection = MagicMock()
+
+        assert get_descripciones_by_claves(["H87"], collection) == {"H87": "Pieza"}
+        collection.find.assert_not_called()
@@ -94,28 +94,24 @@ class TestCertificatesHandlerPost:
 class TestCertificatesHandlerGet:
     """Unit tests for GET method (list certificates)"""
     
-    @patch('invoice_cdk.lambdas.certificates_handler.get_sucursal_by_id')
-    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates_with_sucursales')
     @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
     def test_get_certificates_by_usuario_success(self, mock_valida_cors, mock_list_certificates,
-                                                  mock_get_sucursal, sample_certificate_data,
-                                                  sample_sucursal_data):
+                                                  sample_certificate_data, sample_sucursal_data):
         """Test successful certificate retrieval by usuario"""
         import invoice_cdk.lambdas.certificates_handler as certificates_handler
         
-        # Setup mocks
+        # Setup mocks - sucursales already resolved by the $lookup pipeline
         mock_valida_cors.return_value = "http://localhost:3000"
+        sucursal_data = sample_sucursal_data.copy()
+        sucursal_data["_id"] = ObjectId("507f1f77bcf86cd799439012")
         cert_data = sample_certificate_data.copy()
         cert_data["_id"] = ObjectId("507f1f77bcf86cd799439011")
         cert_data["desde"] = datetime(2023, 1, 1)
         cert_data["hasta"] = datetime(2027, 12, 31)
-        cert_data["sucursales"] = [{"_id": ObjectId("507f1f77bcf86cd799439012")}]
+        cert_data["sucursales"] = [sucursal_data]
         mock_list_certificates.return_value = [cert_data]
         
-        sucursal_data = sample_sucursal_data.copy()
-        sucursal_data["_id"] = ObjectId("507f1f77bcf86cd799439012")
-        mock_get_sucursal.return_value = sucursal_data
-        
         event = {
             "httpMethod": "GET",
             "pathParameters": {"id": "test_user@example.com"},
@@ -126,11 +122,67 @@ class TestCertificatesHandlerGet:
         
         # Assertions
         assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert body[0]["_id"] == "507f1f77bcf86cd799439011"
+        assert body[0]["sucursales"][0]["_id"] == "507f1f77bcf86cd799439012"
         mock_list_certificates.assert_called_once_with("test_user@example.com", 
-                                                       certificates_handler.certificates_collection)
-        mock_get_sucursal.assert_called_once()
+                                                       certificates_handler.certificates_collection,
+                                                       limit=None, after=None)
+    
+    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates_with_sucursales')
+    @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
+    def test_get_certificates_paginated(self, mock_valida_cors, mock_list_certificates,
+                                        sample_certificate_data):
+        """Test paginated listing returns data and the next cursor"""
+        import invoice_cdk.lambdas.certificates_handler as certificates_handler
+        
+        mock_valida_cors.return_value = "http://localhost:3000"
+        certs = []
+        for cert_id in ["507f1f77bcf86cd799439011", "507f1f77bcf86cd799439013"]:
+            cert_data = sample_certificate_data.copy()
+            cert_data["_id"] = ObjectId(cert_id)
+            certs.append(cert_data)
+        mock_list_certificates.return_value = certs
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"id": "test_user@example.com"},
+            "queryStringParameters": {"limit": "2", "after": "507f1f77bcf86cd799439010"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = certificates_handler.handler(event, {})
+        
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert len(body["data"]) == 2
+        assert body["next"] == "507f1f77bcf86cd799439013"
+        mock_list_certificates.assert_called_once_with("test_user@example.com",
+                                                       certificates_handler.certificates_collection,
+                                                       limit=2, after="507f1f77bcf86cd799439010")
+    
+    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates_with_sucursales')
+    @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
+    def test_get_certificates_invalid_cursor(self, mock_valida_cors, mock_list_certificates):
+        """Test a malformed `after` cursor returns 400 instead of 500"""
+        import invoice_cdk.lambdas.certificates_handler as certificates_handler
+        from bson.errors import InvalidId
+        
+        mock_list_certificates.side_effect = InvalidId("'no-es-id' is not a valid ObjectId")
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"id": "test_user@example.com"},
+            "queryStringParameters": {"limit": "2", "after": "no-es-id"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = certificates_handler.handler(event, {})
+        
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        assert json.loads(response["body"]) == {"error": "Cursor inválido"}
     
-    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates_with_sucursales')
     @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
     def test_get_certificates_empty_list(self, mock_valida_cors, mock_list_certificates):
         """Test certificate retrieval when no certificates exist"""
@@ -195,14 +247,11 @@ class TestCertificatesHandlerPut:
 class TestCertificatesHandlerDelete:
     """Unit tests for DELETE method (delete certificate)"""
     
-    @patch('invoice_cdk.lambdas.certificates_handler.delete_certificate')
-    @patch('invoice_cdk.lambdas.certificates_handler.delete_sucursal')
-    @patch('invoice_cdk.lambdas.certificates_handler.get_certificate_by_id')
+    @patch('invoice_cdk.lambdas.certificates_handler.elimina_certificado_cascada')
     @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
-    def test_delete_certificate_with_sucursales(self, mock_valida_cors, mock_get_certificate,
-                                                mock_delete_sucursal, mock_delete_certificate,
+    def test_delete_certificate_with_sucursales(self, mock_valida_cors, mock_cascada,
                                                 sample_certificate_data):
-        """Test certificate deletion with associated sucursales"""
+        """Test certificate deletion cascades through the transactional service"""
         import invoice_cdk.lambdas.certificates_handler as certificates_handler
         
         # Setup mocks
@@ -211,10 +260,7 @@ class TestCertificatesHandlerDelete:
         cert_with_sucursales["sucursales"] = [
             {"_id": "507f1f77bcf86cd799439012", "codigo_sucursal": "SUC001"}
         ]
-        mock_get_certificate.return_value = cert_with_sucursales
-        
-        # Mock folio_collection delete
-        certificates_handler.folio_collection.delete_one = MagicMock()
+        mock_cascada.return_value = cert_with_sucursales
         
         event = {
             "httpMethod": "DELETE",
@@ -228,24 +274,23 @@ class TestCertificatesHandlerDelete:
         assert response["statusCode"] == HTTPStatus.OK
         body = json.loads(response["body"])
         assert body["message"] == "Certificate deleted"
-        mock_get_certificate.assert_called_once()
-        mock_delete_sucursal.assert_called_once()
-        mock_delete_certificate.assert_called_once()
-        certificates_handler.folio_collection.delete_one.assert_called_once()
+        mock_cascada.assert_called_once_with(
+            "507f1f77bcf86cd799439011",
+            certificates_handler.client,
+            certificates_handler.certificates_collection,
+            certificates_handler.sucursal_collection,
+            certificates_handler.folio_collection
+        )
     
-    @patch('invoice_cdk.lambdas.certificates_handler.delete_certificate')
-    @patch('invoice_cdk.lambdas.certificates_handler.get_certificate_by_id')
+    @patch('invoice_cdk.lambdas.certificates_handler.elimina_certificado_cascada')
     @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
-    def test_delete_certificate_without_sucursales(self, mock_valida_cors, mock_get_certificate,
-                                                   mock_delete_certificate, sample_certificate_data):
-        """Test certificate deletion without sucursales"""
+    def test_delete_certificate_not_found(self, mock_valida_cors, mock_cascada):
+        """Test deleting a certificate that does not exist"""
         import invoice_cdk.lambdas.certificates_handler as certificates_handler
         
         # Setup mocks
         mock_valida_cors.return_value = "http://localhost:3000"
-        cert_without_sucursales = sample_certificate_data.copy()
-        cert_without_sucursales["sucursales"] = []
-        mock_get_certificate.return_value = cert_without_sucursales
+        mock_cascada.return_value = None
         
         event = {
             "httpMethod": "DELETE",
@@ -256,16 +301,13 @@ class TestCertificatesHandlerDelete:
         response = certificates_handler.handler(event, {})
         
         # Assertions
-        assert response["statusCode"] == HTTPStatus.OK
-        body = json.loads(response["body"])
-        assert body["message"] == "Certificate deleted"
-        mock_delete_certificate.assert_called_once()
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
 
 
 class TestCertificatesHandlerExceptions:
     """Unit tests for exception handling"""
     
-    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.certificates_handler.list_certificates_with_sucursales')
     @patch('invoice_cdk.lambdas.certificates_handler.valida_cors')
     def test_exception_handling(self, mock_valida_cors, mock_list_certificates):
         """Test that exceptions are properly caught and returned"""
@@ -0,0 +1,59 @@
+"""
+Unit tests for consulta_bitacora_handler.
+These tests use mocks and do not require a database connection.
+"""
+import json
+from unittest.mock import patch
+from http import HTTPStatus
+
+
+def _event(**params):
+    return {
+        "httpMethod": "GET",
+        "headers": {"origin": "http://localhost:3000"},
+        "queryStringParameters": {"fechaInicio": "2025-01-10", "fechaFin": "2025-01-10", **params}
+    }
+
+
+class TestConsultaBitacoraHandlerGet:
+    """Unit tests for GET method (paginated bitácora)"""
+
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.buscar_bitacora_por_fechas')
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.valida_cors')
+    def test_returns_page_with_next_cursor(self, mock_valida_cors, mock_buscar):
+        import invoice_cdk.lambdas.consulta_bitacora_handler as consulta_bitacora_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_buscar.return_value = ([{"_id": "1", "mensaje": "ok"}], "1736532000000_1")
+
+        response = consulta_bitacora_handler.handler(_event(limit="1", after="x_y", traceback="true"), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"data": [{"_id": "1", "mensaje": "ok"}], "next": "1736532000000_1"}
+        kwargs = mock_buscar.call_args[1]
+        assert kwargs == {"limit": 1, "after": "x_y", "incluye_traceback": True}
+        assert mock_buscar.call_args[0][:2] == ("2025-01-10T00:00:00", "2025-01-10T23:59:59")
+
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.buscar_bitacora_por_fechas')
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.valida_cors')
+    def test_invalid_cursor_returns_bad_request(self, mock_valida_cors, mock_buscar):
+        import invoice_cdk.lambdas.consulta_bitacora_handler as consulta_bitacora_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_buscar.side_effect = ValueError("Cursor inválido: basura")
+
+        response = consulta_bitacora_handler.handler(_event(after="basura"), None)
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.buscar_bitacora_por_fechas')
+    @patch('invoice_cdk.lambdas.consulta_bitacora_handler.valida_cors')
+    def test_empty_first_page_returns_not_found(self, mock_valida_cors, mock_buscar):
+        import invoice_cdk.lambdas.consulta_bitacora_handler as consulta_bitacora_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_buscar.return_value = ([], None)
+
+        response = consulta_bitacora_handler.handler(_event(), None)
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
@@ -10,6 +10,16 @@ from bson import ObjectId
 from datetime import datetime, timezone
 
 
+@pytest.fixture(autouse=True)
+def contadores_reconstruidos(monkeypatch):
+    """Los contadores ya tienen el histórico salvo que la prueba diga otra cosa"""
+    import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+    mock = MagicMock(return_value=True)
+    monkeypatch.setattr(consumo_timbres_handler, "contadores_reconstruidos", mock)
+    monkeypatch.setattr(consumo_timbres_handler, "_contadores_listos", False)
+    return mock
+
+
 @pytest.fixture
 def sample_certificate_data():
     """Sample certificate data for testing"""
@@ -35,22 +45,37 @@ def sample_factura_emitida_data():
     }
 
 
+@pytest.fixture
+def sample_resumen_consumo():
+    """Sample aggregated consumption for the sample certificate"""
+    return {
+        "507f1f77bcf86cd799439011": {
+            "total": 3,
+            "cancelados": 1,
+            "periodos": [
+                {"periodo": "2024-01-15", "timbres": 2, "cancelados": 1},
+                {"periodo": "2024-01-16", "timbres": 1, "cancelados": 0}
+            ]
+        }
+    }
+
+
 class TestConsumoTimbresHandlerGet:
     """Unit tests for GET method (retrieve consumo timbres)"""
     
-    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_by_certificado')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_desde_contadores')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
     def test_get_consumo_timbres_success(self, mock_valida_cors, mock_list_certificates,
-                                         mock_consulta_facturas, sample_certificate_data,
-                                         sample_factura_emitida_data):
-        """Test successful retrieval of consumo timbres"""
+                                         mock_resumen, sample_certificate_data,
+                                         sample_resumen_consumo):
+        """Test successful retrieval of the aggregated consumo timbres"""
         import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
         
         # Setup mocks
         mock_valida_cors.return_value = "http://localhost:3000"
         mock_list_certificates.return_value = [sample_certificate_data.copy()]
-        mock_consulta_facturas.return_value = [sample_factura_emitida_data.copy()]
+        mock_resumen.return_value = sample_resumen_consumo
         
         event = {
             "httpMethod": "GET",
@@ -66,18 +91,23 @@ class TestConsumoTimbresHandlerGet:
         body = json.loads(response["body"])
         assert isinstance(body, list)
         assert len(body) > 0
-        assert "facturas_emitidas" in body[0]
+        assert body[0]["consumo"]["total"] == 3
+        assert body[0]["consumo"]["cancelados"] == 1
+        assert "facturas_emitidas" not in body[0]
         mock_list_certificates.assert_called_once_with(
             "test_user@example.com",
             consumo_timbres_handler.certificates_collection
         )
-        mock_consulta_facturas.assert_called_once()
+        mock_resumen.assert_called_once_with(
+            ["507f1f77bcf86cd799439011"], "2024-01-01", "2024-01-31",
+            consumo_timbres_handler.usage_counters_collection, "dia"
+        )
     
-    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_by_certificado')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_desde_contadores')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
     def test_get_consumo_timbres_no_certificates(self, mock_valida_cors, mock_list_certificates,
-                                                  mock_consulta_facturas):
+                                                  mock_resumen):
         """Test retrieval when user has no certificates"""
         import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
         
@@ -99,25 +129,34 @@ class TestConsumoTimbresHandlerGet:
         body = json.loads(response["body"])
         assert isinstance(body, list)
         assert len(body) == 0
-        mock_consulta_facturas.assert_not_called()
+        mock_resumen.assert_not_called()
     
-    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_by_certificado')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_desde_contadores')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
-    def test_get_consumo_timbres_no_facturas(self, mock_valida_cors, mock_list_certificates,
-                                             mock_consulta_facturas, sample_certificate_data):
-        """Test retrieval when certificate has no facturas emitidas"""
+    def test_get_consumo_timbres_multiple_certificates_by_month(self, mock_valida_cors, mock_list_certificates,
+                                                                mock_resumen, sample_certificate_data):
+        """Test a single aggregation covers every certificate"""
         import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
         
-        # Setup mocks
+        # Setup mocks - two certificates
+        cert1 = sample_certificate_data.copy()
+        cert2 = sample_certificate_data.copy()
+        cert2["_id"] = ObjectId("507f1f77bcf86cd799439099")
+        cert2["rfc"] = "TEST987654XYZ"
+        
         mock_valida_cors.return_value = "http://localhost:3000"
-        mock_list_certificates.return_value = [sample_certificate_data.copy()]
-        mock_consulta_facturas.return_value = []
+        mock_list_certificates.return_value = [cert1, cert2]
+        mock_resumen.return_value = {
+            "507f1f77bcf86cd799439011": {"total": 1, "cancelados": 0, "periodos": [
+                {"periodo": "2024-01", "timbres": 1, "cancelados": 0}]},
+            "507f1f77bcf86cd799439099": {"total": 0, "cancelados": 0, "periodos": []}
+        }
         
         event = {
             "httpMethod": "GET",
             "pathParameters": {"usuario": "test_user@example.com"},
-            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31", "agrupacion": "mes"},
             "headers": {"origin": "http://localhost:3000"}
         }
         
@@ -127,43 +166,152 @@ class TestConsumoTimbresHandlerGet:
         assert response["statusCode"] == 200
         body = json.loads(response["body"])
         assert isinstance(body, list)
-        assert len(body) > 0
-        assert body[0]["facturas_emitidas"] == []
+        assert len(body) == 2
+        assert body[0]["consumo"]["periodos"][0]["periodo"] == "2024-01"
+        assert body[1]["consumo"]["total"] == 0
+        mock_resumen.assert_called_once()
+        assert mock_resumen.call_args[0][4] == "mes"
     
-    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_by_certificado')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
     @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
-    def test_get_consumo_timbres_multiple_certificates(self, mock_valida_cors, mock_list_certificates,
-                                                       mock_consulta_facturas, sample_certificate_data,
-                                                       sample_factura_emitida_data):
-        """Test retrieval with multiple certificates"""
+    def test_get_consumo_timbres_invalid_agrupacion(self, mock_valida_cors, mock_list_certificates,
+                                                    sample_certificate_data):
+        """Test an unknown agrupacion is rejected"""
         import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
         
-        # Setup mocks - two certificates
-        cert1 = sample_certificate_data.copy()
-        cert2 = sample_certificate_data.copy()
-        cert2["_id"] = ObjectId("507f1f77bcf86cd799439099")
-        cert2["rfc"] = "TEST987654XYZ"
-        
         mock_valida_cors.return_value = "http://localhost:3000"
-        mock_list_certificates.return_value = [cert1, cert2]
-        mock_consulta_facturas.return_value = [sample_factura_emitida_data.copy()]
+        mock_list_certificates.return_value = [sample_certificate_data.copy()]
         
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31", "agrupacion": "anio"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = consumo_timbres_handler.lambda_handler(event, {})
+        
+        assert response["statusCode"] == 400
+    
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_por_certificado')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_desde_contadores')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
+    def test_get_consumo_timbres_before_rebuild_aggregates_invoices(self, mock_valida_cors, mock_list_certificates,
+                                                                    mock_contadores, mock_agregacion,
+                                                                    contadores_reconstruidos, sample_certificate_data,
+                                                                    sample_resumen_consumo):
+        """Test the report keeps aggregating facturasemitidas until the counters are rebuilt"""
+        import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+
+        contadores_reconstruidos.return_value = False
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_list_certificates.return_value = [sample_certificate_data.copy()]
+        mock_agregacion.return_value = sample_resumen_consumo
+
         event = {
             "httpMethod": "GET",
             "pathParameters": {"usuario": "test_user@example.com"},
             "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31"},
             "headers": {"origin": "http://localhost:3000"}
         }
+
+        response = consumo_timbres_handler.lambda_handler(event, {})
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"])[0]["consumo"]["total"] == 3
+        mock_contadores.assert_not_called()
+        mock_agregacion.assert_called_once_with(
+            ["507f1f77bcf86cd799439011"], "2024-01-01", "2024-01-31",
+            consumo_timbres_handler.facturas_emitidas_collection, "dia"
+        )
+
+    @pytest.mark.parametrize("query_params", [
+        None,
+        {"hasta": "2024-01-31"},
+        {"desde": "2024-01-01"},
+        {"desde": "01/01/2024", "hasta": "2024-01-31"},
+        {"desde": "2024-02-01", "hasta": "2024-01-31"},
+    ])
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.resumen_consumo_desde_contadores')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
+    def test_get_consumo_timbres_invalid_dates(self, mock_valida_cors, mock_list_certificates, mock_resumen,
+                                               query_params, sample_certificate_data):
+        """Test missing or malformed dates are a client error, not an empty report"""
+        import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_list_certificates.return_value = [sample_certificate_data.copy()]
+
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_user@example.com"},
+            "queryStringParameters": query_params,
+            "headers": {"origin": "http://localhost:3000"}
+        }
+
+        response = consumo_timbres_handler.lambda_handler(event, {})
+
+        assert response["statusCode"] == 400
+        mock_resumen.assert_not_called()
+
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_detalle')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
+    def test_get_consumo_timbres_detalle_paginated(self, mock_valida_cors, mock_list_certificates,
+                                                   mock_detalle, sample_certificate_data,
+                                                   sample_factura_emitida_data):
+        """Test detail mode returns a projected page with the next cursor"""
+        import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+        
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_list_certificates.return_value = [sample_certificate_data.copy()]
+        mock_detalle.return_value = [sample_factura_emitida_data.copy()]
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31",
+                                      "detalle": "true", "limit": "1"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
         
         response = consumo_timbres_handler.lambda_handler(event, {})
         
-        # Assertions
         assert response["statusCode"] == 200
         body = json.loads(response["body"])
-        assert isinstance(body, list)
-        assert len(body) == 2
-        assert mock_consulta_facturas.call_count == 2
+        assert len(body["data"]) == 1
+        assert body["next"] == "507f1f77bcf86cd799439012"
+        mock_detalle.assert_called_once_with(
+            ["507f1f77bcf86cd799439011"], "2024-01-01", "2024-01-31",
+            consumo_timbres_handler.facturas_emitidas_collection, 1, None
+        )
+    
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.consulta_facturas_emitidas_detalle')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.list_certificates')
+    @patch('invoice_cdk.lambdas.consumo_timbres_handler.valida_cors')
+    def test_get_consumo_timbres_detalle_foreign_certificate(self, mock_valida_cors, mock_list_certificates,
+                                                             mock_detalle, sample_certificate_data):
+        """Test detail mode ignores certificates that do not belong to the user"""
+        import invoice_cdk.lambdas.consumo_timbres_handler as consumo_timbres_handler
+        
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_list_certificates.return_value = [sample_certificate_data.copy()]
+        mock_detalle.return_value = []
+        
+        event = {
+            "httpMethod": "GET",
+            "pathParameters": {"usuario": "test_user@example.com"},
+            "queryStringParameters": {"desde": "2024-01-01", "hasta": "2024-01-31",
+                                      "detalle": "true", "idCertificado": "ffffffffffffffffffffffff"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = consumo_timbres_handler.lambda_handler(event, {})
+        
+        assert response["statusCode"] == 200
+        assert mock_detalle.call_args[0][0] == []
 
 
 class TestConsumoTimbresHandlerExceptions:
@@ -0,0 +1,129 @@
+"""
+Unit tests for csf_lote.
+These tests use mocks and do not require a database connection or PyMuPDF.
+"""
+import io
+import os
+import zipfile
+from unittest.mock import MagicMock
+import pytest
+
+import invoice_cdk.lambdas.csf_lote as csf_lote
+import invoice_cdk.lambdas.paralelo as paralelo
+import invoice_cdk.lambdas.dbaccess.db_receptor as db_receptor_real
+
+CSF = {"razonSocial": "ESCUELA KEMPER URGATE", "Rfc": "EKU9003173C9", "codigoPostal": "42501",
+       "regimenFiscal": ["Régimen General de Ley Personas Morales"]}
+
+
+def zip_de(archivos: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for nombre, contenido in archivos.items():
+            zip_file.writestr(nombre, contenido)
+    return buffer.getvalue()
+
+
+def procesa_falso(pdf: bytes) -> dict:
+    """Reemplazo de procesa_pdf: b"muere" mata al proceso, b"imagen" no tiene datos"""
+    if pdf == b"muere":
+        os._exit(1)
+    if pdf == b"imagen":
+        return {"error": csf_lote.MENSAJE_SIN_DATOS}
+    return {"csf": {**CSF, "Rfc": pdf.decode()}}
+
+
+@pytest.fixture(autouse=True)
+def sin_pymupdf(monkeypatch):
+    monkeypatch.setattr(csf_lote, "procesa_pdf", procesa_falso)
+    monkeypatch.setattr(csf_lote, "normaliza_texto", db_receptor_real.normaliza_texto)
+
+
+class TestArchivos:
+
+    def test_zip_keeps_only_pdfs(self):
+        contenido = zip_de({"a.pdf": b"A", "carpeta/B.PDF": b"B", "notas.txt": b"x",
+                            "__MACOSX/._a.pdf": b"", "carpeta/.oculto.pdf": b""})
+
+        assert csf_lote.archivos_de_zip(contenido) == [("a.pdf", b"A"), ("carpeta/B.PDF", b"B")]
+
+    def test_invalid_zip(self):
+        with pytest.raises(csf_lote.LoteInvalido):
+            csf_lote.archivos_de_zip(b"no es zip")
+
+    def test_size_guard_uses_uncompressed_size(self, monkeypatch):
+        monkeypatch.setattr(csf_lote, "MAX_BYTES_LOTE", 1000)
+
+        with pytest.raises(csf_lote.LoteInvalido, match="bytes"):
+            csf_lote.archivos_de_zip(zip_de({"grande.pdf": b"0" * 5000}))
+
+    def test_file_count_guard(self, monkeypatch):
+        monkeypatch.setattr(csf_lote, "MAX_ARCHIVOS", 1)
+
+        with pytest.raises(csf_lote.LoteInvalido, match="máximo"):
+            csf_lote.valida_tamano(2, 10)
+
+
+class TestProcesaEnParalelo:
+
+    def test_all_results_come_back(self):
+        pdfs = [(n, f"RFC{n}".encode()) for n in range(13)]
+
+        resultados = dict(csf_lote.procesa_en_paralelo(pdfs, trabajadores=3))
+
+        assert sorted(resultados) == list(range(13))
+        assert resultados[4]["csf"]["Rfc"] == "RFC4"
+
+    def test_dead_worker_only_fails_its_files(self):
+        pdfs = [(n, b"muere" if n == 1 else str(n).encode()) for n in range(8)]
+
+        resultados = dict(csf_lote.procesa_en_paralelo(pdfs, trabajadores=2))
+
+        assert set(resultados) == set(range(8))
+        # El segundo trabajador tenía los impares
+        assert all("error" in resultados[n] for n in (1, 3, 5, 7))
+        assert all(resultados[n]["csf"]["Rfc"] == str(n) for n in (0, 2, 4, 6))
+
+    def test_small_batches_run_in_process(self, monkeypatch):
+        monkeypatch.setattr(paralelo.multiprocessing, "get_context", MagicMock(side_effect=AssertionError))
+
+        assert len(dict(csf_lote.procesa_en_paralelo([(0, b"A"), (1, b"B")], trabajadores=4))) == 2
+
+
+class TestProcesaLote:
+
+    def test_cache_hits_skip_parsing_and_new_results_are_stored(self, monkeypatch):
+        huella_a = csf_lote.hashlib.sha256(b"A").hexdigest()
+        monkeypatch.setattr(csf_lote, "obtiene_csfs", MagicMock(return_value={huella_a: CSF}))
+        guarda = MagicMock()
+        monkeypatch.setattr(csf_lote, "guarda_csfs", guarda)
+
+        lineas = list(csf_lote.procesa_lote([("a.pdf", b"A"), ("b.pdf", b"B"), ("c.pdf", b"imagen")],
+                                            MagicMock(), trabajadores=1))
+
+        assert lineas[0] == {"archivo": "a.pdf", "huella": huella_a, "csf": CSF, "cache": True}
+        assert {l["archivo"] for l in lineas[1:3]} == {"b.pdf", "c.pdf"}
+        assert lineas[-1] == {"resumen": {"archivos": 3, "correctos": 2, "errores": 1, "en_cache": 1}}
+        nuevos = guarda.call_args.args[0]
+        assert list(nuevos) == [csf_lote.hashlib.sha256(b"B").hexdigest()]
+
+    def test_upserts_receptors_with_resolved_regimen(self, monkeypatch):
+        monkeypatch.setattr(csf_lote, "obtiene_csfs", MagicMock(return_value={}))
+        monkeypatch.setattr(csf_lote, "guarda_csfs", MagicMock())
+        actualiza = MagicMock(return_value={"insertados": 1, "actualizados": 0})
+        monkeypatch.setattr(csf_lote, "actualiza_receptores_csf", actualiza)
+        regimenes = csf_lote.claves_regimen({"601": "General de Ley Personas Morales", "605": "Sueldos y Salarios"})
+
+        lineas = list(csf_lote.procesa_lote([("a.pdf", b"EKU9003173C9")], MagicMock(),
+                                            receptor_collection="receptors", regimenes=regimenes, trabajadores=1))
+
+        actualiza.assert_called_once_with([{
+            "Rfc": "EKU9003173C9", "Nombre": "ESCUELA KEMPER URGATE",
+            "DomicilioFiscalReceptor": "42501", "RegimenFiscalReceptor": "601"
+        }], "receptors")
+        assert lineas[-1]["resumen"]["receptores"] == {"insertados": 1, "actualizados": 0}
+
+    def test_several_regimenes_leave_regimen_unset(self):
+        datos = {**CSF, "regimenFiscal": ["Régimen de Arrendamiento", "Régimen Simplificado de Confianza"]}
+
+        assert "RegimenFiscalReceptor" not in csf_lote.receptor_de_csf(datos, {"ARRENDAMIENTO": "606"})
@@ -191,3 +191,75 @@ class TestDatosFacturaHandlerInvalidMethod:
         
         # Handler doesn't have DELETE implemented, so it returns None
         assert response is None
+
+
+class TestDatosFacturaHandlerCache:
+    """Unit tests for ETag / If-None-Match handling"""
+
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_forma_pago')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_regimen_fiscal')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_uso_cfdi')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.valida_cors')
+    def test_matching_etag_returns_not_modified(self, mock_valida_cors, mock_get_uso_cfdi,
+                                                mock_get_regimen_fiscal, mock_get_forma_pago,
+                                                sample_uso_cfdi_data):
+        """A second request with the returned ETag gets a 304 without body"""
+        import invoice_cdk.lambdas.datos_factura_handler as datos_factura_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_get_uso_cfdi.side_effect = lambda _: [dict(u) for u in sample_uso_cfdi_data]
+        mock_get_regimen_fiscal.return_value = []
+        mock_get_forma_pago.return_value = []
+        event = {"httpMethod": "GET", "headers": {"origin": "http://localhost:3000"}}
+
+        first = datos_factura_handler.handler(event, {})
+        etag = first["headers"]["ETag"]
+        assert first["statusCode"] == HTTPStatus.OK
+        assert "max-age" in first["headers"]["Cache-Control"]
+
+        event["headers"]["If-None-Match"] = etag
+        second = datos_factura_handler.handler(event, {})
+
+        assert second["statusCode"] == HTTPStatus.NOT_MODIFIED
+        assert second["body"] == ""
+        assert second["headers"]["ETag"] == etag
+
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_forma_pago')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_regimen_fiscal')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_uso_cfdi')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.valida_cors')
+    def test_stale_etag_returns_full_body(self, mock_valida_cors, mock_get_uso_cfdi,
+                                          mock_get_regimen_fiscal, mock_get_forma_pago):
+        import invoice_cdk.lambdas.datos_factura_handler as datos_factura_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_get_uso_cfdi.return_value = []
+        mock_get_regimen_fiscal.return_value = []
+        mock_get_forma_pago.return_value = []
+        event = {"httpMethod": "GET", "headers": {"origin": "http://localhost:3000", "if-none-match": '"viejo"'}}
+
+        response = datos_factura_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"])["uso_cfdi"] == []
+
+
+class TestDatosFacturaHandlerSnapshot:
+    """Unit tests for serving the bundled catalog snapshot"""
+
+    @patch('invoice_cdk.lambdas.datos_factura_handler.get_uso_cfdi')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.snapshot_vigente')
+    @patch('invoice_cdk.lambdas.datos_factura_handler.valida_cors')
+    def test_snapshot_body_is_served_without_queries(self, mock_valida_cors, mock_snapshot, mock_get_uso_cfdi):
+        import invoice_cdk.lambdas.datos_factura_handler as datos_factura_handler
+
+        body = '{"uso_cfdi": [], "regimen_fiscal": [], "forma_pago": []}'
+        mock_snapshot.return_value = {"datos_factura": body, "etag": '"v1"'}
+        event = {"httpMethod": "GET", "headers": {"origin": "http://localhost:3000"}}
+
+        response = datos_factura_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["body"] is body
+        assert response["headers"]["ETag"] == '"v1"'
+        mock_get_uso_cfdi.assert_not_called()
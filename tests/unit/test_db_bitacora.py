@@ -0,0 +1,168 @@
+"""
+Unit tests for dbaccess.db_bitacora.
+These tests use mocks and do not require a database connection.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import pytest
+from bson import ObjectId
+
+from invoice_cdk.lambdas.dbaccess.db_bitacora import (
+    buscar_bitacora_por_fechas,
+    codifica_cursor,
+    decodifica_cursor,
+    filtro_bitacora,
+    migra_timestamps,
+    pipeline_resumen_bitacora,
+    resumen_bitacora,
+    timestamp_legado_a_utc,
+    MAX_INTERVALOS
+)
+
+
+def _registro(minuto):
+    return {"_id": ObjectId(), "timestamp": datetime(2025, 1, 10, 18, minuto, tzinfo=timezone.utc), "mensaje": "ok"}
+
+
+class TestFiltroBitacora:
+    """Unit tests for the date range filter"""
+
+    def test_local_dates_are_converted_to_utc(self):
+        filtro = filtro_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59")
+
+        assert filtro["timestamp"]["$gte"] == datetime(2025, 1, 10, 6, 0, tzinfo=timezone.utc)
+        assert filtro["timestamp"]["$lte"] == datetime(2025, 1, 11, 5, 59, 59, tzinfo=timezone.utc)
+
+    def test_cursor_round_trip_continues_after_last_record(self):
+        registro = _registro(30)
+        cursor = codifica_cursor(registro)
+
+        assert decodifica_cursor(cursor) == (registro["timestamp"], registro["_id"])
+        filtro = filtro_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", cursor)
+        assert filtro["$and"][1]["$or"] == [
+            {"timestamp": {"$lt": registro["timestamp"]}},
+            {"timestamp": registro["timestamp"], "_id": {"$lt": registro["_id"]}}
+        ]
+
+    def test_invalid_cursor_raises_value_error(self):
+        with pytest.raises(ValueError):
+            filtro_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", "no-es-cursor")
+
+
+class TestBuscarBitacoraPorFechas:
+    """Unit tests for the paginated query"""
+
+    def test_full_page_returns_next_cursor_without_traceback(self):
+        registros = [_registro(m) for m in (40, 30)]
+        collection = MagicMock()
+        collection.find.return_value.sort.return_value.limit.return_value = [dict(r) for r in registros]
+
+        pagina, siguiente = buscar_bitacora_por_fechas("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection, limit=2)
+
+        assert collection.find.call_args[0][1] == {"traceback": 0}
+        assert siguiente == codifica_cursor(registros[-1])
+        assert pagina[0]["_id"] == str(registros[0]["_id"])
+        assert pagina[0]["timestamp"] == "2025-01-10T12:40:00-06:00"
+
+    def test_last_page_has_no_cursor_and_traceback_on_request(self):
+        collection = MagicMock()
+        collection.find.return_value.sort.return_value.limit.return_value = [_registro(10)]
+
+        pagina, siguiente = buscar_bitacora_por_fechas("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection,
+                                                       limit=2, incluye_traceback=True)
+
+        assert collection.find.call_args[0][1] is None
+        assert siguiente is None
+        assert len(pagina) == 1
+
+
+class TestMigraTimestamps:
+    """Unit tests for the legacy timestamp migration"""
+
+    def test_legacy_local_time_is_shifted_to_utc(self):
+        assert timestamp_legado_a_utc("2025-01-10T12:40:00.123456+00:00") == \
+            datetime(2025, 1, 10, 18, 40, 0, 123456, tzinfo=timezone.utc)
+
+    def test_updates_in_batches_guarded_by_original_value(self):
+        legados = [{"_id": ObjectId(), "timestamp": f"2025-01-10T12:0{i}:00+00:00"} for i in range(5)]
+        collection = MagicMock()
+        collection.find.return_value.batch_size.return_value = iter(legados)
+        collection.bulk_write.side_effect = lambda ops, ordered: MagicMock(modified_count=len(ops))
+
+        convertidos = migra_timestamps(collection, tamano_lote=2)
+
+        assert convertidos == 5
+        assert [len(c[0][0]) for c in collection.bulk_write.call_args_list] == [2, 2, 1]
+        primera = collection.bulk_write.call_args_list[0][0][0][0]
+        assert primera._filter == {"_id": legados[0]["_id"], "timestamp": legados[0]["timestamp"]}
+        assert primera._doc["$set"]["timestamp"] == datetime(2025, 1, 10, 18, 0, tzinfo=timezone.utc)
+
+
+class TestResumenBitacora:
+    """Unit tests for the server-side bitácora summary"""
+
+    def _resultado(self, **facets):
+        base = {"total": [{"total": 3}], "por_status": [], "por_rfc_emisor": [], "por_sucursal": [],
+                "por_intervalo": [], "por_mensaje": []}
+        return {**base, **facets}
+
+    def test_error_messages_are_normalized_and_merged(self):
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([self._resultado(por_mensaje=[
+            {"_id": "Error: ticket 123 no encontrado", "total": 2},
+            {"_id": "Error: ticket 98765 no encontrado", "total": 3},
+            {"_id": "CFDI40147 - RFC XAXX010101000 inválido", "total": 1},
+        ])])
+
+        resumen = resumen_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection, top=5)
+
+        assert resumen["total"] == 3
+        assert resumen["por_mensaje"] == [
+            {"valor": "Error: ticket # no encontrado", "total": 5},
+            {"valor": "CFDI# - RFC <rfc> inválido", "total": 1},
+        ]
+        assert resumen["truncado"] is False
+
+    def test_groups_are_renamed_and_intervals_capped(self):
+        intervalos = [{"_id": f"i{n:04d}", "total": 1, "errores": 0} for n in range(MAX_INTERVALOS + 1)]
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([self._resultado(
+            por_status=[{"_id": "error", "total": 2, "errores": 2}],
+            por_intervalo=intervalos
+        )])
+
+        resumen = resumen_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection)
+
+        assert resumen["por_status"] == [{"valor": "error", "total": 2, "errores": 2}]
+        assert len(resumen["por_intervalo"]) == MAX_INTERVALOS
+        assert resumen["truncado"] is True
+
+    def test_groups_beyond_top_are_cut_and_flagged(self):
+        rfcs = [{"_id": f"RFC{n}", "total": 10 - n, "errores": 0} for n in range(3)]
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([self._resultado(por_rfc_emisor=rfcs)])
+
+        resumen = resumen_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection, top=2)
+
+        assert [g["valor"] for g in resumen["por_rfc_emisor"]] == ["RFC0", "RFC1"]
+        assert resumen["truncado"] is True
+
+    def test_messages_beyond_top_are_flagged(self):
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([self._resultado(por_mensaje=[
+            {"_id": "Sin conexión", "total": 3}, {"_id": "Timeout", "total": 2}, {"_id": "RFC inválido", "total": 1},
+        ])])
+
+        resumen = resumen_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", collection, top=2)
+
+        assert len(resumen["por_mensaje"]) == 2
+        assert resumen["truncado"] is True
+
+    def test_pipeline_matches_range_and_filters_first(self):
+        pipeline = pipeline_resumen_bitacora("2025-01-10T00:00:00", "2025-01-10T23:59:59", top=3, intervalo="hora",
+                                             filtros={"rfcEmisor": "FAR0010318A1"})
+
+        assert set(pipeline[0]["$match"]) == {"timestamp", "rfcEmisor"}
+        facet = pipeline[-1]["$facet"]
+        assert facet["por_status"][-1] == {"$limit": 4}
+        assert facet["por_intervalo"][0]["$group"]["_id"]["$dateToString"]["format"] == "%Y-%m-%dT%H:00"
@@ -0,0 +1,103 @@
+"""
+Unit tests for dbaccess.db_cascada.
+These tests use mocks and do not require a database connection.
+"""
+import pytest
+from unittest.mock import MagicMock
+from bson import ObjectId
+
+from invoice_cdk.lambdas.dbaccess.db_cascada import (
+    elimina_certificado_cascada,
+    elimina_sucursal_cascada
+)
+
+
+@pytest.fixture
+def mock_client():
+    """Mongo client whose session runs the transaction callback inline"""
+    session = MagicMock()
+    session.with_transaction.side_effect = lambda callback: callback(session)
+    client = MagicMock()
+    client.start_session.return_value.__enter__.return_value = session
+    return client
+
+
+class TestEliminaCertificadoCascada:
+    """Unit tests for the certificate cascade delete"""
+    
+    def test_deletes_everything_with_bulk_operations(self, mock_client):
+        """Sucursales and folios are removed with one delete_many each, whatever N is"""
+        cert_id = "507f1f77bcf86cd799439011"
+        sucursales = [{"_id": str(ObjectId()), "codigo_sucursal": f"SUC{i}"} for i in range(40)]
+        certificates = MagicMock()
+        certificates.find_one.return_value = {"_id": ObjectId(cert_id), "sucursales": sucursales}
+        sucursal_collection = MagicMock()
+        sucursal_collection.distinct.return_value = ["SUC0", "HUERFANA"]
+        folios = MagicMock()
+        
+        result = elimina_certificado_cascada(cert_id, mock_client, certificates, sucursal_collection, folios)
+        
+        assert result["_id"] == ObjectId(cert_id)
+        sucursal_collection.delete_many.assert_called_once()
+        filtro = sucursal_collection.delete_many.call_args[0][0]
+        assert len(filtro["$or"][0]["_id"]["$in"]) == 40
+        assert filtro["$or"][1] == {"id_certificado": cert_id}
+        folios.delete_many.assert_called_once()
+        codigos = folios.delete_many.call_args[0][0]["sucursal"]["$in"]
+        assert set(codigos) == {f"SUC{i}" for i in range(40)} | {"HUERFANA"}
+        certificates.delete_one.assert_called_once()
+        folios.delete_one.assert_not_called()
+    
+    def test_certificate_not_found(self, mock_client):
+        """Nothing is deleted when the certificate does not exist"""
+        certificates = MagicMock()
+        certificates.find_one.return_value = None
+        sucursal_collection = MagicMock()
+        folios = MagicMock()
+        
+        result = elimina_certificado_cascada("507f1f77bcf86cd799439011", mock_client,
+                                             certificates, sucursal_collection, folios)
+        
+        assert result is None
+        sucursal_collection.delete_many.assert_not_called()
+        folios.delete_many.assert_not_called()
+        certificates.delete_one.assert_not_called()
+
+
+class TestEliminaSucursalCascada:
+    """Unit tests for the sucursal cascade delete"""
+    
+    def test_pulls_reference_instead_of_rewriting_array(self, mock_client):
+        """The certificate reference is removed with $pull in the same transaction"""
+        sucursal_id = "68fab3e28f518fe7ff713f2e"
+        sucursal_collection = MagicMock()
+        sucursal_collection.find_one_and_delete.return_value = {
+            "_id": ObjectId(sucursal_id),
+            "codigo_sucursal": "378",
+            "id_certificado": "68fa9bb5b5ae2b81154d5af9"
+        }
+        certificates = MagicMock()
+        folios = MagicMock()
+        
+        result = elimina_sucursal_cascada(sucursal_id, mock_client, sucursal_collection, certificates, folios)
+        
+        assert result["codigo_sucursal"] == "378"
+        update = certificates.update_one.call_args[0]
+        assert update[0] == {"_id": ObjectId("68fa9bb5b5ae2b81154d5af9")}
+        assert update[1] == {"$pull": {"sucursales": {"_id": {"$in": [sucursal_id, ObjectId(sucursal_id)]}}}}
+        folios.delete_many.assert_called_once()
+        assert folios.delete_many.call_args[0][0] == {"sucursal": "378"}
+    
+    def test_sucursal_not_found(self, mock_client):
+        """Nothing else is touched when the sucursal does not exist"""
+        sucursal_collection = MagicMock()
+        sucursal_collection.find_one_and_delete.return_value = None
+        certificates = MagicMock()
+        folios = MagicMock()
+        
+        result = elimina_sucursal_cascada("68fab3e28f518fe7ff713f2e", mock_client,
+                                          sucursal_collection, certificates, folios)
+        
+        assert result is None
+        certificates.update_one.assert_not_called()
+        folios.delete_many.assert_not_called()
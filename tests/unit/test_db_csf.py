@@ -0,0 +1,69 @@
+"""
+Unit tests for dbaccess.db_csf.
+These tests use mocks and do not require a database connection.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import invoice_cdk.lambdas.dbaccess.db_csf as db_csf
+
+HUELLA = "a" * 64
+
+
+class TestCsfCache:
+
+    def test_read_filters_expired_entries(self):
+        collection = MagicMock()
+        collection.find_one.return_value = {"_id": HUELLA, "csf": {"Rfc": "EKU9003173C9"}}
+
+        assert db_csf.obtiene_csf(HUELLA, collection) == {"Rfc": "EKU9003173C9"}
+
+        filtro, projection = collection.find_one.call_args.args
+        assert filtro["_id"] == HUELLA
+        assert filtro["expira"]["$gt"] <= datetime.now(timezone.utc)
+        assert projection == {"csf": 1}
+
+    def test_miss_returns_none(self):
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        assert db_csf.obtiene_csf(HUELLA, collection) is None
+
+    def test_store_upserts_with_expiry(self):
+        collection = MagicMock()
+
+        db_csf.guarda_csf(HUELLA, {"Rfc": "EKU9003173C9"}, collection)
+
+        filtro, documento = collection.replace_one.call_args.args
+        assert filtro == {"_id": HUELLA}
+        assert collection.replace_one.call_args.kwargs == {"upsert": True}
+        assert (documento["expira"] - documento["creado"]).total_seconds() == db_csf.CACHE_TTL_SEGUNDOS
+
+    def test_hit_rate(self, monkeypatch):
+        monkeypatch.setattr(db_csf, "estadisticas", {"consultas": 0, "aciertos": 0})
+
+        db_csf.registra_consulta(True)
+        db_csf.registra_consulta(False)
+        resultado = db_csf.registra_consulta(True)
+
+        assert resultado == {"consultas": 3, "aciertos": 2, "tasa_aciertos": 0.6667}
+
+    def test_batch_read_is_one_query(self):
+        collection = MagicMock()
+        collection.find.return_value = [{"_id": HUELLA, "csf": {"Rfc": "EKU9003173C9"}}]
+
+        assert db_csf.obtiene_csfs({HUELLA, "b" * 64}, collection) == {HUELLA: {"Rfc": "EKU9003173C9"}}
+
+        filtro, projection = collection.find.call_args.args
+        assert sorted(filtro["_id"]["$in"]) == [HUELLA, "b" * 64]
+        assert projection == {"csf": 1}
+
+    def test_batch_store_uses_one_bulk_write(self):
+        collection = MagicMock()
+
+        db_csf.guarda_csfs({HUELLA: {"Rfc": "A"}, "b" * 64: {"Rfc": "B"}}, collection)
+        db_csf.guarda_csfs({}, collection)
+
+        operaciones, = collection.bulk_write.call_args.args
+        assert [op._filter for op in operaciones] == [{"_id": HUELLA}, {"_id": "b" * 64}]
+        assert collection.bulk_write.call_count == 1
@@ -0,0 +1,48 @@
+"""
+Unit tests for dbaccess.db_factura_pdf.
+These tests use mocks and do not require a database connection.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import invoice_cdk.lambdas.dbaccess.db_factura_pdf as db_factura_pdf
+
+UUID = "6b2f1c3a-0000-4000-8000-000000000001"
+
+
+class TestFacturaPdfCache:
+
+    def test_read_filters_expired_entries(self):
+        collection = MagicMock()
+
+        db_factura_pdf.obtiene_pdf(UUID, collection)
+
+        filtro, projection = collection.find_one.call_args.args
+        assert filtro["_id"] == UUID
+        assert filtro["expira"]["$gt"] <= datetime.now(timezone.utc)
+        assert projection == {"etag": 1, "pdf": 1}
+
+    def test_read_can_skip_the_pdf(self):
+        collection = MagicMock()
+
+        db_factura_pdf.obtiene_pdf(UUID, collection, incluye_pdf=False)
+
+        assert collection.find_one.call_args.args[1] == {"etag": 1}
+
+    def test_store_upserts_with_expiry(self):
+        collection = MagicMock()
+
+        db_factura_pdf.guarda_pdf(UUID, b"%PDF", '"e"', collection)
+
+        filtro, documento = collection.replace_one.call_args.args
+        assert filtro == {"_id": UUID}
+        assert collection.replace_one.call_args.kwargs == {"upsert": True}
+        assert bytes(documento["pdf"]) == b"%PDF" and documento["etag"] == '"e"'
+        assert (documento["expira"] - documento["creado"]).total_seconds() == db_factura_pdf.CACHE_TTL_SEGUNDOS
+
+    def test_batch_read_is_one_query(self):
+        collection = MagicMock()
+        collection.find.return_value = [{"_id": UUID, "pdf": b"%PDF"}]
+
+        assert db_factura_pdf.obtiene_pdfs([UUID, "otro"], collection) == {UUID: b"%PDF"}
+        assert collection.find.call_args.args[0]["_id"] == {"$in": [UUID, "otro"]}
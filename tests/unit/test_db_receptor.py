@@ -0,0 +1,399 @@
+"""
+Unit tests for dbaccess.db_receptor.
+These tests use mocks and do not require a database connection.
+"""
+from unittest.mock import MagicMock
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+import invoice_cdk.lambdas.dbaccess.db_receptor as db_receptor
+
+
+@pytest.fixture(autouse=True)
+def cache_vacio():
+    """Each test starts with an empty per-container cache"""
+    db_receptor.invalida_cache()
+    yield
+    db_receptor.invalida_cache()
+
+
+@pytest.fixture
+def receptor():
+    return {"_id": ObjectId(), "Rfc": "XAXX010101000", "Nombre": "PUBLICO EN GENERAL", "email": "a@example.com"}
+
+
+class TestObtieneReceptor:
+    """Unit tests for the cached RFC lookup"""
+
+    def test_repeated_lookups_hit_mongo_once(self, receptor):
+        collection = MagicMock()
+        collection.find_one.return_value = receptor
+
+        for _ in range(5):
+            assert db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)["Nombre"] == "PUBLICO EN GENERAL"
+
+        collection.find_one.assert_called_once_with({"Rfc": "XAXX010101000"})
+
+    def test_callers_get_copies(self, receptor):
+        collection = MagicMock()
+        collection.find_one.return_value = receptor
+
+        primero = db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+        primero["_id"] = str(primero["_id"])
+
+        assert isinstance(db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)["_id"], ObjectId)
+
+    def test_not_found_is_not_cached(self):
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        assert db_receptor.obtiene_receptor_by_rfc("NOEXISTE", collection) is None
+        assert db_receptor.obtiene_receptor_by_rfc("NOEXISTE", collection) is None
+        assert collection.find_one.call_count == 2
+
+    def test_expired_entries_are_reloaded(self, receptor, monkeypatch):
+        monkeypatch.setattr(db_receptor, "CACHE_TTL_SEGUNDOS", 0)
+        collection = MagicMock()
+        collection.find_one.return_value = receptor
+
+        db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+        db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+
+        assert collection.find_one.call_count == 2
+
+    def test_least_recently_used_entry_is_evicted(self, monkeypatch):
+        monkeypatch.setattr(db_receptor, "CACHE_MAXIMO", 2)
+        collection = MagicMock()
+        collection.find_one.side_effect = lambda filtro: {"_id": 1, "Rfc": filtro["Rfc"]}
+
+        for rfc in ("A", "B", "A", "C"):
+            db_receptor.obtiene_receptor_by_rfc(rfc, collection)
+
+        assert list(db_receptor._cache) == ["A", "C"]
+
+
+class TestEscrituras:
+    """Unit tests for the RFC-keyed upserts"""
+
+    def test_update_filters_by_rfc_and_returns_document_after(self, receptor):
+        collection = MagicMock()
+        collection.find_one_and_update.return_value = receptor
+
+        resultado = db_receptor.update_receptor("XAXX010101000", {"_id": "ignorado", "email": "b@example.com"}, collection)
+
+        assert resultado is receptor
+        collection.find_one_and_update.assert_called_once_with(
+            {"Rfc": "XAXX010101000"},
+            {"$set": {"email": "b@example.com"}},
+            upsert=False,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def test_update_missing_rfc_returns_none(self):
+        collection = MagicMock()
+        collection.find_one_and_update.return_value = None
+
+        assert db_receptor.update_receptor("NOEXISTE", {"email": "b@example.com"}, collection) is None
+
+    def test_write_invalidates_stale_cache_entry(self, receptor):
+        collection = MagicMock()
+        collection.find_one.return_value = receptor
+        db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+        collection.find_one_and_update.return_value = {**receptor, "email": "nuevo@example.com"}
+
+        db_receptor.update_receptor("XAXX010101000", {"email": "nuevo@example.com"}, collection)
+
+        assert db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)["email"] == "nuevo@example.com"
+        collection.find_one.assert_called_once()
+
+    def test_guarda_receptor_upserts_by_rfc(self, receptor):
+        modelo = MagicMock()
+        modelo.Rfc = "XAXX010101000"
+        modelo.dict.return_value = {k: v for k, v in receptor.items() if k != "_id"}
+        collection = MagicMock()
+        collection.find_one_and_update.return_value = receptor
+
+        assert db_receptor.guarda_receptor(modelo, collection) == receptor["_id"]
+        assert collection.find_one_and_update.call_args[1]["upsert"] is True
+
+    def test_writes_normalize_the_rfc_key(self, receptor):
+        modelo = MagicMock()
+        modelo.Rfc = " xaxx010101000"
+        modelo.dict.return_value = {"Rfc": " xaxx010101000", "Nombre": "PUBLICO EN GENERAL"}
+        collection = MagicMock()
+        collection.find_one_and_update.return_value = receptor
+
+        db_receptor.guarda_receptor(modelo, collection)
+
+        filtro, cambios = collection.find_one_and_update.call_args.args
+        assert filtro == {"Rfc": "XAXX010101000"}
+        assert cambios["$set"]["Rfc"] == "XAXX010101000"
+
+
+def fila_receptor(rfc="XAXX010101000", **cambios):
+    fila = {
+        "Nombre": "PUBLICO EN GENERAL",
+        "DomicilioFiscalReceptor": "01000",
+        "email": "a@example.com",
+        "Rfc": rfc,
+        "RegimenFiscalReceptor": "616",
+        "UsoCFDI": "S01"
+    }
+    fila.update(cambios)
+    return fila
+
+
+def resultado_bulk(n_upserted=0, n_modified=0, n_matched=None):
+    resultado = MagicMock()
+    resultado.bulk_api_result = {"nUpserted": n_upserted, "nModified": n_modified,
+                                 "nMatched": n_modified if n_matched is None else n_matched, "writeErrors": []}
+    return resultado
+
+
+def total_filas(resultado: dict) -> int:
+    return sum(resultado[campo] for campo in ("insertados", "actualizados", "sinCambios", "duplicados", "total_errores"))
+
+
+class TestImportaReceptores:
+    """Unit tests for the chunked bulk import"""
+
+    def test_rows_are_upserted_by_rfc_in_chunks(self):
+        collection = MagicMock()
+        collection.bulk_write.side_effect = [resultado_bulk(2), resultado_bulk(1)]
+        filas = [fila_receptor(f"AAA01010100{i}") for i in range(3)]
+
+        resultado = db_receptor.importa_receptores(iter(filas), collection, tamano_lote=2)
+
+        assert collection.bulk_write.call_count == 2
+        operaciones, = collection.bulk_write.call_args_list[0].args
+        assert collection.bulk_write.call_args_list[0].kwargs == {"ordered": False}
+        assert operaciones[0]._filter == {"Rfc": "AAA010101000"}
+        assert operaciones[0]._upsert is True
+        assert resultado == {"procesadas": 3, "insertados": 3, "actualizados": 0, "sinCambios": 0, "duplicados": 0,
+                             "total_errores": 0, "errores": []}
+
+    def test_unchanged_rows_are_counted(self):
+        collection = MagicMock()
+        collection.bulk_write.return_value = resultado_bulk(n_upserted=1, n_modified=1, n_matched=3)
+        filas = [fila_receptor(f"AAA01010100{i}") for i in range(4)]
+
+        resultado = db_receptor.importa_receptores(filas, collection)
+
+        assert (resultado["insertados"], resultado["actualizados"], resultado["sinCambios"]) == (1, 1, 2)
+        assert total_filas(resultado) == resultado["procesadas"] == 4
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        collection = MagicMock()
+        collection.bulk_write.return_value = resultado_bulk(1)
+        sin_nombre = fila_receptor("BBB010101000")
+        del sin_nombre["Nombre"]
+
+        resultado = db_receptor.importa_receptores(
+            [fila_receptor(), sin_nombre, ValueError("JSON inválido")], collection)
+
+        assert resultado["procesadas"] == 3
+        assert resultado["total_errores"] == 2
+        assert resultado["errores"][0]["fila"] == 2
+        assert resultado["errores"][0]["Rfc"] == "BBB010101000"
+        assert resultado["errores"][0]["errores"] == ["Nombre: field required"]
+        assert resultado["errores"][1] == {"fila": 3, "Rfc": None, "errores": ["JSON inválido"]}
+        assert len(collection.bulk_write.call_args.args[0]) == 1
+        assert total_filas(resultado) == resultado["procesadas"]
+
+    def test_rfc_is_normalized_and_last_duplicate_wins(self):
+        collection = MagicMock()
+        collection.bulk_write.return_value = resultado_bulk(1)
+
+        resultado = db_receptor.importa_receptores(
+            [fila_receptor(" xaxx010101000 "), fila_receptor("XAXX010101000", Nombre="ULTIMO")], collection)
+
+        operaciones, = collection.bulk_write.call_args.args
+        assert len(operaciones) == 1
+        assert operaciones[0]._doc["$set"]["Nombre"] == "ULTIMO"
+        assert resultado["duplicados"] == 1
+        assert total_filas(resultado) == resultado["procesadas"] == 2
+
+    def test_write_errors_are_mapped_back_to_rows(self):
+        from pymongo.errors import BulkWriteError
+        collection = MagicMock()
+        collection.bulk_write.side_effect = BulkWriteError({
+            "nUpserted": 1, "nModified": 0,
+            "writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}]
+        })
+
+        resultado = db_receptor.importa_receptores(
+            [fila_receptor("AAA010101000"), fila_receptor("BBB010101000")], collection)
+
+        assert resultado["insertados"] == 1
+        assert resultado["errores"] == [{"fila": 2, "Rfc": "BBB010101000", "errores": ["Document failed validation"]}]
+        assert total_filas(resultado) == resultado["procesadas"]
+
+    def test_import_clears_the_cache(self, receptor):
+        collection = MagicMock()
+        collection.find_one.return_value = receptor
+        collection.bulk_write.return_value = resultado_bulk(0, 1)
+        db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+
+        db_receptor.importa_receptores([fila_receptor()], collection)
+        db_receptor.obtiene_receptor_by_rfc("XAXX010101000", collection)
+
+        assert collection.find_one.call_count == 2
+
+
+class TestActualizaReceptoresCsf:
+    """Unit tests for the receptor upsert from extracted constancias"""
+
+    def test_upserts_only_csf_fields_with_search_fields(self):
+        collection = MagicMock()
+        collection.bulk_write.return_value = MagicMock(upserted_count=1, modified_count=1)
+        receptores = [{"Rfc": "EKU9003173C9", "Nombre": "Escuela Kemper Urgate"}, {"Rfc": "XAXX010101000"}]
+
+        resultado = db_receptor.actualiza_receptores_csf(receptores, collection)
+
+        operaciones, = collection.bulk_write.call_args.args
+        assert operaciones[0]._filter == {"Rfc": "EKU9003173C9"}
+        assert operaciones[0]._doc == {"$set": {
+            "Rfc": "EKU9003173C9", "Nombre": "Escuela Kemper Urgate",
+            "rfcNormalizado": "EKU9003173C9", "nombreNormalizado": "ESCUELA KEMPER URGATE"}}
+        assert operaciones[0]._upsert is True
+        assert resultado == {"insertados": 1, "actualizados": 1}
+
+    def test_empty_list_does_not_write(self):
+        collection = MagicMock()
+
+        assert db_receptor.actualiza_receptores_csf([], collection) == {"insertados": 0, "actualizados": 0}
+        collection.bulk_write.assert_not_called()
+
+
+class TestExportaReceptores:
+    """Unit tests for the cursor-based export"""
+
+    def test_export_pages_by_id_after_cursor(self, receptor):
+        collection = MagicMock()
+        cursor = collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.limit.return_value = iter([receptor])
+        after = ObjectId()
+
+        exportados = list(db_receptor.exporta_receptores(collection, after=str(after), limite=10))
+
+        collection.find.assert_called_once_with({"_id": {"$gt": after}})
+        collection.find.return_value.sort.assert_called_once_with("_id", 1)
+        cursor.limit.assert_called_once_with(10)
+        assert exportados[0]["_id"] == str(receptor["_id"])
+
+    def test_export_is_lazy(self):
+        collection = MagicMock()
+
+        db_receptor.exporta_receptores(collection)
+
+        collection.find.assert_not_called()
+
+
+class TestBusquedaReceptores:
+    """Unit tests for the normalized prefix search"""
+
+    def test_normaliza_texto_folds_accents_case_and_spaces(self):
+        assert db_receptor.normaliza_texto("  José  Núñez\tpeña ") == "JOSE NUNEZ PENA"
+
+    def test_writes_store_normalized_fields(self, receptor):
+        collection = MagicMock()
+        collection.find_one_and_update.return_value = receptor
+
+        db_receptor.update_receptor("XAXX010101000", {"Nombre": "María López"}, collection)
+
+        _, actualizacion = collection.find_one_and_update.call_args.args
+        assert actualizacion["$set"] == {"Nombre": "María López", "nombreNormalizado": "MARIA LOPEZ"}
+
+    def test_bulk_import_stores_normalized_fields(self):
+        collection = MagicMock()
+        collection.bulk_write.return_value = resultado_bulk(1)
+
+        db_receptor.importa_receptores([fila_receptor("aaa010101aaa", Nombre="Ángel")], collection)
+
+        operacion = collection.bulk_write.call_args.args[0][0]
+        assert operacion._doc["$set"]["rfcNormalizado"] == "AAA010101AAA"
+        assert operacion._doc["$set"]["nombreNormalizado"] == "ANGEL"
+
+    def test_campo_busqueda_detects_rfc(self):
+        assert db_receptor.campo_busqueda("xaxx0101") == "rfc"
+        assert db_receptor.campo_busqueda("juan pe") == "nombre"
+
+    def test_search_uses_anchored_escaped_prefix_and_index_order(self, receptor):
+        collection = MagicMock()
+        cursor = collection.find.return_value.sort.return_value
+        cursor.limit.return_value = [dict(receptor, nombreNormalizado="PUBLICO EN GENERAL")]
+
+        receptores, siguiente = db_receptor.busca_receptores("público en", collection, limite=10)
+
+        filtro, proyeccion = collection.find.call_args.args
+        assert filtro == {"nombreNormalizado": {"$regex": "^PUBLICO\\ EN"}}
+        assert proyeccion == {"rfcNormalizado": 0}
+        collection.find.return_value.sort.assert_called_once_with([("nombreNormalizado", 1), ("_id", 1)])
+        cursor.limit.assert_called_once_with(10)
+        assert siguiente is None
+        assert "nombreNormalizado" not in receptores[0]
+        assert receptores[0]["_id"] == str(receptor["_id"])
+
+    def test_full_page_cursor_continues_after_last_result(self, receptor):
+        collection = MagicMock()
+        cursor = collection.find.return_value.sort.return_value
+        cursor.limit.side_effect = lambda limite: [dict(receptor, rfcNormalizado="XAXX010101000")]
+
+        _, siguiente = db_receptor.busca_receptores("X&1", collection, campo="rfc", limite=1)
+        db_receptor.busca_receptores("X&1", collection, campo="rfc", limite=1, after=siguiente)
+
+        filtro = collection.find.call_args.args[0]
+        assert filtro == {"$and": [
+            {"rfcNormalizado": {"$regex": "^X\\&1"}},
+            {"$or": [
+                {"rfcNormalizado": {"$gt": "XAXX010101000"}},
+                {"rfcNormalizado": "XAXX010101000", "_id": {"$gt": receptor["_id"]}}
+            ]}
+        ]}
+
+    @pytest.mark.parametrize("texto,campo,after", [("  ", None, None), ("JUAN", "email", None), ("JUAN", "nombre", "xx")])
+    def test_invalid_search_raises_value_error(self, texto, campo, after):
+        with pytest.raises(ValueError):
+            db_receptor.busca_receptores(texto, MagicMock(), campo=campo, after=after)
+
+    def test_migration_backfills_missing_fields(self):
+        collection = MagicMock()
+        registro_id = ObjectId()
+        collection.find.return_value.batch_size.return_value = [{"_id": registro_id, "Rfc": "xaxx010101000", "Nombre": "Zoé"}]
+        collection.bulk_write.return_value.modified_count = 1
+
+        assert db_receptor.migra_campos_busqueda(collection) == 1
+
+        operacion = collection.bulk_write.call_args.args[0][0]
+        assert operacion._filter == {"_id": registro_id, "rfcNormalizado": {"$exists": False}}
+        assert operacion._doc == {"$set": {"rfcNormalizado": "XAXX010101000", "nombreNormalizado": "ZOE"}}
+
+
+class TestDeduplicaReceptores:
+    """Unit tests for the pre-unique-index dedupe"""
+
+    def test_keeps_newest_fills_missing_fields_and_deletes_the_rest(self):
+        viejo, medio, nuevo = ObjectId(), ObjectId(), ObjectId()
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([{"_id": "XAXX010101000", "ids": [viejo, medio, nuevo], "total": 3}])
+        collection.find.return_value.sort.return_value = iter([
+            {"_id": nuevo, "Rfc": "XAXX010101000", "Nombre": "PUBLICO", "email": None},
+            {"_id": medio, "Rfc": "XAXX010101000", "email": "medio@example.com"},
+            {"_id": viejo, "Rfc": "XAXX010101000", "email": "viejo@example.com", "CodigoPostal": "01000"},
+        ])
+        collection.bulk_write.return_value.deleted_count = 2
+
+        assert db_receptor.deduplica_receptores(collection) == 2
+
+        actualizacion, *borrados = collection.bulk_write.call_args.args[0]
+        assert actualizacion._filter == {"_id": nuevo}
+        assert actualizacion._doc == {"$set": {"email": "medio@example.com", "CodigoPostal": "01000"}}
+        assert [operacion._filter for operacion in borrados] == [{"_id": medio}, {"_id": viejo}]
+
+    def test_no_duplicates_writes_nothing(self):
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([])
+
+        assert db_receptor.deduplica_receptores(collection) == 0
+        collection.bulk_write.assert_not_called()
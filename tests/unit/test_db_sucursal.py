@@ -0,0 +1,150 @@
+"""
+Unit tests for dbaccess.db_sucursal.
+These tests use mocks and do not require a database connection.
+"""
+from unittest.mock import MagicMock
+import pytest
+from bson import ObjectId
+
+import invoice_cdk.lambdas.dbaccess.db_sucursal as db_sucursal
+
+
+@pytest.fixture(autouse=True)
+def cache_vacio():
+    """Each test starts with an empty per-container cache"""
+    db_sucursal.invalida_cache()
+    yield
+    db_sucursal.invalida_cache()
+
+
+@pytest.fixture
+def sucursal():
+    return {"_id": ObjectId(), "codigo_sucursal": "378", "serie": "OPI", "id_certificado": "68fa9bb5b5ae2b81154d5af9"}
+
+
+class TestGetSucursalByCodigo:
+    """Unit tests for the cached lookup used by tapetes_handler"""
+
+    def test_repeated_lookups_hit_mongo_once(self, sucursal):
+        collection = MagicMock()
+        collection.find_one.return_value = sucursal
+
+        for _ in range(5):
+            assert db_sucursal.get_sucursal_by_codigo("378", collection)["serie"] == "OPI"
+
+        collection.find_one.assert_called_once_with({"codigo_sucursal": "378"})
+
+    def test_callers_get_copies(self, sucursal):
+        collection = MagicMock()
+        collection.find_one.return_value = sucursal
+
+        db_sucursal.get_sucursal_by_codigo("378", collection)
+        db_sucursal.get_sucursal_by_codigo("378", collection)["_id"] = "mutado"
+
+        assert isinstance(db_sucursal.get_sucursal_by_codigo("378", collection)["_id"], ObjectId)
+
+    def test_unknown_codes_are_negatively_cached(self):
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        assert db_sucursal.get_sucursal_by_codigo("NOEXISTE", collection) is None
+        assert db_sucursal.get_sucursal_by_codigo("NOEXISTE", collection) is None
+        collection.find_one.assert_called_once()
+
+    def test_negative_entries_expire_with_their_own_ttl(self, sucursal, monkeypatch):
+        monkeypatch.setattr(db_sucursal, "CACHE_NEGATIVO_TTL_SEGUNDOS", 0)
+        collection = MagicMock()
+        collection.find_one.side_effect = [None, sucursal]
+
+        assert db_sucursal.get_sucursal_by_codigo("378", collection) is None
+        assert db_sucursal.get_sucursal_by_codigo("378", collection)["serie"] == "OPI"
+
+    def test_adding_the_code_clears_its_negative_entry(self, sucursal):
+        collection = MagicMock()
+        collection.find_one.side_effect = [None, sucursal]
+        nueva = MagicMock(codigo_sucursal="378")
+
+        db_sucursal.get_sucursal_by_codigo("378", collection)
+        db_sucursal.add_sucursal(nueva, collection)
+
+        assert db_sucursal.get_sucursal_by_codigo("378", collection)["serie"] == "OPI"
+
+    def test_update_clears_the_cache(self, sucursal):
+        collection = MagicMock()
+        collection.find_one.return_value = sucursal
+
+        db_sucursal.get_sucursal_by_codigo("378", collection)
+        db_sucursal.update_sucursal(str(sucursal["_id"]), {"serie": "NUEVA"}, collection)
+        db_sucursal.get_sucursal_by_codigo("378", collection)
+
+        assert collection.find_one.call_count == 2
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(db_sucursal, "CACHE_MAXIMO", 2)
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        for codigo in ("1", "2", "3"):
+            db_sucursal.get_sucursal_by_codigo(codigo, collection)
+
+        assert list(db_sucursal._cache) == ["2", "3"]
+
+
+class TestListaSucursales:
+    """Unit tests for the keyset-paginated listing"""
+
+    def test_filters_by_certificates_and_pages_by_id(self):
+        collection = MagicMock()
+        after = ObjectId()
+
+        db_sucursal.lista_sucursales(["c1", "c2"], collection, 50, after=str(after), projection={"serie": 1})
+
+        collection.find.assert_called_once_with(
+            {"id_certificado": {"$in": ["c1", "c2"]}, "_id": {"$gt": after}}, {"serie": 1})
+        collection.find.return_value.sort.assert_called_once_with([("_id", 1)])
+        collection.find.return_value.sort.return_value.limit.assert_called_once_with(50)
+
+    def test_certificates_of_user_are_returned_as_strings(self):
+        certificates = MagicMock()
+        cert_id = ObjectId()
+        certificates.find.return_value = [{"_id": cert_id}]
+
+        assert db_sucursal.ids_certificados_de_usuario("test@example.com", certificates) == [str(cert_id)]
+        certificates.find.assert_called_once_with({"usuario": "test@example.com"}, {"_id": 1})
+
+
+class TestGetSucursalConCertificado:
+    """Unit tests for the single-aggregation sucursal + certificate lookup"""
+
+    def test_one_aggregation_resolves_both(self, sucursal, monkeypatch):
+        monkeypatch.setattr(db_sucursal, "serialize_certificate", lambda cert: dict(cert, _id=str(cert["_id"])))
+        collection = MagicMock()
+        cert_id = ObjectId()
+        collection.aggregate.return_value = iter([dict(sucursal, certificado=[{"_id": cert_id, "rfc": "EKU9003173C9"}])])
+
+        encontrada, certificado = db_sucursal.get_sucursal_con_certificado("378", collection)
+
+        assert encontrada["serie"] == "OPI"
+        assert "certificado" not in encontrada
+        assert certificado == {"_id": str(cert_id), "rfc": "EKU9003173C9"}
+        pipeline = collection.aggregate.call_args.args[0]
+        assert pipeline[0] == {"$match": {"codigo_sucursal": "378"}}
+        assert pipeline[2]["$lookup"]["from"] == "certificates"
+
+    def test_results_are_cached_including_misses(self):
+        collection = MagicMock()
+        collection.aggregate.side_effect = lambda pipeline: iter([])
+
+        for _ in range(3):
+            assert db_sucursal.get_sucursal_con_certificado("NOEXISTE", collection) == (None, None)
+
+        collection.aggregate.assert_called_once()
+
+    def test_sucursal_without_certificate(self, sucursal):
+        collection = MagicMock()
+        collection.aggregate.return_value = iter([dict(sucursal, certificado=[])])
+
+        encontrada, certificado = db_sucursal.get_sucursal_con_certificado("378", collection)
+
+        assert encontrada["codigo_sucursal"] == "378"
+        assert certificado is None
@@ -0,0 +1,63 @@
+"""
+Unit tests for dbaccess.db_tickets.
+These tests use mocks and do not require a database connection.
+"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import pytest
+
+import invoice_cdk.lambdas.dbaccess.db_tickets as db_tickets
+
+VENTA = {
+    "sucursal": "386",
+    "ticket": {"noVenta": "TAT9340-2027951", "subtotal": 10646.55, "impuesto": 1703.45, "total": 12350.0},
+    "detalle": [{"claveunidad": "H87", "importe": 12350.0}]
+}
+
+
+class TestSnapshot:
+
+    def test_snapshot_is_keyed_by_normalized_ticket_with_expiry(self):
+        collection = MagicMock()
+
+        db_tickets.guarda_snapshot("TAT9340-2027951", VENTA, collection)
+
+        filtro, documento = collection.replace_one.call_args.args
+        assert filtro == {"_id": "TAT93402027951"}
+        assert collection.replace_one.call_args.kwargs == {"upsert": True}
+        assert documento["venta"] is VENTA
+        assert documento["totales"] == {"subtotal": 10646.55, "impuesto": 1703.45, "total": 12350.0}
+        assert (documento["expira"] - documento["creado"]).total_seconds() == db_tickets.SNAPSHOT_TTL_SEGUNDOS
+
+    def test_read_filters_expired_snapshots(self):
+        collection = MagicMock()
+
+        db_tickets.obtiene_snapshot("TAT9340-2027951", collection, {"venta": 1})
+
+        filtro, projection = collection.find_one.call_args.args
+        assert filtro["_id"] == "TAT93402027951"
+        assert filtro["expira"]["$gt"] <= datetime.now(timezone.utc)
+        assert projection == {"venta": 1}
+
+    def test_legacy_impuestos_field_is_normalized(self):
+        assert db_tickets.totales_venta({"ticket": {"subtotal": "1000", "impuestos": 160, "total": "1160.004"}}) == \
+            {"subtotal": 1000.0, "impuesto": 160.0, "total": 1160.0}
+
+
+class TestVerificaTotales:
+
+    @pytest.mark.parametrize("total,esperado", [(12350, True), ("12350.00", True), (12350.009, True), (12351, False), (None, False)])
+    def test_total_is_compared_with_tolerance(self, total, esperado):
+        collection = MagicMock()
+        collection.find_one.return_value = {"totales": {"total": 12350.0}}
+
+        ok, mensaje = db_tickets.verifica_totales("TAT9340-2027951", {"Total": total}, collection)
+
+        assert ok is esperado
+        assert collection.find_one.call_args.args[1] == {"totales": 1}
+
+    def test_without_snapshot_nothing_is_verified(self):
+        collection = MagicMock()
+        collection.find_one.return_value = None
+
+        assert db_tickets.verifica_totales("T1", {"Total": 1}, collection)[0] is None
@@ -0,0 +1,145 @@
+"""
+Unit tests for dbaccess.db_usage_counters.
+These tests use mocks and do not require a database connection.
+"""
+import pytest
+from unittest.mock import MagicMock
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+
+from invoice_cdk.lambdas.dbaccess.db_usage_counters import (
+    registra_timbre,
+    registra_cancelacion,
+    resumen_consumo_desde_contadores,
+    reconstruye_contadores,
+    contadores_reconstruidos,
+    MARCADOR_RECONSTRUCCION
+)
+
+
+@pytest.fixture
+def sample_factura():
+    """Sample factura emitida as stored by genera_factura_handler"""
+    return {
+        "uuid": "12345678-1234-1234-1234-123456789012",
+        "idCertificado": "507f1f77bcf86cd799439011",
+        "sucursal": "378",
+        "fechaTimbrado": datetime(2024, 1, 15, 10, 30, 0),
+        "estatus": "Vigente"
+    }
+
+
+class TestRegistraEventos:
+    """Unit tests for the per-UUID idempotent counters"""
+    
+    def test_registra_timbre_increments_day_counter(self, sample_factura):
+        """A new stamp writes its marker and increments the daily counter"""
+        counters = MagicMock()
+        events = MagicMock()
+        
+        assert registra_timbre(sample_factura, counters, events) is True
+        
+        events.insert_one.assert_called_once_with({"_id": "12345678-1234-1234-1234-123456789012:timbre"})
+        counters.update_one.assert_called_once_with(
+            {"idCertificado": "507f1f77bcf86cd799439011", "sucursal": "378", "dia": "2024-01-15"},
+            {"$inc": {"timbres": 1}},
+            upsert=True
+        )
+    
+    def test_registra_timbre_twice_is_ignored(self, sample_factura):
+        """A repeated UUID does not increment the counter again"""
+        counters = MagicMock()
+        events = MagicMock()
+        events.insert_one.side_effect = DuplicateKeyError("duplicate")
+        
+        assert registra_timbre(sample_factura, counters, events) is False
+        
+        counters.update_one.assert_not_called()
+    
+    def test_registra_cancelacion_uses_stamp_day(self, sample_factura):
+        """Cancellations are counted on the day the factura was stamped"""
+        counters = MagicMock()
+        events = MagicMock()
+        
+        assert registra_cancelacion(sample_factura, counters, events) is True
+        
+        assert counters.update_one.call_args[0][0]["dia"] == "2024-01-15"
+        assert counters.update_one.call_args[0][1] == {"$inc": {"cancelados": 1}}
+
+
+class TestResumenDesdeContadores:
+    """Unit tests for the range summary built from daily counters"""
+    
+    def test_groups_days_by_month(self):
+        """Daily counters of every sucursal are added per month"""
+        counters = MagicMock()
+        counters.find.return_value = [
+            {"idCertificado": "cert1", "dia": "2024-01-02", "timbres": 3, "cancelados": 1},
+            {"idCertificado": "cert1", "dia": "2024-01-20", "timbres": 2},
+            {"idCertificado": "cert1", "dia": "2024-02-01", "timbres": 1, "cancelados": 0}
+        ]
+        
+        resumen = resumen_consumo_desde_contadores(["cert1", "cert2"], "2024-01-01", "2024-02-28", counters, "mes")
+        
+        assert resumen["cert1"] == {
+            "total": 6,
+            "cancelados": 1,
+            "periodos": [
+                {"periodo": "2024-01", "timbres": 5, "cancelados": 1},
+                {"periodo": "2024-02", "timbres": 1, "cancelados": 0}
+            ]
+        }
+        assert resumen["cert2"] == {"total": 0, "cancelados": 0, "periodos": []}
+        filtro = counters.find.call_args[0][0]
+        assert filtro["dia"] == {"$gte": "2024-01-01", "$lte": "2024-02-28"}
+
+
+class TestReconstruyeContadores:
+    """Unit tests for the counter rebuild job"""
+    
+    def test_rebuilds_from_streamed_history(self, sample_factura):
+        """Counters are recomputed per key and markers are written for every UUID"""
+        cancelada = {**sample_factura, "uuid": "otra", "estatus": "Cancelada"}
+        facturas = MagicMock()
+        facturas.find.return_value = iter([sample_factura, cancelada])
+        counters = MagicMock()
+        events = MagicMock()
+        
+        procesadas = reconstruye_contadores(facturas, counters, events)
+        
+        assert procesadas == 2
+        assert facturas.find.call_args.kwargs["batch_size"] == 1000
+        marcadores = [m["_id"] for m in events.insert_many.call_args[0][0]]
+        assert marcadores == ["12345678-1234-1234-1234-123456789012:timbre", "otra:timbre", "otra:cancelacion"]
+        operaciones = counters.bulk_write.call_args[0][0]
+        assert len(operaciones) == 1
+        assert operaciones[0]._doc == {"$set": {"timbres": 2, "cancelados": 1}}
+
+    def test_full_rebuild_leaves_marker(self, sample_factura):
+        """Only a rebuild over the whole history enables reading the counters"""
+        facturas = MagicMock()
+        facturas.find.return_value = iter([sample_factura])
+        events = MagicMock()
+
+        reconstruye_contadores(facturas, MagicMock(), events)
+
+        assert events.replace_one.call_args.args[0] == {"_id": MARCADOR_RECONSTRUCCION}
+        assert events.replace_one.call_args.args[1]["facturas"] == 1
+
+    def test_partial_rebuild_leaves_no_marker(self, sample_factura):
+        """A rebuild limited by filtro does not mark the counters as complete"""
+        facturas = MagicMock()
+        facturas.find.return_value = iter([sample_factura])
+        events = MagicMock()
+
+        reconstruye_contadores(facturas, MagicMock(), events, {"fechaTimbrado": {"$gte": datetime(2024, 1, 1)}})
+
+        events.replace_one.assert_not_called()
+
+    def test_contadores_reconstruidos_reads_marker(self):
+        """The marker lookup is a single find_one by _id"""
+        events = MagicMock()
+        events.find_one.return_value = None
+
+        assert contadores_reconstruidos(events) is False
+        events.find_one.assert_called_once_with({"_id": MARCADOR_RECONSTRUCCION}, {"_id": 1})
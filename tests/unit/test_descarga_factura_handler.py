@@ -0,0 +1,151 @@
+"""
+Unit tests for descarga_factura_handler.
+These tests use mocks and do not require a database connection or fpdf.
+"""
+import base64
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock
+import pytest
+
+import invoice_cdk.lambdas.descarga_factura_handler as descarga_factura_handler
+
+UUID = "6b2f1c3a-0000-4000-8000-000000000001"
+FACTURA = {"uuid": UUID, "ticket": "T1", "cfdi": "<cfdi:Comprobante/>", "qrCode": "qr", "cadenaOriginalSAT": "||"}
+
+
+def _event(uuid=UUID, ticket=None, formato=None, etag=None):
+    event = {
+        "httpMethod": "GET",
+        "headers": {"origin": "http://localhost:3000", **({"If-None-Match": etag} if etag else {})},
+        "pathParameters": {"uuid": uuid} if uuid else {"ticket": ticket},
+        "queryStringParameters": {"formato": formato} if formato else None
+    }
+    if ticket:
+        event["requestContext"] = {"authorizer": {"claims": {"email": "dueno@example.com"}}}
+    return event
+
+
+@pytest.fixture
+def mocks(monkeypatch):
+    """Dependencias del handler reemplazadas; la caché empieza vacía"""
+    mocks = {
+        "get_factura_by_uuid": MagicMock(return_value=dict(FACTURA)),
+        "get_factura_vigente_by_ticket": MagicMock(return_value={"uuid": UUID, "idCertificado": "c1"}),
+        "ids_certificados_de_usuario": MagicMock(return_value=["c1"]),
+        "obtiene_pdf": MagicMock(return_value=None),
+        "guarda_pdf": MagicMock(),
+        "completa_datos_pdf": MagicMock(),
+        "renderiza": MagicMock(return_value={"pdf": b"%PDF-1.4"}),
+    }
+    for nombre, mock in mocks.items():
+        monkeypatch.setattr(descarga_factura_handler, nombre, mock)
+    return mocks
+
+
+class TestDescargaFacturaPdf:
+
+    def test_first_download_renders_and_caches(self, mocks):
+        response = descarga_factura_handler.handler(_event(), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["isBase64Encoded"] is True
+        assert base64.b64decode(response["body"]) == b"%PDF-1.4"
+        assert response["headers"]["Content-Type"] == "application/pdf"
+        assert response["headers"]["Content-Disposition"] == f'attachment; filename="{UUID}.pdf"'
+        mocks["completa_datos_pdf"].assert_called_once()
+        uuid, pdf, etag, _ = mocks["guarda_pdf"].call_args.args
+        assert (uuid, pdf, etag) == (UUID, b"%PDF-1.4", response["headers"]["ETag"])
+
+    def test_cached_download_is_a_single_lookup(self, mocks):
+        mocks["obtiene_pdf"].return_value = {"_id": UUID, "etag": '"abc"', "pdf": b"%PDF-cache"}
+
+        response = descarga_factura_handler.handler(_event(), None)
+
+        assert base64.b64decode(response["body"]) == b"%PDF-cache"
+        assert response["headers"]["ETag"] == '"abc"'
+        assert mocks["obtiene_pdf"].call_args.args[0] == UUID
+        mocks["get_factura_by_uuid"].assert_not_called()
+        mocks["renderiza"].assert_not_called()
+
+    def test_ticket_resolves_the_current_uuid_before_the_cache(self, mocks):
+        mocks["obtiene_pdf"].return_value = {"_id": UUID, "etag": '"abc"', "pdf": b"%PDF-cache"}
+
+        response = descarga_factura_handler.handler(_event(uuid=None, ticket="T1"), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert mocks["get_factura_vigente_by_ticket"].call_args.args[0] == "T1"
+        assert mocks["obtiene_pdf"].call_args.args[0] == UUID
+        assert mocks["ids_certificados_de_usuario"].call_args.args[0] == "dueno@example.com"
+
+    def test_ticket_of_another_users_certificate_is_not_found(self, mocks):
+        mocks["ids_certificados_de_usuario"].return_value = ["otro"]
+
+        response = descarga_factura_handler.handler(_event(uuid=None, ticket="T1"), None)
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        mocks["obtiene_pdf"].assert_not_called()
+
+    def test_cancelled_ticket_without_replacement_is_not_found(self, mocks):
+        mocks["get_factura_vigente_by_ticket"].return_value = None
+
+        response = descarga_factura_handler.handler(_event(uuid=None, ticket="T1"), None)
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        mocks["renderiza"].assert_not_called()
+
+    def test_matching_etag_returns_not_modified_without_reading_pdf(self, mocks):
+        mocks["obtiene_pdf"].return_value = {"_id": UUID, "etag": '"abc"'}
+
+        response = descarga_factura_handler.handler(_event(etag='"abc"'), None)
+
+        assert response["statusCode"] == HTTPStatus.NOT_MODIFIED
+        assert response["body"] == ""
+        assert mocks["obtiene_pdf"].call_args.kwargs == {"incluye_pdf": False}
+        assert mocks["obtiene_pdf"].call_count == 1
+
+    def test_stale_etag_reads_the_cached_pdf(self, mocks):
+        mocks["obtiene_pdf"].side_effect = [{"_id": UUID, "etag": '"nuevo"'},
+                                            {"_id": UUID, "etag": '"nuevo"', "pdf": b"%PDF-cache"}]
+
+        response = descarga_factura_handler.handler(_event(etag='"viejo"'), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert base64.b64decode(response["body"]) == b"%PDF-cache"
+
+    def test_unknown_invoice_returns_not_found(self, mocks):
+        mocks["get_factura_by_uuid"].return_value = None
+
+        response = descarga_factura_handler.handler(_event(), None)
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        mocks["guarda_pdf"].assert_not_called()
+
+    def test_render_error_is_not_cached(self, mocks):
+        mocks["renderiza"].return_value = {"error": "No se pudo generar el PDF: sin QR"}
+
+        response = descarga_factura_handler.handler(_event(), None)
+
+        assert response["statusCode"] == HTTPStatus.INTERNAL_SERVER_ERROR
+        mocks["guarda_pdf"].assert_not_called()
+
+
+class TestDescargaFacturaXml:
+
+    def test_xml_is_returned_as_text_with_etag(self, mocks):
+        response = descarga_factura_handler.handler(_event(formato="xml"), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["body"] == FACTURA["cfdi"]
+        assert "isBase64Encoded" not in response
+        assert response["headers"]["Content-Type"].startswith("application/xml")
+        mocks["obtiene_pdf"].assert_not_called()
+
+        etag = response["headers"]["ETag"]
+        assert descarga_factura_handler.handler(_event(formato="xml", etag=etag), None)["statusCode"] == HTTPStatus.NOT_MODIFIED
+
+    def test_invalid_format_returns_bad_request(self, mocks):
+        response = descarga_factura_handler.handler(_event(formato="html"), None)
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        assert "pdf" in json.loads(response["body"])["message"]
@@ -0,0 +1,231 @@
+"""
+Unit tests for email_sender (SMTP transport and batch delivery).
+These tests mock smtplib.SMTP and do not open network connections.
+"""
+import base64
+import email
+import itertools
+import os
+import smtplib
+from unittest.mock import MagicMock
+
+import pytest
+import invoice_cdk.lambdas.email_sender as email_sender
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """smtplib.SMTP falso; cada llamada crea un servidor nuevo y se guarda en `servidores`"""
+    servidores = []
+
+    def crea(*args, **kwargs):
+        server = MagicMock()
+        server.noop.return_value = (250, b"OK")
+        server.mail.return_value = (250, b"OK")
+        server.rcpt.side_effect = lambda destinatario: (550, b"no") if destinatario.startswith("malo") else (250, b"OK")
+        server.getreply.side_effect = itertools.cycle([(354, b"adelante"), (250, b"aceptado")])
+        servidores.append(server)
+        return server
+
+    fabrica = MagicMock(side_effect=crea)
+    fabrica.servidores = servidores
+    monkeypatch.setattr(email_sender.smtplib, "SMTP", fabrica)
+    return fabrica
+
+
+def enviado(server) -> bytes:
+    """Lo que el transporte escribió al socket durante DATA"""
+    return b"".join(llamada.args[0] for llamada in server.send.call_args_list)
+
+
+def invoice(recipient="cliente@example.com"):
+    return {
+        "recipient_email": recipient, "pdf_base64": "JVBERg==", "cfdi_xml": "<cfdi/>",
+        "pdf_filename": "a.pdf", "xml_filename": "a.xml", "subject": "Factura", "body_text": "Hola",
+    }
+
+
+class TestTransporteSMTP:
+
+    def test_reuses_authenticated_connection(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        transporte.envia("a@x.com", ["c@x.com"], "m2")
+
+        assert smtp.call_count == 1
+        server = smtp.servidores[0]
+        server.starttls.assert_called_once()
+        server.login.assert_called_once_with("user", "pass")
+        assert server.mail.call_count == 2
+        assert enviado(server) == b"m1\r\n.\r\nm2\r\n.\r\n"
+        assert transporte.conexiones == 1
+
+    def test_debug_output_is_off_by_default(self, smtp):
+        email_sender.TransporteSMTP("smtp.local", 587, "user", "pass").envia("a@x.com", ["b@x.com"], "m")
+
+        smtp.servidores[0].set_debuglevel.assert_called_once_with(0)
+
+    def test_idle_connection_is_checked_and_replaced(self, smtp, monkeypatch):
+        monkeypatch.setattr(email_sender, "SMTP_VERIFICA_SEGUNDOS", 0)
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        smtp.servidores[0].noop.side_effect = smtplib.SMTPServerDisconnected()
+
+        transporte.envia("a@x.com", ["b@x.com"], "m2")
+
+        assert smtp.call_count == 2
+        smtp.servidores[0].close.assert_called_once()
+        smtp.servidores[1].mail.assert_called_once_with("a@x.com")
+        assert enviado(smtp.servidores[1]) == b"m2\r\n.\r\n"
+
+    def test_reconnects_once_when_server_closed(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        smtp.servidores[0].mail.side_effect = smtplib.SMTPServerDisconnected()
+
+        transporte.envia("a@x.com", ["b@x.com"], "m2")
+
+        assert smtp.call_count == 2
+        assert enviado(smtp.servidores[1]) == b"m2\r\n.\r\n"
+
+    def test_message_errors_are_not_retried(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        smtp.servidores[0].getreply.side_effect = itertools.chain(
+            [(354, b"adelante"), (554, b"rechazado")], itertools.cycle([(354, b"adelante"), (250, b"aceptado")]))
+
+        with pytest.raises(smtplib.SMTPDataError):
+            transporte.envia("a@x.com", ["b@x.com"], "m2")
+        transporte.envia("a@x.com", ["b@x.com"], "m3")
+
+        assert smtp.call_count == 1
+        assert smtp.servidores[0].mail.call_count == 3
+
+    def test_refused_data_resets_and_keeps_the_connection(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        server = smtp.servidores[0]
+        server.getreply.side_effect = itertools.chain(
+            [(451, b"intenta luego")], itertools.cycle([(354, b"adelante"), (250, b"aceptado")]))
+
+        with pytest.raises(smtplib.SMTPDataError):
+            transporte.envia("a@x.com", ["b@x.com"], "m2")
+        transporte.envia("a@x.com", ["b@x.com"], "m3")
+
+        server._rset.assert_called_once()
+        assert smtp.call_count == 1
+
+    def test_lost_reply_after_final_dot_is_not_retried(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        smtp.servidores[0].getreply.side_effect = [(354, b"adelante"), smtplib.SMTPServerDisconnected()]
+
+        with pytest.raises(email_sender.EnvioSinConfirmar):
+            transporte.envia("a@x.com", ["b@x.com"], "m2")
+
+        assert smtp.call_count == 1
+        smtp.servidores[0].close.assert_called_once()
+
+    def test_timeout_discards_the_connection(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+        smtp.servidores[0].rcpt.side_effect = TimeoutError()
+
+        with pytest.raises(TimeoutError):
+            transporte.envia("a@x.com", ["b@x.com"], "m2")
+        transporte.envia("a@x.com", ["b@x.com"], "m3")
+
+        smtp.servidores[0].close.assert_called_once()
+        assert smtp.call_count == 2
+
+    def test_close_quits_and_next_send_reconnects(self, smtp):
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass")
+        transporte.envia("a@x.com", ["b@x.com"], "m1")
+
+        transporte.cierra()
+        transporte.envia("a@x.com", ["b@x.com"], "m2")
+
+        smtp.servidores[0].quit.assert_called_once()
+        assert smtp.call_count == 2
+
+    def test_sends_are_spaced_by_rate_limit(self, smtp, monkeypatch):
+        reloj = [100.0]
+        esperas = []
+        monkeypatch.setattr(email_sender.time, "monotonic", lambda: reloj[0])
+        monkeypatch.setattr(email_sender.time, "sleep", lambda segundos: (esperas.append(segundos), reloj.__setitem__(0, reloj[0] + segundos)))
+        transporte = email_sender.TransporteSMTP("smtp.local", 587, "user", "pass", por_segundo=4)
+
+        for n in range(3):
+            transporte.envia("a@x.com", ["b@x.com"], f"m{n}")
+
+        assert esperas == [pytest.approx(0.25), pytest.approx(0.25)]
+
+
+class TestEmailSender:
+
+    @pytest.fixture(autouse=True)
+    def remitente(self, monkeypatch):
+        monkeypatch.setattr(email_sender, "FROM", "facturas@example.com")
+        monkeypatch.setattr(email_sender, "REPLY_TO", "contacto@example.com")
+
+    def test_batch_uses_one_session_and_reports_each_message(self, smtp):
+        sender = email_sender.EmailSender(email_sender.TransporteSMTP("smtp.local", 587, "user", "pass"))
+
+        resultados = sender.send_batch([invoice(), invoice("malo@example.com"), invoice("otro@example.com")])
+
+        assert resultados == [True, False, True]
+        assert smtp.call_count == 1
+        smtp.servidores[0].sendmail.assert_not_called()
+
+    def test_send_invoice_streams_pdf_and_xml(self, smtp):
+        sender = email_sender.EmailSender(email_sender.TransporteSMTP("smtp.local", 587, "user", "pass"))
+
+        assert sender.send_invoice(**invoice()) is True
+
+        server = smtp.servidores[0]
+        server.rcpt.assert_called_once_with("cliente@example.com")
+        datos = enviado(server)
+        assert datos.endswith(b"\r\n.\r\n")
+        mensaje = email.message_from_bytes(datos[:-3])
+        adjuntos = {parte.get_filename(): parte.get_payload(decode=True) for parte in mensaje.walk() if parte.get_filename()}
+        assert adjuntos == {"a.pdf": b"%PDF", "a.xml": b"<cfdi/>"}
+        assert mensaje["Subject"] == "Factura"
+
+    def test_large_pdf_as_raw_bytes_is_written_in_blocks(self, smtp):
+        pdf = os.urandom(300 * 1024)
+        sender = email_sender.EmailSender(email_sender.TransporteSMTP("smtp.local", 587, "user", "pass"))
+
+        assert sender.send_invoice(**{**invoice(), "pdf_base64": None, "pdf_bytes": pdf}) is True
+
+        server = smtp.servidores[0]
+        assert server.send.call_count > 1
+        mensaje = email.message_from_bytes(enviado(server)[:-3])
+        assert [parte.get_payload(decode=True) for parte in mensaje.walk() if parte.get_filename() == "a.pdf"] == [pdf]
+
+    def test_pdf_base64_is_reused_without_decoding(self, smtp, monkeypatch):
+        decodifica = MagicMock(side_effect=AssertionError("no debe decodificar"))
+        monkeypatch.setattr(base64, "b64decode", decodifica)
+        sender = email_sender.EmailSender(email_sender.TransporteSMTP("smtp.local", 587, "user", "pass"))
+
+        assert sender.send_invoice(**invoice()) is True
+        assert b"JVBERg==\r\n" in enviado(smtp.servidores[0])
+
+    def test_senders_share_the_container_transport(self, smtp, monkeypatch):
+        monkeypatch.setattr(email_sender, "_transporte", None)
+
+        assert email_sender.EmailSender().transporte is email_sender.EmailSender().transporte
+
+    def test_send_emails_builds_each_message_with_its_attachments(self, smtp):
+        sender = email_sender.EmailSender(email_sender.TransporteSMTP("smtp.local", 587, "user", "pass"))
+        correos = [
+            {"recipient_email": "cliente@example.com", "subject": "Facturas (1 de 2)", "body_text": "Hola",
+             "adjuntos": [email_sender.Adjunto("f.zip", "application/zip", contenido=b"PK")]},
+            {"recipient_email": "malo@example.com", "subject": "Facturas (2 de 2)", "body_text": "Hola", "adjuntos": []},
+        ]
+
+        assert sender.send_emails(correos) == [True, False]
+        assert smtp.call_count == 1
+        mensaje = email.message_from_bytes(enviado(smtp.servidores[0])[:-3])
+        assert mensaje["Subject"] == "Facturas (1 de 2)"
+        assert [parte.get_filename() for parte in mensaje.walk() if parte.get_filename()] == ["f.zip"]
@@ -0,0 +1,42 @@
+"""
+Unit tests for environment_handler.
+These tests do not require a database connection.
+"""
+import json
+from unittest.mock import patch
+
+
+class TestEnvironmentHandlerGet:
+    """Unit tests for GET method"""
+
+    @patch('invoice_cdk.lambdas.environment_handler.valida_cors')
+    def test_returns_environment_with_cache_headers(self, mock_valida_cors):
+        import invoice_cdk.lambdas.environment_handler as environment_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+
+        response = environment_handler.handler({"httpMethod": "GET", "headers": {"origin": "http://localhost:3000"}}, None)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"environment": environment_handler.ENV}
+        assert response["headers"]["ETag"] == environment_handler.ETAG
+        assert "max-age" in response["headers"]["Cache-Control"]
+
+    @patch('invoice_cdk.lambdas.environment_handler.valida_cors')
+    def test_if_none_match_returns_not_modified(self, mock_valida_cors):
+        import invoice_cdk.lambdas.environment_handler as environment_handler
+
+        event = {"httpMethod": "GET", "headers": {"If-None-Match": f'W/{environment_handler.ETAG}'}}
+
+        response = environment_handler.handler(event, None)
+
+        assert response["statusCode"] == 304
+        assert response["body"] == ""
+
+    @patch('invoice_cdk.lambdas.environment_handler.valida_cors')
+    def test_other_methods_not_allowed(self, mock_valida_cors):
+        import invoice_cdk.lambdas.environment_handler as environment_handler
+
+        response = environment_handler.handler({"httpMethod": "POST", "headers": {}}, None)
+
+        assert response["statusCode"] == 405
@@ -0,0 +1,122 @@
+"""
+Unit tests for dbaccess.indices.
+These tests use mocks and do not require a database connection.
+"""
+from unittest.mock import MagicMock
+from pymongo import ASCENDING, IndexModel
+
+from invoice_cdk.lambdas.dbaccess.indices import INDICES, ensure_indexes
+
+
+def _db_con_indices(existentes):
+    """Fake database whose collections report the given index_information()"""
+    colecciones = {}
+
+    def get(nombre):
+        if nombre not in colecciones:
+            coleccion = MagicMock()
+            coleccion.index_information.return_value = existentes.get(nombre, {"_id_": {"key": [("_id", 1)]}})
+            coleccion.create_indexes.side_effect = lambda modelos: [m.document["name"] for m in modelos]
+            colecciones[nombre] = coleccion
+        return colecciones[nombre]
+
+    db = MagicMock()
+    db.__getitem__.side_effect = get
+    return db, colecciones
+
+
+class TestEnsureIndexes:
+    """Unit tests for ensure_indexes"""
+
+    def test_creates_every_registered_index_on_empty_database(self):
+        db, colecciones = _db_con_indices({})
+
+        resultado = ensure_indexes(db)
+
+        assert set(resultado) == set(INDICES)
+        assert resultado["ticket_timbrado"] == {"creados": ["ticket_unique"], "diferentes": [], "obsoletos": []}
+        assert set(resultado["facturasemitidas"]["creados"]) == {
+            "ticket", "uuid", "idCertificado_fechaTimbrado", "rfcReceptor_sucursal_fechaTimbrado",
+            "sucursal_fechaTimbrado"}
+
+    def test_is_idempotent_regardless_of_index_name(self):
+        """An index created by hand with another name is not recreated"""
+        registro = {"ticket_timbrado": [IndexModel([("ticket", ASCENDING)], name="ticket_unique", unique=True)]}
+        db, colecciones = _db_con_indices({
+            "ticket_timbrado": {"_id_": {"key": [("_id", 1)]}, "ticket_1": {"key": [("ticket", 1)], "unique": True}}
+        })
+
+        assert ensure_indexes(db, registro) == {}
+        colecciones["ticket_timbrado"].create_indexes.assert_not_called()
+
+    def test_only_missing_indexes_are_created(self):
+        db, colecciones = _db_con_indices({
+            "facturasemitidas": {"_id_": {"key": [("_id", 1)]}, "uuid": {"key": [("uuid", 1)]}}
+        })
+
+        resultado = ensure_indexes(db, {"facturasemitidas": INDICES["facturasemitidas"]}, obsoletos={})
+
+        assert resultado == {"facturasemitidas": {
+            "creados": ["ticket", "idCertificado_fechaTimbrado", "rfcReceptor_sucursal_fechaTimbrado",
+                        "sucursal_fechaTimbrado"],
+            "diferentes": [], "obsoletos": []}}
+
+    def test_same_keys_with_other_options_are_reported(self):
+        registro = {
+            "ticket_timbrado": [IndexModel([("ticket", ASCENDING)], name="ticket_unique", unique=True)],
+            "csf_cache": [IndexModel([("expira", ASCENDING)], name="expira_ttl", expireAfterSeconds=0)],
+        }
+        db, colecciones = _db_con_indices({
+            "ticket_timbrado": {"_id_": {"key": [("_id", 1)]}, "ticket_1": {"key": [("ticket", 1)]}},
+            "csf_cache": {"_id_": {"key": [("_id", 1)]},
+                          "expira_ttl": {"key": [("expira", 1)], "expireAfterSeconds": 3600}},
+        })
+
+        resultado = ensure_indexes(db, registro, obsoletos={})
+
+        assert resultado["ticket_timbrado"]["diferentes"] == ["ticket_1"]
+        assert resultado["csf_cache"]["diferentes"] == ["expira_ttl"]
+        colecciones["ticket_timbrado"].drop_index.assert_not_called()
+        colecciones["ticket_timbrado"].create_indexes.assert_not_called()
+
+    def test_fix_rebuilds_indexes_with_other_options(self):
+        registro = {"ticket_timbrado": [IndexModel([("ticket", ASCENDING)], name="ticket_unique", unique=True)]}
+        db, colecciones = _db_con_indices({
+            "ticket_timbrado": {"_id_": {"key": [("_id", 1)]}, "ticket_1": {"key": [("ticket", 1)]}}
+        })
+
+        resultado = ensure_indexes(db, registro, obsoletos={}, corrige=True)
+
+        colecciones["ticket_timbrado"].drop_index.assert_called_once_with("ticket_1")
+        assert resultado["ticket_timbrado"]["creados"] == ["ticket_unique"]
+
+    def test_superseded_indexes_are_reported_and_dropped_on_fix(self):
+        existentes = {
+            "sucursales": {"_id_": {"key": [("_id", 1)]}, "id_certificado": {"key": [("id_certificado", 1)]},
+                           "id_certificado_id": {"key": [("id_certificado", 1), ("_id", 1)]}},
+            "bitacora": {"_id_": {"key": [("_id", 1)]}, "timestamp_desc": {"key": [("timestamp", -1)]}},
+        }
+        obsoletos = {"sucursales": [[("id_certificado", 1)]], "bitacora": [[("timestamp", -1)]]}
+        db, colecciones = _db_con_indices(existentes)
+
+        reportado = ensure_indexes(db, {}, obsoletos)
+
+        assert reportado["sucursales"]["obsoletos"] == ["id_certificado"]
+        assert reportado["bitacora"]["obsoletos"] == ["timestamp_desc"]
+        colecciones["sucursales"].drop_index.assert_not_called()
+
+        db, colecciones = _db_con_indices(existentes)
+        ensure_indexes(db, {}, obsoletos, corrige=True)
+
+        colecciones["sucursales"].drop_index.assert_called_once_with("id_certificado")
+        colecciones["bitacora"].drop_index.assert_called_once_with("timestamp_desc")
+
+    def test_uniqueness_declared_for_idempotency_keys(self):
+        unicos = {
+            nombre: [m.document["name"] for m in modelos if m.document.get("unique")]
+            for nombre, modelos in INDICES.items()
+        }
+        assert unicos["ticket_timbrado"] == ["ticket_unique"]
+        assert unicos["serie_folio"] == ["folioTimbrado_unique"]
+        assert unicos["usage_counters"] == ["idCertificado_dia_sucursal"]
+        assert unicos["receptors"] == ["Rfc_unique"]
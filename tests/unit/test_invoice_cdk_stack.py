@@ -13,3 +13,16 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def test_reenvio_alias_is_not_retried():
+    """The re-send self-invocation targets the Prod alias, which must not retry"""
+    app = core.App()
+    stack = InvoiceCdkStack(app, "invoice-cdk")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::EventInvokeConfig", {
+        "FunctionName": assertions.Match.any_value(),
+        "Qualifier": "Prod",
+        "MaximumRetryAttempts": 0
+    })
@@ -0,0 +1,91 @@
+"""
+Unit tests for mensaje_mime (streaming MIME builder).
+"""
+import base64
+import email
+import email.utils
+import os
+
+import pytest
+import invoice_cdk.lambdas.mensaje_mime as mensaje_mime
+
+
+def parsea(msg):
+    return email.message_from_bytes(msg.as_bytes())
+
+
+class TestAdjunto:
+
+    @pytest.mark.parametrize("tamano", [0, 1, 57, 58, 57 * 1024, 57 * 1024 * 3 + 5])
+    def test_raw_and_encoded_inputs_produce_standard_lines(self, tamano):
+        contenido = os.urandom(tamano)
+        esperado = base64.encodebytes(contenido).replace(b"\n", b"\r\n")
+
+        assert b"".join(mensaje_mime.Adjunto("a", "application/pdf", contenido=contenido).bloques_base64()) == esperado
+        assert b"".join(mensaje_mime.Adjunto("a", "application/pdf", base64=base64.b64encode(contenido).decode())
+                        .bloques_base64()) == esperado
+
+    def test_encoded_input_with_line_breaks_is_normalized(self):
+        contenido = os.urandom(500)
+
+        adjunto = mensaje_mime.Adjunto("a", "application/pdf", base64=base64.encodebytes(contenido))
+
+        assert b"".join(adjunto.bloques_base64()) == base64.encodebytes(contenido).replace(b"\n", b"\r\n")
+
+    def test_requires_exactly_one_source(self):
+        with pytest.raises(ValueError):
+            mensaje_mime.Adjunto("a", "application/pdf")
+        with pytest.raises(ValueError):
+            mensaje_mime.Adjunto("a", "application/pdf", contenido=b"x", base64="eA==")
+
+
+class TestMensajeMIME:
+
+    def test_round_trip_with_email_parser(self):
+        pdf = os.urandom(200_000)
+        msg = mensaje_mime.MensajeMIME()
+        msg["Subject"] = "Factura del ticket Ñ-1"
+        msg["To"] = "cliente@example.com"
+        msg.texto = "Se adjuntó la factura"
+        msg.adjunta(mensaje_mime.Adjunto("factura.pdf", "application/pdf", base64=base64.b64encode(pdf)))
+        msg.adjunta(mensaje_mime.Adjunto("cfdi ñ.xml", "application/xml", contenido=b"<cfdi/>"))
+
+        parsed = parsea(msg)
+
+        assert parsed.get_content_type() == "multipart/related"
+        assert str(email.header.make_header(email.header.decode_header(parsed["Subject"]))) == "Factura del ticket Ñ-1"
+        texto, *adjuntos = parsed.get_payload()
+        assert texto.get_payload(decode=True).decode("utf-8") == "Se adjuntó la factura"
+        assert [(parte.get_filename(), parte.get_payload(decode=True)) for parte in adjuntos] == \
+            [("factura.pdf", pdf), ("cfdi ñ.xml", b"<cfdi/>")]
+
+    def test_long_encoded_header_is_folded_with_crlf(self):
+        msg = mensaje_mime.MensajeMIME()
+        msg["Subject"] = "Facturación del ticket " + "ñ" * 80
+
+        encabezado = msg.as_bytes().split(b"\r\n\r\n", 1)[0]
+
+        assert b"\n" not in encabezado.replace(b"\r\n", b"")
+        assert b"\r\n " in encabezado
+        subject = str(email.header.make_header(email.header.decode_header(parsea(msg)["Subject"])))
+        assert subject == "Facturación del ticket " + "ñ" * 80
+
+    def test_only_the_display_name_of_an_address_is_encoded(self):
+        msg = mensaje_mime.MensajeMIME()
+        msg["From"] = "Facturación Farzin <facturas@example.com>"
+
+        assert email.utils.parseaddr(parsea(msg)["From"])[1] == "facturas@example.com"
+        assert b"<facturas@example.com>" in msg.as_bytes()
+
+    def test_ascii_body_is_dot_stuffed_with_crlf(self):
+        msg = mensaje_mime.MensajeMIME()
+        msg.texto = "hola\n.oculto"
+
+        assert b"\r\nhola\r\n..oculto\r\n" in msg.as_bytes()
+
+    def test_fragments_are_bounded_by_block_size(self):
+        msg = mensaje_mime.MensajeMIME()
+        msg.adjunta(mensaje_mime.Adjunto("a.pdf", "application/pdf", contenido=os.urandom(2 * 1024 * 1024)))
+
+        bloque = (mensaje_mime.LINEA_BASE64 + 2) * mensaje_mime.LINEAS_POR_BLOQUE
+        assert max(len(fragmento) for fragmento in msg.fragmentos()) <= bloque
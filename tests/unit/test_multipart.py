@@ -0,0 +1,79 @@
+"""
+Unit tests for the shared multipart/form-data reader.
+"""
+import base64
+import pytest
+
+import invoice_cdk.lambdas.multipart as multipart
+
+BOUNDARY = "----FormBoundary7MA4YWxk"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+CER = bytes(range(256)) * 4
+
+
+def cuerpo(*campos) -> bytes:
+    """campos: (name, filename o None, contenido)"""
+    partes = []
+    for nombre, archivo, contenido in campos:
+        disposicion = f'form-data; name="{nombre}"' + (f'; filename="{archivo}"' if archivo else "")
+        partes.append(f"--{BOUNDARY}\r\nContent-Disposition: {disposicion}\r\n\r\n".encode() + contenido + b"\r\n")
+    return b"".join(partes) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def evento(body: bytes) -> dict:
+    return {"body": base64.b64encode(body).decode(), "isBase64Encoded": True}
+
+
+class TestPartes:
+
+    def test_parts_are_views_over_the_decoded_buffer(self):
+        body = multipart.cuerpo_bytes(evento(cuerpo(("cer", "a.cer", CER), ("ctrsn", None, "contraseña".encode()))))
+
+        campos = multipart.partes_por_nombre(multipart.partes(body, CONTENT_TYPE))
+
+        assert isinstance(campos["cer"].contenido, memoryview)
+        assert campos["cer"].contenido.obj is body
+        assert bytes(campos["cer"].contenido) == CER
+        assert campos["cer"].archivo == "a.cer"
+        assert campos["ctrsn"].texto == "contraseña"
+        assert campos["ctrsn"].archivo is None
+
+    def test_content_containing_crlf_and_dashes_is_kept(self):
+        contenido = b"\r\n--no es boundary\r\n\r\n"
+
+        parte, = multipart.partes(cuerpo(("csf", "a.pdf", contenido)), CONTENT_TYPE)
+
+        assert bytes(parte.contenido) == contenido
+
+    def test_quoted_boundary_and_preamble(self):
+        body = b"preambulo\r\n" + cuerpo(("csf", "a.pdf", b"%PDF"))
+
+        parte, = multipart.partes(body, f'multipart/form-data; boundary="{BOUNDARY}"')
+
+        assert bytes(parte.contenido) == b"%PDF"
+
+    def test_missing_closing_boundary(self):
+        body = cuerpo(("csf", "a.pdf", b"%PDF"))[:-len(BOUNDARY) - 8]
+
+        with pytest.raises(multipart.CargaInvalida):
+            multipart.partes(body, CONTENT_TYPE)
+
+    def test_wrong_content_type(self):
+        with pytest.raises(multipart.CargaInvalida):
+            multipart.partes(b"", "application/pdf")
+
+
+class TestCuerpoBytes:
+
+    def test_size_is_checked_before_decoding(self, monkeypatch):
+        monkeypatch.setattr(multipart.binascii, "a2b_base64", None)
+
+        with pytest.raises(multipart.CargaDemasiadoGrande):
+            multipart.cuerpo_bytes(evento(b"x" * 3000), maximo=1000)
+
+    def test_invalid_base64(self):
+        with pytest.raises(multipart.CargaInvalida):
+            multipart.cuerpo_bytes({"body": "no*es*base64", "isBase64Encoded": True})
+
+    def test_text_body_keeps_bytes_with_latin1(self):
+        assert multipart.cuerpo_bytes({"body": "\xff\x00"}) == b"\xff\x00"
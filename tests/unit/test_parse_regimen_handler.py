@@ -0,0 +1,120 @@
+"""
+Unit tests for parse_regimen_handler.
+These tests use mocks and do not require a database connection.
+"""
+import base64
+import hashlib
+import io
+import json
+import zipfile
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+
+import invoice_cdk.lambdas.parse_regimen_handler as parse_regimen_handler
+
+PDF = b"%PDF-1.7 constancia"
+CSF = {"razonSocial": "ESCUELA KEMPER URGATE", "Rfc": "EKU9003173C9", "codigoPostal": "42501", "regimenFiscal": ["601"]}
+
+
+def evento(pdf=PDF):
+    return {
+        "httpMethod": "POST",
+        "headers": {"origin": "http://localhost:3000", "Content-Type": "application/pdf"},
+        "body": base64.b64encode(pdf).decode(),
+        "isBase64Encoded": True,
+    }
+
+
+def modulo_parser(datos):
+    """Reemplazo de pdf_regimen_parser_pymupdf para sys.modules"""
+    parser = MagicMock(paginas_leidas=2, paginas_totales=4)
+    parser.extract_from_bytes.return_value = datos
+    return MagicMock(RegimenFiscalPyMuPDFParser=MagicMock(return_value=parser)), parser
+
+
+class TestParseRegimenCache:
+
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.guarda_csf')
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.obtiene_csf')
+    def test_hit_returns_without_importing_the_parser(self, mock_obtiene, mock_guarda, monkeypatch):
+        mock_obtiene.return_value = CSF
+        # Con None en sys.modules cualquier import del parser falla
+        monkeypatch.setitem(__import__("sys").modules, "pdf_regimen_parser_pymupdf", None)
+
+        response = parse_regimen_handler.handler(evento(), {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"csf": CSF}
+        mock_obtiene.assert_called_once_with(hashlib.sha256(PDF).hexdigest(), parse_regimen_handler.csf_cache_collection)
+        mock_guarda.assert_not_called()
+
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.guarda_csf')
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.obtiene_csf')
+    def test_miss_parses_and_stores_by_hash(self, mock_obtiene, mock_guarda, monkeypatch):
+        mock_obtiene.return_value = None
+        modulo, parser = modulo_parser(CSF)
+        monkeypatch.setitem(__import__("sys").modules, "pdf_regimen_parser_pymupdf", modulo)
+
+        response = parse_regimen_handler.handler(evento(), {})
+
+        assert json.loads(response["body"]) == {"csf": CSF}
+        parser.extract_from_bytes.assert_called_once_with(PDF)
+        mock_guarda.assert_called_once_with(
+            hashlib.sha256(PDF).hexdigest(), CSF, parse_regimen_handler.csf_cache_collection)
+
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.guarda_csf')
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.obtiene_csf')
+    def test_unreadable_pdf_is_not_cached(self, mock_obtiene, mock_guarda, monkeypatch):
+        mock_obtiene.side_effect = RuntimeError("Mongo caído")
+        modulo, _ = modulo_parser({"razonSocial": "", "Rfc": "", "codigoPostal": "", "regimenFiscal": None})
+        monkeypatch.setitem(__import__("sys").modules, "pdf_regimen_parser_pymupdf", modulo)
+
+        response = parse_regimen_handler.handler(evento(), {})
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        mock_guarda.assert_not_called()
+
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.obtiene_csf')
+    def test_emits_hit_metric(self, mock_obtiene, capsys, monkeypatch):
+        monkeypatch.setattr(parse_regimen_handler, "registra_consulta",
+                            MagicMock(return_value={"consultas": 4, "aciertos": 3, "tasa_aciertos": 0.75}))
+        mock_obtiene.return_value = CSF
+
+        parse_regimen_handler.handler(evento(), {})
+
+        linea = next(json.loads(l) for l in capsys.readouterr().out.splitlines() if l.startswith('{"_aws"'))
+        assert linea["CsfCacheHit"] == 1
+        assert linea["tasa_aciertos"] == 0.75
+        assert linea["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Servicio"]]
+
+
+class TestLote:
+
+    @patch('invoice_cdk.lambdas.parse_regimen_handler.procesa_lote')
+    def test_zip_batch_returns_ndjson(self, mock_procesa):
+        mock_procesa.return_value = iter([
+            {"archivo": "a.pdf", "huella": "h", "csf": CSF, "cache": False},
+            {"resumen": {"archivos": 1, "correctos": 1, "errores": 0, "en_cache": 0}},
+        ])
+        zip_bytes = io.BytesIO()
+        with zipfile.ZipFile(zip_bytes, "w") as zip_file:
+            zip_file.writestr("a.pdf", PDF)
+        event = {**evento(zip_bytes.getvalue()), "resource": "/parsea-pdf/lote"}
+        event["headers"]["Content-Type"] = "application/zip"
+
+        response = parse_regimen_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["headers"]["Content-Type"] == "application/x-ndjson"
+        lineas = [json.loads(l) for l in response["body"].splitlines()]
+        assert lineas[-1]["resumen"]["correctos"] == 1
+        archivos = mock_procesa.call_args.args[0]
+        assert archivos == [("a.pdf", PDF)]
+        assert mock_procesa.call_args.kwargs["receptor_collection"] is None
+
+    def test_invalid_zip_is_bad_request(self):
+        event = {**evento(b"no es zip"), "resource": "/parsea-pdf/lote"}
+
+        response = parse_regimen_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,136 @@
+"""
+Unit tests for pdf_regimen_parser_pymupdf (text extraction only, no PDF needed).
+"""
+from unittest.mock import MagicMock
+import invoice_cdk.lambdas.pdf_regimen_parser_pymupdf as pdf_parser
+
+PERSONA_FISICA = "\n".join([
+    "CÉDULA DE IDENTIFICACIÓN FISCAL",
+    "RFC:",
+    "pefa800101ab1",
+    "Nombre (s):",
+    "ANA",
+    "Primer Apellido:",
+    "PEREZ",
+    "Segundo Apellido:",
+    "FLORES",
+    "Código Postal:\t06600",
+    "Actividades Económicas:",
+    "Fecha Fin",
+    "1",
+    "Regímenes:",
+    "Régimen",
+    "Fecha Inicio",
+    "Fecha Fin",
+    "Régimen de Sueldos y Salarios e Ingresos Asimilados a Salarios",
+    "01/01/2010",
+    "",
+    "Régimen Simplificado de Confianza",
+    "01/01/2022",
+    "Obligaciones:",
+    "Declaración anual",
+])
+
+PERSONA_MORAL = "\n".join([
+    "RFC:",
+    "EKU9003173C9",
+    "Denominación/Razón Social:",
+    "ESCUELA KEMPER URGATE",
+    "CódigoPostal: 42501",
+    "Obligaciones:",
+    "Regímenes:",
+])
+
+
+def extrae(texto):
+    return pdf_parser.RegimenFiscalPyMuPDFParser()._extract_all_from_text(texto)
+
+
+class TestExtractorCSF:
+
+    def test_persona_fisica(self, capsys):
+        assert extrae(PERSONA_FISICA) == {
+            "razonSocial": "ANA PEREZ FLORES",
+            "Rfc": "PEFA800101AB1",
+            "codigoPostal": "06600",
+            "regimenFiscal": [
+                "Régimen de Sueldos y Salarios e Ingresos Asimilados a Salarios",
+                "Régimen Simplificado de Confianza",
+            ],
+        }
+        assert capsys.readouterr().out == ""
+
+    def test_persona_moral_with_obligaciones_before_regimenes(self):
+        assert extrae(PERSONA_MORAL) == {
+            "razonSocial": "ESCUELA KEMPER URGATE",
+            "Rfc": "EKU9003173C9",
+            "codigoPostal": "42501",
+            "regimenFiscal": [],
+        }
+
+    def test_unclosed_regimenes_table_is_not_reported(self):
+        texto = PERSONA_FISICA.split("Obligaciones:")[0]
+
+        assert extrae(texto)["regimenFiscal"] is None
+
+    def test_empty_value_takes_next_line_like_before(self):
+        datos = extrae("RFC:\nPEFA800101AB1\nNombre (s):\nPrimer Apellido:\nPEREZ\nSegundo Apellido:\nFLORES")
+
+        assert datos["razonSocial"] == "Primer Apellido: PEREZ FLORES"
+
+    def test_missing_fields_default_to_empty(self):
+        assert extrae("texto sin datos") == {
+            "razonSocial": "", "Rfc": "", "codigoPostal": "", "regimenFiscal": None
+        }
+
+    def test_stops_once_complete(self):
+        extractor = pdf_parser.ExtractorCSF()
+        for line in PERSONA_FISICA.splitlines():
+            extractor.alimenta(line)
+            if line == "Obligaciones:":
+                break
+            assert not extractor.completo
+
+        assert extractor.completo
+
+
+def documento(*paginas):
+    """Documento de PyMuPDF falso con una página por texto"""
+    pages = []
+    for texto in paginas:
+        page = MagicMock()
+        page.get_text.return_value = texto
+        pages.append(page)
+    doc = MagicMock()
+    doc.page_count = len(pages)
+    doc.__iter__.side_effect = lambda: iter(pages)
+    doc.__enter__.return_value = doc
+    return doc, pages
+
+
+class TestLecturaPorPaginas:
+
+    def test_stops_decoding_pages_once_complete(self, monkeypatch):
+        primera, segunda = PERSONA_FISICA.split("Regímenes:")
+        doc, pages = documento(primera, "Regímenes:" + segunda, "Página 3", "Página 4")
+        fitz = MagicMock()
+        fitz.open.return_value = doc
+        monkeypatch.setattr(pdf_parser, "fitz", fitz)
+        parser = pdf_parser.RegimenFiscalPyMuPDFParser()
+
+        datos = parser.extract_from_bytes(b"%PDF")
+
+        assert datos == extrae(PERSONA_FISICA)
+        assert (parser.paginas_leidas, parser.paginas_totales) == (2, 4)
+        pages[2].get_text.assert_not_called()
+        fitz.open.assert_called_once_with(stream=b"%PDF", filetype="pdf")
+
+    def test_text_only_mode_passes_flags(self, monkeypatch):
+        doc, pages = documento(PERSONA_MORAL)
+        monkeypatch.setattr(pdf_parser, "fitz", MagicMock(open=MagicMock(return_value=doc)))
+
+        pdf_parser.RegimenFiscalPyMuPDFParser().extract_from_bytes(b"%PDF")
+        pdf_parser.RegimenFiscalPyMuPDFParser(solo_texto=False).extract_from_bytes(b"%PDF")
+
+        assert pages[0].get_text.call_args_list[0].kwargs == {"flags": pdf_parser.FLAGS_SOLO_TEXTO}
+        assert pages[0].get_text.call_args_list[1].kwargs == {}
@@ -156,23 +156,17 @@ class TestReceptorHandlerPut:
     @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
     def test_update_receptor_success(self, mock_valida_cors, mock_update_receptor,
                                      mock_obtiene_receptor, sample_receptor_data):
-        """Test successful receptor update"""
+        """Test successful receptor update returns the updated document without re-reading it"""
         import invoice_cdk.lambdas.receptor_handler as receptor_handler
         
         # Setup mocks
         mock_valida_cors.return_value = "http://localhost:3000"
         
-        # Mock UpdateResult with matched_count attribute
-        mock_update_result = MagicMock()
-        mock_update_result.matched_count = 1
-        mock_update_result.modified_count = 1
-        mock_update_receptor.return_value = mock_update_result
-        
-        # Mock the updated receptor retrieval
+        # update_receptor returns the document after the update
         updated_receptor = sample_receptor_data.copy()
         updated_receptor["Nombre"] = "Juan Perez Updated"
         updated_receptor["_id"] = ObjectId("507f1f77bcf86cd799439011")
-        mock_obtiene_receptor.return_value = updated_receptor
+        mock_update_receptor.return_value = updated_receptor
         
         updated_data = sample_receptor_data.copy()
         updated_data["Nombre"] = "Juan Perez Updated"
@@ -191,8 +185,30 @@ class TestReceptorHandlerPut:
         body = json.loads(response["body"])
         assert "message" in body
         assert body["message"] == "Receptor updated"
-        mock_update_receptor.assert_called_once()
-        mock_obtiene_receptor.assert_called_once()
+        assert body["receptor"]["Nombre"] == "Juan Perez Updated"
+        assert body["receptor"]["_id"] == "507f1f77bcf86cd799439011"
+        mock_update_receptor.assert_called_once_with("TEST123456ABC", updated_data, receptor_handler.receptor_collection)
+        mock_obtiene_receptor.assert_not_called()
+    
+    @patch('invoice_cdk.lambdas.receptor_handler.update_receptor')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_update_receptor_not_found(self, mock_valida_cors, mock_update_receptor, sample_receptor_data):
+        """Test update of a RFC that does not exist"""
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_update_receptor.return_value = None
+        
+        event = {
+            "httpMethod": "PUT",
+            "pathParameters": {"id_receptor": "NOEXISTE123"},
+            "body": json.dumps(sample_receptor_data),
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = receptor_handler.handler(event, {})
+        
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
 
 
 class TestReceptorHandlerInvalidMethod:
@@ -216,3 +232,151 @@ class TestReceptorHandlerInvalidMethod:
         assert response["statusCode"] == HTTPStatus.BAD_REQUEST
         body = json.loads(response["body"])
         assert "error" in body
+
+
+class TestReceptorHandlerImportar:
+    """Unit tests for POST /receptor/importar"""
+
+    @patch('invoice_cdk.lambdas.receptor_handler.importa_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_csv_body_is_parsed_with_headers(self, mock_valida_cors, mock_importa):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        filas = []
+        mock_importa.side_effect = lambda f, coll: filas.extend(f) or {"procesadas": len(filas)}
+
+        event = {
+            "httpMethod": "POST",
+            "resource": "/receptor/importar",
+            "body": "﻿Rfc,Nombre\nXAXX010101000,PUBLICO\nAAA010101AAA,\"EMPRESA, SA\"\n",
+            "headers": {"origin": "http://localhost:3000", "Content-Type": "text/csv; charset=utf-8"}
+        }
+
+        response = receptor_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert filas == [{"Rfc": "XAXX010101000", "Nombre": "PUBLICO"}, {"Rfc": "AAA010101AAA", "Nombre": "EMPRESA, SA"}]
+        assert json.loads(response["body"]) == {"procesadas": 2}
+
+    @patch('invoice_cdk.lambdas.receptor_handler.importa_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_ndjson_base64_body_reports_bad_lines(self, mock_valida_cors, mock_importa):
+        import base64
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        filas = []
+        mock_importa.side_effect = lambda f, coll: filas.extend(f) or {}
+        cuerpo = '{"Rfc": "XAXX010101000"}\n\nno es json\n[1]\n'
+
+        event = {
+            "httpMethod": "POST",
+            "resource": "/receptor/importar",
+            "body": base64.b64encode(cuerpo.encode()).decode(),
+            "isBase64Encoded": True,
+            "headers": {"origin": "http://localhost:3000", "content-type": "application/x-ndjson"}
+        }
+
+        response = receptor_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert filas[0] == {"Rfc": "XAXX010101000"}
+        assert isinstance(filas[1], ValueError) and isinstance(filas[2], ValueError)
+        assert len(filas) == 3
+
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_unknown_format_is_rejected(self, mock_valida_cors):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+
+        event = {
+            "httpMethod": "POST",
+            "resource": "/receptor/importar",
+            "queryStringParameters": {"formato": "xlsx"},
+            "body": "",
+            "headers": {"origin": "http://localhost:3000"}
+        }
+
+        assert receptor_handler.handler(event, {})["statusCode"] == HTTPStatus.BAD_REQUEST
+
+
+class TestReceptorHandlerExportar:
+    """Unit tests for GET /receptor/exportar"""
+
+    @patch('invoice_cdk.lambdas.receptor_handler.exporta_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_full_page_returns_ndjson_and_next_cursor(self, mock_valida_cors, mock_exporta):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        mock_exporta.return_value = iter([{"_id": "a1", "Rfc": "X"}, {"_id": "b2", "Rfc": "Y"}])
+
+        event = {
+            "httpMethod": "GET",
+            "resource": "/receptor/exportar",
+            "queryStringParameters": {"limit": "2", "after": "0f"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+
+        response = receptor_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert response["headers"]["Content-Type"] == "application/x-ndjson"
+        assert response["headers"]["X-Next-Cursor"] == "b2"
+        assert [json.loads(l)["Rfc"] for l in response["body"].splitlines()] == ["X", "Y"]
+        mock_exporta.assert_called_once_with(receptor_handler.receptor_collection, after="0f", limite=2)
+
+    @patch('invoice_cdk.lambdas.receptor_handler.exporta_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_last_page_has_no_cursor(self, mock_valida_cors, mock_exporta):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        mock_exporta.return_value = iter([{"_id": "a1"}])
+
+        event = {"httpMethod": "GET", "resource": "/receptor/exportar", "headers": {"origin": "http://localhost:3000"}}
+
+        response = receptor_handler.handler(event, {})
+
+        assert "X-Next-Cursor" not in response["headers"]
+
+    @patch('invoice_cdk.lambdas.receptor_handler.exporta_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_invalid_cursor_is_rejected(self, mock_valida_cors, mock_exporta):
+        from bson.errors import InvalidId
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        mock_exporta.side_effect = InvalidId("no")
+
+        event = {"httpMethod": "GET", "resource": "/receptor/exportar",
+                 "queryStringParameters": {"after": "no"}, "headers": {"origin": "http://localhost:3000"}}
+
+        assert receptor_handler.handler(event, {})["statusCode"] == HTTPStatus.BAD_REQUEST
+
+
+class TestReceptorHandlerBuscar:
+    """Unit tests for GET /receptor/buscar"""
+
+    @patch('invoice_cdk.lambdas.receptor_handler.busca_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_search_returns_page_and_cursor(self, mock_valida_cors, mock_busca):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        mock_busca.return_value = ([{"_id": "a1", "Rfc": "XAXX010101000"}], "cursor")
+
+        event = {
+            "httpMethod": "GET",
+            "resource": "/receptor/buscar",
+            "queryStringParameters": {"q": "xaxx", "limit": "500"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+
+        response = receptor_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"data": [{"_id": "a1", "Rfc": "XAXX010101000"}], "next": "cursor"}
+        mock_busca.assert_called_once_with("xaxx", receptor_handler.receptor_collection,
+                                           campo=None, limite=receptor_handler.BUSQUEDA_LIMITE_MAXIMO, after=None)
+
+    @patch('invoice_cdk.lambdas.receptor_handler.busca_receptores')
+    @patch('invoice_cdk.lambdas.receptor_handler.valida_cors')
+    def test_invalid_search_is_bad_request(self, mock_valida_cors, mock_busca):
+        import invoice_cdk.lambdas.receptor_handler as receptor_handler
+        mock_busca.side_effect = ValueError("El texto de búsqueda está vacío")
+
+        event = {"httpMethod": "GET", "resource": "/receptor/buscar", "headers": {"origin": "http://localhost:3000"}}
+
+        response = receptor_handler.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        assert "vacío" in json.loads(response["body"])["error"]
@@ -0,0 +1,146 @@
+"""
+Unit tests for reenvia_facturas_handler.
+These tests use mocks and do not require a database connection or AWS credentials.
+"""
+import json
+from http import HTTPStatus
+from unittest.mock import ANY, MagicMock
+import pytest
+
+import invoice_cdk.lambdas.reenvia_facturas_handler as reenvia_facturas_handler
+
+BODY = {"desde": "2024-01-01", "hasta": "2024-01-31", "rfc": "xaxx010101000", "formato": "zip"}
+
+
+def _event(body=BODY, method="POST", usuario="test_user@example.com", email_token="Test_User@example.com"):
+    return {
+        "httpMethod": method,
+        "headers": {"origin": "http://localhost:3000"},
+        "pathParameters": {"usuario": usuario},
+        "requestContext": {"authorizer": {"claims": {"email": email_token}}},
+        "body": json.dumps(body)
+    }
+
+
+@pytest.fixture
+def mocks(monkeypatch):
+    """Dependencias del handler reemplazadas; regresa los mocks por nombre"""
+    mocks = {
+        "ids_certificados_de_usuario": MagicMock(return_value=["c1", "c2"]),
+        "cuenta_facturas_reenvio": MagicMock(return_value=12),
+        "consulta_facturas_reenvio": MagicMock(return_value=[{"uuid": "1"}]),
+        "completa_datos_pdf": MagicMock(),
+        "obtiene_pdfs": MagicMock(return_value={}),
+        "ejecuta_reenvio": MagicMock(return_value={"facturas": 1, "facturasEnviadas": 1, "correosEnviados": 1}),
+        "EmailSender": MagicMock(),
+        "BitacoraWriter": MagicMock(),
+        "_lambda_client": MagicMock(),
+    }
+    for nombre, mock in mocks.items():
+        monkeypatch.setattr(reenvia_facturas_handler, nombre, mock)
+    return mocks
+
+
+def _contexto():
+    contexto = MagicMock()
+    contexto.invoked_function_arn = "arn:aws:lambda:us-east-1:123:function:reenvia-facturas-lambda-invoice:Prod"
+    return contexto
+
+
+class TestReenviaFacturasHandlerPost:
+
+    def test_accepts_and_invokes_itself_asynchronously(self, mocks):
+        response = reenvia_facturas_handler.handler(_event(), _contexto())
+
+        assert response["statusCode"] == HTTPStatus.ACCEPTED
+        body = json.loads(response["body"])
+        assert body["facturas"] == 12
+        kwargs = mocks["_lambda_client"].return_value.invoke.call_args.kwargs
+        assert kwargs["InvocationType"] == "Event"
+        assert kwargs["FunctionName"].endswith(":Prod")
+        solicitud = json.loads(kwargs["Payload"])["reenvio"]
+        assert solicitud["idReenvio"] == body["idReenvio"]
+        assert solicitud["rfc"] == "XAXX010101000"
+        assert solicitud["idsCertificado"] == ["c1", "c2"]
+        assert solicitud["solicitante"] == "test_user@example.com"
+        mocks["BitacoraWriter"].return_value.flush.assert_called_once()
+
+    def test_other_users_invoices_are_forbidden(self, mocks):
+        response = reenvia_facturas_handler.handler(_event(usuario="otro@example.com"), _contexto())
+
+        assert response["statusCode"] == HTTPStatus.FORBIDDEN
+        mocks["ids_certificados_de_usuario"].assert_not_called()
+        mocks["_lambda_client"].assert_not_called()
+
+    def test_missing_token_is_forbidden(self, mocks):
+        event = _event()
+        del event["requestContext"]
+
+        assert reenvia_facturas_handler.handler(event, _contexto())["statusCode"] == HTTPStatus.FORBIDDEN
+
+    def test_email_override_is_logged_with_the_caller(self, mocks):
+        reenvia_facturas_handler.handler(_event({**BODY, "email": "contador@example.com"}), _contexto())
+
+        evento = mocks["BitacoraWriter"].return_value.registra.call_args.args[0]
+        assert evento["solicitante"] == "test_user@example.com"
+        assert "contador@example.com" in evento["mensaje"]
+
+    def test_invalid_body_returns_bad_request(self, mocks):
+        response = reenvia_facturas_handler.handler(_event({"desde": "2024-01-01"}), _contexto())
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        mocks["_lambda_client"].assert_not_called()
+
+    def test_no_invoices_returns_not_found(self, mocks):
+        mocks["cuenta_facturas_reenvio"].return_value = 0
+
+        response = reenvia_facturas_handler.handler(_event(), _contexto())
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        mocks["_lambda_client"].assert_not_called()
+
+    def test_too_many_invoices_returns_bad_request(self, mocks):
+        mocks["cuenta_facturas_reenvio"].return_value = reenvia_facturas_handler.MAX_FACTURAS + 1
+
+        response = reenvia_facturas_handler.handler(_event(), _contexto())
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+        mocks["_lambda_client"].assert_not_called()
+
+
+class TestReenviaFacturasHandlerAsync:
+
+    def test_runs_job_and_records_summary(self, mocks):
+        solicitud = {"idReenvio": "abc", "idsCertificado": ["c1"], "desde": "2024-01-01", "hasta": "2024-01-31",
+                     "rfc": "XAXX010101000", "sucursal": None, "email": None, "formato": "zip"}
+
+        resumen = reenvia_facturas_handler.handler({"reenvio": solicitud}, _contexto())
+
+        assert resumen["facturasEnviadas"] == 1
+        mocks["completa_datos_pdf"].assert_called_once_with([{"uuid": "1"}], ANY, ANY)
+        bitacora = mocks["BitacoraWriter"].return_value
+        assert mocks["ejecuta_reenvio"].call_args.args[3] is bitacora
+        assert "Reenvío terminado" in bitacora.registra.call_args.args[0]["mensaje"]
+        bitacora.flush.assert_called_once()
+
+    def test_cached_pdfs_are_not_rendered_again(self, mocks):
+        mocks["consulta_facturas_reenvio"].return_value = [{"uuid": "1"}, {"uuid": "2"}]
+        mocks["obtiene_pdfs"].return_value = {"1": b"%PDF-1"}
+        solicitud = {"idReenvio": "abc", "idsCertificado": ["c1"], "desde": "2024-01-01", "hasta": "2024-01-31"}
+
+        reenvia_facturas_handler.handler({"reenvio": solicitud}, _contexto())
+
+        mocks["completa_datos_pdf"].assert_called_once_with([{"uuid": "2"}], ANY, ANY)
+        facturas = mocks["ejecuta_reenvio"].call_args.args[1]
+        assert facturas[0]["pdf"] == b"%PDF-1" and "pdf" not in facturas[1]
+
+    def test_job_errors_are_logged_without_retry(self, mocks):
+        mocks["consulta_facturas_reenvio"].side_effect = RuntimeError("sin conexión")
+        solicitud = {"idReenvio": "abc", "idsCertificado": ["c1"], "desde": "2024-01-01", "hasta": "2024-01-31"}
+
+        resultado = reenvia_facturas_handler.handler({"reenvio": solicitud}, _contexto())
+
+        assert resultado == {"error": "sin conexión"}
+        bitacora = mocks["BitacoraWriter"].return_value
+        assert bitacora.registra.call_args.args[0]["status"] == "error"
+        bitacora.flush.assert_called_once()
@@ -0,0 +1,223 @@
+"""
+Unit tests for reenvio_facturas, factura_pdf and the re-send queries of db_factura.
+These tests use mocks and do not require a database connection, fpdf or an SMTP server.
+"""
+import io
+import os
+import zipfile
+from unittest.mock import MagicMock
+import pytest
+
+import invoice_cdk.lambdas.reenvio_facturas as reenvio_facturas
+import invoice_cdk.lambdas.factura_pdf as factura_pdf
+import invoice_cdk.lambdas.dbaccess.db_factura as db_factura
+
+CFDI = ('<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4">'
+        '<cfdi:Emisor Rfc="EKU9003173C9" RegimenFiscal="601"/>'
+        '<cfdi:Receptor Rfc="XAXX010101000" RegimenFiscalReceptor="616"/>'
+        '</cfdi:Comprobante>')
+
+
+def factura(uuid, email="cliente@example.com", sucursal="S1"):
+    return {"uuid": uuid, "ticket": f"T-{uuid}", "sucursal": sucursal, "email": email, "cfdi": CFDI,
+            "qrCode": "qr", "cadenaOriginalSAT": "||1.1||"}
+
+
+def renderiza_falso(factura: dict) -> dict:
+    """Reemplazo de factura_pdf.renderiza: "muere" mata al proceso, "roto" no se puede generar"""
+    if factura["uuid"] == "muere":
+        os._exit(1)
+    if factura["uuid"] == "roto":
+        return {"error": "No se pudo generar el PDF: roto"}
+    return {"pdf": b"%PDF-" + factura["uuid"].encode()}
+
+
+@pytest.fixture(autouse=True)
+def sin_fpdf(monkeypatch):
+    monkeypatch.setattr(reenvio_facturas, "renderiza", renderiza_falso)
+
+
+@pytest.fixture
+def sender():
+    """EmailSender falso: send_emails regresa True para cada correo salvo los de malo@"""
+    sender = MagicMock()
+    sender.send_emails.side_effect = lambda correos: [not c["recipient_email"].startswith("malo") for c in correos]
+    return sender
+
+
+def solicitud(**cambios):
+    return {"idReenvio": "abc", "desde": "2024-01-01", "hasta": "2024-01-31", "rfc": "XAXX010101000",
+            "sucursal": None, "email": None, "formato": "adjuntos", **cambios}
+
+
+class TestValidaSolicitud:
+
+    def test_normalizes_fields(self):
+        resultado = reenvio_facturas.valida_solicitud(
+            {"desde": "2024-01-01", "hasta": "2024-01-31", "rfc": " xaxx010101000 ", "email": ""})
+
+        assert resultado == {"desde": "2024-01-01", "hasta": "2024-01-31", "rfc": "XAXX010101000",
+                             "sucursal": None, "email": None, "formato": "adjuntos"}
+
+    @pytest.mark.parametrize("body", [
+        {"desde": "2024-01-31", "hasta": "2024-01-01", "rfc": "X"},
+        {"desde": "01/01/2024", "hasta": "2024-01-31", "rfc": "X"},
+        {"desde": "2024-01-01", "hasta": "2024-01-31"},
+        {"desde": "2024-01-01", "hasta": "2024-01-31", "sucursal": "S1", "email": "sin-arroba"},
+        {"desde": "2024-01-01", "hasta": "2024-01-31", "sucursal": "S1", "formato": "tar"},
+        {"desde": "2024-01-01", "hasta": "2024-01-31", "sucursal": "S1", "email": "contador@example.com"},
+    ])
+    def test_invalid_requests_are_rejected(self, body):
+        with pytest.raises(reenvio_facturas.SolicitudInvalida):
+            reenvio_facturas.valida_solicitud(body)
+
+
+class TestAgrupaYParte:
+
+    def test_groups_case_insensitively_and_separates_missing_email(self):
+        facturas = [factura("1", "Cliente@Example.com"), factura("2"), factura("3", None)]
+
+        grupos, sin_correo = reenvio_facturas.agrupa_por_destinatario(facturas)
+
+        assert {k: [f["uuid"] for f in v] for k, v in grupos.items()} == {"cliente@example.com": ["1", "2"]}
+        assert [f["uuid"] for f in sin_correo] == ["3"]
+
+    def test_override_email_receives_everything(self):
+        grupos, sin_correo = reenvio_facturas.agrupa_por_destinatario(
+            [factura("1", None), factura("2", "otro@example.com")], "contador@example.com")
+
+        assert list(grupos) == ["contador@example.com"] and len(grupos["contador@example.com"]) == 2
+        assert sin_correo == []
+
+    def test_split_by_size_keeps_pdf_and_xml_together(self):
+        archivos = [[("a.pdf", b"x" * 40), ("a.xml", b"x" * 10)],
+                    [("b.pdf", b"x" * 40), ("b.xml", b"x" * 10)],
+                    [("c.pdf", b"x" * 200), ("c.xml", b"x" * 10)]]
+
+        correos = reenvio_facturas.parte_por_tamano(archivos, maximo=100)
+
+        assert [[nombre for nombre, _ in correo] for correo in correos] == [
+            ["a.pdf", "a.xml", "b.pdf", "b.xml"], ["c.pdf", "c.xml"]]
+
+    def test_zip_format_attaches_a_single_archive(self):
+        archivos = [reenvio_facturas.archivos_de_factura({**factura("1"), "pdf": b"%PDF"})]
+
+        correos = reenvio_facturas.correos_de_destinatario("c@x.com", archivos, "zip", "Facturas")
+
+        assert len(correos) == 1 and correos[0]["subject"] == "Facturas"
+        adjunto, = correos[0]["adjuntos"]
+        assert adjunto.tipo == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(adjunto.contenido)) as zip_file:
+            assert sorted(zip_file.namelist()) == ["1.pdf", "1.xml"]
+
+
+class TestEjecutaReenvio:
+
+    def test_sends_one_batch_per_recipient_and_logs_progress(self, sender):
+        bitacora = MagicMock()
+        facturas = [factura("1"), factura("2"), factura("3", "otro@example.com"), factura("4", None)]
+
+        resumen = reenvio_facturas.ejecuta_reenvio(solicitud(), facturas, sender, bitacora, trabajadores=1)
+
+        assert resumen == {"facturas": 4, "pdfsConError": 0, "destinatarios": 2, "sinCorreo": 1,
+                           "facturasEnviadas": 3, "correosEnviados": 2, "correosConError": 0}
+        assert sender.send_emails.call_count == 2
+        primeros = sender.send_emails.call_args_list[0].args[0]
+        assert [a.nombre for a in primeros[0]["adjuntos"]] == ["1.pdf", "1.xml", "2.pdf", "2.xml"]
+        eventos = [llamada.args[0] for llamada in bitacora.registra.call_args_list]
+        assert all(evento["idReenvio"] == "abc" for evento in eventos)
+        assert [e["status"] for e in eventos] == ["error", "exito", "exito"]
+        assert bitacora.flush_en_segundo_plano.call_count == 2
+
+    def test_failed_pdfs_and_failed_sends_are_reported(self, sender):
+        bitacora = MagicMock()
+        facturas = [factura("roto"), factura("2", "malo@example.com"), factura("3")]
+
+        resumen = reenvio_facturas.ejecuta_reenvio(solicitud(), facturas, sender, bitacora, trabajadores=1)
+
+        assert resumen["pdfsConError"] == 1
+        assert resumen["facturasEnviadas"] == 1
+        assert resumen["correosConError"] == 1
+        assert "UUID roto" in bitacora.registra.call_args_list[0].args[0]["mensaje"]
+
+    def test_invoices_with_pdf_are_not_rendered(self, sender, monkeypatch):
+        renderiza = MagicMock(side_effect=renderiza_falso)
+        monkeypatch.setattr(reenvio_facturas, "renderiza", renderiza)
+        facturas = [{**factura("1"), "pdf": b"%PDF-cache"}, factura("2")]
+
+        resumen = reenvio_facturas.ejecuta_reenvio(solicitud(), facturas, sender, MagicMock(), trabajadores=1)
+
+        assert resumen["facturasEnviadas"] == 2
+        assert [llamada.args[0]["uuid"] for llamada in renderiza.call_args_list] == ["2"]
+        assert facturas[0]["pdf"] == b"%PDF-cache"
+
+    def test_pdfs_are_rendered_in_worker_processes(self, sender):
+        facturas = [factura(str(n)) for n in range(8)] + [factura("muere")]
+
+        resumen = reenvio_facturas.ejecuta_reenvio(solicitud(), facturas, sender, MagicMock(), trabajadores=2)
+
+        assert resumen["pdfsConError"] == 1
+        assert resumen["facturasEnviadas"] == 8
+
+
+class TestFacturaPdf:
+
+    def test_regimen_and_sucursal_lookups_happen_once(self, monkeypatch):
+        regimen = MagicMock(side_effect=lambda clave, _: {"601": "General de Ley", "616": "Sin obligaciones"}[clave])
+        sucursal = MagicMock(return_value={"direccion": "Av. Reforma 1"})
+        monkeypatch.setattr(factura_pdf, "get_regimen_fiscal_by_clave", regimen)
+        monkeypatch.setattr(factura_pdf, "get_sucursal_by_codigo", sucursal)
+        facturas = [factura("1"), factura("2"), {**factura("3"), "direccion": "Guardada"}]
+
+        factura_pdf.completa_datos_pdf(facturas, MagicMock(), MagicMock())
+
+        assert regimen.call_count == 2
+        sucursal.assert_called_once()
+        assert facturas[0]["regimenEmisor"] == "General de Ley"
+        assert facturas[1]["regimenReceptor"] == "Sin obligaciones"
+        assert [f["direccion"] for f in facturas] == ["Av. Reforma 1", "Av. Reforma 1", "Guardada"]
+
+    def test_render_errors_are_returned_not_raised(self, monkeypatch):
+        monkeypatch.setattr(factura_pdf, "genera_pdf", MagicMock(side_effect=ValueError("sin QR")))
+
+        assert factura_pdf.renderiza(factura("1")) == {"error": "No se pudo generar el PDF: sin QR"}
+
+
+class TestConsultasReenvio:
+
+    def test_filter_matches_index_prefix(self):
+        filtro = db_factura.filtro_reenvio(["c1"], "2024-01-01", "2024-01-31", rfc="xaxx010101000", sucursal="S1")
+
+        assert list(filtro)[:3] == ["rfcReceptor", "sucursal", "fechaTimbrado"]
+        assert filtro["rfcReceptor"] == "XAXX010101000"
+        assert filtro["fechaTimbrado"]["$gte"] < filtro["fechaTimbrado"]["$lte"]
+        assert filtro["estatus"] == {"$ne": "Cancelada"}
+
+    def test_count_stops_after_the_limit(self):
+        collection = MagicMock()
+
+        db_factura.cuenta_facturas_reenvio({"x": 1}, collection, 500)
+
+        collection.count_documents.assert_called_once_with({"x": 1}, limit=501)
+
+    def test_backfill_reads_rfc_from_xml_in_batches(self):
+        collection = MagicMock()
+        collection.find.return_value.batch_size.return_value = [
+            {"_id": 1, "cfdi": CFDI}, {"_id": 2, "cfdi": "no es xml"}, {"_id": 3, "cfdi": CFDI}]
+        collection.bulk_write.return_value.modified_count = 1
+
+        actualizadas = db_factura.migra_rfc_receptor(collection, tamano_lote=1)
+
+        assert actualizadas == 2
+        operaciones = [llamada.args[0][0] for llamada in collection.bulk_write.call_args_list]
+        assert [op._filter for op in operaciones] == [{"_id": 1, "rfcReceptor": None}, {"_id": 3, "rfcReceptor": None}]
+        assert operaciones[0]._doc == {"$set": {"rfcReceptor": "XAXX010101000"}}
+
+    def test_ticket_lookup_skips_cancelled_invoices(self):
+        collection = MagicMock()
+
+        db_factura.get_factura_vigente_by_ticket("T1", collection, {"uuid": 1})
+
+        filtro, projection = collection.find_one.call_args.args
+        assert filtro == {"ticket": "T1", "estatus": {"$ne": "Cancelada"}}
+        assert collection.find_one.call_args.kwargs == {"sort": [("fechaTimbrado", -1)]}
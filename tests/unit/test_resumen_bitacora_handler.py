@@ -0,0 +1,52 @@
+"""
+Unit tests for resumen_bitacora_handler.
+These tests use mocks and do not require a database connection.
+"""
+import json
+from unittest.mock import patch
+from http import HTTPStatus
+
+
+def _event(**params):
+    return {
+        "httpMethod": "GET",
+        "headers": {"origin": "http://localhost:3000"},
+        "queryStringParameters": {"fechaInicio": "2025-01-01", "fechaFin": "2025-01-31", **params}
+    }
+
+
+class TestResumenBitacoraHandlerGet:
+    """Unit tests for GET method (bitácora summary)"""
+
+    @patch('invoice_cdk.lambdas.resumen_bitacora_handler.resumen_bitacora')
+    @patch('invoice_cdk.lambdas.resumen_bitacora_handler.valida_cors')
+    def test_passes_filters_and_caps_top(self, mock_valida_cors, mock_resumen):
+        import invoice_cdk.lambdas.resumen_bitacora_handler as resumen_bitacora_handler
+
+        mock_valida_cors.return_value = "http://localhost:3000"
+        mock_resumen.return_value = {"total": 0}
+
+        response = resumen_bitacora_handler.handler(
+            _event(top="1000", intervalo="hora", status="error", rfcEmisor="FAR0010318A1"), None)
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"total": 0}
+        args, kwargs = mock_resumen.call_args
+        assert args[:2] == ("2025-01-01T00:00:00", "2025-01-31T23:59:59")
+        assert kwargs == {"top": 50, "intervalo": "hora", "filtros": {"status": "error", "rfcEmisor": "FAR0010318A1"}}
+
+    @patch('invoice_cdk.lambdas.resumen_bitacora_handler.valida_cors')
+    def test_invalid_interval_returns_bad_request(self, mock_valida_cors):
+        import invoice_cdk.lambdas.resumen_bitacora_handler as resumen_bitacora_handler
+
+        response = resumen_bitacora_handler.handler(_event(intervalo="semana"), None)
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
+
+    @patch('invoice_cdk.lambdas.resumen_bitacora_handler.valida_cors')
+    def test_missing_dates_returns_bad_request(self, mock_valida_cors):
+        import invoice_cdk.lambdas.resumen_bitacora_handler as resumen_bitacora_handler
+
+        response = resumen_bitacora_handler.handler({"httpMethod": "GET", "headers": {}, "queryStringParameters": None}, None)
+
+        assert response["statusCode"] == HTTPStatus.BAD_REQUEST
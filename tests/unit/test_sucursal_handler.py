@@ -139,37 +139,97 @@ class TestSucursalHandlerGet:
         body = json.loads(response["body"])
         assert body["error"] == "Sucursal not found"
     
+    @patch('invoice_cdk.lambdas.sucursal_handler.lista_sucursales')
+    @patch('invoice_cdk.lambdas.sucursal_handler.ids_certificados_de_usuario')
     @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
-    def test_get_all_sucursales(self, mock_cors, sucursal_handler_module):
-        """Test retrieval of all sucursales"""
+    def test_list_sucursales_by_certificado(self, mock_cors, mock_ids, mock_lista, sucursal_handler_module):
+        """Test paginated listing of the sucursales of one certificate"""
         mock_cors.return_value = "*"
-        
-        # Mock the collection find method to return a list
-        mock_find_result = [
-            {
-                "_id": ObjectId("68fab3e28f518fe7ff713f2e"),
-                "codigo_sucursal": "378",
-                "serie": "OPI"
-            },
-            {
-                "_id": ObjectId("68fab3e28f518fe7ff713f2f"),
-                "codigo_sucursal": "379",
-                "serie": "OPI"
-            }
+        mock_ids.return_value = ["68fa9bb5b5ae2b81154d5af9", "c2"]
+        mock_lista.return_value = [
+            {"_id": ObjectId("68fab3e28f518fe7ff713f2e"), "codigo_sucursal": "378", "serie": "OPI"},
+            {"_id": ObjectId("68fab3e28f518fe7ff713f2f"), "codigo_sucursal": "379", "serie": "OPI"}
         ]
-        
-        # Patch list() to return the mock data
-        with patch('invoice_cdk.lambdas.sucursal_handler.list', return_value=mock_find_result):
-            event = {
-                "httpMethod": "GET",
-                "headers": {"origin": "http://localhost:3000"}
-            }
-        
-            response = sucursal_handler_module.handler(event, {})
-        
-            assert response["statusCode"] == HTTPStatus.OK
-            body = json.loads(response["body"])
-            assert len(body) == 2
+
+        event = {
+            "httpMethod": "GET",
+            "queryStringParameters": {"id_certificado": "68fa9bb5b5ae2b81154d5af9", "limit": "2",
+                                      "campos": "codigo_sucursal,serie,password"},
+            "headers": {"origin": "http://localhost:3000"},
+            "requestContext": {"authorizer": {"claims": {"email": "test@example.com"}}}
+        }
+
+        response = sucursal_handler_module.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        body = json.loads(response["body"])
+        assert len(body["data"]) == 2
+        assert body["next"] == "68fab3e28f518fe7ff713f2f"
+        mock_lista.assert_called_once_with(
+            ["68fa9bb5b5ae2b81154d5af9"], sucursal_handler_module.sucursal_collection, 2,
+            after=None, projection={"codigo_sucursal": 1, "serie": 1})
+
+    @patch('invoice_cdk.lambdas.sucursal_handler.lista_sucursales')
+    @patch('invoice_cdk.lambdas.sucursal_handler.ids_certificados_de_usuario')
+    @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
+    def test_list_sucursales_by_usuario(self, mock_cors, mock_ids, mock_lista, sucursal_handler_module):
+        """Test listing resolves the certificates owned by the user"""
+        mock_cors.return_value = "*"
+        mock_ids.return_value = ["c1", "c2"]
+        mock_lista.return_value = []
+
+        event = {
+            "httpMethod": "GET",
+            "queryStringParameters": {"usuario": "test@example.com", "after": "68fab3e28f518fe7ff713f2e"},
+            "headers": {"origin": "http://localhost:3000"},
+            "requestContext": {"authorizer": {"claims": {"email": "Test@Example.com"}}}
+        }
+
+        response = sucursal_handler_module.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert json.loads(response["body"]) == {"data": [], "next": None}
+        mock_ids.assert_called_once_with("test@example.com", sucursal_handler_module.certificado_collection)
+        assert mock_lista.call_args.args[0] == ["c1", "c2"]
+        assert mock_lista.call_args.kwargs == {"after": "68fab3e28f518fe7ff713f2e", "projection": None}
+
+    @patch('invoice_cdk.lambdas.sucursal_handler.lista_sucursales')
+    @patch('invoice_cdk.lambdas.sucursal_handler.ids_certificados_de_usuario')
+    @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
+    def test_list_sucursales_defaults_to_token_user(self, mock_cors, mock_ids, mock_lista, sucursal_handler_module):
+        """Test listing without filters returns the sucursales of the Cognito user"""
+        mock_cors.return_value = "*"
+        mock_ids.return_value = ["c1"]
+        mock_lista.return_value = []
+        event = {"httpMethod": "GET", "headers": {"origin": "*"},
+                 "requestContext": {"authorizer": {"claims": {"email": "test@example.com"}}}}
+
+        response = sucursal_handler_module.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        mock_ids.assert_called_once_with("test@example.com", sucursal_handler_module.certificado_collection)
+
+    @pytest.mark.parametrize("query_params, claims", [
+        ({"usuario": "test@example.com"}, None),
+        ({"usuario": "otro@example.com"}, {"email": "test@example.com"}),
+        ({"id_certificado": "c9"}, {"email": "test@example.com"}),
+    ])
+    @patch('invoice_cdk.lambdas.sucursal_handler.lista_sucursales')
+    @patch('invoice_cdk.lambdas.sucursal_handler.ids_certificados_de_usuario')
+    @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
+    def test_list_sucursales_of_others_is_forbidden(self, mock_cors, mock_ids, mock_lista, query_params, claims,
+                                                    sucursal_handler_module):
+        """Test listing without token, for another user or a foreign certificate is forbidden"""
+        mock_cors.return_value = "*"
+        mock_ids.return_value = ["c1"]
+        event = {"httpMethod": "GET", "headers": {"origin": "*"}, "queryStringParameters": query_params}
+        if claims:
+            event["requestContext"] = {"authorizer": {"claims": claims}}
+
+        response = sucursal_handler_module.handler(event, {})
+
+        assert response["statusCode"] == HTTPStatus.FORBIDDEN
+        mock_lista.assert_not_called()
 
 
 class TestSucursalHandlerPut:
@@ -203,29 +263,16 @@ class TestSucursalHandlerPut:
 class TestSucursalHandlerDelete:
     """Test DELETE method - Delete sucursal"""
     
-    @patch('invoice_cdk.lambdas.sucursal_handler.delete_sucursal')
-    @patch('invoice_cdk.lambdas.sucursal_handler.update_certificate')
-    @patch('invoice_cdk.lambdas.sucursal_handler.get_certificate_by_id')
-    @patch('invoice_cdk.lambdas.sucursal_handler.get_sucursal_by_id')
+    @patch('invoice_cdk.lambdas.sucursal_handler.elimina_sucursal_cascada')
     @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
-    def test_delete_sucursal_success(self, mock_cors, mock_get_suc, mock_get_cert, 
-                                     mock_update_cert, mock_delete, sucursal_handler_module):
+    def test_delete_sucursal_success(self, mock_cors, mock_cascada, sucursal_handler_module):
         """Test successful sucursal deletion"""
         mock_cors.return_value = "*"
-        mock_get_suc.return_value = {
+        mock_cascada.return_value = {
             "_id": "68fab3e28f518fe7ff713f2e",
             "codigo_sucursal": "378",
             "id_certificado": "68fa9bb5b5ae2b81154d5af9"
         }
-        mock_get_cert.return_value = {
-            "_id": "68fa9bb5b5ae2b81154d5af9",
-            "sucursales": [
-                {"_id": "68fab3e28f518fe7ff713f2e", "codigo": "378"}
-            ]
-        }
-        
-        # Mock folio_collection
-        sucursal_handler_module.folio_collection.delete_one = Mock()
         
         event = {
             "httpMethod": "DELETE",
@@ -238,3 +285,29 @@ class TestSucursalHandlerDelete:
         assert response["statusCode"] == HTTPStatus.OK
         body = json.loads(response["body"])
         assert body["message"] == "Sucursal deleted"
+        mock_cascada.assert_called_once_with(
+            "68fab3e28f518fe7ff713f2e",
+            sucursal_handler_module.client,
+            sucursal_handler_module.sucursal_collection,
+            sucursal_handler_module.certificado_collection,
+            sucursal_handler_module.folio_collection
+        )
+    
+    @patch('invoice_cdk.lambdas.sucursal_handler.elimina_sucursal_cascada')
+    @patch('invoice_cdk.lambdas.sucursal_handler.valida_cors')
+    def test_delete_sucursal_not_found(self, mock_cors, mock_cascada, sucursal_handler_module):
+        """Test deleting a sucursal that does not exist"""
+        mock_cors.return_value = "*"
+        mock_cascada.return_value = None
+        
+        event = {
+            "httpMethod": "DELETE",
+            "pathParameters": {"id": "68fab3e28f518fe7ff713f2e"},
+            "headers": {"origin": "http://localhost:3000"}
+        }
+        
+        response = sucursal_handler_module.handler(event, {})
+        
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        body = json.loads(response["body"])
+        assert body["error"] == "Sucursal not found"
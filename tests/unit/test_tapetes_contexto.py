@@ -0,0 +1,151 @@
+"""
+Unit tests for tapetes_contexto.
+These tests use mocks and do not require a database connection or the Tapetes API.
+"""
+import copy
+from unittest.mock import MagicMock, patch
+import pytest
+
+import invoice_cdk.lambdas.tapetes_contexto as tapetes_contexto
+
+VENTA = {"sucursal": "378", "detalle": [{"claveunidad": "H87"}, {"claveunidad": "KGM"}, {"claveunidad": "H87"}]}
+
+
+def respuesta(datos, status_code=200):
+    return MagicMock(status_code=status_code, json=MagicMock(return_value=datos))
+
+
+@pytest.fixture(autouse=True)
+def sesion(monkeypatch):
+    """Tapetes stand-in: every test starts without a cached token"""
+    monkeypatch.setattr(tapetes_contexto.Constants, "APPLICATION_JSON", "application/json", raising=False)
+    sesion = MagicMock()
+    monkeypatch.setattr(tapetes_contexto, "_sesion", sesion)
+    tapetes_contexto.invalida_token()
+    yield sesion
+    tapetes_contexto.invalida_token()
+
+
+def rutas(sesion, ticket=None, token_status=None):
+    """Routes POSTs to /token or /tickets"""
+    def post(url, **kwargs):
+        if url.endswith("token"):
+            return respuesta({"access_token": f"tok{sesion.post.call_count}", "expires_in": 3600})
+        status = token_status.pop(0) if token_status else 200
+        return respuesta(copy.deepcopy(ticket) if status == 200 else {"detail": "Not authenticated"}, status)
+    sesion.post.side_effect = post
+
+
+def llamadas(sesion, ruta):
+    return [c for c in sesion.post.call_args_list if c.args[0].endswith(ruta)]
+
+
+class TestToken:
+    """Unit tests for the cached Tapetes token"""
+
+    def test_token_is_reused_until_it_expires(self, sesion):
+        rutas(sesion)
+
+        assert tapetes_contexto.obten_token() == tapetes_contexto.obten_token()
+
+        assert len(llamadas(sesion, "token")) == 1
+
+    def test_expired_ticket_token_is_renewed_once(self, sesion):
+        rutas(sesion, ticket={"ok": True}, token_status=[401, 200])
+
+        assert tapetes_contexto.consulta_ticket("T1", "viejo") == {"ok": True}
+
+        assert len(llamadas(sesion, "token")) == 1
+        assert llamadas(sesion, "tickets")[1].kwargs["headers"]["Authorization"].startswith("Bearer tok")
+
+
+@patch('invoice_cdk.lambdas.tapetes_contexto.get_descripciones_by_claves')
+@patch('invoice_cdk.lambdas.tapetes_contexto.get_sucursal_con_certificado')
+class TestResuelveContexto:
+    """Unit tests for the ticket context resolver"""
+
+    def test_resolves_sucursal_certificate_and_units_once(self, mock_sucursal, mock_unidades, sesion):
+        rutas(sesion, ticket=VENTA)
+        mock_sucursal.return_value = ({"_id": "abc", "codigo_sucursal": "378"}, {"_id": "c1", "rfc": "EKU9003173C9"})
+        mock_unidades.return_value = {"H87": "Pieza", "KGM": "Kilogramo"}
+        sucursales, medidas = MagicMock(), MagicMock()
+
+        contexto, tiempos = tapetes_contexto.resuelve_contexto("T1", sucursales, medidas)
+
+        assert [item["unidad"] for item in contexto["venta"]["detalle"]] == ["Pieza", "Kilogramo", "Pieza"]
+        assert contexto["certificado"]["rfc"] == "EKU9003173C9"
+        mock_sucursal.assert_called_once_with("378", sucursales)
+        mock_unidades.assert_called_once_with(["H87", "KGM", "H87"], medidas)
+        assert set(tiempos) == {"token", "ticket", "sucursal_certificado", "unidades", "total"}
+
+    def test_cached_token_skips_token_request(self, mock_sucursal, mock_unidades, sesion):
+        rutas(sesion, ticket=VENTA)
+        mock_sucursal.return_value = ({"_id": "abc"}, {"_id": "c1"})
+        mock_unidades.return_value = {}
+
+        tapetes_contexto.resuelve_contexto("T1", MagicMock(), MagicMock())
+        tapetes_contexto.resuelve_contexto("T2", MagicMock(), MagicMock())
+
+        assert len(llamadas(sesion, "token")) == 1
+        assert len(llamadas(sesion, "tickets")) == 2
+
+    @pytest.mark.parametrize("venta,resultado,mensaje", [
+        ({"detail": "Ticket no encontrado"}, None, "Ticket no encontrado"),
+        (VENTA, (None, None), tapetes_contexto.MENSAJE_SUCURSAL),
+        (VENTA, ({"_id": "abc"}, None), tapetes_contexto.MENSAJE_CERTIFICADO),
+    ])
+    def test_missing_context_raises(self, mock_sucursal, mock_unidades, sesion, venta, resultado, mensaje):
+        rutas(sesion, ticket=venta)
+        mock_sucursal.return_value = resultado
+        mock_unidades.return_value = {}
+
+        with pytest.raises(tapetes_contexto.ContextoNoEncontrado, match=mensaje):
+            tapetes_contexto.resuelve_contexto("T1", MagicMock(), MagicMock())
+
+    @patch('invoice_cdk.lambdas.tapetes_contexto.guarda_snapshot')
+    @patch('invoice_cdk.lambdas.tapetes_contexto.obtiene_snapshot')
+    def test_snapshot_hit_skips_tapetes(self, mock_obtiene, mock_guarda, mock_sucursal, mock_unidades, sesion):
+        mock_obtiene.return_value = {"venta": {**VENTA, "detalle": []}}
+        mock_sucursal.return_value = ({"_id": "abc"}, {"_id": "c1"})
+        mock_unidades.return_value = {}
+        snapshots = MagicMock()
+
+        contexto, tiempos = tapetes_contexto.resuelve_contexto("T1", MagicMock(), MagicMock(), snapshots)
+
+        sesion.post.assert_not_called()
+        mock_guarda.assert_not_called()
+        mock_obtiene.assert_called_once_with("T1", snapshots, {"venta": 1})
+        assert contexto["venta"]["sucursal"] == "378"
+        assert "snapshot" in tiempos and "ticket" not in tiempos
+
+    @patch('invoice_cdk.lambdas.tapetes_contexto.guarda_snapshot')
+    @patch('invoice_cdk.lambdas.tapetes_contexto.obtiene_snapshot')
+    def test_snapshot_miss_stores_the_raw_venta(self, mock_obtiene, mock_guarda, mock_sucursal, mock_unidades, sesion):
+        rutas(sesion, ticket=VENTA)
+        mock_obtiene.return_value = None
+        mock_sucursal.return_value = ({"_id": "abc"}, {"_id": "c1"})
+        mock_unidades.return_value = {"H87": "Pieza"}
+        snapshots = MagicMock()
+
+        contexto, _ = tapetes_contexto.resuelve_contexto("T1", MagicMock(), MagicMock(), snapshots)
+
+        ticket, guardada, coleccion = mock_guarda.call_args.args
+        assert (ticket, coleccion) == ("T1", snapshots)
+        assert "unidad" not in guardada["detalle"][0]
+        assert contexto["venta"]["detalle"][0]["unidad"] == "Pieza"
+
+    @patch('invoice_cdk.lambdas.tapetes_contexto.obtiene_snapshot')
+    def test_snapshot_errors_fall_back_to_tapetes(self, mock_obtiene, mock_sucursal, mock_unidades, sesion):
+        rutas(sesion, ticket=VENTA)
+        mock_obtiene.side_effect = RuntimeError("mongo caído")
+        mock_sucursal.return_value = ({"_id": "abc"}, {"_id": "c1"})
+        mock_unidades.return_value = {}
+
+        with patch('invoice_cdk.lambdas.tapetes_contexto.guarda_snapshot', side_effect=RuntimeError("mongo caído")):
+            contexto, _ = tapetes_contexto.resuelve_contexto("T1", MagicMock(), MagicMock(), MagicMock())
+
+        assert len(llamadas(sesion, "tickets")) == 1
+        assert contexto["sucursal"]["_id"] == "abc"
+
+    def test_server_timing_header(self, mock_sucursal, mock_unidades):
+        assert tapetes_contexto.server_timing({"token": 0.5, "total": 12.25}) == "token;dur=0.5, total;dur=12.25"
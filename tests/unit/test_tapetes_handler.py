@@ -0,0 +1,42 @@
+"""
+Unit tests for tapetes_handler.
+These tests use mocks and do not require a database connection.
+"""
+import json
+from http import HTTPStatus
+from unittest.mock import patch
+
+import invoice_cdk.lambdas.tapetes_handler as tapetes_handler
+
+EVENT = {"httpMethod": "GET", "pathParameters": {"ticket": "T1"}, "headers": {"origin": "http://localhost:3000"}}
+
+
+class TestTapetesHandler:
+
+    @patch('invoice_cdk.lambdas.tapetes_handler.resuelve_contexto')
+    def test_returns_context_with_server_timing(self, mock_resuelve):
+        mock_resuelve.return_value = ({"venta": {}, "certificado": {}, "sucursal": {}}, {"ticket": 3.0, "total": 5.0})
+
+        response = tapetes_handler.handler(EVENT, {})
+
+        assert response["statusCode"] == HTTPStatus.OK
+        assert set(json.loads(response["body"])) == {"venta", "certificado", "sucursal"}
+        assert response["headers"]["Server-Timing"] == "ticket;dur=3.0, total;dur=5.0"
+        mock_resuelve.assert_called_once_with(
+            "T1", tapetes_handler.sucursal_collection, tapetes_handler.medidas_collection,
+            tapetes_handler.ticket_snapshot_collection)
+
+    @patch('invoice_cdk.lambdas.tapetes_handler.resuelve_contexto')
+    def test_missing_context_is_not_found(self, mock_resuelve):
+        mock_resuelve.side_effect = tapetes_handler.ContextoNoEncontrado("Sucursal no encontrada")
+
+        response = tapetes_handler.handler(EVENT, {})
+
+        assert response["statusCode"] == HTTPStatus.NOT_FOUND
+        assert json.loads(response["body"]) == {"message": "Sucursal no encontrada"}
+
+    @patch('invoice_cdk.lambdas.tapetes_handler.resuelve_contexto')
+    def test_unexpected_error_is_500(self, mock_resuelve):
+        mock_resuelve.side_effect = RuntimeError("Tapetes caído")
+
+        assert tapetes_handler.handler(EVENT, {})["statusCode"] == HTTPStatus.INTERNAL_SERVER_ERROR